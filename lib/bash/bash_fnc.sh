@@ -83,6 +83,31 @@ assert_normal_exit_status() {
   fi
 }
 
+# Collect the python profile sidecars of a pipeline run, when NGS_PROFILE=1, in a new directory
+# named after the output prefix of the run.  Pipelines run by an enclosing pipeline keep its directory
+ngs_profile_init() {
+    # $1: Output prefix of the pipeline run
+    if [ "$NGS_PROFILE" == "1" ] && [ -z "$NGS_PROFILE_DIR" ]; then
+	export NGS_PROFILE_DIR=`readlink -m $1`.profile/`date +%Y%m%d.%H%M%S`.$$
+	mkdir -p $NGS_PROFILE_DIR
+	NGS_PROFILE_RUN_DIR=$NGS_PROFILE_DIR
+    fi
+}
+
+# Summarize the python profile sidecars of a pipeline run, if ngs_profile_init created its directory
+ngs_profile_report() {
+    # $1: Comma-separated ids of the jobs to wait for, to submit the summary with qsub.  Optional
+    if [ -z "$NGS_PROFILE_RUN_DIR" ]; then
+	return
+    fi
+    if [ -n "$1" ]; then
+	$NGS_ANALYSIS_DIR/modules/util/qsub_wrapper.sh profile.report all.q 1 $1 n \
+	    $NGS_ANALYSIS_DIR/modules/util/ngs_profile_report.sh $NGS_PROFILE_RUN_DIR
+    else
+	$NGS_ANALYSIS_DIR/modules/util/ngs_profile_report.sh $NGS_PROFILE_RUN_DIR
+    fi
+}
+
 # Check number of input parameters.  If incorrect, output usage information
 # Checks to see if the number of parameters is == number of needed parameters
 usage() {
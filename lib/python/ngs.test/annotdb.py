@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from ngs import annotdb
+
+class TestAnnotDb(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'annot.db')
+        g2t = StringIO('GENE_A\tENSG1\tENST1\n'
+                       'GENE_A\tENSG1\tENST2\n'
+                       '\n'
+                       'GENE_B\tENSG2\tENST3\n')
+        conn = annotdb.connect(self.db_path)
+        self.table2count = annotdb.load_tables(conn, {
+            'gene2transcript': annotdb.read_tsv_rows(g2t, 3),
+            'transcript_length': [('ENST1', '100'), ('ENST2', 250)],
+            'exon': [('1', 200, 300, 'ENST1', 2), ('1', 10, 50, 'ENST1', 1)],
+            'gene2entrez': annotdb.read_tsv_rows(StringIO('GENE_A\t123\nGENE_B\t\n'), 2)})
+        self.journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_load_tables(self):
+        self.assertTrue(annotdb.is_annotdb(self.db_path))
+        self.assertEqual(self.journal_mode, 'wal')
+        self.assertEqual(self.table2count, {'gene2transcript': 3,
+                                            'transcript_length': 2,
+                                            'exon': 2,
+                                            'gene2entrez': 1})
+        conn = annotdb.connect(self.db_path)
+        self.assertRaises(ValueError, annotdb.load_tables, conn, {'foo': []})
+        # Failed loads are rolled back
+        self.assertRaises(Exception, annotdb.load_tables, conn, {'gene2entrez': [('GENE_A',)]})
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM gene2entrez').fetchone()[0], 1)
+        conn.close()
+
+    def test_lookups(self):
+        with annotdb.AnnotDb(self.db_path, cache_size=2) as annot:
+            self.assertEqual(annot.transcript2gene('ENST3'), 'GENE_B')
+            self.assertEqual(annot.transcript2gene('ENST9'), None)
+            self.assertEqual(sorted(annot.gene2transcripts('GENE_A')), ['ENST1', 'ENST2'])
+            self.assertEqual(annot.gene2transcripts('GENE_C'), [])
+            self.assertEqual(annot.transcript_length('ENST1'), 100)
+            self.assertEqual(annot.gene2entrez('GENE_A'), '123')
+            self.assertEqual(annot.exons('ENST1'), [('1', 10, 50, 1), ('1', 200, 300, 2)])
+            self.assertEqual(annot.load_dict('gene2transcript', 'transcript_id', 'gene_name'),
+                             {'ENST1': 'GENE_A', 'ENST2': 'GENE_A', 'ENST3': 'GENE_B'})
+            self.assertRaises(ValueError, annot.load_dict, 'gene2entrez', 'gene_name', 'foo')
+
+            t2l = annot.lookup('transcript_length')
+            self.assertTrue('ENST2' in t2l)
+            self.assertFalse('ENST3' in t2l)
+            self.assertEqual(t2l['ENST2'], 250)
+            self.assertRaises(KeyError, t2l.__getitem__, 'ENST3')
+            self.assertEqual(t2l.get('ENST3', 0), 0)
+            self.assertRaises(ValueError, annot.lookup, 'foo')
+
+            cache = annot.name2cache['transcript_length']
+            self.assertEqual(len(cache), 2)
+            self.assertTrue(cache.hits > 0)
+
+    def test_lru_cache(self):
+        cache = annotdb.LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -137,6 +137,48 @@ class TestAnnovarCsv(unittest.TestCase):
                 count += 1
             self.assertEqual(count, 2)
 
+    def test_filtered_variants_batch(self):
+        ff = self.filter_factory
+        filter_sets = [[],
+                       [ff.create_genes_filter(set(['SAMD11']))],
+                       [ff.create_genes_selector(set(['SAMD11'])), ff.create_dbSNP_filter()],
+                       [ff.create_dbSNP_selector()],
+                       [ff.create_polyphen_pred_selector(set(['D']))],
+                       [ff.create_sift_pred_selector(set(['T']))],
+                       [ff.create_1000Genomes_maf_selector(equalval=0.04)],
+                       [ff.create_1000Genomes_maf_selector(minval=0.44, maxval=1)],
+                       [ff.create_1000Genomes_maf_selector(maxval=0.44)]]
+        for filters in filter_sets:
+            results = []
+            for batch in (False, True):
+                with open(self.annovar_csv_file, 'r') as f:
+                    reader = annovar.AnnovarCsv(f)
+                    for filter in filters:
+                        reader.add_filter(filter)
+                    if batch:
+                        results.append(list(reader.filtered_variants_batch(chunk_size=2)))
+                    else:
+                        results.append(list(reader.filtered_variants()))
+            self.assertEqual(results[0], results[1])
+
+    def test_filter_short_circuit(self):
+        tested = []
+        class CountingFilter(annovar.AnnovarCsvFilter):
+            def pass_test(self, colname2val):
+                tested.append(colname2val['Gene'])
+                return True
+        with open(self.annovar_csv_file, 'r') as f:
+            reader = annovar.AnnovarCsv(f)
+            reader.add_filter(self.filter_factory.create_genes_selector(set(['NOC2L'])))
+            reader.add_filter(CountingFilter())
+            self.assertEqual(len(list(reader.filtered_variants())), 1)
+        self.assertEqual(tested, ['NOC2L'])
+        # Filters without columns are evaluated row by row in batch mode
+        with open(self.annovar_csv_file, 'r') as f:
+            reader = annovar.AnnovarCsv(f)
+            reader.add_filter(CountingFilter())
+            self.assertEqual(len(list(reader.filtered_variants_batch())), 3)
+
     def test_count(self):
         with open(self.annovar_csv_file, 'r') as f:
             reader = annovar.AnnovarCsv(f)
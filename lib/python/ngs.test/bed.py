@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import os
+import unittest
+from ngs import bed
+
+RESOURCE_DIR = 'resources'
+EXAMPLE_BED = 'example.bed'
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.example_bed = os.path.join(RESOURCE_DIR, EXAMPLE_BED)
+        with open(self.example_bed, 'r') as f:
+            self.index = bed.IntervalIndex.from_bed(f)
+
+    def test_read_bed(self):
+        with open(self.example_bed, 'r') as f:
+            records = list(bed.read_bed(f))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0], bed.BedRecord('chr1', 100, 200, 'GENE_A'))
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.chroms(), ['chr1', 'chr2'])
+
+    def test_overlap(self):
+        self.assertTrue(self.index.overlaps('chr1', 110, 111))
+        self.assertFalse(self.index.overlaps('chr1', 300, 500))
+        self.assertFalse(self.index.overlaps('chr3', 0, 1000))
+        names = [r.name for r in self.index.overlap_records('chr1', 110, 160)]
+        self.assertEqual(names, ['GENE_C', 'GENE_A', 'GENE_A'])
+        names = [r.name for r in self.index.overlap_records('chr1', 250, 550)]
+        self.assertEqual(names, ['GENE_A', 'GENE_B'])
+        self.assertEqual(self.index.overlap_records('chr1', 0, 50), [])
+
+    def test_nearest(self):
+        rec, dist = self.index.nearest('chr1', 120, 121)
+        self.assertEqual(dist, 0)
+        rec, dist = self.index.nearest('chr1', 310, 311)
+        self.assertEqual((rec.name, dist), ('GENE_A', 11))
+        rec, dist = self.index.nearest('chr1', 490, 491)
+        self.assertEqual((rec.name, dist), ('GENE_B', 10))
+        rec, dist = self.index.nearest('chr2', 0, 10)
+        self.assertEqual((rec.name, dist), ('GENE_D', 991))
+        self.assertEqual(self.index.nearest('chr3', 0, 10), (None, None))
+
+    def test_merge_coverage(self):
+        merged = list(self.index.merge().records())
+        self.assertEqual(merged, [bed.BedRecord('chr1', 50, 300, None),
+                                  bed.BedRecord('chr1', 500, 600, None),
+                                  bed.BedRecord('chr2', 1000, 2000, None)])
+        self.assertEqual(self.index.coverage('chr1', 0, 1000), 350)
+        self.assertEqual(self.index.coverage('chr1', 250, 550), 100)
+        self.assertEqual(self.index.coverage('chr2', 0, 10), 0)
+        self.assertEqual(self.index.total_length(), 1350)
+
+    def test_merge_intervals(self):
+        self.assertEqual(bed.merge_intervals([(50, 60), (0, 10), (10, 20), (5, 8), (30, 40), (35, 45)]),
+                         [(0, 20), (30, 45), (50, 60)])
+        self.assertEqual(bed.merge_intervals([]), [])
+
+    def test_read_group(self):
+        grouped_bed = os.path.join(RESOURCE_DIR, 'example.grouped.test.bed')
+        with open(grouped_bed, 'w') as f:
+            f.write('chr1\t1\t2\tA\nchr1\t5\t6\tA\nchr2\t1\t2\tB\n')
+        with open(grouped_bed + bed.GROUP_INDEX_EXT, 'w') as f:
+            f.write('A\t0\t22\nB\t22\t11\n')
+        with open(grouped_bed + bed.GROUP_INDEX_EXT, 'r') as f:
+            name2offset = bed.load_group_index(f)
+        self.assertEqual(name2offset, {'A': (0, 22), 'B': (22, 11)})
+        with open(grouped_bed, 'r') as f:
+            self.assertEqual(bed.read_group(f, *name2offset['B']), ['chr2\t1\t2\tB\n'])
+            self.assertEqual(len(bed.read_group(f, *name2offset['A'])), 2)
+        os.remove(grouped_bed)
+        os.remove(grouped_bed + bed.GROUP_INDEX_EXT)
+
+
+if __name__ == '__main__':
+    unittest.main()
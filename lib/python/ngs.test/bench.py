@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+from ngs import annovar, bench, fastq, seq, vcf
+
+class TestBench(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_generators_seeded(self):
+        outputs = []
+        for seed in [0, 0, 1]:
+            fout = StringIO()
+            bench.generate_varscan_snpeff_vcf(fout, 50, seed=seed)
+            outputs.append(fout.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertNotEqual(outputs[0], outputs[2])
+
+    def test_generated_vcf(self):
+        filename = bench.generate_input(self.tmpdir, 'vcf', 100)
+        self.assertEqual(bench.count_records('vcf', filename), 100)
+        with vcf.SnpEffVcfFile(filename, 'r') as vcffile:
+            vcffile.jump2variants()
+            self.assertEqual(vcffile.get_sample_names(), ['NORMAL', 'TUMOR'])
+            for line in vcffile:
+                variant = vcffile.parse_line(line)
+                self.assertTrue(len(vcffile.parse_effects(variant)) >= 1)
+                self.assertEqual(vcffile.get_sample_gt(variant, 'NORMAL'), '%s/%s' % ((variant['REF'],) * 2))
+
+    def test_generated_fastq(self):
+        filename = bench.generate_input(self.tmpdir, 'fastq', 100)
+        self.assertTrue(os.path.exists(filename.replace('_R1_', '_R2_')))
+        self.assertEqual(fastq.IlluminaFastqFile.parse_filename(filename + '.gz').read, 'R1')
+        readcount, basecount, length_hist = seq.FastqStats(filename).get_seqstats()
+        self.assertEqual(readcount, 100)
+        self.assertTrue(length_hist[100] < 100)
+        with open(filename, 'r') as f1, open(filename.replace('_R1_', '_R2_'), 'r') as f2:
+            rec1, rec2 = fastq.FastqFilePairs(f1, f2).next()
+        self.assertEqual(rec1[0].split()[0], rec2[0].split()[0])
+        self.assertEqual(len(rec1[1]), len(rec1[3]))
+
+    def test_generated_annovar(self):
+        filename = bench.generate_input(self.tmpdir, 'annovar', 100)
+        with open(filename, 'r') as f:
+            annovarcsv = annovar.AnnovarCsv(f)
+            self.assertEqual(annovarcsv.header[:2], ['Func', 'Gene'])
+            self.assertEqual(len(list(annovarcsv)), 100)
+
+    def test_run_benchmarks(self):
+        results = bench.run_benchmarks(self.tmpdir, names=['vcf_parse_effects', 'maf_gene', 'fastq_stats'],
+                                       scale=0.002)
+        self.assertEqual(results['sizes'], {'vcf': 100, 'maf': 40, 'fastq': 200})
+        for name in ['vcf_parse_effects', 'maf_gene', 'fastq_stats']:
+            result = results['benchmarks'][name]
+            self.assertTrue('error' not in result, result)
+            self.assertTrue(result['records'] > 0 and result['peak_rss_kb'] > 0)
+        self.assertRaises(ValueError, bench.run_benchmarks, self.tmpdir, names=['foo'])
+
+    def test_measure_error(self):
+        m = bench.measure(int, 'x')
+        self.assertTrue(m.error.startswith('ValueError'))
+        self.assertEqual(bench.measure(sys.exit, 3).error, 'SystemExit: 3')
+        # A child that dies without a result
+        m = bench.measure(lambda: os.kill(os.getpid(), signal.SIGKILL))
+        self.assertEqual(m.error, 'Benchmark process killed by signal %i' % signal.SIGKILL)
+
+    def test_compare_results(self):
+        baseline = {'benchmarks': {'a': {'records_per_sec': 100.0, 'peak_rss_kb': 1000},
+                                   'b': {'records_per_sec': 100.0, 'peak_rss_kb': 1000}}}
+        results = {'benchmarks': {'a': {'records_per_sec': 95.0, 'peak_rss_kb': 1050},
+                                  'b': {'records_per_sec': 80.0, 'peak_rss_kb': 1200},
+                                  'c': {'error': 'ImportError: No module named Bio'}}}
+        self.assertEqual(bench.compare_results(baseline, results, tolerance=0.1),
+                         [('b', 'records_per_sec', 100.0, 80.0), ('b', 'peak_rss_kb', 1000, 1200)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import gzip
 import os
 import unittest
 from ngs import filesys
@@ -37,6 +38,28 @@ class TestFilesysFunctions(unittest.TestCase):
 
         # Test that they are all equal
         self.assertTrue(d == d_or and d == d_gz and d == d_zip)
+
+    def test_compressed_chunks(self):
+        data = 'abc\t123\n' * 20000
+        out_file = os.path.join(RESOURCE_DIR, 'example.compressed.test.gz')
+
+        # Concatenated gzip members
+        with open(out_file, 'wb') as f:
+            f.write(filesys.gzip_compress(data))
+            f.write(filesys.gzip_compress(data))
+        f = gzip.GzipFile(out_file, 'r')
+        self.assertEqual(f.read(), data + data)
+        f.close()
+
+        # Concatenated bgzf blocks followed by the eof marker
+        with open(out_file, 'wb') as f:
+            f.write(filesys.bgzf_compress(data))
+            f.write(filesys.bgzf_compress(data))
+            f.write(filesys.BGZF_EOF)
+        f = gzip.GzipFile(out_file, 'r')
+        self.assertEqual(f.read(), data + data)
+        f.close()
+        os.remove(out_file)
         
 
 if __name__ == '__main__':
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import os
+import unittest
+from ngs import bed, gtf
+
+RESOURCE_DIR = 'resources'
+
+GTF_LINES = ['1\tprotein_coding\texon\t101\t200\t.\t+\t.\tgene_id "G1"; transcript_id "T1"; exon_number "1"; gene_name "GENE_A";\n',
+             '1\tprotein_coding\tCDS\t151\t200\t.\t+\t0\tgene_id "G1"; transcript_id "T1"; exon_number "1"; gene_name "GENE_A";\n',
+             '1\tprotein_coding\texon\t301\t400\t.\t+\t.\tgene_id "G1"; transcript_id "T1"; exon_number "2"; gene_name "GENE_A";\n',
+             '1\tprotein_coding\texon\t151\t250\t.\t+\t.\tgene_id "G1"; transcript_id "T2"; exon_number "1"; gene_name "GENE_A";\n',
+             '2\tlincRNA\texon\t11\t20\t.\t-\t.\tgene_id "G2"; transcript_id "T3"; exon_number "1"; gene_name "GENE_B";\n',
+             '1\tlincRNA\texon\t1001\t1100\t.\t-\t.\tgene_id "G3"; transcript_id "T4"; exon_number "1"; gene_name "GENE_C";\n']
+
+def chrom_filter(chrom):
+    return chrom != '2'
+
+class TestGtf(unittest.TestCase):
+
+    def setUp(self):
+        self.summary = gtf.GtfSummary().scan(GTF_LINES)
+
+    def test_parse_line(self):
+        record = gtf.parse_line(GTF_LINES[0])
+        self.assertEqual((record.chrom, record.feature, record.start, record.end), ('1', 'exon', 100, 200))
+        self.assertEqual(record.attributes, {'gene_id': 'G1',
+                                             'transcript_id': 'T1',
+                                             'exon_number': '1',
+                                             'gene_name': 'GENE_A'})
+        self.assertTrue(record.attributes['gene_name'] is gtf.parse_line(GTF_LINES[2]).attributes['gene_name'])
+
+    def test_summary(self):
+        self.assertEqual(self.summary.genes(), [bed.BedRecord('1', 100, 400, 'GENE_A'),
+                                                bed.BedRecord('1', 1000, 1100, 'GENE_C'),
+                                                bed.BedRecord('2', 10, 20, 'GENE_B')])
+        self.assertEqual(self.summary.transcripts()[:2], [bed.BedRecord('1', 100, 400, 'GENE_A_T1'),
+                                                          bed.BedRecord('1', 150, 250, 'GENE_A_T2')])
+        self.assertEqual(self.summary.transcript_exons()[:3], [bed.BedRecord('1', 100, 200, 'GENE_A_T1'),
+                                                               bed.BedRecord('1', 150, 250, 'GENE_A_T2'),
+                                                               bed.BedRecord('1', 300, 400, 'GENE_A_T1')])
+        self.assertEqual(self.summary.gene_exons()[:2], [bed.BedRecord('1', 100, 250, 'GENE_A'),
+                                                         bed.BedRecord('1', 300, 400, 'GENE_A')])
+        self.assertEqual(self.summary.transcript_lengths(), {'T1': 200, 'T2': 100, 'T3': 10, 'T4': 100})
+        self.assertEqual(self.summary.gene2transcript(), [('GENE_A', 'G1', 'T1'),
+                                                          ('GENE_A', 'G1', 'T2'),
+                                                          ('GENE_B', 'G2', 'T3'),
+                                                          ('GENE_C', 'G3', 'T4')])
+
+    def test_transcript_table(self):
+        table = self.summary.transcript_table()
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table['T1'], 200)
+        self.assertEqual(table.get('T9', 0), 0)
+        self.assertTrue('T2' in table)
+        self.assertEqual(table.exons('T1'), [(100, 200), (300, 400)])
+        self.assertEqual(table.exons('T4'), [(1000, 1100)])
+        self.assertEqual(table.transcripts[table.get_id('T3')], 'T3')
+        table = gtf.TranscriptTable.from_lengths_file(['T1\t10\n', 'T2\t\n', 'T3\t30\n'])
+        self.assertEqual((len(table), table['T3'], table.exons('T3')), (2, 30, []))
+
+    def test_chrom_filter_rename(self):
+        summary = gtf.GtfSummary(lambda c: 'chr' + c).scan(GTF_LINES, chrom_filter)
+        self.assertEqual([r.chrom for r in summary.genes()], ['chr1', 'chr1'])
+
+        # Transcripts of the filtered out chromosomes are only listed in gene2transcript
+        summary = gtf.GtfSummary(chrom_filter=chrom_filter).scan(GTF_LINES)
+        self.assertEqual(sorted(summary.transcript_lengths()), ['T1', 'T2', 'T4'])
+        self.assertEqual(summary.gene2transcript(), self.summary.gene2transcript())
+
+    def test_summarize_parallel(self):
+        gtf_file = os.path.join(RESOURCE_DIR, 'example.test.gtf')
+        with open(gtf_file, 'w') as f:
+            f.write(''.join(GTF_LINES))
+        with open(gtf_file, 'r') as f:
+            self.assertEqual([run[0] for run in gtf.chrom_runs(f)], ['1', '2', '1'])
+        summary = gtf.summarize_parallel(gtf_file, processes=2)
+        filtered = gtf.summarize_parallel(gtf_file, processes=2, chrom_filter=chrom_filter)
+        os.remove(gtf_file)
+        self.assertEqual([r.chrom for r in filtered.genes()], ['1', '1'])
+        self.assertEqual(filtered.gene2transcript(), self.summary.gene2transcript())
+        self.assertEqual(summary.transcript_exons(), self.summary.transcript_exons())
+        self.assertEqual(summary.genes(), self.summary.genes())
+        self.assertEqual(summary.gene2transcript(), self.summary.gene2transcript())
+
+
+if __name__ == '__main__':
+    unittest.main()
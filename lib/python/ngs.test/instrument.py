@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from StringIO import StringIO
+from ngs import instrument, maf, vcf
+
+RESOURCE_DIR = 'resources'
+EXAMPLE_MAF = 'example.maf'
+
+class TestInstrument(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        instrument.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_inactive(self):
+        lines = ['a\n', 'b\n']
+        fout = StringIO()
+        self.assertTrue(instrument.active() is None)
+        self.assertTrue(instrument.timed(lines, 'read') is lines)
+        self.assertTrue(instrument.timed_writer(fout) is fout)
+        with instrument.stage('parse'):
+            instrument.count('records')
+
+    def test_exclusive_stages(self):
+        instrument.start('test')
+
+        def slow(items, seconds):
+            for item in items:
+                time.sleep(seconds)
+                yield item
+
+        # Each layer of a chain of generators gets its own time
+        lines = instrument.timed(slow(['a\n', 'bb\n'], 0.02), 'read')
+        records = instrument.timed(slow(lines, 0.01), 'parse')
+        fout = instrument.timed_writer(StringIO())
+        for record in records:
+            fout.write(record)
+        report = instrument.stop(0).report
+        self.assertTrue(instrument.active() is None)
+        self.assertTrue(0.04 <= report['stages']['read'] < 0.1, report['stages'])
+        self.assertTrue(0.02 <= report['stages']['parse'] < 0.04, report['stages'])
+        self.assertEqual(report['counters'], {'read_records': 2, 'read_bytes': 5,
+                                              'parse_records': 2, 'parse_bytes': 5,
+                                              'write_bytes': 5})
+        self.assertEqual(fout.getvalue(), 'a\nbb\n')
+        self.assertTrue(report['wall_seconds'] >= sum(report['stages'].values()) - 0.001)
+        self.assertTrue(report['peak_rss_kb'] > 0)
+
+    def test_library_stages(self):
+        instrument.start('test')
+        lines = ['##fileformat=VCFv4.1\n',
+                 '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNORMAL\tTUMOR\n']
+        lines += ['chr1\t%i\t.\tA\t+AT\t.\tPASS\tSS=2\tGT\t0/0\t0/1\n' % pos for pos in xrange(5)]
+        vcf.run_stages(lines, StringIO(), [vcf.varscan_clean_indel])
+        with maf.MafFile(os.path.join(RESOURCE_DIR, EXAMPLE_MAF), 'r') as maffile:
+            maffile.generate_pos_report(fout=StringIO())
+        report = instrument.stop().report
+        self.assertEqual(report['counters']['transform_records'], 5)
+        self.assertTrue(report['counters']['parse_records'] > 5)
+        self.assertTrue(report['counters']['write_bytes'] > 0)
+        self.assertTrue(set(['read', 'parse', 'transform', 'write', 'other']) <= set(report['stages']))
+
+    def test_sidecar(self):
+        prof = instrument.start('tool.py', ['tool.py', '-a'], sample_interval=0.001)
+        start = time.clock()
+        while time.clock() - start < 0.1:
+            pass
+        instrument.stop('Exiting')
+        sidecar = instrument.sidecar_path('tool.py', self.tmpdir)
+        self.assertTrue(os.path.basename(sidecar).startswith('tool.'))
+        prof.write(sidecar)
+        with open(sidecar, 'r') as f:
+            report = json.load(f)
+        self.assertEqual((report['tool'], report['exit_status']), ('tool.py', 1))
+        self.assertTrue(report['samples']['total'] > 0)
+        self.assertTrue(os.path.exists(sidecar.replace(instrument.SIDECAR_SUFFIX, instrument.SAMPLES_SUFFIX)))
+
+        rows, functions = instrument.summarize_reports([report, report])
+        self.assertEqual(rows[0][:3], ['tool.py', 2, 2])
+        self.assertTrue(functions[0][1] > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
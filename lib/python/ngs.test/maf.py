@@ -3,6 +3,7 @@
 import os
 import sys
 import unittest
+from StringIO import StringIO
 from ngs import maf
 
 RESOURCE_DIR = 'resources'
@@ -76,5 +77,81 @@ class TestMafFileFunctions(unittest.TestCase):
         self.assertEqual(report_gene, report_gene_test)
 
 
+class TestMafCohortStore(unittest.TestCase):
+
+    def setUp(self):
+        # Example maf, with the transcript_name and amino_acid_change columns
+        with open(os.path.join(RESOURCE_DIR, EXAMPLE_MAF), 'r') as f:
+            self.lines = [line.rstrip('\n') for line in f]
+        self.lines = ['%s\t%s\n' % (line, extra)
+                      for line, extra in zip(self.lines,
+                                             ['transcript_name\tamino_acid_change'] +
+                                             ['T%i\tp.X%iY' % (i, i) for i in xrange(len(self.lines) - 1)])]
+        self.tmp_maf = os.path.join(RESOURCE_DIR, 'example.cohort.test.maf')
+
+    def tearDown(self):
+        if os.path.exists(self.tmp_maf):
+            os.remove(self.tmp_maf)
+
+    def sample_lines(self, sample):
+        return [line for line in self.lines[1:] if line.split('\t')[15] == sample]
+
+    def maf_reports(self, lines):
+        with open(self.tmp_maf, 'w') as f:
+            f.write(''.join(lines))
+        reports = []
+        for method, kwargs in (('generate_pos_report', {'detailed': False}),
+                               ('generate_pos_report', {'detailed': True}),
+                               ('generate_gene_report', {})):
+            out = StringIO()
+            with maf.MafFile(self.tmp_maf, 'r') as maffile:
+                getattr(maffile, method)(fout=out, **kwargs)
+            reports.append(out.getvalue())
+        return reports
+
+    def store_reports(self, store):
+        reports = []
+        for method, kwargs in (('generate_pos_report', {'detailed': False}),
+                               ('generate_pos_report', {'detailed': True}),
+                               ('generate_gene_report', {})):
+            out = StringIO()
+            getattr(store, method)(fout=out, **kwargs)
+            reports.append(out.getvalue())
+        return reports
+
+    def assertReportsEqual(self, store_reports, maf_reports):
+        self.assertEqual(store_reports[:2], maf_reports[:2])
+        # Gene report rows are sorted by the store
+        store_gene = store_reports[2].splitlines()
+        maf_gene = maf_reports[2].splitlines()
+        self.assertEqual(store_gene[0], maf_gene[0])
+        self.assertEqual(store_gene[1:], sorted(maf_gene[1:]))
+
+    def test_add_remove_samples(self):
+        store = maf.MafCohortStore()
+        self.assertEqual(store.add_samples(self.lines[:1] + self.sample_lines('s1')), ['s1'])
+        self.assertEqual(store.add_samples(self.sample_lines('s2') + self.sample_lines('s3')), ['s2', 's3'])
+        self.assertReportsEqual(self.store_reports(store), self.maf_reports(self.lines))
+        self.assertRaises(ValueError, store.add_samples, self.sample_lines('s1'))
+
+        # Persisted store
+        store_file = os.path.join(RESOURCE_DIR, 'example.cohort.test.store')
+        store.save(store_file)
+        store = maf.MafCohortStore.load(store_file)
+        os.remove(store_file)
+
+        # Removal, and replacement
+        store.remove_sample('s2')
+        self.assertEqual(store.samples.samples(), ['s1', 's3'])
+        self.assertReportsEqual(self.store_reports(store),
+                                self.maf_reports(self.lines[:1] + self.sample_lines('s1') + self.sample_lines('s3')))
+        self.assertRaises(ValueError, store.remove_sample, 's2')
+        store.add_samples(self.sample_lines('s2'))
+        store.add_samples(self.sample_lines('s1')[:1], replace=True)
+        self.assertReportsEqual(self.store_reports(store),
+                                self.maf_reports(self.lines[:1] + self.sample_lines('s1')[:1] +
+                                                 self.sample_lines('s2') + self.sample_lines('s3')))
+
+
 if __name__ == '__main__':
     unittest.main()
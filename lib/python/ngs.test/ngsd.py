@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from StringIO import StringIO
+from ngs import gtf, ngsd
+
+SCRIPT = '''
+import sys
+from ngs import ngsd
+data = sys.stdin.read()
+sys.stdout.write('%s %i\\n' % (' '.join(sys.argv[1:]), len(data)))
+sys.stderr.write('%s\\n' % ngsd.warm_table('gene2entrez', 'g2e.tsv'))
+sys.exit(3)
+'''
+
+class TestNgsd(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.g2e = os.path.join(self.tmpdir, 'g2e.tsv')
+        with open(self.g2e, 'w') as f:
+            f.write('BRCA1\t672\nTP53\t7157\nXYZ\t\n')
+
+    def tearDown(self):
+        ngsd._warm_tables.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_tables(self):
+        self.assertTrue(ngsd.warm_table('gene2entrez', self.g2e) is None)
+        self.assertEqual(ngsd.load_table('gene2entrez', self.g2e), {'BRCA1': '672', 'TP53': '7157'})
+        table = ngsd.preload_table('gene2entrez', self.g2e)
+        self.assertTrue(ngsd.load_table('gene2entrez', self.g2e) is table)
+        self.assertTrue(ngsd.warm_table('rsid', self.g2e) is None)
+
+        t2l = os.path.join(self.tmpdir, 't2l.tsv')
+        with open(t2l, 'w') as f:
+            f.write('T1\t10\nT2\t20\n')
+        table = ngsd.load_table('transcript_length', t2l)
+        self.assertTrue(isinstance(table, gtf.TranscriptTable))
+        self.assertEqual(table['T2'], 20)
+
+        # Tables are reloaded once their file changes
+        with open(self.g2e, 'a') as f:
+            f.write('EGFR\t1956\n')
+        self.assertTrue(ngsd.warm_table('gene2entrez', self.g2e) is None)
+        self.assertRaises(ValueError, ngsd.load_table, 'no_such_table', self.g2e)
+
+    def test_server(self):
+        socket_path = os.path.join(self.tmpdir, 'ngsd.sock')
+        script = os.path.join(self.tmpdir, 'script.py')
+        with open(script, 'w') as f:
+            f.write(SCRIPT)
+        stdin = tempfile.TemporaryFile()
+        stdin.write('x' * 100000)
+        stdin.seek(0)
+
+        self.assertTrue(ngsd.status(socket_path) is None)
+        server = ngsd.Server(socket_path, modules=['ngs.vcf'], tables=[('gene2entrez', self.g2e)],
+                             log=StringIO())
+        server.preload()
+        server.bind()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                server.serve()
+            finally:
+                os._exit(0)
+        server.sock.close()
+        ngsd._warm_tables.clear()
+
+        try:
+            status = ngsd.status(socket_path)
+            self.assertEqual((status['pid'], status['modules']), (pid, ['ngs.vcf']))
+            self.assertEqual(status['tables'][0][2], 2)
+
+            cwd = os.getcwd()
+            os.chdir(self.tmpdir)
+            try:
+                stdout, stderr = StringIO(), StringIO()
+                self.assertEqual(ngsd.run(socket_path, [script, '-a', 'b'], stdin, stdout, stderr), 3)
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(stdout.getvalue(), '-a b 100000\n')
+            self.assertEqual(stderr.getvalue(), "{'BRCA1': '672', 'TP53': '7157'}\n")
+            self.assertEqual(ngsd.stop(socket_path)['requests'], 1)
+        finally:
+            os.waitpid(pid, 0)
+        self.assertFalse(os.path.exists(socket_path))
+        self.assertRaises(socket.error, ngsd.run, socket_path, [script])
+        self.assertTrue(ngsd.connect_running(socket_path) is None)
+        # A socket file that no ngsd listens on
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        self.assertTrue(ngsd.connect_running(socket_path) is None)
+        self.assertRaises(socket.error, ngsd.connect_running, os.path.join(socket_path, 'x'))
+
+
+if __name__ == '__main__':
+    unittest.main()
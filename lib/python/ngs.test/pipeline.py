@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from StringIO import StringIO
+from ngs import pipeline
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        with open('in.txt', 'w') as f:
+            f.write('a\nb\n')
+        self.pipeline_json = '''
+        {"steps": [{"name": "count", "command": "wc -l < ${IN} > count.txt",
+                    "inputs": ["${IN}"], "outputs": ["count.txt"]},
+                   {"name": "upper", "command": "tr a-z A-Z < ${IN} > upper.txt",
+                    "inputs": ["${IN}"], "outputs": ["upper.txt"], "threads": 2, "memory": "1G"},
+                   {"name": "report", "command": "cat count.txt upper.txt > report.txt",
+                    "inputs": ["count.txt", "upper.txt"], "outputs": ["report.txt"]}]}
+        '''
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def load(self):
+        return pipeline.load_pipeline(StringIO(self.pipeline_json), {'IN': 'in.txt'})
+
+    def test_load_pipeline(self):
+        pipe = self.load()
+        self.assertEqual(pipe.order, ['count', 'upper', 'report'])
+        self.assertEqual(pipe.name2deps['report'], set(['count', 'upper']))
+        self.assertEqual(pipe['upper'].memory_bytes, 1024 ** 3)
+        self.assertEqual(pipe['count'].command, 'wc -l < in.txt > count.txt')
+
+    def test_invalid_pipelines(self):
+        self.assertRaises(ValueError, pipeline.Pipeline,
+                          [pipeline.Step('a', 'true', inputs=['y'], outputs=['x']),
+                           pipeline.Step('b', 'true', inputs=['x'], outputs=['y'])])
+        self.assertRaises(ValueError, pipeline.Pipeline,
+                          [pipeline.Step('a', 'true', outputs=['x']),
+                           pipeline.Step('b', 'true', outputs=['x'])])
+        self.assertRaises(ValueError, pipeline.Pipeline, [pipeline.Step('a', 'true', after=['c'])])
+        self.assertRaises(ValueError, pipeline.parse_memory, 'lots')
+
+    def test_run_local(self):
+        pipe = self.load()
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(threads=2))
+        self.assertEqual(sorted((r.name, r.status) for r in results),
+                         [('count', 'ran'), ('report', 'ran'), ('upper', 'ran')])
+        self.assertEqual(results[-1].name, 'report')
+        self.assertTrue(all(r.maxrss > 0 and r.wall >= 0 for r in results))
+        with open('report.txt', 'r') as f:
+            self.assertEqual(f.read(), '2\nA\nB\n')
+
+        # Everything is up to date
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(threads=2))
+        self.assertEqual([r.status for r in results], ['skipped'] * 3)
+
+        # Steps downstream of an updated input are run again
+        os.utime('upper.txt', (time.time() + 10, time.time() + 10))
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(threads=2))
+        self.assertEqual([(r.name, r.status) for r in results],
+                         [('count', 'skipped'), ('upper', 'skipped'), ('report', 'ran')])
+
+        # Dry run
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(), force=True, dry_run=True)
+        self.assertEqual([r.status for r in results], ['ran'] * 3)
+
+    def test_run_local_other_children(self):
+        # Child processes of the caller that finish while the pipeline runs are not reaped
+        other = subprocess.Popen(['/bin/bash', '-c', 'exit 3'])
+        time.sleep(0.1)
+        results = pipeline.run_pipeline(self.load(), pipeline.LocalBackend(threads=2))
+        self.assertEqual([r.status for r in results], ['ran'] * 3)
+        self.assertEqual(other.wait(), 3)
+
+    def test_run_checksum(self):
+        pipe = self.load()
+        state_file = 'state.json'
+        backend = pipeline.LocalBackend(threads=1)
+        results = pipeline.run_pipeline(pipe, backend, check='checksum', state_file=state_file)
+        self.assertEqual([r.status for r in results], ['ran'] * 3)
+        results = pipeline.run_pipeline(pipe, backend, check='checksum', state_file=state_file)
+        self.assertEqual([r.status for r in results], ['skipped'] * 3)
+        # Touching a file without changing its content does not rerun anything
+        os.utime('in.txt', (time.time() + 10, time.time() + 10))
+        results = pipeline.run_pipeline(pipe, backend, check='checksum', state_file=state_file)
+        self.assertEqual([r.status for r in results], ['skipped'] * 3)
+
+    def test_run_failure(self):
+        pipe = pipeline.Pipeline([pipeline.Step('fail', 'touch x; exit 3', outputs=['x']),
+                                  pipeline.Step('after', 'touch y', inputs=['x'], outputs=['y'])])
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend())
+        self.assertEqual([(r.name, r.status, r.returncode) for r in results], [('fail', 'failed', 3)])
+        self.assertFalse(os.path.exists('x'))
+        self.assertFalse(os.path.exists('y'))
+        self.assertTrue(pipeline.format_report(results).startswith('step\tstatus'))
+
+    def test_file_fingerprint(self):
+        with open('big.txt', 'w') as f:
+            f.write('x' * 1000)
+        fingerprint = pipeline.file_fingerprint('big.txt', sample_size=10, sample_blocks=4)
+        self.assertTrue(fingerprint.startswith('1000:'))
+        # Changes between the sampled blocks are not seen, changes within them are
+        with open('big.txt', 'r+') as f:
+            f.seek(500)
+            f.write('y')
+        self.assertEqual(pipeline.file_fingerprint('big.txt', sample_size=10, sample_blocks=4),
+                         fingerprint)
+        with open('big.txt', 'r+') as f:
+            f.seek(995)
+            f.write('y')
+        self.assertNotEqual(pipeline.file_fingerprint('big.txt', sample_size=10, sample_blocks=4),
+                            fingerprint)
+
+    def test_cache(self):
+        pipe = self.load()
+        cache = pipeline.StepCache('cache')
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(threads=2), cache=cache)
+        self.assertEqual([r.status for r in results], ['ran'] * 3)
+        self.assertEqual((cache.stats.hits, cache.stats.misses, cache.stats.stored), (0, 3, 3))
+        self.assertEqual(len(cache.entries()), 3)
+
+        # Outputs removed, and served from the cache
+        for output in ['count.txt', 'upper.txt', 'report.txt']:
+            os.remove(output)
+        cache = pipeline.StepCache('cache')
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(threads=2), cache=cache)
+        self.assertEqual([r.status for r in results], ['cached'] * 3)
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (3, 0))
+        self.assertEqual(cache.stats.bytes_saved, 2 + 4 + 6)
+        with open('report.txt', 'r') as f:
+            self.assertEqual(f.read(), '2\nA\nB\n')
+        self.assertTrue(cache.stats.report(cache).startswith('hits\t3\n'))
+
+        # A different tool version misses the cache, for the step and the steps downstream
+        pipe['count'].version = '2.0'
+        os.remove('count.txt')
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(threads=2), cache=cache)
+        self.assertEqual([(r.name, r.status) for r in results],
+                         [('upper', 'skipped'), ('count', 'ran'), ('report', 'ran')])
+        self.assertEqual(len(cache.entries()), 5)
+
+        # Eviction by size, least recently used first, and by age
+        count_key = pipeline.step_key(pipe['count'])
+        os.utime(os.path.join('cache', count_key, pipeline.CACHE_MANIFEST), (0, 0))
+        cache.evict(max_bytes=18)
+        self.assertEqual(len(cache.entries()), 4)
+        self.assertTrue(count_key not in [e['key'] for e in cache.entries()])
+        cache.evict(max_age=3600)
+        self.assertEqual(len(cache.entries()), 4)
+        cache.evict(max_age=0)
+        self.assertEqual((len(cache.entries()), cache.stats.evicted), (0, 5))
+
+    def test_cache_restore_failure(self):
+        # An entry evicted between the manifest load and the copy is a miss, and the step is run
+        pipe = self.load()
+        cache = pipeline.StepCache('cache')
+        pipeline.run_pipeline(pipe, pipeline.LocalBackend(), cache=cache)
+        for output in ['count.txt', 'upper.txt', 'report.txt']:
+            os.remove(output)
+        cache = pipeline.StepCache('cache')
+        load_manifest = cache.load_manifest
+        def load_manifest_and_evict(key):
+            manifest = load_manifest(key)
+            if manifest['step'] == 'upper':
+                os.remove(os.path.join(cache.entry_dir(key), '0'))
+            return manifest
+        cache.load_manifest = load_manifest_and_evict
+        results = pipeline.run_pipeline(pipe, pipeline.LocalBackend(), cache=cache)
+        self.assertEqual(sorted((r.name, r.status) for r in results),
+                         [('count', 'cached'), ('report', 'cached'), ('upper', 'ran')])
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (2, 1))
+        with open('upper.txt', 'r') as f:
+            self.assertEqual(f.read(), 'A\nB\n')
+
+    def test_cache_store_failure(self):
+        # A step whose outputs can not be copied into the cache is not cached, with a warning
+        step = pipeline.Step('lost', 'true', outputs=['lost.txt'])
+        cache = pipeline.StepCache('cache')
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            cache.store('key', step)
+            warning = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertTrue(warning.startswith('Warning: could not cache the outputs of step lost'))
+        self.assertEqual((cache.stats.stored, cache.entries()), (0, []))
+
+    def test_sge_backend(self):
+        backend = pipeline.SgeBackend(queue='big.q')
+        args = backend.qsub_args(pipeline.Step('s', 'true', threads=4, memory='8G'), 'job.sh')
+        self.assertEqual(args[-3:], ['-l', 'h_vmem=8G', 'job.sh'])
+        self.assertTrue('big.q' in args)
+        self.assertEqual(pipeline.parse_qacct('ru_wallclock 12\ncpu          10.5\nmaxvmem      1.5G\n'),
+                         (12.0, 10.5, int(1.5 * 1024 ** 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import os
+import random
+import tempfile
+import unittest
+from StringIO import StringIO
+import numpy as np
+from ngs import tabular
+
+RESOURCE_DIR = 'resources'
+EXAMPLE_TSV = 'data.tsv'
+
+class TestTabularScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ['a\t1\t2.5\n',
+                      'b\t2\t-1\n',
+                      '\n',
+                      'a\tfoo\t3\n',
+                      'c\t4\t0.5\textra\n']
+
+    def test_to_float_array(self):
+        arr = tabular.to_float_array(['1', '2.5', '-3e2'])
+        self.assertEqual(list(arr), [1.0, 2.5, -300.0])
+        arr = tabular.to_float_array(['1', 'x', ''])
+        self.assertEqual(arr[0], 1.0)
+        self.assertTrue(np.isnan(arr[1]) and np.isnan(arr[2]))
+
+    def test_scan(self):
+        scanner = tabular.TabularScanner(numeric_columns=[1, 2], freq_columns=[0], count_columns=True,
+                                         weight_column=2, chunk_size=2)
+        scanner.scan(iter(self.lines))
+        self.assertEqual(scanner.line_count, 5)
+        self.assertEqual(scanner.blank_lines, [3])
+
+        stats = scanner.stats[1]
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.total, 7.0)
+        self.assertEqual(stats.weighted_total, 2.5 - 2 + 2)
+        self.assertAlmostEqual(stats.mean, 7.0 / 3)
+        self.assertAlmostEqual(stats.variance(), np.var([1, 2, 4]))
+        self.assertEqual((stats.min, stats.max), (1.0, 4.0))
+        self.assertEqual((stats.invalid_count, stats.invalid_lines), (1, [4]))
+        self.assertEqual(scanner.stats[2].count, 4)
+
+        self.assertEqual(scanner.freqs[0], {'a': 2, 'b': 1, 'c': 1})
+        self.assertEqual(scanner.colcount2freq, {3: 3, 4: 1})
+        self.assertEqual(scanner.colcount2linenums[4], [5])
+
+    def test_scan_file(self):
+        with open(os.path.join(RESOURCE_DIR, EXAMPLE_TSV), 'r') as f:
+            scanner = tabular.TabularScanner(numeric_columns=[1]).scan(f)
+        self.assertEqual(scanner.stats[1].total, 6.0)
+
+    def test_quantiles(self):
+        random.seed(0)
+        values = [random.gauss(0, 1) for i in xrange(20000)]
+        stats = tabular.ColumnStats(compression=100)
+        for i in xrange(0, len(values), 1000):
+            stats.update(np.array(values[i:i + 1000]))
+        self.assertTrue(len(stats.digest.means) <= 100)
+        self.assertAlmostEqual(stats.quantile(0.5), np.median(values), places=1)
+        self.assertAlmostEqual(stats.quantile(0.99), np.percentile(values, 99), places=1)
+        self.assertAlmostEqual(stats.stdev(), np.std(values))
+
+    def test_transpose(self):
+        f = tempfile.TemporaryFile()
+        f.write('a\tb\tc\n1\t\t3\n4\t5\t6\textra\n')
+        for block_columns in (1, 2, 10):
+            fout = StringIO()
+            tabular.transpose(f, fout, block_columns=block_columns)
+            self.assertEqual(fout.getvalue(), 'a\t1\t4\nb\t\t5\nc\t3\t6\n')
+        f.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,10 @@ class TestUtilFunctions(unittest.TestCase):
             d = util.load_dict(f)
         self.assertEqual(d, {'a':'1','b':'2','c':'3'})
 
+    def test_natural_chrom_key(self):
+        chroms = ['chrX', 'chr10', 'chr2', 'chrY', 'chr1']
+        self.assertEqual(sorted(chroms, key=util.natural_chrom_key), ['chr1', 'chr2', 'chr10', 'chrX', 'chrY'])
+
     def test_prepend_value_type(self):
         self.assertEqual(util.prepend_value_type(1), '__int1')
         self.assertEqual(util.prepend_value_type('1'), '__num1')
@@ -72,6 +76,59 @@ class TestUtilFunctions(unittest.TestCase):
         self.assertEqual(generated_xml, desired_output)
         self.assertEqual(generated_d, d)
 
+    def test_joins(self):
+        rows1 = [['a', '1', 'x'], ['b', '2', 'y'], ['c', '3', 'z'], ['c', '3', 'w']]
+        rows2 = [['a', '1', 'A'], ['c', '3', 'C1'], ['c', '3', 'C2'], ['d', '4', 'D']]
+        inner = [(['a', '1', 'x'], ['a', '1', 'A']),
+                 (['c', '3', 'z'], ['c', '3', 'C1']),
+                 (['c', '3', 'z'], ['c', '3', 'C2']),
+                 (['c', '3', 'w'], ['c', '3', 'C1']),
+                 (['c', '3', 'w'], ['c', '3', 'C2'])]
+        left = inner[:1] + [(['b', '2', 'y'], None)] + inner[1:]
+        anti = [(['b', '2', 'y'], None)]
+        for join in util.JOIN_METHODS.values():
+            self.assertEqual(list(join(rows1, rows2, [0], [0])), inner)
+            self.assertEqual(list(join(rows1, rows2, [0, 1], [0, 1], how='left')), left)
+            self.assertEqual(list(join(rows1, rows2, [1], [1], how='anti')), anti)
+        self.assertRaises(ValueError, list, util.hash_join(rows1, rows2, [0], [0], how='outer'))
+
+        # Spill to disk: output is grouped by partition
+        spilled = list(util.grace_hash_join(rows1, rows2, [0], [0], how='left', max_bytes=1, num_partitions=3))
+        self.assertEqual(sorted(spilled), sorted(left))
+
+    def test_sample_index(self):
+        index = util.SampleIndex()
+        mask = index.add('s1') | index.add('s2') | index.add('s3')
+        self.assertEqual((index.count(mask), index.join(mask)), (3, 's1,s2,s3'))
+        self.assertEqual(index.remove('s2'), 2)
+        self.assertEqual(index.add('s4'), 2)
+        self.assertEqual(index.names_of(mask), ['s1', 's3', 's4'])
+
+    def test_lru_cache(self):
+        calls = []
+        @util.lru_cache(2)
+        def square(x):
+            calls.append(x)
+            return x * x
+        self.assertEqual([square(2), square(3), square(2), square(4), square(2), square(3)],
+                         [4, 9, 4, 16, 4, 9])
+        # 3 was the least recently used when 4 was added
+        self.assertEqual(calls, [2, 3, 4, 3])
+        self.assertEqual(square.cache_info(), (2, 4, 2))
+        square.cache_clear()
+        self.assertEqual(square.cache_info(), (0, 0, 0))
+
+    def test_lazy_import(self):
+        # Already imported modules are returned as is
+        self.assertTrue(util.lazy_import('os') is os)
+        sys.modules.pop('colorsys', None)
+        colorsys = util.lazy_import('colorsys')
+        self.assertTrue(isinstance(colorsys, util.LazyModule))
+        self.assertFalse('colorsys' in sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertTrue('colorsys' in sys.modules)
+        self.assertRaises(ImportError, getattr, util.lazy_import('no_such_module'), 'x')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 
+import functools
 import os
 import unittest
-from ngs import vcf
+from StringIO import StringIO
+from ngs import gtf, vcf
 
 RESOURCE_DIR = 'resources'
 EXAMPLE_VCF = 'example.vcf'
@@ -183,6 +185,125 @@ class TestVascanVcfFileFunctions(unittest.TestCase):
         pass
 
 
+class TestVcfStages(unittest.TestCase):
+
+    def setUp(self):
+        header = '#' + '\t'.join(['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO',
+                                   'FORMAT', 'NORMAL', 'TUMOR']) + '\n'
+        self.lines = ['##source=VarScan2\n',
+                      header,
+                      'chr1\t10\t.\tA\t+TG\t.\tPASS\tDP=30;SOMATIC;SS=2;SPV=1E-3\tGT:DP\t0/0:20\t0/1:15\n',
+                      'chr1\t20\t.\tC\t-GA\t.\tPASS\tDP=30;SS=2;SPV=2E-1\tGT:DP\t0/0:20\t0/1:15\n',
+                      'chr1\t30\t.\tG\t+T\t.\tPASS\tDP=30;SS=1;SPV=1E-3\tGT:DP\t0/1:20\t0/1:15\n',
+                      'chr1\t40\t.\tT\t-A\t.\tPASS\tDP=8;SS=2;SPV=1E-3\tGT:DP\t0/0:4\t0/1:4\n']
+
+    def run_stages(self, stages, lines=None):
+        out = StringIO()
+        vcf.run_stages(lines or self.lines, out, stages)
+        return out.getvalue().splitlines(True)
+
+    def test_record(self):
+        header, records = vcf.read_records(self.lines)
+        self.assertEqual(header.meta_lines, ['##source=VarScan2\n'])
+        record = next(records)
+        self.assertEqual((record['POS'], record['ALT']), ('10', '+TG'))
+        self.assertEqual(record.info(), {'DP': '30', 'SS': '2', 'SPV': '1E-3'})
+        self.assertEqual(record.sample_field('TUMOR', 'DP'), '15')
+        self.assertEqual(record.to_line(), self.lines[2])
+        record['ID'] = 'rs1'
+        self.assertTrue(record.to_line().startswith('chr1\t10\trs1\tA'))
+        self.assertRaises(ValueError, vcf.read_records, ['chr1\t1\n'])
+
+    def test_varscan_clean_indel(self):
+        out = self.run_stages([vcf.varscan_clean_indel])
+        self.assertEqual(out[:2], self.lines[:2])
+        self.assertEqual([l.split('\t')[3:5] for l in out[2:]],
+                         [['A', 'ATG'], ['CGA', 'C'], ['G', 'GT'], ['TA', 'T']])
+        snp = self.lines[2].replace('+TG', 'C')
+        self.assertRaises(ValueError, self.run_stages, [vcf.varscan_clean_indel], self.lines[:2] + [snp])
+
+    def test_somatic_filter(self):
+        out = self.run_stages([functools.partial(vcf.somatic_filter, somatic_type='somatic')])
+        self.assertEqual([l.split('\t')[1] for l in out[2:]], ['10', '20', '40'])
+        out = self.run_stages([functools.partial(vcf.somatic_filter, somatic_type='somatic',
+                                                 min_dp_tumor=10, min_dp_normal=10,
+                                                 somatic_p_val=0.05)])
+        self.assertEqual(out[2:], self.lines[2:3])
+        out = self.run_stages([functools.partial(vcf.somatic_filter, somatic_type='germline')])
+        self.assertEqual(out[2:], self.lines[4:5])
+
+    def test_chain(self):
+        out = self.run_stages([vcf.varscan_clean_indel,
+                               functools.partial(vcf.somatic_filter, min_dp_tumor=10),
+                               vcf.insert_format_field])
+        self.assertEqual([l.split('\t')[3:9] for l in out[2:]],
+                         [['A', 'ATG', '.', 'PASS', 'DP=30;SOMATIC;SS=2;SPV=1E-3', vcf.VARSCAN_FORMAT_FIELD],
+                          ['CGA', 'C', '.', 'PASS', 'DP=30;SS=2;SPV=2E-1', vcf.VARSCAN_FORMAT_FIELD],
+                          ['G', 'GT', '.', 'PASS', 'DP=30;SS=1;SPV=1E-3', vcf.VARSCAN_FORMAT_FIELD]])
+
+
+class TestGenotypeBlocks(unittest.TestCase):
+
+    def setUp(self):
+        self.example_vcf = os.path.join(RESOURCE_DIR, EXAMPLE_VCF)
+
+    def test_genotype_code(self):
+        self.assertEqual([vcf.genotype_code(gt) for gt in ['0/0', '0|1', '1/1', '1|2', '2/2', './.', './1', '0', '1']],
+                         [vcf.GT_HOM_REF, vcf.GT_HET, vcf.GT_HOM_ALT, vcf.GT_HET, vcf.GT_HOM_ALT,
+                          vcf.GT_NOCALL, vcf.GT_NOCALL, vcf.GT_HOM_REF, vcf.GT_HOM_ALT])
+
+    def test_decode_genotype(self):
+        self.assertEqual(vcf.decode_genotype('0/1', 2), ((0, 1), False))
+        self.assertEqual(vcf.decode_genotype('2|.', 3), ((2, None), True))
+        self.assertEqual(vcf.decode_genotype('1', 2), ((1,), False))
+        self.assertEqual(vcf.decode_genotype('0/1/1', 2), ((0, 1, 1), False))
+        self.assertRaises(ValueError, vcf.decode_genotype, '0/2', 2)
+        self.assertRaises(ValueError, vcf.decode_genotype, '0/x', 2)
+
+    def test_genotype_bases(self):
+        self.assertEqual(vcf.genotype_bases('0/2', 'A', 'G,T'), 'A/T')
+        self.assertEqual(vcf.genotype_bases('2/1', 'A', 'G,T'), 'G/T')
+        self.assertEqual(vcf.genotype_bases('2/1', 'A', 'G,T', sort=False), 'T/G')
+        self.assertEqual(vcf.genotype_bases('1|0', 'A', 'G', phased=True), 'G|A')
+        self.assertEqual(vcf.genotype_bases('./.', 'A', 'G'), 'N/N')
+        self.assertEqual(vcf.genotype_bases('1', 'A', 'G'), 'G')
+
+    def test_read_genotype_blocks(self):
+        with open(self.example_vcf, 'r') as f:
+            header, blocks = vcf.read_genotype_blocks(f, block_size=3, string_fields=['GT', 'HQ'])
+            blocks = list(blocks)
+        self.assertEqual([len(b) for b in blocks], [3, 2])
+        block = blocks[0]
+        self.assertEqual(block.sample_names, ['NA00001', 'NA00002', 'NA00003'])
+        self.assertEqual(block.rows[2][:5], ['20', '1110696', 'rs6040355', 'A', 'G,T'])
+        self.assertEqual(block.gt.tolist(), [[0, 1, 2], [0, 1, 0], [1, 1, 2]])
+        self.assertEqual(block.dp.tolist(), [[1, 8, 5], [3, 5, 3], [6, 0, 4]])
+        self.assertEqual(block.gq[1].tolist(), [49, 3, 41])
+        # Missing trailing fields, and fields missing from the FORMAT
+        self.assertEqual(block.strings['HQ'][1], ['58,50', '65,3', ''])
+        self.assertEqual(blocks[1].strings['HQ'][1], ['', '', ''])
+        self.assertEqual(blocks[1].strings['GT'][1], ['0/1', '0/2', '1/1'])
+
+        # Reductions
+        self.assertEqual(block.genotype_counts().tolist(), [[0, 1, 1, 1], [0, 2, 1, 0], [0, 0, 2, 1]])
+        self.assertEqual(block.sample_genotype_counts().tolist(), [[0, 2, 1, 0], [0, 0, 3, 0], [0, 1, 0, 2]])
+        dp_sums, dp_counts = block.sample_depth_sums()
+        self.assertEqual((dp_sums.tolist(), dp_counts.tolist()), ([10, 13, 12], [3, 3, 3]))
+        self.assertEqual(block.samples_with(0, vcf.GT_HOM_ALT), ['NA00003'])
+
+    def test_nocalls(self):
+        lines = ['#' + '\t'.join(['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO',
+                                  'FORMAT', 'S1', 'S2', 'S3', 'S4']) + '\n',
+                 '1\t10\t.\tA\tC\t.\tPASS\t.\tGT:DP:GQ\t./.\t./.\t0/1:7:20\t./.\n',
+                 '1\t20\t.\tA\tC\t.\tPASS\t.\tGT:DP:GQ\t1/1:.\t0/0:3:9\t.\t0/1:4:8\n']
+        header, blocks = vcf.read_genotype_blocks(lines)
+        block = next(blocks)
+        self.assertEqual(block.gt.tolist(), [[-1, -1, 1, -1], [2, 0, -1, 1]])
+        self.assertEqual(block.dp.tolist(), [[-1, -1, 7, -1], [-1, 3, -1, 4]])
+        self.assertEqual(block.genotype_counts()[:, 0].tolist(), [3, 1])
+        self.assertRaises(ValueError, vcf.read_genotype_blocks, ['#CHROM\tPOS\n'])
+
+
 class TestSnpEffVcfFileFunctions(unittest.TestCase):
     
     def setUp(self):
@@ -378,6 +499,30 @@ class TestSnpEffVcfFiles(unittest.TestCase):
         self.assertEqual(g2t2e2c['CYP4B1']['ENST00000468637']['NON_SYNONYMOUS_CODING'], 4)
         self.assertEqual(g2t2e2c['AL691432.2']['ENST00000340677']['TRANSCRIPT'], 2)
 
+    def test_count_transcript_effects_parallel(self):
+        for fn in (self.example_vcf, self.example2_vcf):
+            self.vcffiles.append(vcf.SnpEffVcfFile(fn, 'r'))
+        g2t2e2c, effect2impact = self.vcffiles.count_transcript_effects_all(False)
+        g2t2high = self.vcffiles.g2t2high
+
+        vcffiles = vcf.SnpEffVcfFiles([vcf.SnpEffVcfFile(fn, 'r') for fn in (self.example_vcf, self.example2_vcf)])
+        self.assertEqual(vcffiles.count_transcript_effects_all(False, processes=2), (g2t2e2c, effect2impact))
+        self.assertEqual(vcffiles.g2t2high, g2t2high)
+        self.assertEqual(vcffiles.impact_conflicts, [])
+
+    def test_impact_conflicts(self):
+        conflict_vcf = os.path.join(RESOURCE_DIR, 'example.conflict.test.vcf')
+        with open(self.example_vcf, 'r') as f:
+            with open(conflict_vcf, 'w') as fo:
+                fo.write(f.read().replace('SPLICE_SITE_ACCEPTOR(HIGH', 'SPLICE_SITE_ACCEPTOR(LOW', 1))
+        vcffiles = vcf.SnpEffVcfFiles([vcf.SnpEffVcfFile(fn, 'r') for fn in (self.example_vcf, conflict_vcf)])
+        g2t2e2c, effect2impact = vcffiles.count_transcript_effects_all(False, processes=2)
+        self.assertEqual(effect2impact['SPLICE_SITE_ACCEPTOR'], 'HIGH')
+        self.assertEqual(vcffiles.impact_conflicts, [vcf.ImpactConflict('SPLICE_SITE_ACCEPTOR', 'LOW', 'HIGH', conflict_vcf)])
+        self.assertRaises(ValueError, self.vcffiles.count_transcript_effects_single,
+                          vcf.SnpEffVcfFile(conflict_vcf, 'r'), {}, dict(effect2impact))
+        os.remove(conflict_vcf)
+
     def test_select_transcript_for_gene(self):
         # g1 tests for most high impact count
         # g2 tests for tied high impact counts but longest transcript
@@ -486,6 +631,19 @@ class TestSnpEffVcfFiles(unittest.TestCase):
         self.assertEqual(g2t['g6'], 'g6t2')
         self.assertTrue('g7' not in g2t)
 
+        # Compact transcript table and precomputed HIGH impact counts give the same selection
+        g2t2high = snpeffvcffiles.count_high_impact(g2t2e2c, e2i)
+        self.assertEqual(g2t2high['g1'], {'g1t1': 10, 'g1t2': 3, 'g1t3': 3})
+        table = gtf.TranscriptTable.from_dict(t2l)
+        self.assertEqual(snpeffvcffiles.select_transcript_for_gene(g2t2e2c, e2i, table, g2t2high), g2t)
+
+    def test_running_high_impact_counts(self):
+        self.vcffiles.append(vcf.SnpEffVcfFile(self.example_vcf, 'r'))
+        self.vcffiles.append(vcf.SnpEffVcfFile(self.example2_vcf, 'r'))
+        g2t2e2c, effect2impact = self.vcffiles.count_transcript_effects_all(False)
+        self.assertEqual(self.vcffiles.g2t2high, self.vcffiles.count_high_impact(g2t2e2c, effect2impact))
+        self.assertEqual(self.vcffiles.g2t2high['WASH2P']['ENST00000542901'], 4)
+
 #     def test_register_transcript_counts(self):
 #         self.vcffiles.register_transcript_counts('hello', 'foo', 'bar')
 #         self.assertEqual(self.vcffiles.g2t2e2c, 'hello')
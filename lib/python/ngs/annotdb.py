@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+import sqlite3
+from collections import OrderedDict
+
+# First bytes of every sqlite3 database file
+SQLITE_HEADER = 'SQLite format 3\x00'
+
+# Number of lookup results remembered by each lookup of an AnnotDb
+DEFAULT_CACHE_SIZE = 100000
+
+# Annotation tables: table name => (column definitions, indexed columns)
+# Tables are derived from Ensembl's Homo_sapiens.GRChxx.xx.gtf file, except for gene2entrez
+TABLES = OrderedDict([
+    ('gene2transcript', (['gene_name TEXT', 'gene_id TEXT', 'transcript_id TEXT'],
+                         ['gene_name', 'transcript_id'])),
+    ('transcript_length', (['transcript_id TEXT', 'length INTEGER'],
+                           ['transcript_id'])),
+    ('exon', (['chrom TEXT', 'start INTEGER', 'end INTEGER', 'transcript_id TEXT', 'exon_number INTEGER'],
+              ['transcript_id'])),
+    ('gene2entrez', (['gene_name TEXT', 'entrez_id TEXT'],
+                     ['gene_name']))])
+
+# Lookup name => (sql, whether the lookup returns multiple rows)
+# Single-row lookups return a value, multiple-row lookups return a list of values or tuples
+LOOKUPS = {'transcript2gene': ('SELECT gene_name FROM gene2transcript WHERE transcript_id=? LIMIT 1', False),
+           'gene2transcripts': ('SELECT DISTINCT transcript_id FROM gene2transcript WHERE gene_name=?', True),
+           'transcript_length': ('SELECT length FROM transcript_length WHERE transcript_id=? LIMIT 1', False),
+           'gene2entrez': ('SELECT entrez_id FROM gene2entrez WHERE gene_name=? LIMIT 1', False),
+           'exons': ('SELECT chrom, start, end, exon_number FROM exon WHERE transcript_id=? ORDER BY start', True)}
+
+def is_annotdb(filename):
+    '''
+    Check whether a file is a sqlite3 database
+    '''
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except IOError:
+        return False
+
+def connect(db_path):
+    '''
+    Open a connection to an annotation database in write-ahead logging mode, so that
+    readers do not block each other, or the loader
+    '''
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+def read_tsv_rows(fin, num_columns):
+    '''
+    Generate the first num_columns column values of each line of a tab-separated file
+    Blank lines, comment lines, and lines with missing values are skipped
+    '''
+    for line in fin:
+        if not line.strip() or line[0] == '#':
+            continue
+        row = line.rstrip('\n').split('\t')[:num_columns]
+        if len(row) == num_columns and all(row):
+            yield row
+
+def load_tables(conn, table2rows):
+    '''
+    Bulk load the tables in the table2rows mapping (table name => iterable of rows) in
+    a single transaction.  Each table is dropped and recreated, and its indexes are
+    created after all of its rows have been inserted, so that the inserts do not have to
+    update the indexes row by row
+    Return mapping of table name => number of rows loaded
+    '''
+    for table in table2rows:
+        if table not in TABLES:
+            raise ValueError, 'Unknown annotation table %s' % table
+
+    table2count = {}
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    conn.execute('PRAGMA synchronous=OFF')
+    c = conn.cursor()
+    try:
+        c.execute('BEGIN')
+        for table, rows in table2rows.iteritems():
+            coldefs, index_columns = TABLES[table]
+            c.execute('DROP TABLE IF EXISTS %s' % table)
+            c.execute('CREATE TABLE %s (%s)' % (table, ', '.join(coldefs)))
+            c.executemany('INSERT INTO %s VALUES (%s)' % (table, ','.join('?' * len(coldefs))), rows)
+            table2count[table] = c.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+            for column in index_columns:
+                c.execute('CREATE INDEX %s_idx_%s ON %s (%s)' % (table, column, table, column))
+        c.execute('COMMIT')
+    except:
+        c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.execute('PRAGMA synchronous=FULL')
+        conn.isolation_level = isolation_level
+    return table2count
+
+class LRUCache(object):
+    '''
+    Mapping that holds up to maxsize items, evicting the least recently used item
+    '''
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        try:
+            val = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data[key] = val
+        self.hits += 1
+        return val
+
+    def put(self, key, val):
+        self.data.pop(key, None)
+        if len(self.data) >= self.maxsize:
+            self.data.popitem(last=False)
+        self.data[key] = val
+
+class Lookup(object):
+    '''
+    Read-only, dict-like view of one of the lookups of an AnnotDb, so that it can be used
+    in place of the dicts loaded from pickle and mapping files, i.e.
+      gene2entrez = annot.lookup('gene2entrez')
+      if gene in gene2entrez:
+          entrez_id = gene2entrez[gene]
+    '''
+    def __init__(self, annot, name):
+        self.annot = annot
+        self.name = name
+
+    def __contains__(self, key):
+        return self.annot.query(self.name, key) is not None
+
+    def __getitem__(self, key):
+        val = self.annot.query(self.name, key)
+        if val is None:
+            raise KeyError(key)
+        return val
+
+    def get(self, key, default=None):
+        val = self.annot.query(self.name, key)
+        if val is None:
+            return default
+        return val
+
+class AnnotDb(object):
+    '''
+    Cached lookups on an annotation database loaded with load_tables.
+    Each lookup runs a fixed statement, which sqlite3 keeps prepared in its statement cache,
+    and its results, including misses, are kept in an LRU cache
+    '''
+    _MISSING = object()
+
+    def __init__(self, db_path, cache_size=DEFAULT_CACHE_SIZE):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, cached_statements=len(LOOKUPS) * 2)
+        self.name2cache = dict((name, LRUCache(cache_size)) for name in LOOKUPS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def query(self, name, key):
+        '''
+        Run a lookup by name, returning None if nothing was found
+        '''
+        cache = self.name2cache[name]
+        val = cache.get(key, self._MISSING)
+        if val is not self._MISSING:
+            return val
+        sql, multiple = LOOKUPS[name]
+        rows = self.conn.execute(sql, (key,)).fetchall()
+        if not rows:
+            val = None
+        elif multiple:
+            val = [row[0] if len(row) == 1 else row for row in rows]
+        else:
+            val = rows[0][0]
+        cache.put(key, val)
+        return val
+
+    def lookup(self, name):
+        '''
+        Return a dict-like view of a lookup
+        '''
+        if name not in LOOKUPS:
+            raise ValueError, 'Unknown annotation lookup %s' % name
+        return Lookup(self, name)
+
+    def load_dict(self, table, key_column, value_column):
+        '''
+        Load the whole key_column => value_column mapping of a table into a dict, keeping the
+        first value of each key.  Used where the lookups are shared by forked processes,
+        which can not share the database connection
+        '''
+        if table not in TABLES:
+            raise ValueError, 'Unknown annotation table %s' % table
+        columns = [c.split()[0] for c in TABLES[table][0]]
+        for column in (key_column, value_column):
+            if column not in columns:
+                raise ValueError, 'Table %s has no column %s' % (table, column)
+        mapping = {}
+        for key, val in self.conn.execute('SELECT %s, %s FROM %s ORDER BY rowid' % (key_column,
+                                                                                    value_column,
+                                                                                    table)):
+            if key not in mapping:
+                mapping[key] = val
+        return mapping
+
+    def transcript2gene(self, transcript_id):
+        return self.query('transcript2gene', transcript_id)
+
+    def gene2transcripts(self, gene_name):
+        return self.query('gene2transcripts', gene_name) or []
+
+    def transcript_length(self, transcript_id):
+        return self.query('transcript_length', transcript_id)
+
+    def gene2entrez(self, gene_name):
+        return self.query('gene2entrez', gene_name)
+
+    def exons(self, transcript_id):
+        return self.query('exons', transcript_id) or []
@@ -1,10 +1,31 @@
 #!/usr/bin/env python
 
 import csv
+import itertools
 from collections import defaultdict
+from ngs import instrument, tabular
+from ngs.util import lazy_import
 #import pandas
 #import pandas.rpy.common as com
 
+np = lazy_import('numpy')
+
+# Number of rows filtered at a time in batch mode
+DEFAULT_CHUNK_SIZE = 100000
+
+# Columns loaded as floats in batch mode
+NUMERIC_COLUMNS = set(['ESP5400_ALL', '1000g2010nov_ALL'])
+
+def load_column(rows, column, numeric=False):
+    '''
+    Load the values of a column of a list of rows into a NumPy array
+    Numeric columns are loaded as floats, with missing values set to NaN
+    '''
+    values = tabular.get_column(rows, column)
+    if numeric:
+        return tabular.to_float_array(values)
+    return np.array(values, dtype=str)
+
 class AnnovarCsv(object):
     '''
     Class to handle Annovar output excel csv files
@@ -35,7 +56,7 @@ class AnnovarCsv(object):
 #                                          columns=self.colnames)
     def __init__(self, filehandle):
         self.filters = []
-        self.reader = csv.reader(filehandle, dialect='excel')
+        self.reader = instrument.timed(csv.reader(instrument.timed(filehandle, 'read'), dialect='excel'), 'parse')
         # Read in column headers
         self.header = self.reader.next()
 
@@ -55,14 +76,41 @@ class AnnovarCsv(object):
     def filtered_variants(self):
         '''
         Given a list of filters, generate resulting variants that pass all the filters
+        Filters are compiled into predicates on the row once, and evaluated in order until
+        one fails
         '''
+        predicates = [filter.compile(self.header) for filter in self.filters]
         for row in self:
-            tests_passed = True
-            for filter in self.filters:
-                tests_passed = tests_passed and filter.pass_test(dict(zip(self.header, row)))
-            if tests_passed:
+            for predicate in predicates:
+                if not predicate(row):
+                    break
+            else:
                 yield row
 
+    def filtered_variants_batch(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        '''
+        Same as filtered_variants, but rows are read in chunks, the columns used by the filters
+        are loaded into typed NumPy arrays, and each filter is evaluated as a boolean mask
+        over the chunk
+        '''
+        column2index = dict((c, i) for i, c in reversed(list(enumerate(self.header))))
+        predicates = [filter.compile(self.header) if filter.columns is None else None
+                      for filter in self.filters]
+        for rows in tabular.read_chunks(self.reader, chunk_size):
+            columns = {}
+            mask = np.ones(len(rows), dtype=bool)
+            for filter, predicate in itertools.izip(self.filters, predicates):
+                if predicate is not None:
+                    filter_mask = np.fromiter((predicate(row) for row in rows), dtype=bool, count=len(rows))
+                else:
+                    for c in filter.columns:
+                        if c not in columns:
+                            columns[c] = load_column(rows, column2index[c], c in NUMERIC_COLUMNS)
+                    filter_mask = filter.mask(columns)
+                mask &= filter_mask
+            for i in np.nonzero(mask)[0]:
+                yield rows[i]
+
     def count(self, column_name):
         '''
         Given a list of filters, count up all the variants with respect to the values
@@ -84,10 +132,36 @@ class AnnovarCsv(object):
 class AnnovarCsvFilter(object):
     '''
     Abstract filter class
+    Filters test the values of the columns listed in columns:
+      test:  test the column values of a single row
+      mask:  test the column arrays of many rows at once, returning a boolean array
+    Filters that only implement pass_test, on a column name to value mapping, should leave
+    columns set to None
     '''
-    def pass_test(self):
+    columns = None
+
+    def pass_test(self, colname2val):
+        return self.test(*[colname2val[c] for c in self.columns])
+
+    def test(self, *values):
+        pass
+
+    def mask(self, columns):
         pass
 
+    def compile(self, header):
+        '''
+        Return a predicate on a row, with the column indexes resolved from the header
+        '''
+        if self.columns is None:
+            return lambda row: self.pass_test(dict(zip(header, row)))
+        test = self.test
+        indexes = [header.index(c) for c in self.columns]
+        if len(indexes) == 1:
+            i = indexes[0]
+            return lambda row: test(row[i])
+        return lambda row: test(*[row[i] for i in indexes])
+
 
 class AnnovarCsvFilterFactory(object):
     '''
@@ -98,9 +172,13 @@ class AnnovarCsvFilterFactory(object):
         Return a filter that tests to see if the variant occurs in a set of genes.
         Filter will pass the test if variant occurs in the gene set.
         '''
+        gene_array = np.array(sorted(genes), dtype=str)
         class GeneSelector(AnnovarCsvFilter):
-            def pass_test(self, colname2val):
-                return colname2val['Gene'] in genes
+            columns = ['Gene']
+            def test(self, gene):
+                return gene in genes
+            def mask(self, columns):
+                return np.in1d(columns['Gene'], gene_array)
         return GeneSelector()
 
     def create_genes_filter(self, genes):
@@ -108,9 +186,13 @@ class AnnovarCsvFilterFactory(object):
         Similar to create_genes_selector, but this time the filter will pass the test if variant
         does NOT occur within the gene set
         '''
+        gene_array = np.array(sorted(genes), dtype=str)
         class GeneFilter(AnnovarCsvFilter):
-            def pass_test(self, colname2val):
-                return colname2val['Gene'] not in genes
+            columns = ['Gene']
+            def test(self, gene):
+                return gene not in genes
+            def mask(self, columns):
+                return ~np.in1d(columns['Gene'], gene_array)
         return GeneFilter()
 
     def create_dbSNP_selector(self):
@@ -119,8 +201,11 @@ class AnnovarCsvFilterFactory(object):
         Filter will pass the test if variant does occur in dbSNP
         '''
         class DbSNPSelector(AnnovarCsvFilter):
-            def pass_test(self, colname2val):
-                return colname2val['dbSNP135'] and colname2val['dbSNP135'][:2] == 'rs'
+            columns = ['dbSNP135']
+            def test(self, dbsnp):
+                return dbsnp[:2] == 'rs'
+            def mask(self, columns):
+                return np.char.startswith(columns['dbSNP135'], 'rs')
         return DbSNPSelector()
         
     def create_dbSNP_filter(self):
@@ -129,63 +214,75 @@ class AnnovarCsvFilterFactory(object):
         Filter will pass the test if variant does NOT occur in dbSNP
         '''
         class DbSNPFilter(AnnovarCsvFilter):
-            def pass_test(self, colname2val):
-                return not colname2val['dbSNP135']
+            columns = ['dbSNP135']
+            def test(self, dbsnp):
+                return not dbsnp
+            def mask(self, columns):
+                return columns['dbSNP135'] == ''
         return DbSNPFilter()
 
+    def _create_pred_selector(self, column, prediction_set):
+        '''
+        Return a selector that tests to see if the prediction in column is empty or in the
+        prediction set
+        '''
+        prediction_set = set(prediction_set)
+        prediction_array = np.array(sorted(prediction_set | set([''])), dtype=str)
+        class PredSelector(AnnovarCsvFilter):
+            columns = [column]
+            def test(self, pred):
+                return pred == '' or pred in prediction_set
+            def mask(self, columns):
+                return np.in1d(columns[column], prediction_array)
+        return PredSelector()
+
     def create_polyphen_pred_selector(self, prediction_set):
         '''
         Return a selector that tests to see if the polyphen prediction is in the
         prediction_set
         '''
-        prediction_set = set(prediction_set)
-        class PolyphenPredSelector(AnnovarCsvFilter):
-            def pass_test(self, colname2val):
-                polyphenpred = colname2val['LJB_PolyPhen2_Pred']
-                return polyphenpred == '' or polyphenpred in prediction_set
-        return PolyphenPredSelector()
+        return self._create_pred_selector('LJB_PolyPhen2_Pred', prediction_set)
 
     def create_sift_pred_selector(self, prediction_set):
         '''
         Return a selector that tests to see if the sift prediction is in the prediction set
         '''
-        prediction_set = set(prediction_set)
-        class SIFTPredSelector(AnnovarCsvFilter):
-            def pass_test(self, colname2val):
-                siftpred = colname2val['LJB_SIFT_Pred']
-                return siftpred == '' or siftpred in prediction_set
-        return SIFTPredSelector()
+        return self._create_pred_selector('LJB_SIFT_Pred', prediction_set)
 
     def create_1000Genomes_maf_selector(self, equalval=None, minval=None, maxval=None):
         '''
         Return a filter that tests to see if the variant maf in 1000Genomes is either
-        equal to equalval, or is > minval and < maxval
+        equal to equalval, or is >= minval and <= maxval
+        Missing values are treated as 0.0
         '''
         if equalval is not None:
-            _equalval = float(equalval)
+            equalval = float(equalval)
         if minval is not None:
-            _minval = float(minval)
+            minval = float(minval)
         if maxval is not None:
-            _maxval = float(maxval)
+            maxval = float(maxval)
         class G1000Selector(AnnovarCsvFilter):
-            def pass_test(self, colname2val):
-                mafval = 0.0
-                if colname2val['1000g2010nov_ALL']:
-                    mafval = float(colname2val['1000g2010nov_ALL'])
+            columns = ['1000g2010nov_ALL']
+            def test(self, maf):
+                mafval = float(maf) if maf else 0.0
                 # Compare equal
                 if equalval is not None:
-                    return mafval == _equalval
-
-                else:
-                    # Compare against minimal accepted value
-                    if minval is not None:
-                        if mafval < _minval:
-                            return False
-
-                    # Compare against maximum accepted value
-                    if maxval is not None:
-                        if mafval > _maxval:
-                            return False
-                
-                    return True
+                    return mafval == equalval
+                # Compare against minimal and maximum accepted values
+                if minval is not None and mafval < minval:
+                    return False
+                if maxval is not None and mafval > maxval:
+                    return False
+                return True
+            def mask(self, columns):
+                mafvals = columns['1000g2010nov_ALL']
+                mafvals = np.where(np.isnan(mafvals), 0.0, mafvals)
+                if equalval is not None:
+                    return mafvals == equalval
+                mask = np.ones(len(mafvals), dtype=bool)
+                if minval is not None:
+                    mask &= mafvals >= minval
+                if maxval is not None:
+                    mask &= mafvals <= maxval
+                return mask
         return G1000Selector()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+from collections import defaultdict, namedtuple
+from ngs.util import lazy_import
+
+np = lazy_import('numpy')
+
+BedRecord = namedtuple('BedRecord', ['chrom', 'start', 'end', 'name'])
+
+# Extension of the index file for bed files with lines grouped by name
+GROUP_INDEX_EXT = '.idx'
+
+def is_bed_line(line):
+    '''
+    Check to see if line contains a region, and is not a header, comment, or blank line
+    '''
+    if not line.strip():
+        return False
+    if line[0] == '#':
+        return False
+    if line.startswith('track') or line.startswith('browser'):
+        return False
+    return True
+
+def parse_line(line):
+    '''
+    Parse a bed line and return a BedRecord object
+    Name is set to None if the line contains less than 4 columns
+    '''
+    la = line.strip().split()
+    name = None
+    if len(la) > 3:
+        name = la[3]
+    return BedRecord(la[0], int(la[1]), int(la[2]), name)
+
+def merge_intervals(intervals):
+    '''
+    Given a list of (start, end) tuples, return the sorted list of intervals in which
+    overlapping and book-ended intervals are merged
+    '''
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def read_bed(fin):
+    '''
+    Generate BedRecord objects for each region in a bed file
+    '''
+    for line in fin:
+        if is_bed_line(line):
+            yield parse_line(line)
+
+def load_group_index(fin):
+    '''
+    Load the index of a bed file with lines grouped by name (bed_split_by_genes.py -c)
+    Return a dictionary mapping name to (byte offset, byte length) of its lines
+    '''
+    name2offset = {}
+    for line in fin:
+        name, offset, length = line.rstrip('\n').split('\t')
+        name2offset[name] = (int(offset), int(length))
+    return name2offset
+
+def read_group(fin, offset, length):
+    '''
+    Seek to the lines of a single group in a grouped bed file, and return them as a list of lines
+    '''
+    fin.seek(offset)
+    return fin.read(length).splitlines(True)
+
+class IntervalIndex(object):
+    '''
+    Index of bed regions for fast interval queries.
+    For each chromosome, region starts and ends are stored in NumPy arrays sorted by start,
+    along with the running maximum of the ends.  Since the running maximum is non-decreasing,
+    the regions that can overlap a query are found with two binary searches, giving
+    O(log n + k) queries for k overlapping regions.
+    Coordinates are 0-based, half-open as in bed files.
+    '''
+    def __init__(self, records=()):
+        chrom2regions = defaultdict(list)
+        for rec in records:
+            chrom2regions[rec[0]].append(rec)
+
+        self.chrom2starts = {}
+        self.chrom2ends = {}
+        self.chrom2maxends = {}
+        self.chrom2names = {}
+        for chrom, regions in chrom2regions.iteritems():
+            starts = np.array([r[1] for r in regions], dtype=np.int64)
+            order = np.argsort(starts, kind='mergesort')
+            ends = np.array([r[2] for r in regions], dtype=np.int64)[order]
+            self.chrom2starts[chrom] = starts[order]
+            self.chrom2ends[chrom] = ends
+            self.chrom2maxends[chrom] = np.maximum.accumulate(ends)
+            self.chrom2names[chrom] = [regions[i][3] if len(regions[i]) > 3 else None for i in order]
+        self._merged = None
+
+    @classmethod
+    def from_bed(cls, fin):
+        '''
+        Build an index from a bed file handle
+        '''
+        return cls(read_bed(fin))
+
+    def __len__(self):
+        return sum(len(starts) for starts in self.chrom2starts.itervalues())
+
+    def chroms(self):
+        '''
+        Return the sorted list of indexed chromosomes
+        '''
+        return sorted(self.chrom2starts.keys())
+
+    def records(self, chrom=None):
+        '''
+        Generate the indexed regions as BedRecord objects, sorted by position
+        '''
+        chroms = self.chroms() if chrom is None else [chrom]
+        for c in chroms:
+            starts = self.chrom2starts.get(c, ())
+            for i in xrange(len(starts)):
+                yield BedRecord(c, int(starts[i]), int(self.chrom2ends[c][i]), self.chrom2names[c][i])
+
+    def _candidate_range(self, chrom, start, end):
+        '''
+        Return the range of array indexes [lo, hi) of the regions that may overlap the query.
+        Every region in the range starts before end, and region lo overlaps the query if lo < hi
+        '''
+        if chrom not in self.chrom2starts:
+            return 0, 0
+        lo = np.searchsorted(self.chrom2maxends[chrom], start, side='right')
+        hi = np.searchsorted(self.chrom2starts[chrom], end, side='left')
+        return lo, hi
+
+    def overlaps(self, chrom, start, end):
+        '''
+        Check to see if the query overlaps any region
+        '''
+        lo, hi = self._candidate_range(chrom, start, end)
+        return lo < hi
+
+    def overlap(self, chrom, start, end):
+        '''
+        Return the array indexes of the regions on the chromosome that overlap the query
+        '''
+        lo, hi = self._candidate_range(chrom, start, end)
+        if lo >= hi:
+            return np.array([], dtype=np.int64)
+        return lo + np.nonzero(self.chrom2ends[chrom][lo:hi] > start)[0]
+
+    def overlap_records(self, chrom, start, end):
+        '''
+        Return the list of BedRecord objects that overlap the query
+        '''
+        return [BedRecord(chrom,
+                          int(self.chrom2starts[chrom][i]),
+                          int(self.chrom2ends[chrom][i]),
+                          self.chrom2names[chrom][i]) for i in self.overlap(chrom, start, end)]
+
+    def nearest(self, chrom, start, end):
+        '''
+        Return the BedRecord of the region nearest to the query and its distance in bases.
+        Distance is 0 for overlapping regions and 1 for book-ended regions, as in bedtools closest.
+        Ties are resolved in favor of the upstream region.
+        Return (None, None) if there are no regions on the chromosome
+        '''
+        if chrom not in self.chrom2starts or len(self.chrom2starts[chrom]) == 0:
+            return None, None
+        overlapping = self.overlap_records(chrom, start, end)
+        if overlapping:
+            return overlapping[0], 0
+
+        starts = self.chrom2starts[chrom]
+        maxends = self.chrom2maxends[chrom]
+        hi = np.searchsorted(starts, end, side='left')
+
+        best_i = None
+        best_dist = None
+        # Upstream: the region with the largest end among those starting before the query
+        if hi > 0:
+            best_i = np.searchsorted(maxends, maxends[hi - 1], side='left')
+            best_dist = int(start - maxends[hi - 1]) + 1
+        # Downstream: the first region starting at or after the query end
+        if hi < len(starts):
+            dist = int(starts[hi] - end) + 1
+            if best_dist is None or dist < best_dist:
+                best_i = hi
+                best_dist = dist
+        return BedRecord(chrom, int(starts[best_i]), int(self.chrom2ends[chrom][best_i]),
+                         self.chrom2names[chrom][best_i]), best_dist
+
+    def merge(self):
+        '''
+        Return a new IntervalIndex in which overlapping and book-ended regions are merged.
+        Names are not kept
+        '''
+        merged = []
+        for chrom in self.chroms():
+            starts = self.chrom2starts[chrom]
+            maxends = self.chrom2maxends[chrom]
+            # A new merged region begins wherever a start is past all the previous ends
+            breaks = np.nonzero(starts[1:] > maxends[:-1])[0] + 1
+            first = np.concatenate(([0], breaks))
+            last = np.concatenate((breaks - 1, [len(starts) - 1]))
+            for s, e in zip(starts[first], maxends[last]):
+                merged.append(BedRecord(chrom, int(s), int(e), None))
+        return IntervalIndex(merged)
+
+    def coverage(self, chrom, start, end):
+        '''
+        Return the number of bases within the query that are covered by at least one region
+        '''
+        if self._merged is None:
+            self._merged = self.merge()
+        idx = self._merged.overlap(chrom, start, end)
+        if len(idx) == 0:
+            return 0
+        starts = np.maximum(self._merged.chrom2starts[chrom][idx], start)
+        ends = np.minimum(self._merged.chrom2ends[chrom][idx], end)
+        return int((ends - starts).sum())
+
+    def total_length(self):
+        '''
+        Return the number of bases covered by at least one region
+        '''
+        if self._merged is None:
+            self._merged = self.merge()
+        return int(sum((self._merged.chrom2ends[c] - self._merged.chrom2starts[c]).sum()
+                       for c in self._merged.chroms()))
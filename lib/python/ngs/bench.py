@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+
+import cPickle
+import csv
+import imp
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from collections import namedtuple
+from ngs import annovar, fastq, maf, seq, vcf
+
+#------------------------------------------------------------------------------------------------
+# Synthetic data generators
+#
+# Each generator writes a seeded synthetic file in one of the formats read by the library and
+# the modules, so that the same size and seed always give the same file.
+
+CHROMS = ['chr%i' % i for i in xrange(1, 23)] + ['chrX', 'chrY']
+
+IMPACTS = ['HIGH', 'MODERATE', 'LOW', 'MODIFIER']
+
+MAF_VAR_CLASSES = ['Missense_Mutation',
+                   'Silent',
+                   'Nonsense_Mutation',
+                   'Intron',
+                   'Splice_Site',
+                   'Frame_Shift_Del']
+
+ANNOVAR_FUNCS = ['exonic', 'intronic', 'intergenic', 'UTR3', 'UTR5', 'splicing', 'ncRNA_exonic']
+
+ANNOVAR_EXONIC_FUNCS = ['synonymous SNV', 'nonsynonymous SNV', 'stopgain SNV', 'frameshift deletion']
+
+ANNOVAR_COLUMNS = ['Func', 'Gene', 'ExonicFunc', 'AAChange', 'Conserved', 'SegDup',
+                   'ESP5400_ALL', '1000g2010nov_ALL', 'dbSNP135', 'AVSIFT', 'LJB_PhyloP',
+                   'LJB_PhyloP_Pred', 'LJB_SIFT', 'LJB_SIFT_Pred', 'LJB_PolyPhen2',
+                   'LJB_PolyPhen2_Pred', 'LJB_LRT', 'LJB_LRT_Pred', 'LRT_MutationTaster',
+                   'LRT_MutationTaster_Pred', 'LJB_GERP++', 'Chr', 'Start', 'End', 'Ref', 'Obs',
+                   'Otherinfo']
+
+VARSCAN_SNPEFF_META = '''##fileformat=VCFv4.1
+##source=VarScan2
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Total depth of quality bases">
+##INFO=<ID=SOMATIC,Number=0,Type=Flag,Description="Indicates if record is a somatic mutation">
+##INFO=<ID=SS,Number=1,Type=String,Description="Somatic status of variant (0=Reference,1=Germline,2=Somatic,3=LOH, or 5=Unknown)">
+##INFO=<ID=SSC,Number=1,Type=String,Description="Somatic score in Phred scale (0-255) derived from somatic p-value">
+##INFO=<ID=GPV,Number=1,Type=Float,Description="Fisher's Exact Test P-value of tumor+normal versus no variant for Germline calls">
+##INFO=<ID=SPV,Number=1,Type=Float,Description="Fisher's Exact Test P-value of tumor versus normal for Somatic/LOH calls">
+##FILTER=<ID=str10,Description="Less than 10% or more than 90% of variant supporting reads on one strand">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=GQ,Number=1,Type=Integer,Description="Genotype Quality">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read Depth">
+##FORMAT=<ID=RD,Number=1,Type=Integer,Description="Depth of reference-supporting bases (reads1)">
+##FORMAT=<ID=AD,Number=1,Type=Integer,Description="Depth of variant-supporting bases (reads2)">
+##FORMAT=<ID=FREQ,Number=1,Type=String,Description="Variant allele frequency">
+##INFO=<ID=EFF,Number=.,Type=String,Description="Predicted effects for this variant.Format: 'Effect ( Effect_Impact | Functional_Class | Codon_Change | Amino_Acid_change | Gene_Name | Gene_BioType | Coding | Transcript | Exon [ | ERRORS | WARNINGS ] )' ">
+'''
+
+def _sorted_positions(rand, num):
+    '''
+    Generate num (chrom, pos) pairs in the order of CHROMS, and of increasing position
+    '''
+    per_chrom = num // len(CHROMS) + 1
+    for chrom in CHROMS:
+        pos = 0
+        for i in xrange(min(per_chrom, num)):
+            pos += rand.randint(1, 20000)
+            yield chrom, pos
+        num -= per_chrom
+        if num <= 0:
+            break
+
+def generate_fastq_pair(fout1, fout2, num_reads, read_length=100, seed=0, qscore_offset=33):
+    '''
+    Write a pair of fastq files of num_reads paired reads, with Casava 1.8 read names.
+    One in ten reads is trimmed to a shorter length
+    '''
+    rand = random.Random(seed)
+    genome = ''.join(rand.choice('ACGT') for i in xrange(100000))
+    quals = [''.join(chr(qscore_offset + max(2, 40 - j // 4 - rand.randint(0, 10)))
+                     for j in xrange(read_length))
+             for i in xrange(1000)]
+    barcode = 'ACGTAC'
+    for i in xrange(num_reads):
+        name = 'HWI-ST1234:8:%i:%i:%i' % (1101 + i // 1000000, rand.randint(1000, 20000), rand.randint(1000, 200000))
+        for read, fout in ((1, fout1), (2, fout2)):
+            length = read_length
+            if rand.random() < 0.1:
+                length = rand.randint(read_length // 3, read_length - 1)
+            start = rand.randint(0, len(genome) - length)
+            fout.write('@%s %i:N:0:%s\n%s\n+\n%s\n' % (name, read, barcode,
+                                                        genome[start:start + length],
+                                                        rand.choice(quals)[:length]))
+
+def generate_varscan_snpeff_vcf(fout, num_variants, seed=0):
+    '''
+    Write a VarScan somatic vcf file annotated by snpEff, with NORMAL and TUMOR samples.
+    One in ten variants is an indel, and one in ten does not PASS
+    '''
+    rand = random.Random(seed)
+    effects = vcf.SnpEffVcfFile.effects_prioritized
+    fout.write(VARSCAN_SNPEFF_META)
+    fout.write('#%s\n' % '\t'.join(['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO',
+                                    'FORMAT', 'NORMAL', 'TUMOR']))
+    for chrom, pos in _sorted_positions(rand, num_variants):
+        ref, alt = rand.sample('ACGT', 2)
+        if rand.random() < 0.1:
+            alt = ref + ''.join(rand.choice('ACGT') for i in xrange(rand.randint(1, 5)))
+        gene = rand.randint(0, 20000)
+        effs = []
+        for i in xrange(rand.randint(1, 6)):
+            transcript = 'ENST%011i' % rand.randint(0, 10 ** 6)
+            effs.append('%s(%s|||%s|GENE%i|protein_coding|CODING|%s|exon_%s_%i_%i)' %
+                        (rand.choice(effects), rand.choice(IMPACTS), rand.choice(['', 'R10W']),
+                         gene, transcript, chrom[3:], pos - 50, pos + 50))
+        samples = []
+        for gt in ('0/0', rand.choice(['0/1', '1/1'])):
+            dp = rand.randint(1, 200)
+            ad = rand.randint(0, dp)
+            samples.append('%s:.:%i:%i:%i:%.2f%%' % (gt, dp, dp - ad, ad, 100.0 * ad / dp))
+        info = 'DP=%i;SOMATIC;SS=2;SSC=%i;GPV=1E0;SPV=%.4E;EFF=%s' % (rand.randint(10, 400),
+                                                                      rand.randint(0, 255),
+                                                                      rand.random(),
+                                                                      ','.join(effs))
+        filtr = 'str10' if rand.random() < 0.1 else 'PASS'
+        fout.write('%s\n' % '\t'.join([chrom, str(pos), '.', ref, alt, '0.0', filtr, info,
+                                       vcf.VARSCAN_FORMAT_FIELD] + samples))
+
+def generate_maf(fout, num_samples, num_positions, seed=0):
+    '''
+    Write a synthetic maf file.  Each position is mutated in a Pareto distributed number of samples
+    '''
+    rand = random.Random(seed)
+    fout.write('%s\n' % '\t'.join(maf.MafFile.COLNAMES))
+    for i in xrange(num_positions):
+        chrom = 'chr%i' % rand.randint(1, 22)
+        pos = str(rand.randint(1, 10 ** 8))
+        gene = rand.randint(0, num_positions // 20)
+        var_class = rand.choice(MAF_VAR_CLASSES)
+        ref, alt = rand.sample('ACGT', 2)
+        num_carriers = min(num_samples, int(rand.paretovariate(1.2)))
+        for sample in rand.sample(xrange(num_samples), num_carriers):
+            fout.write('%s\n' % '\t'.join(['GENE_%i' % gene, str(gene), 'center', '37',
+                                           chrom, pos, pos, '+', var_class, 'SNP',
+                                           ref, ref, alt, '', '',
+                                           'TCGA-%04i-01' % sample, 'TCGA-%04i-10' % sample,
+                                           ref, ref, '', '', '', '', '', '', 'Somatic', '', '', '',
+                                           '', '', 'Illumina', 'T%i' % gene, 'p.X%iY' % i]))
+
+def generate_annovar_csv(fout, num_variants, num_samples=5, seed=0):
+    '''
+    Write an annovar summarize csv file, with the vcf columns of num_samples samples
+    in the Otherinfo columns
+    '''
+    rand = random.Random(seed)
+    writer = csv.writer(fout, dialect='excel')
+    writer.writerow(ANNOVAR_COLUMNS + [''] * (8 + num_samples))
+
+    def freq():
+        return '%.6f' % rand.random() ** 3 if rand.random() < 0.5 else ''
+
+    def pred(values):
+        return rand.choice(values) if rand.random() < 0.7 else ''
+
+    for chrom, pos in _sorted_positions(rand, num_variants):
+        ref, alt = rand.sample('ACGT', 2)
+        func = rand.choice(ANNOVAR_FUNCS)
+        gene = 'GENE%i' % rand.randint(0, 20000)
+        exonic_func, aa_change = '', ''
+        if func == 'exonic':
+            exonic_func = rand.choice(ANNOVAR_EXONIC_FUNCS)
+            aa_change = 'NM_%06i:c.%s%i%s' % (rand.randint(0, 10 ** 5), ref, pos % 5000, alt)
+        dbsnp = 'rs%i' % rand.randint(1, 10 ** 8) if rand.random() < 0.5 else ''
+        samples = [rand.choice(['0/0', '0/1', '1/1', './.']) + ':%i:99' % rand.randint(1, 200)
+                   for i in xrange(num_samples)]
+        writer.writerow([func, gene, exonic_func, aa_change, '', '', freq(), freq(), dbsnp,
+                         '%.2f' % rand.random(), '%.6f' % rand.random(), pred('CN'),
+                         '%.2f' % rand.random(), pred('DT'), '%.6f' % rand.random(), pred('DPB'),
+                         '%.6f' % rand.random(), pred('DN'), '%.6f' % rand.random(), pred('AD'),
+                         '%.2f' % rand.uniform(-5, 5), chrom[3:], pos, pos, ref, alt,
+                         chrom[3:], pos, dbsnp or '.', ref, alt, '%.2f' % rand.uniform(30, 3000),
+                         'PASS', 'DP=%i' % rand.randint(10, 400), 'GT:DP:GQ'] + samples)
+
+def generate_depthofcov(fout, num_positions, num_samples=10, seed=0):
+    '''
+    Write a GATK DepthOfCoverage table of num_positions positions and num_samples samples
+    '''
+    rand = random.Random(seed)
+    fout.write('%s\n' % '\t'.join(['Locus', 'Total_Depth', 'Average_Depth_sample'] +
+                                  ['Depth_for_S%i' % i for i in xrange(num_samples)]))
+    for chrom, pos in _sorted_positions(rand, num_positions):
+        # Consecutive covered bases
+        pos = pos // 10000 * 10000
+        depths = [rand.randint(0, 100) for i in xrange(num_samples)]
+        total = sum(depths)
+        fout.write('%s:%i\t%i\t%.2f\t%s\n' % (chrom, pos, total, total / float(num_samples),
+                                              '\t'.join(map(str, depths))))
+
+#------------------------------------------------------------------------------------------------
+# Benchmark inputs
+#
+# An input kind names the generator of a benchmark input, its default size, and how records
+# are counted in it.
+
+DEFAULT_SIZES = {'fastq': 100000,
+                 'vcf': 50000,
+                 'maf': 20000,
+                 'annovar': 50000,
+                 'depthofcov': 100000}
+
+# Number of samples of the generated maf
+MAF_SAMPLES = 500
+
+def input_filename(data_dir, kind, size, seed=0):
+    '''
+    Path of the generated input of a kind, size, and seed.  For fastq, the read 1 file
+    '''
+    name = 'bench-n%i-s%i' % (size, seed)
+    if kind == 'fastq':
+        return os.path.join(data_dir, '%s_ACGTAC_L001_R1_001.fastq' % name)
+    ext = {'vcf': 'vcf', 'maf': 'maf', 'annovar': 'csv', 'depthofcov': 'depthofcov'}[kind]
+    return os.path.join(data_dir, '%s.%s' % (name, ext))
+
+def generate_input(data_dir, kind, size, seed=0):
+    '''
+    Generate the input of a kind, unless it already exists, and return its path
+    '''
+    filename = input_filename(data_dir, kind, size, seed)
+    if os.path.exists(filename):
+        return filename
+    if not os.path.isdir(data_dir):
+        os.makedirs(data_dir)
+    # Written under a temporary name, so that interrupted generation is not reused
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as fout:
+        if kind == 'fastq':
+            with open(tmp_filename.replace('_R1_', '_R2_'), 'w') as fout2:
+                generate_fastq_pair(fout, fout2, size, seed=seed)
+            os.rename(tmp_filename.replace('_R1_', '_R2_'), filename.replace('_R1_', '_R2_'))
+        elif kind == 'vcf':
+            generate_varscan_snpeff_vcf(fout, size, seed=seed)
+        elif kind == 'maf':
+            generate_maf(fout, MAF_SAMPLES, size, seed=seed)
+        elif kind == 'annovar':
+            generate_annovar_csv(fout, size, seed=seed)
+        elif kind == 'depthofcov':
+            generate_depthofcov(fout, size, seed=seed)
+        else:
+            raise ValueError, 'Unknown input kind %s' % kind
+    os.rename(tmp_filename, filename)
+    return filename
+
+def count_records(kind, filename):
+    '''
+    Number of records of an input: reads, variant lines, or data rows
+    '''
+    with open(filename, 'r') as f:
+        if kind == 'fastq':
+            return sum(1 for line in f) // 4
+        if kind == 'vcf':
+            return sum(1 for line in f if line[0] != '#')
+        return sum(1 for line in f) - 1
+
+#------------------------------------------------------------------------------------------------
+# Measurement
+
+# Result of running a function in a child process
+#   seconds:          wall time
+#   peak_rss_kb:      peak resident set size of the child
+#   rss_increase_kb:  increase of the peak resident set size while running the function
+#   error:            the exception raised, the exit status of a child that died, or None
+Measurement = namedtuple('Measurement', ['seconds', 'peak_rss_kb', 'rss_increase_kb', 'error'])
+
+def measure(func, *args):
+    '''
+    Run func(*args) in a forked child process, so that its peak memory is not shared with
+    other runs, and return its Measurement.  A child that dies without a result, e.g. killed
+    for running out of memory, is a failed Measurement with its exit status as the error
+    '''
+    rfd, wfd = os.pipe()
+    start = time.time()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(rfd)
+            error = None
+            maxrss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.time()
+            try:
+                func(*args)
+            except BaseException as e:
+                error = '%s: %s' % (type(e).__name__, e)
+            wall = time.time() - start
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            with os.fdopen(wfd, 'wb') as f:
+                cPickle.dump(Measurement(wall, maxrss, maxrss - maxrss_start, error), f)
+        finally:
+            os._exit(0)
+    os.close(wfd)
+    with os.fdopen(rfd, 'rb') as f:
+        try:
+            result = cPickle.load(f)
+        except EOFError:
+            result = None
+    _, status, rusage = os.wait4(pid, 0)
+    if result is None:
+        if os.WIFSIGNALED(status):
+            error = 'Benchmark process killed by signal %i' % os.WTERMSIG(status)
+        else:
+            error = 'Benchmark process exited with status %i' % os.WEXITSTATUS(status)
+        result = Measurement(time.time() - start, rusage.ru_maxrss, None, error)
+    return result
+
+# Imported module scripts, by name
+_scripts = {}
+
+def load_script(subdir, name):
+    '''
+    Import a module script, i.e. ('seq', 'fastq_scores'), from the modules directory of
+    $NGS_ANALYSIS_DIR, or else of the source tree of this library.  Scripts are imported once
+    '''
+    if name in _scripts:
+        return _scripts[name]
+    analysis_dir = os.environ.get('NGS_ANALYSIS_DIR',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+    dont_write_bytecode = sys.dont_write_bytecode
+    sys.dont_write_bytecode = True
+    try:
+        script = _scripts[name] = imp.load_source(name, os.path.join(analysis_dir, 'modules', subdir, name + '.py'))
+        return script
+    finally:
+        sys.dont_write_bytecode = dont_write_bytecode
+
+#------------------------------------------------------------------------------------------------
+# Benchmarks
+#
+# A benchmark runs a hot path over a whole generated input, discarding its output.
+
+def bench_vcf_parse_line(filename):
+    with vcf.VcfFile(filename, 'r') as vcffile:
+        vcffile.jump2variants()
+        for line in vcffile:
+            vcffile.parse_line(line)
+
+def bench_vcf_parse_effects(filename):
+    with vcf.SnpEffVcfFile(filename, 'r') as vcffile:
+        vcffile.jump2variants()
+        for line in vcffile:
+            vcffile.parse_effects(vcffile.parse_line(line))
+
+def bench_vcf_filter(filename):
+    vcf_filter = load_script('variant', 'vcf_filter')
+    stdout = sys.stdout
+    with open(filename, 'r') as fin, open(os.devnull, 'w') as sys.stdout:
+        try:
+            vcf_filter.filter_vcf_file(fin, col_filter='PASS', remove_indel=True, sample_dp_threshold=10)
+        finally:
+            sys.stdout = stdout
+
+def bench_fastq_stats(filename):
+    seq.FastqStats(filename).get_seqstats()
+
+def bench_fastq_pairs(filename):
+    with open(filename, 'r') as f1, open(filename.replace('_R1_', '_R2_'), 'r') as f2:
+        for status in fastq.FastqFilePairs(f1, f2).generate_length_tests(minlen=50):
+            pass
+
+def bench_fastq_scores(filename):
+    fastq_scores = load_script('seq', 'fastq_scores')
+    fastq_scores.fastq_scores_report(filename, platform=fastq_scores._PLATFORM_TYPE['fastq-sanger'])
+
+def bench_maf_pos_simple(filename):
+    with maf.MafFile(filename, 'r') as maffile, open(os.devnull, 'w') as fout:
+        maffile.generate_pos_report(fout=fout, detailed=False)
+
+def bench_maf_pos_detailed(filename):
+    with maf.MafFile(filename, 'r') as maffile, open(os.devnull, 'w') as fout:
+        maffile.generate_pos_report(fout=fout, detailed=True)
+
+def bench_maf_gene(filename):
+    with maf.MafFile(filename, 'r') as maffile, open(os.devnull, 'w') as fout:
+        maffile.generate_gene_report(fout=fout)
+
+def _annovar_filters(annovarcsv):
+    factory = annovar.AnnovarCsvFilterFactory()
+    annovarcsv.add_filter(factory.create_1000Genomes_maf_selector(maxval=0.01))
+    annovarcsv.add_filter(factory.create_polyphen_pred_selector(['D', 'P']))
+
+def bench_annovar_filter(filename):
+    with open(filename, 'r') as f:
+        annovarcsv = annovar.AnnovarCsv(f)
+        _annovar_filters(annovarcsv)
+        for row in annovarcsv.filtered_variants():
+            pass
+
+def bench_annovar_filter_batch(filename):
+    with open(filename, 'r') as f:
+        annovarcsv = annovar.AnnovarCsv(f)
+        _annovar_filters(annovarcsv)
+        for row in annovarcsv.filtered_variants_batch():
+            pass
+
+def bench_depthofcov(filename):
+    pos_vs_depth = load_script('align', 'pos_vs_depth')
+    with open(filename, 'r') as f:
+        samples = pos_vs_depth.read_depthofcov_header(f)
+        for chrom, pos, depths in pos_vs_depth.generate_chrom_depths(f, len(samples)):
+            pos_vs_depth.summarize_chrom(pos, depths, pos_vs_depth.DEFAULT_MAX_POINTS)
+
+# Benchmark name => (input kind, function), in the order they are run
+BENCHMARKS = [('vcf_parse_line', ('vcf', bench_vcf_parse_line)),
+              ('vcf_parse_effects', ('vcf', bench_vcf_parse_effects)),
+              ('vcf_filter', ('vcf', bench_vcf_filter)),
+              ('fastq_stats', ('fastq', bench_fastq_stats)),
+              ('fastq_pairs', ('fastq', bench_fastq_pairs)),
+              ('fastq_scores', ('fastq', bench_fastq_scores)),
+              ('maf_pos_simple', ('maf', bench_maf_pos_simple)),
+              ('maf_pos_detailed', ('maf', bench_maf_pos_detailed)),
+              ('maf_gene', ('maf', bench_maf_gene)),
+              ('annovar_filter', ('annovar', bench_annovar_filter)),
+              ('annovar_filter_batch', ('annovar', bench_annovar_filter_batch)),
+              ('depthofcov', ('depthofcov', bench_depthofcov))]
+
+BENCHMARK_NAMES = [name for name, _ in BENCHMARKS]
+
+# Module scripts of the benchmarks, imported before they are measured
+BENCHMARK_SCRIPTS = {'vcf_filter': ('variant', 'vcf_filter'),
+                     'fastq_scores': ('seq', 'fastq_scores'),
+                     'depthofcov': ('align', 'pos_vs_depth')}
+
+def run_benchmarks(data_dir, names=None, scale=1.0, seed=0, log=None):
+    '''
+    Generate the inputs, and run the benchmarks, all by default.
+    Input sizes are the DEFAULT_SIZES multiplied by scale.
+    Return the results as a dictionary that can be dumped as json, where each benchmark has
+    its input records, seconds, records per second, and peak memory, or its error
+    '''
+    name2benchmark = dict(BENCHMARKS)
+    if names is None:
+        names = BENCHMARK_NAMES
+    for name in names:
+        if name not in name2benchmark:
+            raise ValueError, 'Unknown benchmark %s' % name
+
+    results = {'python': platform.python_version(),
+               'seed': seed,
+               'sizes': {},
+               'benchmarks': {}}
+    kind2input = {}
+    for name in names:
+        kind, func = name2benchmark[name]
+        if kind not in kind2input:
+            size = max(1, int(DEFAULT_SIZES[kind] * scale))
+            filename = generate_input(data_dir, kind, size, seed)
+            kind2input[kind] = filename, count_records(kind, filename)
+            results['sizes'][kind] = size
+        filename, records = kind2input[kind]
+        if name in BENCHMARK_SCRIPTS:
+            try:
+                load_script(*BENCHMARK_SCRIPTS[name])
+            except ImportError:
+                # Reported as the error of the benchmark
+                pass
+        m = measure(func, filename)
+        result = {'input': kind,
+                  'records': records,
+                  'seconds': round(m.seconds, 4),
+                  'records_per_sec': round(records / m.seconds, 1) if m.seconds > 0 else None,
+                  'peak_rss_kb': m.peak_rss_kb,
+                  'rss_increase_kb': m.rss_increase_kb}
+        if m.error is not None:
+            result = {'input': kind, 'error': m.error}
+        results['benchmarks'][name] = result
+        if log is not None:
+            log(name, result)
+    return results
+
+def compare_results(baseline, results, tolerance=0.1):
+    '''
+    Compare benchmark results with baseline results of the same sizes, and return a list of
+    (benchmark, metric, baseline value, value) of the regressions: records per second lower,
+    or peak memory higher, than the baseline by more than the tolerance fraction
+    '''
+    regressions = []
+    for name, result in sorted(results['benchmarks'].iteritems()):
+        base = baseline['benchmarks'].get(name)
+        if base is None or 'error' in base or 'error' in result:
+            continue
+        if (base['records_per_sec'] is not None and result['records_per_sec'] is not None and
+            result['records_per_sec'] < base['records_per_sec'] * (1 - tolerance)):
+            regressions.append((name, 'records_per_sec', base['records_per_sec'], result['records_per_sec']))
+        if result['peak_rss_kb'] > base['peak_rss_kb'] * (1 + tolerance):
+            regressions.append((name, 'peak_rss_kb', base['peak_rss_kb'], result['peak_rss_kb']))
+    return regressions
@@ -2,8 +2,17 @@
 
 import gzip
 import os
+import struct
 import sys
 import zipfile
+import zlib
+
+# BGZF end-of-file marker block (empty block, see SAM/BAM specification)
+BGZF_EOF = ('\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+            '\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00')
+
+# Maximum number of uncompressed bytes per BGZF block, as used by htslib
+BGZF_BLOCK_SIZE = 65280
 
 def get_file_read_handle(filename):
     '''
@@ -22,3 +31,36 @@ def get_file_read_handle(filename):
     except IOError:
         return False
 
+def gzip_compress(data, level=6):
+    '''
+    Compress data into a single gzip member.
+    Members can be appended to one another, and the resulting file is still
+    readable by gzip/zcat as a single stream
+    '''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+def bgzf_compress(data, level=6):
+    '''
+    Compress data into a series of BGZF blocks.
+    Blocks can be appended to one another; the BGZF_EOF marker should be
+    written once at the very end of the file
+    '''
+    blocks = []
+    for i in xrange(0, len(data), BGZF_BLOCK_SIZE):
+        chunk = data[i:i + BGZF_BLOCK_SIZE]
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        cdata = compressor.compress(chunk) + compressor.flush()
+        # Header with the BC extra subfield holding the total block size - 1
+        header = struct.pack('<BBBBIBBHBBHH', 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata) + 25)
+        footer = struct.pack('<II', zlib.crc32(chunk) & 0xffffffff, len(chunk))
+        blocks.append(header + cdata + footer)
+    return ''.join(blocks)
+
+# Chunk compressors and file extensions for the supported output compression types
+COMPRESSORS = {None: lambda data: data,
+               'gzip': gzip_compress,
+               'bgzf': bgzf_compress}
+COMPRESSION_EXT = {None: '',
+                   'gzip': '.gz',
+                   'bgzf': '.gz'}
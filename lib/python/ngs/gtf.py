@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+import array
+from collections import namedtuple
+from ngs import bed
+from ngs.util import lazy_import
+
+multiprocessing = lazy_import('multiprocessing')
+
+GtfRecord = namedtuple('GtfRecord', ['chrom', 'source', 'feature', 'start', 'end', 'score', 'strand',
+                                     'frame', 'attributes'])
+
+# Attributes whose values are repeated on many lines, and are interned to save memory
+INTERNED_ATTRIBUTES = frozenset(['gene_id', 'transcript_id', 'gene_name', 'gene_biotype',
+                                 'transcript_name', 'source'])
+
+def parse_attributes(attr_str):
+    '''
+    Parse the attributes column of a gtf line, i.e.
+      gene_id "ENSG00000223972"; transcript_id "ENST00000456328"; exon_number "1";
+    Return a dict mapping attribute names to values, with the quotes removed
+    Names, and the values of INTERNED_ATTRIBUTES, are interned
+    '''
+    attrs = {}
+    for field in attr_str.split(';'):
+        field = field.strip()
+        if not field:
+            continue
+        key, _, val = field.partition(' ')
+        key = intern(key)
+        val = val.strip('"')
+        if key in INTERNED_ATTRIBUTES:
+            val = intern(val)
+        attrs[key] = val
+    return attrs
+
+def parse_line(line):
+    '''
+    Parse a gtf line and return a GtfRecord object
+    Coordinates are converted from 1-based closed to 0-based half-open, as in bed files
+    '''
+    la = line.rstrip('\n').split('\t')
+    return GtfRecord(intern(la[0]),
+                     la[1],
+                     la[2],
+                     int(la[3]) - 1,
+                     int(la[4]),
+                     la[5],
+                     la[6],
+                     la[7],
+                     parse_attributes(la[8]))
+
+def read_gtf(fin, chrom_filter=None):
+    '''
+    Generate GtfRecord objects for each line in a gtf file
+    If chrom_filter is set, only the lines for which chrom_filter(chrom) is True are parsed
+    '''
+    for line in fin:
+        if not line.strip() or line[0] == '#':
+            continue
+        if chrom_filter is not None and not chrom_filter(line[:line.find('\t')]):
+            continue
+        yield parse_line(line)
+
+class TranscriptTable(object):
+    '''
+    Compact table of transcript lengths and exons.
+    Each transcript is assigned an integer id in order of addition, which indexes the
+    lengths array, and the exon_offsets array into the exon_starts and exon_ends arrays.
+    Can be used in place of a transcript => length dict
+    '''
+    def __init__(self):
+        self.transcript2id = {}
+        self.transcripts = []
+        self.lengths = array.array('l')
+        self.exon_offsets = array.array('l', [0])
+        self.exon_starts = array.array('l')
+        self.exon_ends = array.array('l')
+
+    @classmethod
+    def from_dict(cls, transcript2len):
+        '''
+        Build a table from a transcript => length mapping
+        '''
+        table = cls()
+        for transcript, length in sorted(transcript2len.iteritems()):
+            table.add(transcript, length)
+        return table
+
+    @classmethod
+    def from_lengths_file(cls, fin):
+        '''
+        Build a table from a tab-separated file of transcript, length lines
+        '''
+        table = cls()
+        for line in fin:
+            la = line.rstrip('\n').split('\t')
+            if len(la) > 1 and la[1]:
+                table.add(la[0], int(la[1]))
+        return table
+
+    def add(self, transcript, length, exons=()):
+        '''
+        Add a transcript with its length and list of exon (start, end), and return its id
+        '''
+        transcript_id = len(self.transcripts)
+        self.transcript2id[intern(transcript)] = transcript_id
+        self.transcripts.append(transcript)
+        self.lengths.append(length)
+        for start, end in exons:
+            self.exon_starts.append(start)
+            self.exon_ends.append(end)
+        self.exon_offsets.append(len(self.exon_starts))
+        return transcript_id
+
+    def __len__(self):
+        return len(self.transcripts)
+
+    def __contains__(self, transcript):
+        return transcript in self.transcript2id
+
+    def __getitem__(self, transcript):
+        return self.lengths[self.transcript2id[transcript]]
+
+    def get(self, transcript, default=None):
+        transcript_id = self.transcript2id.get(transcript)
+        if transcript_id is None:
+            return default
+        return self.lengths[transcript_id]
+
+    def get_id(self, transcript):
+        return self.transcript2id.get(transcript)
+
+    def exons(self, transcript):
+        '''
+        Return the list of exon (start, end) of a transcript
+        '''
+        transcript_id = self.transcript2id[transcript]
+        first = self.exon_offsets[transcript_id]
+        last = self.exon_offsets[transcript_id + 1]
+        return zip(self.exon_starts[first:last], self.exon_ends[first:last])
+
+class GtfSummary(object):
+    '''
+    Genes, transcripts, and exons collected from a single pass through a gtf file,
+    from which all the derived bed files and tables are generated.
+    Summaries of different parts of a gtf file can be combined with update()
+      chrom_rename: function applied to the chromosome names of the output bed files
+      chrom_filter: function selecting the gtf chromosomes of the bed files and transcript
+                    lengths.  The transcripts of the other chromosomes are only listed in
+                    gene2transcript
+    '''
+    def __init__(self, chrom_rename=None, chrom_filter=None):
+        self.chrom_rename = chrom_rename
+        self.chrom_filter = chrom_filter
+        # (gene_name, gene_id, transcript_id) of the transcripts of the filtered out chromosomes
+        self.other_gene2transcript = set()
+        # (chrom, gene_name) => [start, end]
+        self.gene2span = {}
+        # transcript_id => [chrom, gene_name, gene_id, start, end]
+        self.transcript2info = {}
+        # transcript_id => list of exon (start, end)
+        self.transcript2exons = {}
+
+    def add(self, record):
+        '''
+        Add a GtfRecord to the summary
+        '''
+        attrs = record.attributes
+        gene_name = attrs.get('gene_name') or attrs.get('gene_id')
+        if gene_name is None:
+            return
+        if self.chrom_filter is not None and not self.chrom_filter(record.chrom):
+            transcript = attrs.get('transcript_id')
+            if transcript is not None:
+                self.other_gene2transcript.add((gene_name, attrs.get('gene_id', ''), transcript))
+            return
+        chrom = record.chrom
+        if self.chrom_rename is not None:
+            chrom = self.chrom_rename(chrom)
+
+        # Gene span
+        key = (chrom, gene_name)
+        span = self.gene2span.get(key)
+        if span is None:
+            self.gene2span[key] = [record.start, record.end]
+        else:
+            if record.start < span[0]:
+                span[0] = record.start
+            if record.end > span[1]:
+                span[1] = record.end
+
+        # Transcript span
+        transcript = attrs.get('transcript_id')
+        if transcript is None:
+            return
+        info = self.transcript2info.get(transcript)
+        if info is None:
+            self.transcript2info[transcript] = [chrom, gene_name, attrs.get('gene_id', ''),
+                                                record.start, record.end]
+        else:
+            if record.start < info[3]:
+                info[3] = record.start
+            if record.end > info[4]:
+                info[4] = record.end
+
+        # Exons
+        if record.feature == 'exon':
+            self.transcript2exons.setdefault(transcript, []).append((record.start, record.end))
+
+    def scan(self, fin, chrom_filter=None):
+        '''
+        Add all the records of a gtf file input stream
+        '''
+        for record in read_gtf(fin, chrom_filter):
+            self.add(record)
+        return self
+
+    def update(self, other):
+        '''
+        Combine another summary into this one
+        '''
+        for key, (start, end) in other.gene2span.iteritems():
+            span = self.gene2span.setdefault(key, [start, end])
+            span[0] = min(span[0], start)
+            span[1] = max(span[1], end)
+        for transcript, info in other.transcript2info.iteritems():
+            curr = self.transcript2info.setdefault(transcript, list(info))
+            curr[3] = min(curr[3], info[3])
+            curr[4] = max(curr[4], info[4])
+        for transcript, exons in other.transcript2exons.iteritems():
+            self.transcript2exons.setdefault(transcript, []).extend(exons)
+        self.other_gene2transcript |= other.other_gene2transcript
+        return self
+
+    def _merged_exons(self, transcript):
+        '''
+        Merged exons of a transcript.  Transcripts without exon records are represented by
+        their span
+        '''
+        exons = self.transcript2exons.get(transcript)
+        if exons:
+            return bed.merge_intervals(exons)
+        info = self.transcript2info[transcript]
+        return [(info[3], info[4])]
+
+    def genes(self):
+        '''
+        Sorted BedRecords spanning each gene, named by gene
+        '''
+        return sorted(bed.BedRecord(chrom, span[0], span[1], gene)
+                      for (chrom, gene), span in self.gene2span.iteritems())
+
+    def transcripts(self):
+        '''
+        Sorted BedRecords spanning each transcript, named gene_transcript
+        '''
+        return sorted(bed.BedRecord(info[0], info[3], info[4], '_'.join([info[1], transcript]))
+                      for transcript, info in self.transcript2info.iteritems())
+
+    def transcript_exons(self):
+        '''
+        Sorted BedRecords of the merged exons of each transcript, named gene_transcript
+        '''
+        records = []
+        for transcript, info in self.transcript2info.iteritems():
+            name = '_'.join([info[1], transcript])
+            for start, end in self._merged_exons(transcript):
+                records.append(bed.BedRecord(info[0], start, end, name))
+        return sorted(records)
+
+    def gene_exons(self):
+        '''
+        Sorted BedRecords of the exons of all the transcripts of each gene, merged,
+        and named by gene
+        '''
+        gene2exons = {}
+        for transcript, info in self.transcript2info.iteritems():
+            gene2exons.setdefault((info[0], info[1]), []).extend(self._merged_exons(transcript))
+        records = []
+        for (chrom, gene), exons in gene2exons.iteritems():
+            for start, end in bed.merge_intervals(exons):
+                records.append(bed.BedRecord(chrom, start, end, gene))
+        return sorted(records)
+
+    def transcript_lengths(self):
+        '''
+        Return mapping of transcript => total length of its merged exons
+        '''
+        return dict((transcript, sum(end - start for start, end in self._merged_exons(transcript)))
+                    for transcript in self.transcript2info)
+
+    def transcript_table(self):
+        '''
+        Return a TranscriptTable of the merged exons of each transcript, in transcript order
+        '''
+        table = TranscriptTable()
+        for transcript in sorted(self.transcript2info):
+            exons = self._merged_exons(transcript)
+            table.add(transcript, sum(end - start for start, end in exons), exons)
+        return table
+
+    def gene2transcript(self):
+        '''
+        Sorted list of unique (gene_name, gene_id, transcript_id) tuples, of all the chromosomes
+        '''
+        return sorted(set((info[1], info[2], transcript)
+                          for transcript, info in self.transcript2info.iteritems()) | self.other_gene2transcript)
+
+#------------------------------------------------------------------------------------------------
+# Parallel mode
+
+def chrom_runs(fin):
+    '''
+    Read through a gtf file, and return a list of (chrom, byte offset, byte length) tuples
+    for each run of consecutive lines on the same chromosome
+    '''
+    runs = []
+    offset = 0
+    for line in fin:
+        chrom = line[:line.find('\t')]
+        if runs and runs[-1][0] == chrom:
+            runs[-1][2] += len(line)
+        else:
+            runs.append([chrom, offset, len(line)])
+        offset += len(line)
+    return [tuple(run) for run in runs]
+
+def _summarize_runs(args):
+    '''
+    Worker function for summarize_parallel
+    Summarize the runs of a gtf file assigned to a single process
+    '''
+    filename, runs, chrom_filter, chrom_rename = args
+    summary = GtfSummary(chrom_rename, chrom_filter)
+    with open(filename, 'r') as f:
+        for chrom, offset, length in runs:
+            f.seek(offset)
+            summary.scan(f.read(length).splitlines(True))
+    return summary
+
+def summarize_parallel(filename, processes=None, chrom_filter=None, chrom_rename=None):
+    '''
+    Summarize a gtf file with a pool of processes, each parsing its own chromosomes.
+    Runs of chromosomes are assigned to processes largest first, to balance the load
+    chrom_filter and chrom_rename are those of GtfSummary, and must be module-level functions,
+    so that they can be pickled
+    '''
+    with open(filename, 'r') as f:
+        runs = chrom_runs(f)
+    processes = processes or multiprocessing.cpu_count()
+
+    # Assign runs to the least loaded process
+    loads = [0] * processes
+    process_runs = [[] for i in xrange(processes)]
+    for run in sorted(runs, key=lambda r: r[2], reverse=True):
+        i = loads.index(min(loads))
+        process_runs[i].append(run)
+        loads[i] += run[2]
+
+    summary = GtfSummary(chrom_rename, chrom_filter)
+    pool = multiprocessing.Pool(processes)
+    try:
+        for partial in pool.imap_unordered(_summarize_runs, [(filename, r, chrom_filter, chrom_rename)
+                                                             for r in process_runs if r]):
+            summary.update(partial)
+    finally:
+        pool.close()
+        pool.join()
+    return summary
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+
+import json
+import os
+import resource
+import signal
+import time
+from collections import Counter, defaultdict
+
+# Stages that the time of a run is attributed to.  Time not spent in an instrumented stage
+# is attributed to other
+STAGES = ('read', 'parse', 'transform', 'write', 'other')
+
+# Environment variables
+#   NGS_PROFILE:         profile the python scripts run by python_ngs.sh, when set to 1
+#   NGS_PROFILE_DIR:     directory in which the json sidecars of the profiled runs are collected
+#   NGS_PROFILE_SAMPLE:  interval of the sampling profiler, in seconds.  Off when unset
+ENV_PROFILE = 'NGS_PROFILE'
+ENV_PROFILE_DIR = 'NGS_PROFILE_DIR'
+ENV_PROFILE_SAMPLE = 'NGS_PROFILE_SAMPLE'
+
+DEFAULT_PROFILE_DIR = 'profile'
+
+# Suffixes of the json sidecar, and of the collapsed stacks of the sampling profiler
+SIDECAR_SUFFIX = '.profile.json'
+SAMPLES_SUFFIX = '.samples.txt'
+
+# Number of functions with the most samples kept in the sidecar
+TOP_FUNCTIONS = 25
+
+def read_proc_io():
+    '''
+    Return the bytes read and written by this process so far, including from pipes and
+    compressed files, or None where /proc/self/io is not available
+    '''
+    try:
+        with open('/proc/self/io', 'r') as f:
+            field2val = dict(line.split(': ') for line in f)
+        return int(field2val['rchar']), int(field2val['wchar'])
+    except (IOError, KeyError, ValueError):
+        return None
+
+class Profile(object):
+    '''
+    Stage timers, counters, and optional sampling profiler of a run.
+    Time is attributed to a single stage at a time: switching to a stage stops the clock of the
+    current one, so that the stages of nested, lazily chained iterators get exclusive times
+    '''
+
+    def __init__(self, tool, argv=None, sample_interval=None):
+        self.tool = tool
+        self.argv = list(argv or [])
+        self.start_time = time.time()
+        self.stage2seconds = defaultdict(float)
+        self.counters = Counter()
+        self.current = 'other'
+        self.last_switch = self.start_time
+        self.rusage_start = resource.getrusage(resource.RUSAGE_SELF)
+        self.io_start = read_proc_io()
+        self.report = None
+        self.samples = None
+        self.sample_interval = sample_interval
+        if sample_interval:
+            self.samples = Counter()
+            signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(signal.ITIMER_PROF, sample_interval, sample_interval)
+
+    def switch(self, stage):
+        '''
+        Attribute the time since the last switch to the current stage, make stage the current
+        one, and return the previous stage
+        '''
+        now = time.time()
+        previous = self.current
+        self.stage2seconds[previous] += now - self.last_switch
+        self.current = stage
+        self.last_switch = now
+        return previous
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append('%s:%s' % (os.path.basename(code.co_filename), code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        self.samples[';'.join(stack)] += 1
+
+    def top_functions(self, num=TOP_FUNCTIONS):
+        '''
+        List of [function, self samples, total samples] of the functions with the most
+        samples, where self samples are those in which the function was running
+        '''
+        func2self = Counter()
+        func2total = Counter()
+        for stack, n in self.samples.iteritems():
+            funcs = stack.split(';')
+            func2self[funcs[-1]] += n
+            for func in set(funcs):
+                func2total[func] += n
+        return [[func, n, func2total[func]] for func, n in func2self.most_common(num)]
+
+    def stop(self, exit_status=0):
+        '''
+        Stop the clocks and the sampling profiler, and return the report of the run
+        '''
+        if self.report is not None:
+            return self.report
+        if self.samples is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        self.switch('other')
+        wall = time.time() - self.start_time
+        rusage = resource.getrusage(resource.RUSAGE_SELF)
+        io_end = read_proc_io()
+        if exit_status is None:
+            exit_status = 0
+        elif not isinstance(exit_status, int):
+            exit_status = 1
+
+        self.report = {'tool': self.tool,
+                       'argv': self.argv,
+                       'start': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.start_time)),
+                       'exit_status': exit_status,
+                       'wall_seconds': round(wall, 4),
+                       'cpu_user_seconds': round(rusage.ru_utime - self.rusage_start.ru_utime, 4),
+                       'cpu_system_seconds': round(rusage.ru_stime - self.rusage_start.ru_stime, 4),
+                       'peak_rss_kb': rusage.ru_maxrss,
+                       'io_read_bytes': None,
+                       'io_write_bytes': None,
+                       'stages': dict((s, round(t, 4)) for s, t in self.stage2seconds.iteritems()),
+                       'counters': dict(self.counters)}
+        if self.io_start is not None and io_end is not None:
+            self.report['io_read_bytes'] = io_end[0] - self.io_start[0]
+            self.report['io_write_bytes'] = io_end[1] - self.io_start[1]
+        if self.samples is not None:
+            self.report['samples'] = {'interval': self.sample_interval,
+                                      'total': sum(self.samples.itervalues()),
+                                      'top_functions': self.top_functions()}
+        return self.report
+
+    def write(self, sidecar):
+        '''
+        Write the report of the run as a json sidecar file, and the collapsed stacks of the
+        sampling profiler, one "func;func;func count" line per stack, next to it
+        '''
+        report = self.stop()
+        sidecar_dir = os.path.dirname(sidecar)
+        if sidecar_dir and not os.path.isdir(sidecar_dir):
+            os.makedirs(sidecar_dir)
+        with open(sidecar, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        if self.samples:
+            samples_file = sidecar[:-len(SIDECAR_SUFFIX)] + SAMPLES_SUFFIX if sidecar.endswith(SIDECAR_SUFFIX) else sidecar + SAMPLES_SUFFIX
+            with open(samples_file, 'w') as f:
+                for stack, n in sorted(self.samples.iteritems()):
+                    f.write('%s %i\n' % (stack, n))
+
+def sidecar_path(tool, profile_dir=DEFAULT_PROFILE_DIR):
+    '''
+    Path of the sidecar of a run of tool, unique per process
+    '''
+    name = os.path.basename(tool)
+    if name.endswith('.py'):
+        name = name[:-3]
+    return os.path.join(profile_dir, '%s.%s.%i%s' % (name, time.strftime('%Y%m%d-%H%M%S'),
+                                                     os.getpid(), SIDECAR_SUFFIX))
+
+#------------------------------------------------------------------------------------------------
+# Instrumentation hooks
+#
+# The library hot paths call these hooks, which do nothing unless a run is being profiled.
+
+# Profile of the current run, or None
+_active = None
+
+def active():
+    return _active
+
+def start(tool, argv=None, sample_interval=None):
+    '''
+    Start profiling the current run, and return its Profile
+    '''
+    global _active
+    _active = Profile(tool, argv, sample_interval)
+    return _active
+
+def stop(exit_status=0):
+    '''
+    Stop profiling the current run, and return its Profile
+    '''
+    global _active
+    prof, _active = _active, None
+    if prof is not None:
+        prof.stop(exit_status)
+    return prof
+
+def _timed(prof, it, stage):
+    num, num_bytes = 0, 0
+    try:
+        while True:
+            previous = prof.switch(stage)
+            try:
+                item = next(it)
+            finally:
+                prof.switch(previous)
+            num += 1
+            if isinstance(item, str):
+                num_bytes += len(item)
+            yield item
+    except StopIteration:
+        pass
+    finally:
+        prof.count('%s_records' % stage, num)
+        if num_bytes:
+            prof.count('%s_bytes' % stage, num_bytes)
+
+def timed(iterable, stage):
+    '''
+    Return iterable unchanged, or, when profiling, an iterator over its items that attributes
+    the time spent producing each item to stage, and counts the items, and the bytes of string
+    items, as <stage>_records and <stage>_bytes
+    '''
+    if _active is None:
+        return iterable
+    return _timed(_active, iter(iterable), stage)
+
+class _TimedWriter(object):
+    '''
+    File wrapper that attributes the time spent in write calls to a stage, and counts the
+    bytes written as <stage>_bytes
+    '''
+
+    def __init__(self, prof, fout, stage):
+        self.prof = prof
+        self.fout = fout
+        self.stage = stage
+
+    def write(self, s):
+        previous = self.prof.switch(self.stage)
+        self.fout.write(s)
+        self.prof.switch(previous)
+        self.prof.counters['%s_bytes' % self.stage] += len(s)
+
+    def __getattr__(self, name):
+        return getattr(self.fout, name)
+
+def timed_writer(fout, stage='write'):
+    '''
+    Return fout unchanged, or, when profiling, a wrapper of it that times its writes
+    '''
+    if _active is None:
+        return fout
+    return _TimedWriter(_active, fout, stage)
+
+class stage(object):
+    '''
+    Context manager that attributes the time spent in its block to a stage, when profiling
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.prof = None
+
+    def __enter__(self):
+        self.prof = _active
+        if self.prof is not None:
+            self.previous = self.prof.switch(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.prof is not None:
+            self.prof.switch(self.previous)
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+#------------------------------------------------------------------------------------------------
+# Sidecar summaries
+
+def summarize_reports(reports):
+    '''
+    Aggregate the sidecar reports of a project run by tool.
+    Return a list of rows of (tool, runs, failed runs, wall seconds, cpu seconds, max peak rss kb,
+    io read bytes, io write bytes, seconds of each of the STAGES), sorted by decreasing wall time,
+    and a list of [function, self samples, total samples] of the sampled functions, summed over
+    the runs, sorted by decreasing self samples
+    '''
+    tool2row = {}
+    func2samples = defaultdict(lambda: [0, 0])
+    for report in reports:
+        row = tool2row.setdefault(report['tool'], [report['tool'], 0, 0, 0.0, 0.0, 0, 0, 0] + [0.0] * len(STAGES))
+        row[1] += 1
+        row[2] += int(report['exit_status'] != 0)
+        row[3] += report['wall_seconds']
+        row[4] += report['cpu_user_seconds'] + report['cpu_system_seconds']
+        row[5] = max(row[5], report['peak_rss_kb'])
+        row[6] += report['io_read_bytes'] or 0
+        row[7] += report['io_write_bytes'] or 0
+        for i, s in enumerate(STAGES):
+            row[8 + i] += report['stages'].get(s, 0.0)
+        for func, self_samples, total_samples in report.get('samples', {}).get('top_functions', []):
+            func2samples[func][0] += self_samples
+            func2samples[func][1] += total_samples
+    rows = sorted(tool2row.itervalues(), key=lambda row: (-row[3], row[0]))
+    functions = sorted(([func, s[0], s[1]] for func, s in func2samples.iteritems()),
+                       key=lambda f: (-f[1], f[0]))
+    return rows, functions
@@ -1,9 +1,36 @@
 #!/usr/bin/env python
 
 #import re
+import cPickle
+import operator
+import os
 import sys
 import itertools
 from collections import defaultdict
+from ngs import instrument
+from ngs.util import SampleIndex
+
+# Position report keys, simple version
+POS_SIMPLE_COLUMNS = ('Chromosome',
+                      'Start_position',
+                      'End_position',
+                      'Variant_Type')
+
+# Position report keys, detailed version
+POS_DETAILED_COLUMNS = ('Hugo_Symbol',
+                        'Entrez_Gene_Id',
+                        'Chromosome',
+                        'Start_position',
+                        'End_position',
+                        'Variant_Classification',
+                        'Variant_Type',
+                        'Reference_Allele',
+                        'Tumor_Seq_Allele1',
+                        'Tumor_Seq_Allele2',
+                        'Match_Norm_Seq_Allele1',
+                        'Match_Norm_Seq_Allele2',
+                        'transcript_name',
+                        'amino_acid_change')
 
 class MafFile(file):
     '''
@@ -61,54 +88,34 @@ class MafFile(file):
         Optional output to ostream fout
         Note: This file iterator must be positioned at the top of the file
         work properly.
+        Returns the mapping of position key to sample bitmask, whose samples are
+        registered in self.sample_index
         '''
 
-        # Simple version
-        poskey_columns = ('Chromosome',
-                          'Start_position',
-                          'End_position',
-                          'Variant_Type')
-
-        # Detailed version
+        poskey_columns = POS_SIMPLE_COLUMNS
         if detailed:
-            poskey_columns = ('Hugo_Symbol',
-                              'Entrez_Gene_Id',
-                              'Chromosome',
-                              'Start_position',
-                              'End_position',
-                              'Variant_Classification',
-                              'Variant_Type',
-                              'Reference_Allele',
-                              'Tumor_Seq_Allele1',
-                              'Tumor_Seq_Allele2',
-                              'Match_Norm_Seq_Allele1',
-                              'Match_Norm_Seq_Allele2',
-                              'transcript_name',
-                              'amino_acid_change')
+            poskey_columns = POS_DETAILED_COLUMNS
 
         # Process file
-        poskey2samples = defaultdict(set)
-        for line in self:
+        self.sample_index = SampleIndex()
+        add_sample = self.sample_index.add
+        poskey2samples = {}
+        maf_records = instrument.timed(itertools.imap(self.parse_line, instrument.timed(self, 'read')), 'parse')
+        with instrument.stage('transform'):
+            for maf_record in maf_records:
 
-            # Parse mutation data
-            maf_record = self.parse_line(line)
+                # Skip header line
+                if maf_record['Hugo_Symbol'] == self.COLNAMES[0]:
+                    continue
 
-            # Skip header line
-            if maf_record['Hugo_Symbol'] == self.COLNAMES[0]:
-                continue
+                # Generate key
+                poskey = tuple([maf_record[k] for k in poskey_columns])
+
+                # Update sample list for the given mutation
+                poskey2samples[poskey] = poskey2samples.get(poskey, 0) | add_sample(maf_record['Tumor_Sample_Barcode'])
 
-            # Generate key
-            poskey = tuple([maf_record[k] for k in poskey_columns])
-
-            # Update sample list for the given mutation
-            poskey2samples[poskey].add(maf_record['Tumor_Sample_Barcode'])
-            
-        # Sorted Output
-        fout.write('%s\n' % '\t'.join(list(poskey_columns) + ['Num_Samples','Samples']))
-        for poskey,samples in sorted(poskey2samples.items()):
-            fout.write('%s\t%i\t%s\n' % ('\t'.join(poskey),
-                                         len(samples),
-                                         ','.join(sorted(samples))))
+        with instrument.stage('write'):
+            write_pos_report(fout, poskey_columns, poskey2samples, self.sample_index)
         return poskey2samples
                 
 
@@ -117,74 +124,245 @@ class MafFile(file):
         Generate a gene report
         Optional output to ostream fout
         Note: This file iterator must be positioned at the top of the file
+        Returns the mappings of gene to var class to variant count, to sample
+        bitmask, and to chrom:pos to sample bitmask, whose samples are
+        registered in self.sample_index
         '''
 
+        self.sample_index = SampleIndex()
         g2c2varcounts = defaultdict(dict)
         g2c2samples = defaultdict(dict)
-        g2c2samplepos = defaultdict(dict)
-        var_classes = set()
-        for line in self:
-            # Parse mutation data
-            maf_record = self.parse_line(line)
+        g2c2pos2samples = defaultdict(dict)
+        maf_records = instrument.timed(itertools.imap(self.parse_line, instrument.timed(self, 'read')), 'parse')
+        with instrument.stage('transform'):
+            for maf_record in maf_records:
+
+                # Skip header line
+                if maf_record['Hugo_Symbol'] == self.COLNAMES[0]:
+                    continue
+
+                # Update counts
+                gene = maf_record['Hugo_Symbol']
+                var_class = maf_record['Variant_Classification']
+                g2c2varcounts[gene][var_class] = g2c2varcounts[gene].get(var_class, 0) + 1
+
+                # Update samples
+                bit = self.sample_index.add(maf_record['Tumor_Sample_Barcode'])
+                g2c2samples[gene][var_class] = g2c2samples[gene].get(var_class, 0) | bit
+
+                # Update samplepos
+                chrom = maf_record['Chromosome'].replace('chr','')
+                pos = ':'.join([chrom, maf_record['Start_position']])
+                pos2samples = g2c2pos2samples[gene].setdefault(var_class, {})
+                pos2samples[pos] = pos2samples.get(pos, 0) | bit
+
+        with instrument.stage('write'):
+            write_gene_report(fout, g2c2varcounts, g2c2samples, g2c2pos2samples, self.sample_index)
+        return g2c2varcounts, g2c2samples, g2c2pos2samples
+
+
+def write_pos_report(fout, poskey_columns, poskey2samples, sample_index):
+    '''
+    Output a positional report, in sorted position key order, from the mapping
+    of position key to sample bitmask
+    '''
+    fout.write('%s\n' % '\t'.join(list(poskey_columns) + ['Num_Samples','Samples']))
+    for poskey, samples in sorted(poskey2samples.iteritems()):
+        names = sample_index.names_of(samples)
+        fout.write('%s\t%i\t%s\n' % ('\t'.join(poskey),
+                                     len(names),
+                                     ','.join(names)))
+
+def write_gene_report(fout, g2c2varcounts, g2c2samples, g2c2pos2samples, sample_index, genes=None):
+    '''
+    Output a gene report from the mappings of gene to var class to variant count,
+    to sample bitmask, and to chrom:pos to sample bitmask.
+    Genes are output in the order of genes, by default that of g2c2varcounts
+    '''
+    # Format and output header line
+    var_classes = sorted(set(itertools.chain(*g2c2varcounts.itervalues())))
+    sample_cols = ['%s_Num_Samples\t%s_Sample_Chrom_Pos' % (vc,vc) for vc in var_classes]
+    var_classes_columns = list(itertools.chain(*zip(var_classes,sample_cols)))
+    fout.write('%s\n' % '\t'.join(['Gene'] +
+                                  var_classes_columns +
+                                  ['Total',
+                                   'Total_Num_Samples',
+                                   'Total_Sample_Chrom_Pos']))
+    # Output counts per gene
+    if genes is None:
+        genes = g2c2varcounts
+    for g in genes:
+        # Start with gene name
+        output_line_items = [g]
+
+        # Append var class info
+        total = 0
+        total_samples = 0
+        total_samplepos = set()
+        for vc in var_classes:
+            varcounts = g2c2varcounts[g].get(vc, 0)
+            samples = g2c2samples[g].get(vc, 0)
+            samplepos = ['%s:%s' % (sample, pos)
+                         for pos, pos_samples in g2c2pos2samples[g].get(vc, {}).iteritems()
+                         for sample in sample_index.names_of(pos_samples)]
+            output_line_items.append(str(varcounts))
+            output_line_items.append(str(sample_index.count(samples)))
+            output_line_items.append(','.join(sorted(samplepos)))
+
+            # Update total counts
+            total += varcounts
+            total_samples |= samples
+            total_samplepos.update(samplepos)
+
+        # Append total counts info
+        output_line_items.append(str(total))
+        output_line_items.append(str(sample_index.count(total_samples)))
+        output_line_items.append(','.join(sorted(total_samplepos)))
+
+        # Output the line
+        fout.write('%s\n' % '\t'.join(output_line_items))
+
+
+class MafCohortStore(object):
+    '''
+    Persistent cohort aggregates of maf files, updated one sample at a time.
+    Holds the sample bitmask of each position report key, and the variant
+    counts and sample positions of each gene and variant classification,
+    so the position and gene reports of the cohort are output without
+    re-reading the maf files of the samples already added.
+    '''
+
+    def __init__(self):
+        self.samples = SampleIndex()
+        # poskey -> sample bitmask
+        self.pos_simple = {}
+        self.pos_detailed = {}
+        # gene -> var_class -> variant count
+        self.g2c2varcounts = {}
+        # gene -> var_class -> chrom:pos -> sample bitmask
+        self.g2c2pos2samples = {}
+        # sample -> (gene, var_class) -> variant count, to remove samples
+        self.sample2counts = {}
+
+    @classmethod
+    def load(cls, filename):
+        '''
+        Load a store from file, or return an empty store if the file does not exist
+        '''
+        if not os.path.exists(filename):
+            return cls()
+        with open(filename, 'rb') as f:
+            return cPickle.load(f)
+
+    def save(self, filename):
+        '''
+        Save the store, replacing the file only once completely written
+        '''
+        tmp_filename = '%s.tmp' % filename
+        with open(tmp_filename, 'wb') as f:
+            cPickle.dump(self, f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_filename, filename)
+
+    def add_samples(self, lines, replace=False):
+        '''
+        Add the maf records of lines, grouped by Tumor_Sample_Barcode.
+        Samples already in the store raise ValueError, unless replace is set,
+        in which case their previous records are removed first.
+        Returns the list of samples added
+        '''
+        sample2records = defaultdict(list)
+        for line in lines:
+            maf_record = dict(zip(MafFile.COLNAMES, line.strip('\n').split('\t')))
 
             # Skip header line
-            if maf_record['Hugo_Symbol'] == self.COLNAMES[0]:
+            if maf_record['Hugo_Symbol'] == MafFile.COLNAMES[0]:
                 continue
+            sample2records[maf_record['Tumor_Sample_Barcode']].append(maf_record)
+
+        for sample in sample2records:
+            if sample in self.samples:
+                if not replace:
+                    raise ValueError, 'Sample %s is already in the cohort store' % sample
+                self.remove_sample(sample)
+
+        for sample, maf_records in sample2records.iteritems():
+            self._add_sample_records(sample, maf_records)
+        return sorted(sample2records)
+
+    def _add_sample_records(self, sample, maf_records):
+        bit = self.samples.add(sample)
+        counts = defaultdict(int)
+        for maf_record in maf_records:
+            # Position reports
+            for poskey2samples, poskey_columns in ((self.pos_simple, POS_SIMPLE_COLUMNS),
+                                                   (self.pos_detailed, POS_DETAILED_COLUMNS)):
+                poskey = tuple([maf_record.get(k, '') for k in poskey_columns])
+                poskey2samples[poskey] = poskey2samples.get(poskey, 0) | bit
 
-            # Update counts
+            # Gene report
             gene = maf_record['Hugo_Symbol']
             var_class = maf_record['Variant_Classification']
-            var_classes.add(var_class)
-            g2c2varcounts[gene][var_class] = g2c2varcounts[gene].setdefault(var_class, 0) + 1
-
-            # Update samples
-            sample = maf_record['Tumor_Sample_Barcode']
-            g2c2samples[gene].setdefault(var_class, set()).add(sample)
-
-            # Update samplepos
-            chrom = maf_record['Chromosome'].replace('chr','')
-            pos = maf_record['Start_position']
-            samplepos = ':'.join([sample, chrom, pos])
-            g2c2samplepos[gene].setdefault(var_class, set()).add(samplepos)
-            
-        # Output results
-        # Format and output header line
-        var_classes = sorted(var_classes)
-        sample_cols = ['%s_Num_Samples\t%s_Sample_Chrom_Pos' % (vc,vc) for vc in var_classes]
-        var_classes_columns = list(itertools.chain(*zip(var_classes,sample_cols)))
-        fout.write('%s\n' % '\t'.join(['Gene'] +
-                                      var_classes_columns +
-                                      ['Total',
-                                       'Total_Num_Samples',
-                                       'Total_Sample_Chrom_Pos']))
-        # Output counts per gene
-        for g in g2c2varcounts:
-            # Start with gene name
-            output_line_items = [g]
-
-            # Append var class info
-            total = 0
-            total_samples = set()
-            total_samplepos = set()
-            for vc in var_classes:
-                varcounts = g2c2varcounts[g].setdefault(vc,0)
-                samples = g2c2samples[g].setdefault(vc,set())
-                samplepos = g2c2samplepos[g].setdefault(vc,set())
-                output_line_items.append(str(varcounts))
-                output_line_items.append(str(len(samples)))
-                output_line_items.append(','.join(sorted(samplepos)))
-
-                # Update total counts
-                total += varcounts
-                total_samples.update(samples)
-                total_samplepos.update(samplepos)
-
-            # Append total counts info
-            output_line_items.append(str(total))
-            output_line_items.append(str(len(total_samples)))
-            output_line_items.append(','.join(sorted(total_samplepos)))
-
-            # Output the line
-            fout.write('%s\n' % '\t'.join(output_line_items))
-
-        return g2c2varcounts, g2c2samples, g2c2samplepos
+            c2varcounts = self.g2c2varcounts.setdefault(gene, {})
+            c2varcounts[var_class] = c2varcounts.get(var_class, 0) + 1
+            counts[(gene, var_class)] += 1
+            pos = ':'.join([maf_record['Chromosome'].replace('chr',''),
+                            maf_record['Start_position']])
+            pos2samples = self.g2c2pos2samples.setdefault(gene, {}).setdefault(var_class, {})
+            pos2samples[pos] = pos2samples.get(pos, 0) | bit
+        self.sample2counts[sample] = dict(counts)
+
+    def remove_sample(self, sample):
+        '''
+        Remove a sample's records from the cohort aggregates
+        '''
+        if sample not in self.samples:
+            raise ValueError, 'Sample %s is not in the cohort store' % sample
+        keep = ~self.samples.remove(sample)
+        for poskey2samples in (self.pos_simple, self.pos_detailed):
+            for poskey, mask in poskey2samples.items():
+                mask &= keep
+                if mask:
+                    poskey2samples[poskey] = mask
+                else:
+                    del poskey2samples[poskey]
+
+        for (gene, var_class), count in self.sample2counts.pop(sample).iteritems():
+            c2varcounts = self.g2c2varcounts[gene]
+            c2varcounts[var_class] -= count
+            c2pos2samples = self.g2c2pos2samples[gene]
+            if c2varcounts[var_class]:
+                pos2samples = c2pos2samples[var_class]
+                for pos, mask in pos2samples.items():
+                    mask &= keep
+                    if mask:
+                        pos2samples[pos] = mask
+                    else:
+                        del pos2samples[pos]
+            else:
+                del c2varcounts[var_class]
+                del c2pos2samples[var_class]
+                if not c2varcounts:
+                    del self.g2c2varcounts[gene]
+                    del self.g2c2pos2samples[gene]
+
+    def generate_pos_report(self, fout=sys.stdout, detailed=False):
+        '''
+        Output the cohort positional report, in the format of MafFile.generate_pos_report
+        '''
+        if detailed:
+            write_pos_report(fout, POS_DETAILED_COLUMNS, self.pos_detailed, self.samples)
+        else:
+            write_pos_report(fout, POS_SIMPLE_COLUMNS, self.pos_simple, self.samples)
+
+    def generate_gene_report(self, fout=sys.stdout):
+        '''
+        Output the cohort gene report, in the format of MafFile.generate_gene_report,
+        with genes in sorted order
+        '''
+        g2c2samples = {}
+        for gene, c2pos2samples in self.g2c2pos2samples.iteritems():
+            c2samples = g2c2samples[gene] = {}
+            for var_class, pos2samples in c2pos2samples.iteritems():
+                c2samples[var_class] = reduce(operator.or_, pos2samples.itervalues(), 0)
+        write_gene_report(fout, self.g2c2varcounts, g2c2samples, self.g2c2pos2samples, self.samples,
+                          genes=sorted(self.g2c2varcounts))
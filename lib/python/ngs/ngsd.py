@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+
+import cPickle
+import errno
+import importlib
+import json
+import os
+import runpy
+import select
+import signal
+import socket
+import struct
+import sys
+import time
+import traceback
+
+# Environment variable with the socket path of a running ngsd.  python_ngs.sh runs the python
+# scripts through it when it is set
+ENV_SOCKET = 'NGSD_SOCKET'
+
+# Modules imported by ngsd at startup, unless others are given
+DEFAULT_MODULES = ('numpy', 'ngs.annotdb', 'ngs.annovar', 'ngs.bed', 'ngs.gtf', 'ngs.maf',
+                   'ngs.seq', 'ngs.tabular', 'ngs.util', 'ngs.vcf')
+
+# A request is a json object prefixed by its length.  For the run request, the bytes that follow
+# are the stdin of the script
+REQUEST_HEADER = struct.Struct('>I')
+
+# Replies are frames of a channel byte and a length, followed by the data
+FRAME_HEADER = struct.Struct('>cI')
+STDOUT = '1'
+STDERR = '2'
+EXIT = 'x'
+REPLY = 'r'
+
+BUFFER_SIZE = 65536
+
+#------------------------------------------------------------------------------------------------
+# Warm lookup tables
+#
+# ngsd loads the lookup tables it is given at startup, and the scripts it runs get them from
+# load_table and warm_table instead of loading them again.  A table is only used while the file
+# it was loaded from is unchanged.
+
+def _load_gene2entrez(filename):
+    '''
+    gene => entrez id dict, from a tab-separated mapping file or an annotation database
+    '''
+    from ngs import annotdb
+    if annotdb.is_annotdb(filename):
+        with annotdb.AnnotDb(filename) as annot:
+            gene2entrez = annot.load_dict('gene2entrez', 'gene_name', 'entrez_id')
+        return dict((g, e) for g, e in gene2entrez.iteritems() if g and e)
+    gene2entrez = {}
+    with open(filename, 'r') as f:
+        for line in f:
+            la = line.strip('\n').split('\t')
+            if la[0] and la[1]:
+                gene2entrez[la[0]] = la[1]
+    return gene2entrez
+
+def _load_transcript_length(filename):
+    '''
+    gtf.TranscriptTable of transcript lengths, from a pickled dict, a tab-separated file, or an
+    annotation database
+    '''
+    from ngs import annotdb, gtf
+    if annotdb.is_annotdb(filename):
+        with annotdb.AnnotDb(filename) as annot:
+            return gtf.TranscriptTable.from_dict(annot.load_dict('transcript_length', 'transcript_id', 'length'))
+    if filename.endswith('.pkl'):
+        with open(filename, 'rb') as f:
+            return gtf.TranscriptTable.from_dict(cPickle.load(f))
+    with open(filename, 'r') as f:
+        return gtf.TranscriptTable.from_lengths_file(f)
+
+def _load_rsid(filename):
+    '''
+    (chrom, pos, ref, alt) => rsid dict pickled by dbsnp_variant2rsid_pickle.py
+    '''
+    with open(filename, 'rb') as f:
+        return cPickle.load(f)
+
+TABLE_LOADERS = {'gene2entrez': _load_gene2entrez,
+                 'transcript_length': _load_transcript_length,
+                 'rsid': _load_rsid}
+
+# (kind, real path) => ((size, mtime), table)
+_warm_tables = {}
+
+def _file_signature(filename):
+    st = os.stat(filename)
+    return st.st_size, st.st_mtime
+
+def warm_table(kind, filename):
+    '''
+    Return the table of kind loaded from filename by ngsd, or None if it was not preloaded,
+    or if the file changed since
+    '''
+    if not _warm_tables:
+        return None
+    entry = _warm_tables.get((kind, os.path.realpath(filename)))
+    if entry is None:
+        return None
+    try:
+        if _file_signature(filename) != entry[0]:
+            return None
+    except OSError:
+        return None
+    return entry[1]
+
+def load_table(kind, filename):
+    '''
+    Load the lookup table of kind, one of TABLE_LOADERS, from filename, or return its warm copy
+    '''
+    if kind not in TABLE_LOADERS:
+        raise ValueError, 'Unknown lookup table %s' % kind
+    table = warm_table(kind, filename)
+    if table is None:
+        table = TABLE_LOADERS[kind](filename)
+    return table
+
+def preload_table(kind, filename):
+    '''
+    Load the lookup table of kind from filename, and keep it warm for the scripts run after
+    '''
+    if kind not in TABLE_LOADERS:
+        raise ValueError, 'Unknown lookup table %s' % kind
+    signature = _file_signature(filename)
+    table = TABLE_LOADERS[kind](filename)
+    _warm_tables[(kind, os.path.realpath(filename))] = (signature, table)
+    return table
+
+#------------------------------------------------------------------------------------------------
+# Protocol
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError('Connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+def _encode(obj):
+    '''
+    Convert the unicode strings decoded by json back to str
+    '''
+    if isinstance(obj, unicode):
+        return obj.encode('utf-8')
+    if isinstance(obj, list):
+        return [_encode(o) for o in obj]
+    if isinstance(obj, dict):
+        return dict((_encode(k), _encode(v)) for k, v in obj.iteritems())
+    return obj
+
+def send_request(sock, request):
+    data = json.dumps(request)
+    sock.sendall(REQUEST_HEADER.pack(len(data)) + data)
+
+def recv_request(sock):
+    size, = REQUEST_HEADER.unpack(_recv_exactly(sock, REQUEST_HEADER.size))
+    return _encode(json.loads(_recv_exactly(sock, size)))
+
+def send_frame(sock, channel, data):
+    sock.sendall(FRAME_HEADER.pack(channel, len(data)) + data)
+
+def recv_frame(sock):
+    channel, size = FRAME_HEADER.unpack(_recv_exactly(sock, FRAME_HEADER.size))
+    return channel, _recv_exactly(sock, size)
+
+#------------------------------------------------------------------------------------------------
+# Running scripts
+
+def exec_script(argv):
+    '''
+    Run the script argv[0] in this process as __main__, as if it was run from the command line,
+    and return its exit status
+    '''
+    sys.argv = list(argv)
+    sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+    try:
+        runpy.run_path(argv[0], run_name='__main__')
+        status = 0
+    except SystemExit as e:
+        status = e.code
+    except:
+        traceback.print_exc()
+        status = 1
+    if status is None:
+        status = 0
+    elif not isinstance(status, int):
+        sys.stderr.write('%s\n' % status)
+        status = 1
+    for f in (sys.stdout, sys.stderr):
+        try:
+            f.flush()
+        except IOError:
+            pass
+    return status
+
+def _flush_std():
+    # Flush before forking, so that buffered output is not written twice
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+def _handle_run(conn, request):
+    '''
+    Run the script of a request in a forked process, with the connection as its stdin, and
+    relay its stdout, stderr, and exit status to the client
+    '''
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    _flush_std()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(out_r)
+            os.close(err_r)
+            os.dup2(conn.fileno(), 0)
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            os.close(out_w)
+            os.close(err_w)
+            conn.close()
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            status = exec_script(request['argv'])
+        finally:
+            os._exit(status)
+    os.close(out_w)
+    os.close(err_w)
+
+    fd2channel = {out_r: STDOUT, err_r: STDERR}
+    try:
+        while fd2channel:
+            readable, _, _ = select.select(list(fd2channel), [], [])
+            for fd in readable:
+                data = os.read(fd, BUFFER_SIZE)
+                if data:
+                    send_frame(conn, fd2channel[fd], data)
+                else:
+                    os.close(fd)
+                    del fd2channel[fd]
+    except socket.error:
+        # The client is gone
+        os.kill(pid, signal.SIGTERM)
+    _, status = os.waitpid(pid, 0)
+    if os.WIFEXITED(status):
+        exit_status = os.WEXITSTATUS(status)
+    else:
+        exit_status = 128 + os.WTERMSIG(status)
+    try:
+        send_frame(conn, EXIT, str(exit_status))
+    except socket.error:
+        pass
+
+class Server(object):
+    '''
+    ngsd, a long-lived worker that imports modules and loads lookup tables once, and runs the
+    python scripts on request over a unix socket.  Each script runs in a process forked from
+    the server, so that it starts with the warm modules and tables, but can not change them
+    '''
+    def __init__(self, socket_path, modules=DEFAULT_MODULES, tables=(), log=sys.stderr):
+        self.socket_path = socket_path
+        self.modules = list(modules)
+        self.tables = list(tables)
+        self.log = log
+        self.sock = None
+        self.running = False
+        self.start_time = None
+        self.num_requests = 0
+
+    def preload(self):
+        '''
+        Import the modules, and load the (kind, filename) lookup tables
+        '''
+        for name in self.modules:
+            if name.startswith('matplotlib') and 'matplotlib' not in sys.modules:
+                import matplotlib
+                matplotlib.use('Agg')
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                self.log.write('Could not import %s: %s\n' % (name, e))
+        for kind, filename in self.tables:
+            table = preload_table(kind, filename)
+            self.log.write('Loaded %s table %s, %i entries\n' % (kind, filename, len(table)))
+
+    def bind(self):
+        '''
+        Listen on the socket, readable and writable by the user only.  A stale socket of an ngsd
+        that is no longer running is replaced
+        '''
+        if os.path.exists(self.socket_path):
+            if status(self.socket_path) is not None:
+                raise ValueError, 'ngsd is already running on %s' % self.socket_path
+            os.remove(self.socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0077)
+        try:
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        sock.listen(128)
+        self.sock = sock
+
+    def status(self):
+        return {'pid': os.getpid(),
+                'uptime_seconds': round(time.time() - self.start_time, 1),
+                'requests': self.num_requests,
+                'modules': sorted(name for name in self.modules if name in sys.modules),
+                'tables': sorted([kind, path, len(table)] for (kind, path), (_, table) in _warm_tables.iteritems())}
+
+    def _reap(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.ECHILD:
+                    return
+                raise
+            if pid == 0:
+                return
+
+    def _handle(self, conn):
+        request = recv_request(conn)
+        op = request.get('op')
+        if op == 'status':
+            send_frame(conn, REPLY, json.dumps(self.status()))
+        elif op == 'stop':
+            self.running = False
+            send_frame(conn, REPLY, json.dumps(self.status()))
+        elif op == 'run':
+            self.num_requests += 1
+            _flush_std()
+            if os.fork() == 0:
+                try:
+                    self.sock.close()
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    _handle_run(conn, request)
+                finally:
+                    os._exit(0)
+        else:
+            send_frame(conn, REPLY, json.dumps({'error': 'Unknown request %s' % op}))
+
+    def serve(self):
+        '''
+        Serve requests until stopped by a stop request, or SIGTERM
+        '''
+        def terminate(signum, frame):
+            raise SystemExit(0)
+        signal.signal(signal.SIGTERM, terminate)
+        self.start_time = time.time()
+        self.running = True
+        try:
+            while self.running:
+                self._reap()
+                try:
+                    conn, _ = self.sock.accept()
+                except socket.error as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    raise
+                try:
+                    self._handle(conn)
+                except (socket.error, EOFError, ValueError) as e:
+                    self.log.write('Bad request: %s\n' % e)
+                finally:
+                    conn.close()
+        finally:
+            self.sock.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+#------------------------------------------------------------------------------------------------
+# Client
+
+def connect(socket_path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except:
+        sock.close()
+        raise
+    return sock
+
+# Errors connecting to a socket that no ngsd listens on: missing, or left by a killed ngsd
+NOT_RUNNING_ERRNOS = (errno.ENOENT, errno.ECONNREFUSED)
+
+def connect_running(socket_path):
+    '''
+    Connect to the ngsd listening on socket_path, or return None if none is.
+    Other connection errors are raised
+    '''
+    try:
+        return connect(socket_path)
+    except socket.error as e:
+        if e.errno in NOT_RUNNING_ERRNOS:
+            return None
+        raise
+
+def _request_reply(socket_path, op):
+    sock = connect(socket_path)
+    try:
+        send_request(sock, {'op': op})
+        _, data = recv_frame(sock)
+        return json.loads(data)
+    finally:
+        sock.close()
+
+def status(socket_path):
+    '''
+    Return the status of the ngsd listening on socket_path, or None if none is
+    '''
+    try:
+        return _request_reply(socket_path, 'status')
+    except (socket.error, EOFError):
+        return None
+
+def stop(socket_path):
+    '''
+    Stop the ngsd listening on socket_path, and return its last status
+    '''
+    return _request_reply(socket_path, 'stop')
+
+def run(socket_path, argv, stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr):
+    '''
+    Run the script argv[0] with arguments argv[1:] in the ngsd listening on socket_path,
+    relaying stdin, stdout and stderr, and return its exit status.
+    Raise socket.error if ngsd can not be reached
+    '''
+    return run_on(connect(socket_path), argv, stdin, stdout, stderr)
+
+def run_on(sock, argv, stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr):
+    '''
+    Same as run, over a socket connected to ngsd, which is closed afterwards
+    '''
+    try:
+        send_request(sock, {'op': 'run',
+                            'argv': list(argv),
+                            'cwd': os.getcwd(),
+                            'env': dict(os.environ)})
+        return _relay(sock, stdin, stdout, stderr)
+    finally:
+        sock.close()
+
+def _relay(sock, stdin, stdout, stderr):
+    sock.setblocking(0)
+    stdin_fd = stdin.fileno()
+    try:
+        os.fstat(stdin_fd)
+        stdin_open = True
+    except OSError:
+        stdin_open = False
+        sock.shutdown(socket.SHUT_WR)
+    pending = ''
+    buf = ''
+    while True:
+        rlist = [sock]
+        if stdin_open and not pending:
+            rlist.append(stdin_fd)
+        wlist = [sock] if pending else []
+        readable, writable, _ = select.select(rlist, wlist, [])
+
+        # Forward stdin, until its end or until the script stops reading it
+        if stdin_fd in readable:
+            pending = os.read(stdin_fd, BUFFER_SIZE)
+            if not pending:
+                stdin_open = False
+                sock.shutdown(socket.SHUT_WR)
+        if writable:
+            try:
+                pending = pending[sock.send(pending):]
+            except socket.error as e:
+                if e.errno == errno.EPIPE:
+                    stdin_open = False
+                    pending = ''
+                elif e.errno != errno.EAGAIN:
+                    raise
+
+        # Write out the output frames
+        if sock in readable:
+            try:
+                data = sock.recv(BUFFER_SIZE)
+            except socket.error as e:
+                if e.errno == errno.EAGAIN:
+                    continue
+                raise
+            if not data:
+                raise EOFError('ngsd closed the connection')
+            buf += data
+            while len(buf) >= FRAME_HEADER.size:
+                channel, size = FRAME_HEADER.unpack_from(buf)
+                end = FRAME_HEADER.size + size
+                if len(buf) < end:
+                    break
+                data, buf = buf[FRAME_HEADER.size:end], buf[end:]
+                if channel == EXIT:
+                    stdout.flush()
+                    stderr.flush()
+                    return int(data)
+                if channel == STDOUT:
+                    stdout.write(data)
+                else:
+                    stderr.write(data)
+                    stderr.flush()
@@ -0,0 +1,730 @@
+#!/usr/bin/env python
+
+import hashlib
+import json
+import os
+import Queue
+import re
+import shutil
+import string
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# File in which the checksums of the inputs of each step are kept, for the checksum check
+DEFAULT_STATE_FILE = '.ngs_pipeline.state'
+
+# Directory in which the job scripts and logs of the SGE backend are written
+DEFAULT_SGE_DIR = os.path.join('tmp', 'pipeline')
+
+# Longest interval, in seconds, at which the local backend polls its running steps
+LOCAL_POLL_INTERVAL = 0.1
+
+# Methods to check whether the outputs of a step are up to date
+CHECK_METHODS = ('mtime', 'checksum')
+
+# Size of the blocks, and number of blocks, read from each input file to compute the
+# cache key of a step
+CACHE_SAMPLE_SIZE = 64 * 1024
+CACHE_SAMPLE_BLOCKS = 8
+
+# Name of the manifest file in each cache entry directory
+CACHE_MANIFEST = 'manifest.json'
+
+# Result of a step
+#   status:  ran, skipped, cached, or failed
+#   wall:    elapsed seconds
+#   cpu:     user + system cpu seconds
+#   maxrss:  peak resident set size, in bytes
+StepResult = namedtuple('StepResult', ['name', 'status', 'returncode', 'wall', 'cpu', 'maxrss'])
+
+MEMORY_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def parse_memory(memory_str):
+    '''
+    Convert a memory string, i.e. 512M or 8G, to bytes
+    '''
+    if memory_str is None:
+        return None
+    m = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$', str(memory_str).upper())
+    if not m:
+        raise ValueError, 'Could not parse memory %s' % memory_str
+    return int(float(m.group(1)) * MEMORY_UNITS[m.group(2)])
+
+def file_checksum(filename, block_size=1024 * 1024):
+    '''
+    Return the md5 hex digest of the content of a file
+    '''
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), ''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def file_fingerprint(filename, sample_size=CACHE_SAMPLE_SIZE, sample_blocks=CACHE_SAMPLE_BLOCKS):
+    '''
+    Cheap fingerprint of a file: its size, mtime, and the md5 of sample_blocks blocks of
+    sample_size bytes spread evenly through the file.  Small files are hashed in full
+    '''
+    st = os.stat(filename)
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as f:
+        if st.st_size <= sample_size * sample_blocks:
+            md5.update(f.read())
+        else:
+            stride = (st.st_size - sample_size) // (sample_blocks - 1)
+            for i in xrange(sample_blocks):
+                f.seek(i * stride)
+                md5.update(f.read(sample_size))
+    return '%d:%d:%s' % (st.st_size, int(st.st_mtime), md5.hexdigest())
+
+class Step(object):
+    '''
+    A pipeline step: a shell command that reads its input files and writes its output files
+      threads:  number of cores used by the command
+      memory:   memory used by the command, i.e. 8G
+      after:    names of steps that must finish first, in addition to the steps that
+                produce the inputs
+      version:  version of the tool run by the command, part of the cache key of the step
+      version_command:  shell command that prints the version of the tool, if version is
+                        not given
+    '''
+    def __init__(self, name, command, inputs=(), outputs=(), threads=1, memory=None, after=(),
+                 version=None, version_command=None):
+        self.name = name
+        self.command = command
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.threads = int(threads)
+        self.memory = memory
+        self.memory_bytes = parse_memory(memory)
+        self.after = list(after)
+        self.version = version
+        self.version_command = version_command
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['name'],
+                   d['command'],
+                   inputs=d.get('inputs', ()),
+                   outputs=d.get('outputs', ()),
+                   threads=d.get('threads', 1),
+                   memory=d.get('memory'),
+                   after=d.get('after', ()),
+                   version=d.get('version'),
+                   version_command=d.get('version_command'))
+
+    def __repr__(self):
+        return 'Step(%r)' % self.name
+
+class Pipeline(object):
+    '''
+    Directed acyclic graph of steps.  A step depends on the steps that produce its inputs,
+    and on the steps listed in its after list
+    '''
+    def __init__(self, steps):
+        self.steps = OrderedDict()
+        output2step = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError, 'Duplicate step name %s' % step.name
+            self.steps[step.name] = step
+            for output in step.outputs:
+                if output in output2step:
+                    raise ValueError, 'Output %s is produced by steps %s and %s' % (output,
+                                                                                   output2step[output],
+                                                                                   step.name)
+                output2step[output] = step.name
+
+        # Dependencies
+        self.name2deps = OrderedDict()
+        for step in self.steps.itervalues():
+            deps = set(output2step[i] for i in step.inputs if i in output2step)
+            for name in step.after:
+                if name not in self.steps:
+                    raise ValueError, 'Step %s runs after unknown step %s' % (step.name, name)
+                deps.add(name)
+            deps.discard(step.name)
+            self.name2deps[step.name] = deps
+        self.order = self.topological_order()
+
+    def topological_order(self):
+        '''
+        Return the step names ordered so that each step comes after its dependencies, keeping
+        the order of definition where possible.  Raise ValueError if there is a cycle
+        '''
+        order = []
+        done = set()
+        remaining = list(self.steps)
+        while remaining:
+            ready = [name for name in remaining if self.name2deps[name] <= done]
+            if not ready:
+                raise ValueError, 'Pipeline has a dependency cycle among steps %s' % ', '.join(remaining)
+            order.extend(ready)
+            done.update(ready)
+            remaining = [name for name in remaining if name not in done]
+        return order
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __getitem__(self, name):
+        return self.steps[name]
+
+def load_pipeline(fin, variables=None):
+    '''
+    Load a pipeline from a json file of the form
+      {"steps": [{"name": ..., "command": ..., "inputs": [...], "outputs": [...],
+                  "threads": 1, "memory": "4G", "after": [...],
+                  "version": ..., "version_command": ...}, ...]}
+    ${VAR} references in the commands, inputs, outputs, and version commands are replaced
+    by the values in the variables mapping, or else the environment
+    '''
+    values = dict(os.environ)
+    values.update(variables or {})
+    def substitute(s):
+        return string.Template(s).safe_substitute(values)
+
+    steps = []
+    for d in json.load(fin)['steps']:
+        d = dict(d)
+        d['command'] = substitute(d['command'])
+        d['inputs'] = [substitute(i) for i in d.get('inputs', ())]
+        d['outputs'] = [substitute(o) for o in d.get('outputs', ())]
+        if 'version_command' in d:
+            d['version_command'] = substitute(d['version_command'])
+        steps.append(Step.from_dict(d))
+    return Pipeline(steps)
+
+#------------------------------------------------------------------------------------------------
+# Up-to-date checks
+
+class StepState(object):
+    '''
+    Checksums of the inputs and the command of each step at its last successful run,
+    kept in a json file
+    '''
+    def __init__(self, filename=DEFAULT_STATE_FILE):
+        self.filename = filename
+        self.name2state = {}
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                self.name2state = json.load(f)
+
+    def fingerprint(self, step):
+        return {'command': step.command,
+                'inputs': dict((i, file_checksum(i)) for i in step.inputs)}
+
+    def is_current(self, step):
+        return self.name2state.get(step.name) == self.fingerprint(step)
+
+    def update(self, step):
+        self.name2state[step.name] = self.fingerprint(step)
+        with open(self.filename, 'w') as f:
+            json.dump(self.name2state, f, indent=1, sort_keys=True)
+
+def outputs_up_to_date(step, check='mtime', state=None):
+    '''
+    Check whether a step's outputs exist and are up to date with its inputs
+      mtime:     every output is newer than every input
+      checksum:  the inputs and command are the same as at the last successful run
+    Steps without outputs are never up to date
+    '''
+    if not step.outputs:
+        return False
+    for filename in step.outputs + step.inputs:
+        if not os.path.exists(filename):
+            return False
+    if check == 'checksum':
+        return state is not None and state.is_current(step)
+    if not step.inputs:
+        return True
+    oldest_output = min(os.path.getmtime(o) for o in step.outputs)
+    newest_input = max(os.path.getmtime(i) for i in step.inputs)
+    return oldest_output >= newest_input
+
+def remove_outputs(step):
+    '''
+    Remove the existing output files of a step
+    '''
+    for filename in step.outputs:
+        if os.path.isfile(filename):
+            os.remove(filename)
+
+#------------------------------------------------------------------------------------------------
+# Result cache
+
+# Version strings of the tools, memoized by version command
+_version_command2version = {}
+
+def tool_version(step):
+    '''
+    Return the version of the tool run by a step: its version, or else the output of its
+    version command, or else an empty string
+    '''
+    if step.version is not None:
+        return str(step.version)
+    if not step.version_command:
+        return ''
+    if step.version_command not in _version_command2version:
+        p = subprocess.Popen(['/bin/bash', '-c', step.version_command],
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        _version_command2version[step.version_command] = p.communicate()[0].strip()
+    return _version_command2version[step.version_command]
+
+def step_key(step, input2key=None):
+    '''
+    Return the cache key of a step: the sha1 hex digest of its command, tool version, and the
+    fingerprints of its input files.
+    Inputs produced by other steps of the pipeline can be given keys in input2key, derived
+    from the keys of those steps, so that the key does not depend on when they were written
+    '''
+    sha1 = hashlib.sha1()
+    command = step.command
+    if isinstance(command, unicode):
+        command = command.encode('utf-8')
+    sha1.update('%s\0%s\0' % (command, tool_version(step)))
+    for filename in step.inputs:
+        if input2key is not None and filename in input2key:
+            sha1.update('%s\0' % input2key[filename])
+        else:
+            sha1.update('%s\0' % file_fingerprint(filename))
+    return sha1.hexdigest()
+
+class CacheStats(object):
+    '''
+    Cache hits, misses, and the bytes and seconds of running that hits saved
+    '''
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+        self.evicted = 0
+        self.bytes_evicted = 0
+
+    def report(self, cache=None):
+        '''
+        Return a tab-separated report of the statistics, and of the size of the cache if given
+        '''
+        rows = [('hits', self.hits),
+                ('misses', self.misses),
+                ('stored', self.stored),
+                ('bytes_saved', self.bytes_saved),
+                ('seconds_saved', '%.2f' % self.seconds_saved),
+                ('evicted', self.evicted),
+                ('bytes_evicted', self.bytes_evicted)]
+        if cache is not None:
+            entries = cache.entries()
+            rows += [('cache_entries', len(entries)),
+                     ('cache_bytes', sum(e['bytes'] for e in entries))]
+        return ''.join('%s\t%s\n' % row for row in rows)
+
+class StepCache(object):
+    '''
+    Content-addressed cache of the outputs of steps, in a directory that can be shared by
+    pipelines and users.  Each entry is a directory named by the step key, holding a copy of
+    each output and a manifest.  The mtime of the manifest is the time the entry was last used
+    '''
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.stats = CacheStats()
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load_manifest(self, key):
+        '''
+        Return the manifest of a cache entry, or None if the entry does not exist
+        '''
+        try:
+            with open(os.path.join(self.entry_dir(key), CACHE_MANIFEST), 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def restore(self, key, step):
+        '''
+        Copy the cached outputs of a step to its output files.  Return True on a hit.
+        An entry that can not be copied, e.g. evicted by another pipeline sharing the cache
+        in the meantime, is a miss, and the outputs already copied are removed
+        '''
+        manifest = self.load_manifest(key)
+        if manifest is None or len(manifest['outputs']) != len(step.outputs):
+            self.stats.misses += 1
+            return False
+        entry_dir = self.entry_dir(key)
+        try:
+            for i, output in enumerate(step.outputs):
+                output_dir = os.path.dirname(output)
+                if output_dir and not os.path.isdir(output_dir):
+                    os.makedirs(output_dir)
+                shutil.copyfile(os.path.join(entry_dir, str(i)), output)
+            os.utime(os.path.join(entry_dir, CACHE_MANIFEST), None)
+        except (IOError, OSError):
+            remove_outputs(step)
+            self.stats.misses += 1
+            return False
+        self.stats.hits += 1
+        self.stats.bytes_saved += manifest['bytes']
+        self.stats.seconds_saved += manifest['wall'] or 0.0
+        return True
+
+    def store(self, key, step, wall=None):
+        '''
+        Copy the outputs of a step that ran successfully into the cache.  The entry is written
+        to a temporary directory and renamed into place, so that concurrent pipelines sharing
+        the cache never see a partial entry.  An entry that can not be written, e.g. when the
+        disk is full, is skipped with a warning as the step itself ran successfully
+        '''
+        if os.path.isdir(self.entry_dir(key)):
+            return
+        tmp_dir = os.path.join(self.cache_dir, '.tmp.%s.%d' % (key, os.getpid()))
+        try:
+            os.makedirs(tmp_dir)
+            size = 0
+            for i, output in enumerate(step.outputs):
+                shutil.copyfile(output, os.path.join(tmp_dir, str(i)))
+                size += os.path.getsize(output)
+            manifest = {'step': step.name,
+                        'command': step.command,
+                        'outputs': step.outputs,
+                        'bytes': size,
+                        'wall': wall}
+            with open(os.path.join(tmp_dir, CACHE_MANIFEST), 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.rename(tmp_dir, self.entry_dir(key))
+        except (IOError, OSError) as e:
+            # Another pipeline may have stored the same entry first
+            if not os.path.isdir(self.entry_dir(key)):
+                sys.stderr.write('Warning: could not cache the outputs of step %s: %s\n' % (step.name, e))
+                return
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.stats.stored += 1
+
+    def entries(self):
+        '''
+        Return list of dicts with the key, bytes, and last used time of each cache entry
+        '''
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            manifest_file = os.path.join(self.cache_dir, key, CACHE_MANIFEST)
+            if key.startswith('.') or not os.path.isfile(manifest_file):
+                continue
+            manifest = self.load_manifest(key)
+            if manifest is None:
+                continue
+            entries.append({'key': key,
+                            'bytes': manifest['bytes'],
+                            'last_used': os.path.getmtime(manifest_file)})
+        return entries
+
+    def evict(self, max_bytes=None, max_age=None):
+        '''
+        Remove the entries last used more than max_age seconds ago, and then the least recently
+        used entries until the cache holds at most max_bytes
+        '''
+        now = time.time()
+        entries = sorted(self.entries(), key=lambda e: e['last_used'])
+        total = sum(e['bytes'] for e in entries)
+        for entry in entries:
+            too_old = max_age is not None and now - entry['last_used'] > max_age
+            too_big = max_bytes is not None and total > max_bytes
+            if not too_old and not too_big:
+                continue
+            shutil.rmtree(self.entry_dir(entry['key']), ignore_errors=True)
+            total -= entry['bytes']
+            self.stats.evicted += 1
+            self.stats.bytes_evicted += entry['bytes']
+
+#------------------------------------------------------------------------------------------------
+# Backends
+#
+# A backend runs steps:
+#   has_capacity(step):  whether the step can be started now
+#   submit(step):        start running the step
+#   wait():              wait for a running step to finish, and return its StepResult
+
+class LocalBackend(object):
+    '''
+    Run steps as local processes, as many at a time as fit in the number of threads and
+    memory.  Wall time, cpu time, and peak RSS of each step are taken from the resource
+    usage of its process
+    '''
+    def __init__(self, threads=None, memory=None):
+        self.threads = threads or os.sysconf('SC_NPROCESSORS_ONLN')
+        self.memory_bytes = parse_memory(memory)
+        self.pid2job = {}
+        self.used_threads = 0
+        self.used_memory = 0
+
+    def _requirements(self, step):
+        threads = min(step.threads, self.threads)
+        memory = step.memory_bytes or 0
+        if self.memory_bytes is not None:
+            memory = min(memory, self.memory_bytes)
+        return threads, memory
+
+    def has_capacity(self, step):
+        threads, memory = self._requirements(step)
+        if self.used_threads + threads > self.threads:
+            return False
+        if self.memory_bytes is not None and self.used_memory + memory > self.memory_bytes:
+            return False
+        return True
+
+    def submit(self, step):
+        threads, memory = self._requirements(step)
+        p = subprocess.Popen(['/bin/bash', '-c', step.command])
+        self.pid2job[p.pid] = (step, p, time.time(), threads, memory)
+        self.used_threads += threads
+        self.used_memory += memory
+
+    def wait(self):
+        '''
+        Wait for one of the running steps to finish, and return its StepResult.  Only the
+        processes of the steps are reaped, so that the other child processes of the caller
+        are left for it to wait on
+        '''
+        interval = 0.001
+        while True:
+            for pid in self.pid2job:
+                reaped_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+                if reaped_pid == pid:
+                    return self._finished(pid, status, rusage)
+            time.sleep(interval)
+            interval = min(2 * interval, LOCAL_POLL_INTERVAL)
+
+    def _finished(self, pid, status, rusage):
+        step, p, start, threads, memory = self.pid2job.pop(pid)
+        self.used_threads -= threads
+        self.used_memory -= memory
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        # The process has been reaped, so that Popen does not wait for it again
+        p.returncode = returncode
+        return StepResult(step.name,
+                          'ran' if returncode == 0 else 'failed',
+                          returncode,
+                          time.time() - start,
+                          rusage.ru_utime + rusage.ru_stime,
+                          rusage.ru_maxrss * 1024)
+
+def parse_qacct(output):
+    '''
+    Parse the output of qacct -j, and return the wall time, cpu time, and peak memory
+    '''
+    fields = {}
+    for line in output.splitlines():
+        la = line.split(None, 1)
+        if len(la) == 2:
+            fields[la[0]] = la[1].strip()
+    def to_float(key):
+        try:
+            return float(re.match(r'[\d.]+', fields[key]).group(0))
+        except (KeyError, AttributeError, ValueError):
+            return None
+    maxvmem = None
+    if 'maxvmem' in fields:
+        try:
+            maxvmem = parse_memory(fields['maxvmem'])
+        except ValueError:
+            pass
+    return to_float('ru_wallclock'), to_float('cpu'), maxvmem
+
+class SgeBackend(object):
+    '''
+    Submit each step as a Sun Grid Engine job as soon as its dependencies have finished.
+    The jobs are submitted with qsub -sync y from a thread per running step, and the wall
+    time, cpu time, and peak memory are read from qacct
+    '''
+    def __init__(self, queue='all.q', max_jobs=None, jobdir=DEFAULT_SGE_DIR, qsub='qsub', qacct='qacct'):
+        self.queue = queue
+        self.max_jobs = max_jobs
+        self.jobdir = jobdir
+        self.qsub = qsub
+        self.qacct = qacct
+        self.results = Queue.Queue()
+        self.num_running = 0
+
+    def has_capacity(self, step):
+        return self.max_jobs is None or self.num_running < self.max_jobs
+
+    def qsub_args(self, step, script):
+        '''
+        Return the qsub command line to submit the job script of a step
+        '''
+        args = [self.qsub,
+                '-cwd',
+                '-N', step.name,
+                '-V',
+                '-S', '/bin/bash',
+                '-j', 'y',
+                '-o', self.jobdir,
+                '-pe', 'orte', str(step.threads),
+                '-q', self.queue,
+                '-terse',
+                '-sync', 'y']
+        if step.memory:
+            args += ['-l', 'h_vmem=%s' % step.memory]
+        return args + [script]
+
+    def submit(self, step):
+        if not os.path.isdir(self.jobdir):
+            os.makedirs(self.jobdir)
+        script = os.path.join(self.jobdir, '%s.sh' % step.name)
+        with open(script, 'w') as f:
+            f.write('#!/bin/bash\n%s\n' % step.command)
+        self.num_running += 1
+        t = threading.Thread(target=self._run_job, args=(step, script))
+        t.daemon = True
+        t.start()
+
+    def _run_job(self, step, script):
+        start = time.time()
+        p = subprocess.Popen(self.qsub_args(step, script), stdout=subprocess.PIPE)
+        output = p.communicate()[0]
+        wall, cpu, maxrss = time.time() - start, None, None
+        lines = output.split()
+        if lines:
+            try:
+                p_acct = subprocess.Popen([self.qacct, '-j', lines[0]], stdout=subprocess.PIPE,
+                                          stderr=subprocess.PIPE)
+                acct_wall, cpu, maxrss = parse_qacct(p_acct.communicate()[0])
+                wall = acct_wall if acct_wall is not None else wall
+            except OSError:
+                pass
+        status = 'ran' if p.returncode == 0 else 'failed'
+        self.results.put(StepResult(step.name, status, p.returncode, wall, cpu, maxrss))
+
+    def wait(self):
+        result = self.results.get()
+        self.num_running -= 1
+        return result
+
+BACKENDS = {'local': LocalBackend,
+            'sge': SgeBackend}
+
+#------------------------------------------------------------------------------------------------
+# Scheduler
+
+def run_pipeline(pipeline, backend, check='mtime', force=False, state_file=DEFAULT_STATE_FILE,
+                 dry_run=False, log=None, cache=None):
+    '''
+    Run the steps of a pipeline with a backend, starting every step as soon as all its
+    dependencies have finished and the backend has capacity for it.
+    Steps whose outputs are up to date are skipped, unless force is set or one of their
+    dependencies was run.  After a step fails, its outputs are removed, so that they are not
+    mistaken for up to date, and no more steps are started.
+    If a StepCache is given, the outputs of steps that need to be run are copied from the
+    cache when it holds a run of the same command, tool version, and inputs, and are stored in
+    the cache after the step runs successfully.  force bypasses cache lookups.
+    If dry_run is set, the steps that would be run are reported as ran without running them.
+    log is an optional function called with each StepResult as it finishes.
+    Return list of StepResults, in order of completion
+    '''
+    if check not in CHECK_METHODS:
+        raise ValueError, 'Unknown check method %s' % check
+    state = StepState(state_file) if check == 'checksum' and not dry_run else None
+
+    results = []
+    name2status = {}
+    name2key = {}
+    output2key = {}
+    running = set()
+    failed = False
+    pending = list(pipeline.order)
+
+    def finish(result):
+        name2status[result.name] = result.status
+        results.append(result)
+        if log is not None:
+            log(result)
+
+    while pending or running:
+        # Start every step that is ready
+        started = True
+        while started and not failed:
+            started = False
+            for name in pending:
+                deps = pipeline.name2deps[name]
+                if not all(name2status.get(d) in ('ran', 'skipped', 'cached') for d in deps):
+                    continue
+                step = pipeline[name]
+                new_key = False
+                if cache is not None and name not in name2key:
+                    try:
+                        name2key[name] = step_key(step, output2key)
+                        for i, output in enumerate(step.outputs):
+                            output2key[output] = '%s:%d' % (name2key[name], i)
+                        new_key = True
+                    except (IOError, OSError):
+                        # Missing inputs: the step is run without the cache, and fails
+                        name2key[name] = None
+                deps_ran = any(name2status[d] in ('ran', 'cached') for d in deps)
+                if not force and not deps_ran and outputs_up_to_date(step, check, state):
+                    pending.remove(name)
+                    finish(StepResult(name, 'skipped', None, 0.0, 0.0, 0))
+                    started = True
+                    break
+                if dry_run:
+                    pending.remove(name)
+                    finish(StepResult(name, 'ran', None, 0.0, 0.0, 0))
+                    started = True
+                    break
+                if new_key and step.outputs and not force:
+                    start = time.time()
+                    if cache.restore(name2key[name], step):
+                        pending.remove(name)
+                        if state is not None:
+                            state.update(step)
+                        finish(StepResult(name, 'cached', None, time.time() - start, 0.0, 0))
+                        started = True
+                        break
+                if backend.has_capacity(step) or not running:
+                    pending.remove(name)
+                    backend.submit(step)
+                    running.add(name)
+                    started = True
+                    break
+
+        if not running:
+            break
+
+        # Wait for a step to finish
+        result = backend.wait()
+        running.discard(result.name)
+        if result.status == 'failed':
+            failed = True
+            remove_outputs(pipeline[result.name])
+        else:
+            if state is not None:
+                state.update(pipeline[result.name])
+            if name2key.get(result.name):
+                cache.store(name2key[result.name], pipeline[result.name], result.wall)
+        finish(result)
+
+    return results
+
+def format_report(results):
+    '''
+    Return a tab-separated report of the step results
+    '''
+    lines = ['\t'.join(['step', 'status', 'returncode', 'wall_sec', 'cpu_sec', 'maxrss_mb'])]
+    for r in results:
+        lines.append('\t'.join([r.name,
+                                r.status,
+                                '' if r.returncode is None else str(r.returncode),
+                                '' if r.wall is None else '%.2f' % r.wall,
+                                '' if r.cpu is None else '%.2f' % r.cpu,
+                                '' if r.maxrss is None else '%.1f' % (r.maxrss / 1048576.0)]))
+    return '\n'.join(lines) + '\n'
@@ -2,7 +2,7 @@
 
 import io
 import xml.dom.minidom
-from ngs import filesys
+from ngs import filesys, instrument
 
 class FastqStats(object):
     
@@ -37,17 +37,18 @@ class FastqStats(object):
         self.basecount = 0
         self.readcount = 0
         self.length_hist = {}
-        for i,line in enumerate(fin):
-            # If sequence line (line 2 of 4)
-            if i % 4 == 1:
-                read_len = len(line.strip())
-                self.basecount += read_len
-                self.readcount += 1
-                # Update histogram
-                if read_len in self.length_hist:
-                    self.length_hist[read_len] += 1
-                else:
-                    self.length_hist[read_len] = 1
+        with instrument.stage('parse'):
+            for i,line in enumerate(instrument.timed(fin, 'read')):
+                # If sequence line (line 2 of 4)
+                if i % 4 == 1:
+                    read_len = len(line.strip())
+                    self.basecount += read_len
+                    self.readcount += 1
+                    # Update histogram
+                    if read_len in self.length_hist:
+                        self.length_hist[read_len] += 1
+                    else:
+                        self.length_hist[read_len] = 1
         # Close filehandle
         fin.close()
 
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+import itertools
+import mmap
+from collections import Counter, defaultdict
+from ngs.util import lazy_import
+
+np = lazy_import('numpy')
+
+# Number of lines parsed at a time
+DEFAULT_CHUNK_SIZE = 100000
+
+# Compression parameter of the quantile digests; larger is more accurate, but uses more memory
+DEFAULT_COMPRESSION = 200
+
+# Maximum number of line numbers to remember for warnings and reports
+MAX_LINE_NUMBERS = 3
+
+# Approximate memory to use for each block of a transpose
+DEFAULT_TRANSPOSE_MAX_BYTES = 512 * 1024 * 1024
+
+# Approximate memory used by a python string, in addition to its characters
+STR_OVERHEAD_BYTES = 40
+
+def read_chunks(fin, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Generate lists of up to chunk_size lines from the file input stream
+    '''
+    while True:
+        lines = list(itertools.islice(fin, chunk_size))
+        if not lines:
+            return
+        yield lines
+
+def split_lines(lines, delim='\t'):
+    '''
+    Split each line into its column values
+    If delim is None, split on whitespace
+    '''
+    if delim is None:
+        return [line.split() for line in lines]
+    return [line.rstrip('\r\n').split(delim) for line in lines]
+
+def get_column(rows, column):
+    '''
+    Return the list of values of a column, with '' for rows that are too short
+    '''
+    return [row[column] if len(row) > column else '' for row in rows]
+
+def to_float_array(values):
+    '''
+    Convert a list of strings to a float array in a single call.
+    Non-numeric values are set to NaN
+    '''
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        pass
+    # Slow path, only for chunks containing non-numeric values
+    arr = np.empty(len(values), dtype=np.float64)
+    for i, val in enumerate(values):
+        try:
+            arr[i] = float(val)
+        except ValueError:
+            arr[i] = np.nan
+    return arr
+
+class TDigest(object):
+    '''
+    Merging t-digest for approximate quantiles in bounded memory.
+    Values are summarized as weighted centroids, which are small near the tails and larger
+    near the median.  Each update merges the new values into at most about compression / 2
+    centroids.
+    '''
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.array([], dtype=np.float64)
+        self.weights = np.array([], dtype=np.float64)
+
+    def update(self, values):
+        '''
+        Add an array of values to the digest
+        '''
+        if len(values) == 0:
+            return
+        means = np.concatenate((self.means, values))
+        weights = np.concatenate((self.weights, np.ones(len(values))))
+        self._merge(means, weights)
+
+    def _merge(self, means, weights):
+        '''
+        Merge sorted centroids whose quantiles fall into the same unit interval of the
+        k1 scale function k(q) = compression / (2 pi) * asin(2q - 1)
+        '''
+        order = np.argsort(means, kind='mergesort')
+        means = means[order]
+        weights = weights[order]
+        q = (np.cumsum(weights) - weights / 2.0) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        groups = np.floor(k - k[0]).astype(np.int64)
+        # Centroids are never merged across a jump in group number
+        _, groups = np.unique(groups, return_inverse=True)
+        merged_weights = np.bincount(groups, weights=weights)
+        self.means = np.bincount(groups, weights=weights * means) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        '''
+        Return the approximate value at quantile q (0 <= q <= 1)
+        '''
+        if len(self.means) == 0:
+            return np.nan
+        if len(self.means) == 1:
+            return self.means[0]
+        midpoints = np.cumsum(self.weights) - self.weights / 2.0
+        return float(np.interp(q * self.weights.sum(), midpoints, self.means))
+
+class ColumnStats(object):
+    '''
+    Running statistics for a numeric column, updated one chunk of values at a time.
+    Mean and variance are combined across chunks with the parallel form of Welford's
+    algorithm, and quantiles are estimated with a t-digest
+    '''
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.count = 0
+        self.total = 0.0
+        self.weighted_total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.invalid_count = 0
+        self.invalid_lines = []
+        self.digest = TDigest(compression)
+
+    def update(self, values, weights=None):
+        '''
+        Update the statistics with an array of numeric values
+        Optional weights array is used for the weighted total
+        '''
+        n = len(values)
+        if n == 0:
+            return
+        chunk_mean = values.mean()
+        chunk_m2 = ((values - chunk_mean) ** 2).sum()
+        delta = chunk_mean - self.mean
+        count = self.count + n
+        self.mean += delta * n / count
+        self.m2 += chunk_m2 + delta ** 2 * self.count * n / count
+        self.count = count
+        self.total += values.sum()
+        if weights is not None:
+            self.weighted_total += (weights * values).sum()
+        self.min = np.nanmin([self.min, values.min()])
+        self.max = np.nanmax([self.max, values.max()])
+        self.digest.update(values)
+
+    def add_invalid(self, line_numbers):
+        '''
+        Register the line numbers of non-numeric values
+        '''
+        self.invalid_count += len(line_numbers)
+        self.invalid_lines.extend(line_numbers[:MAX_LINE_NUMBERS - len(self.invalid_lines)])
+
+    def variance(self):
+        '''
+        Population variance
+        '''
+        if self.count == 0:
+            return np.nan
+        return self.m2 / self.count
+
+    def stdev(self):
+        '''
+        Population standard deviation
+        '''
+        return np.sqrt(self.variance())
+
+    def quantile(self, q):
+        '''
+        Approximate quantile
+        '''
+        return self.digest.quantile(q)
+
+class TabularScanner(object):
+    '''
+    Compute statistics for many columns of a delimited file in a single pass.
+    Lines are read and split in chunks, and the values of each numeric column are converted
+    to NumPy arrays, so that statistics are updated one chunk at a time in bounded memory.
+      numeric_columns: columns for which to compute ColumnStats
+      freq_columns:    columns for which to count the frequencies of each value
+      count_columns:   count the number of columns in each line
+      weight_column:   column of weights used for the weighted totals of the numeric columns
+    Blank lines are skipped.  Line numbers are 1-based.
+    '''
+    def __init__(self, numeric_columns=(), freq_columns=(), count_columns=False, weight_column=None,
+                 delim='\t', chunk_size=DEFAULT_CHUNK_SIZE, compression=DEFAULT_COMPRESSION):
+        self.numeric_columns = list(numeric_columns)
+        self.freq_columns = list(freq_columns)
+        self.count_columns = count_columns
+        self.weight_column = weight_column
+        self.delim = delim
+        self.chunk_size = chunk_size
+
+        self.stats = dict((c, ColumnStats(compression)) for c in self.numeric_columns)
+        self.freqs = dict((c, Counter()) for c in self.freq_columns)
+        self.colcount2freq = Counter()
+        self.colcount2linenums = defaultdict(list)
+        self.line_count = 0
+        self.blank_count = 0
+        self.blank_lines = []
+
+    def scan(self, fin):
+        '''
+        Read through the file input stream, and update the statistics
+        '''
+        for lines in read_chunks(fin, self.chunk_size):
+            self.update(lines)
+        return self
+
+    def update(self, lines):
+        '''
+        Update the statistics with a chunk of lines
+        '''
+        first_line_number = self.line_count + 1
+        self.line_count += len(lines)
+
+        # Skip blank lines, keeping track of the line numbers of the rest
+        line_numbers = []
+        nonblank = []
+        for i, line in enumerate(lines):
+            if line.strip():
+                line_numbers.append(first_line_number + i)
+                nonblank.append(line)
+            else:
+                self.blank_count += 1
+                if len(self.blank_lines) < MAX_LINE_NUMBERS:
+                    self.blank_lines.append(first_line_number + i)
+        rows = split_lines(nonblank, self.delim)
+
+        # Column counts
+        if self.count_columns:
+            for line_number, row in itertools.izip(line_numbers, rows):
+                colcount = len(row)
+                self.colcount2freq[colcount] += 1
+                if len(self.colcount2linenums[colcount]) < MAX_LINE_NUMBERS:
+                    self.colcount2linenums[colcount].append(line_number)
+
+        # Value frequencies
+        for c in self.freq_columns:
+            self.freqs[c].update(get_column(rows, c))
+
+        # Numeric statistics
+        weights = None
+        if self.weight_column is not None and self.numeric_columns:
+            weights = to_float_array(get_column(rows, self.weight_column))
+        for c in self.numeric_columns:
+            values = to_float_array(get_column(rows, c))
+            valid = ~np.isnan(values)
+            if weights is not None:
+                valid &= ~np.isnan(weights)
+            self.stats[c].add_invalid([line_numbers[i] for i in np.nonzero(~valid)[0]])
+            self.stats[c].update(values[valid], None if weights is None else weights[valid])
+
+#------------------------------------------------------------------------------------------------
+# Transpose
+
+def build_line_index(fin, delim='\t'):
+    '''
+    Read through a file and return an array of the byte offsets of the start of each line,
+    followed by the file size, along with the minimum number of columns over all the lines
+    '''
+    offsets = [0]
+    min_columns = None
+    for line in fin:
+        offsets.append(offsets[-1] + len(line))
+        num_columns = line.count(delim) + 1
+        if min_columns is None or num_columns < min_columns:
+            min_columns = num_columns
+    return np.array(offsets, dtype=np.int64), min_columns or 0
+
+def transpose(fin, fout, delim='\t', block_columns=None, max_bytes=DEFAULT_TRANSPOSE_MAX_BYTES):
+    '''
+    Transpose the matrix in file fin (a regular file, not a stream), and write it to fout.
+    The input is memory-mapped and read in blocks of block_columns columns, one pass per block,
+    so that only one block of output rows is held in memory at a time.  The byte position of
+    the next block is remembered for every line, so each pass only reads its own columns.
+    If block_columns is not set, it is chosen so that a block takes about max_bytes of memory.
+    As with zip, lines are truncated to the number of columns of the shortest line
+    '''
+    fin.seek(0)
+    offsets, num_columns = build_line_index(fin, delim)
+    num_lines = len(offsets) - 1
+    if num_lines == 0 or offsets[-1] == 0:
+        return
+
+    # Estimate the number of columns per block from the average cell size
+    if block_columns is None:
+        cell_bytes = offsets[-1] / float(num_lines * num_columns) + STR_OVERHEAD_BYTES
+        block_columns = int(max_bytes / (cell_bytes * num_lines))
+    block_columns = max(1, block_columns)
+
+    mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # End of each line, excluding the newline
+        line_ends = offsets[1:].copy()
+        for i in xrange(num_lines):
+            if mm[line_ends[i] - 1] == '\n':
+                line_ends[i] -= 1
+        cursors = offsets[:-1].tolist()
+        line_ends = line_ends.tolist()
+
+        for block_start in xrange(0, num_columns, block_columns):
+            ncols = min(block_columns, num_columns - block_start)
+            block = []
+            for i in xrange(num_lines):
+                # Slice out the block's cells in this line, starting from its cursor
+                pos = cursors[i]
+                line_end = line_ends[i]
+                cells = []
+                for j in xrange(ncols):
+                    cell_end = mm.find(delim, pos, line_end)
+                    if cell_end == -1:
+                        cell_end = line_end
+                    cells.append(mm[pos:cell_end])
+                    pos = cell_end + 1
+                block.append(cells)
+                cursors[i] = pos
+            for row in itertools.izip(*block):
+                fout.write('%s\n' % delim.join(row))
+    finally:
+        mm.close()
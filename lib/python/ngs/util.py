@@ -1,7 +1,16 @@
 #!/usr/bin/env python
 
+import importlib
+import itertools
+import operator
+import os
 import re
+import shutil
+import sys
+import tempfile
 import xml.dom.minidom
+import zlib
+from collections import defaultdict
 
 
 def load_dict(fin, key_col=0, val_col=1, delim='\t'):
@@ -17,6 +26,354 @@ def load_dict(fin, key_col=0, val_col=1, delim='\t'):
             d[k] = v
     return d    
 
+def parse_columns(columns_str):
+    '''
+    Parse a comma-separated list of 0-based column numbers, i.e. '0,2' => [0, 2]
+    '''
+    return [int(c) for c in str(columns_str).split(',')]
+
+def generate_rows(fin, delim='\t'):
+    '''
+    Generate the list of column values for each line in a delimited file
+    '''
+    for line in fin:
+        yield line.rstrip('\n').split(delim)
+
+def natural_chrom_key(chrom):
+    '''
+    Sort key for chromosomes in natural order
+    i.e. chr1, chr2, ..., chr10, ..., chrX, chrY
+    '''
+    c = chrom.replace('chr', '')
+    if c.isdigit():
+        return (0, int(c), c)
+    return (1, 0, c)
+
+#------------------------------------------------------------------------------------------------
+# Joins
+#
+# The join functions take two iterables of rows (lists of column values), the key columns
+# for each, and the type of join:
+#   inner: generate (row1, row2) for every pair of rows with matching keys
+#   left:  same as inner, plus (row1, None) for rows1 without any matching rows2
+#   anti:  generate (row1, None) for rows1 without any matching rows2
+# rows2 is the lookup table, and rows1 is streamed through.
+
+JOIN_TYPES = ('inner', 'left', 'anti')
+
+# Approximate size of the rows2 lookup table, in bytes, at which grace_hash_join spills to disk
+DEFAULT_JOIN_MAX_BYTES = 512 * 1024 * 1024
+
+# Number of partitions that grace_hash_join spills the rows into
+DEFAULT_JOIN_PARTITIONS = 64
+
+def _key_getter(columns):
+    '''
+    Return a function that extracts the tuple of key column values from a row
+    '''
+    if len(columns) == 1:
+        col = columns[0]
+        return lambda row: (row[col],)
+    return operator.itemgetter(*columns)
+
+def _probe(rows1, key2rows, key1, how):
+    '''
+    Look up each row in rows1 in the key2rows table, and generate the joined pairs
+    '''
+    if how not in JOIN_TYPES:
+        raise ValueError('Unknown join type %s' % how)
+    for row in rows1:
+        matches = key2rows.get(key1(row))
+        if how == 'anti':
+            if not matches:
+                yield row, None
+        elif matches:
+            for match in matches:
+                yield row, match
+        elif how == 'left':
+            yield row, None
+
+def hash_join(rows1, rows2, columns1, columns2, how='inner'):
+    '''
+    Join by loading all of rows2 into an in-memory hash table keyed on columns2.
+    The output is in the order of rows1
+    '''
+    key2 = _key_getter(columns2)
+    key2rows = defaultdict(list)
+    for row in rows2:
+        key2rows[key2(row)].append(row)
+    return _probe(rows1, key2rows, _key_getter(columns1), how)
+
+def _partition_rows(rows, key, num_partitions, tmpdir, prefix):
+    '''
+    Write the rows into num_partitions temporary files by the hash of their key
+    Return the list of partition file names
+    '''
+    filenames = [os.path.join(tmpdir, '%s.%i' % (prefix, i)) for i in xrange(num_partitions)]
+    fouts = [open(fn, 'w') for fn in filenames]
+    for row in rows:
+        fouts[zlib.crc32('\t'.join(key(row))) % num_partitions].write('%s\n' % '\t'.join(row))
+    for fout in fouts:
+        fout.close()
+    return filenames
+
+def grace_hash_join(rows1, rows2, columns1, columns2, how='inner', max_bytes=DEFAULT_JOIN_MAX_BYTES,
+                    num_partitions=DEFAULT_JOIN_PARTITIONS, tmpdir=None):
+    '''
+    Join using an in-memory hash table of rows2, as long as its approximate size stays under
+    max_bytes.  Otherwise, both inputs are partitioned into temporary files by the hash of their
+    keys, and each pair of partitions is joined in memory.
+    When the table fits in memory, the output is in the order of rows1.  After spilling to disk,
+    the output is grouped by partition, and in the order of rows1 within each partition.
+    '''
+    key1 = _key_getter(columns1)
+    key2 = _key_getter(columns2)
+
+    # Build the table in memory until the size threshold is crossed
+    key2rows = defaultdict(list)
+    table_bytes = 0
+    rows2 = iter(rows2)
+    spill = False
+    for row in rows2:
+        key2rows[key2(row)].append(row)
+        table_bytes += sum(len(v) for v in row) + len(row)
+        if table_bytes > max_bytes:
+            spill = True
+            break
+
+    # Small table: probe directly
+    if not spill:
+        for pair in _probe(rows1, key2rows, key1, how):
+            yield pair
+        return
+
+    # Large table: partition both inputs to disk
+    tmpdir = tempfile.mkdtemp(dir=tmpdir)
+    try:
+        table_rows = itertools.chain(itertools.chain(*key2rows.itervalues()), rows2)
+        partitions2 = _partition_rows(table_rows, key2, num_partitions, tmpdir, 'rows2')
+        key2rows = None
+        partitions1 = _partition_rows(rows1, key1, num_partitions, tmpdir, 'rows1')
+        for filename1, filename2 in zip(partitions1, partitions2):
+            with open(filename2, 'r') as f2:
+                partition_key2rows = defaultdict(list)
+                for row in generate_rows(f2):
+                    partition_key2rows[key2(row)].append(row)
+            with open(filename1, 'r') as f1:
+                for pair in _probe(generate_rows(f1), partition_key2rows, key1, how):
+                    yield pair
+    finally:
+        shutil.rmtree(tmpdir)
+
+def sort_merge_join(rows1, rows2, columns1, columns2, how='inner'):
+    '''
+    Join two inputs that are both sorted by their key columns (string order), holding only one
+    group of rows with the same key in memory at a time.
+    The output is in the order of rows1
+    '''
+    if how not in JOIN_TYPES:
+        raise ValueError('Unknown join type %s' % how)
+    key1 = _key_getter(columns1)
+    groups2 = itertools.groupby(rows2, _key_getter(columns2))
+    k2, matches = None, None
+    exhausted = False
+    for k1, group1 in itertools.groupby(rows1, key1):
+        # Advance through rows2 until its key is no longer less than the rows1 key
+        while not exhausted and (k2 is None or k2 < k1):
+            try:
+                k2, group2 = groups2.next()
+                matches = list(group2)
+            except StopIteration:
+                exhausted = True
+                k2, matches = None, None
+        found = matches if k2 == k1 else None
+        for row in group1:
+            if how == 'anti':
+                if not found:
+                    yield row, None
+            elif found:
+                for match in found:
+                    yield row, match
+            elif how == 'left':
+                yield row, None
+
+JOIN_METHODS = {'hash': hash_join,
+                'grace': grace_hash_join,
+                'merge': sort_merge_join}
+
+#------------------------------------------------------------------------------------------------
+# Sample sets
+#
+# Sets of samples carrying a variant, one per position or gene, are stored as int bitmasks over
+# a SampleIndex, instead of sets of sample names: union is |, and membership is &.
+
+class SampleIndex(object):
+    '''
+    Registry of sample names to bit positions, so that a set of samples is
+    stored as an int bitmask.  Bits of removed samples are reused.
+    '''
+
+    def __init__(self):
+        self.names = []
+        self.name2bit = {}
+        self.name2mask = {}
+        self.free_bits = []
+
+    def __len__(self):
+        return len(self.name2bit)
+
+    def __contains__(self, name):
+        return name in self.name2bit
+
+    def add(self, name):
+        '''
+        Register a sample, and return its bitmask
+        '''
+        mask = self.name2mask.get(name)
+        if mask is None:
+            if self.free_bits:
+                bit = self.free_bits.pop()
+                self.names[bit] = name
+            else:
+                bit = len(self.names)
+                self.names.append(name)
+            self.name2bit[name] = bit
+            mask = self.name2mask[name] = 1 << bit
+        return mask
+
+    def remove(self, name):
+        '''
+        Unregister a sample, and return its former bitmask.  The bit must be
+        cleared from all sample sets before it is reused.
+        '''
+        bit = self.name2bit.pop(name)
+        self.names[bit] = None
+        self.free_bits.append(bit)
+        return self.name2mask.pop(name)
+
+    def mask(self, name):
+        return self.name2mask[name]
+
+    def samples(self):
+        return sorted(self.name2bit)
+
+    @staticmethod
+    def count(mask):
+        '''
+        Number of samples in a bitmask
+        '''
+        return bin(mask).count('1')
+
+    def names_of(self, mask):
+        '''
+        Sorted sample names of a bitmask
+        '''
+        names = []
+        while mask:
+            low = mask & -mask
+            names.append(self.names[low.bit_length() - 1])
+            mask ^= low
+        return sorted(names)
+
+    def join(self, mask, sep=','):
+        return sep.join(self.names_of(mask))
+
+
+#------------------------------------------------------------------------------------------------
+# Caching
+
+def lru_cache(maxsize=128):
+    '''
+    Decorator that memoizes a function of hashable positional arguments, keeping the
+    results of the maxsize most recently used arguments.  Exceptions are not cached.
+    The wrapper has cache_info() => (hits, misses, size), and cache_clear().
+    '''
+    def decorator(func):
+        # Circular doubly linked list of [prev, next, key, result], most recent last
+        root = []
+        root[:] = [root, root, None, None]
+        cache = {}
+        stats = [0, 0]
+
+        def wrapper(*args):
+            link = cache.get(args)
+            if link is not None:
+                # Move to the most recent end
+                link_prev, link_next, _, result = link
+                link_prev[1] = link_next
+                link_next[0] = link_prev
+                last = root[0]
+                last[1] = root[0] = link
+                link[0] = last
+                link[1] = root
+                stats[0] += 1
+                return result
+            result = func(*args)
+            stats[1] += 1
+            if len(cache) >= maxsize:
+                # Discard the least recently used
+                oldest = root[1]
+                root[1] = oldest[1]
+                oldest[1][0] = root
+                del cache[oldest[2]]
+            last = root[0]
+            link = [last, root, args, result]
+            last[1] = root[0] = cache[args] = link
+            return result
+
+        def cache_info():
+            return stats[0], stats[1], len(cache)
+
+        def cache_clear():
+            cache.clear()
+            root[:] = [root, root, None, None]
+            stats[:] = [0, 0]
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
+
+
+#------------------------------------------------------------------------------------------------
+# Lazy imports
+#
+# Modules that are slow to import, such as numpy, are imported by the library modules through
+# lazy_import, so that scripts which do not use them do not pay for their import at startup.
+
+class LazyModule(object):
+    '''
+    Placeholder of a module that is imported on the first access to one of its attributes
+    '''
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = self.__dict__['_module'] = importlib.import_module(self.__dict__['_name'])
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, val):
+        setattr(self._load(), attr, val)
+
+    def __repr__(self):
+        return '<lazy module %s%s>' % (self.__dict__['_name'],
+                                       '' if self.__dict__['_module'] is None else ' (loaded)')
+
+def lazy_import(name):
+    '''
+    Return the module if it is already imported, or else a LazyModule that imports it when
+    first used, i.e. np = lazy_import('numpy')
+    '''
+    return sys.modules.get(name) or LazyModule(name)
+
 #------------------------------------------------------------------------------------------------
 # XML
 
@@ -1,8 +1,13 @@
 #!/usr/bin/env python
 
+import itertools
 import re
-import sys
-from collections import namedtuple
+from collections import Counter, namedtuple
+from ngs import instrument
+from ngs.util import lazy_import, lru_cache
+
+multiprocessing = lazy_import('multiprocessing')
+np = lazy_import('numpy')
 
 class VcfFile(file):
     '''
@@ -182,32 +187,61 @@ class VcfFile(file):
           phased: True | False, default False
           
         '''
-        # Set separator
-        sep = '/'
-        if phased:
-            sep = '|'
-
-        # Get sample GT value
-        sample2field2val = self.parse_samples(variant)
-        alleles_str = sample2field2val[sample]['GT']
-        alleles = alleles_str.split(sep)
-
-        possible_genotypes = [variant['REF']] +  variant['ALT'].split(',')
-
-        # Get ref/alt alleles
-        bases = []
-        for a in alleles:
-            # No Call
-            if a == '.':
-                bases.append('N')
-            # Allele index
-            else:
-                bases.append(possible_genotypes[int(a)])
+        # Only the requested sample is split
+        format2val = dict(zip(variant['FORMAT'].split(':'), variant[sample].split(':')))
+        return genotype_bases(format2val['GT'], variant['REF'], variant['ALT'], phased)
+
+
+# Number of distinct (GT, number of alleles) pairs kept decoded
+GENOTYPE_CACHE_SIZE = 1024
+
+@lru_cache(GENOTYPE_CACHE_SIZE)
+def decode_genotype(gt, num_alleles):
+    '''
+    Decode a GT value into a tuple of allele indexes, with None for missing alleles,
+    and whether it is phased.  Diploid, haploid, polyploid, and multi-allelic calls are
+    all handled, i.e. (0/1, 2) => ((0, 1), False), (1|., 2) => ((1, None), True),
+    (2, 3) => ((2,), False)
+    Raises ValueError if an allele is not an index below num_alleles
+    '''
+    alleles = []
+    for a in gt.replace('|', '/').split('/'):
+        if a == '.':
+            alleles.append(None)
+            continue
+        if not a.isdigit() or int(a) >= num_alleles:
+            raise ValueError('Could not recognize allele %s of genotype %s with %i alleles' %
+                             (a, gt, num_alleles))
+        alleles.append(int(a))
+    return tuple(alleles), '|' in gt
+
+def genotype_bases(gt, ref, alt, phased=False, sort=True):
+    '''
+    Substitute the nucleotide bases into the numeric alleles of a GT value,
+    i.e.  0/0, 0/1, 1|1, 0/2 => A/A, A/C, C|C, A/G.  No calls are N.
+      ref, alt: REF and ALT columns, alt possibly comma separated
+      phased: True to separate the bases by |, False (default) by /
+      sort: sort the bases of unphased genotypes (default), or keep the allele order
+    '''
+    alleles, _ = decode_genotype(gt, alt.count(',') + 2)
+    alts = None
+    bases = []
+    for a in alleles:
+        if a is None:
+            bases.append('N')
+        elif a == 0:
+            bases.append(ref)
+        else:
+            # Split the ALT alleles only when needed
+            if alts is None:
+                alts = alt.split(',')
+            bases.append(alts[a - 1])
 
-        # For unphased, sort the genotype bases
-        if not phased:
-            bases = sorted(bases)
-        return sep.join(bases)
+    if phased:
+        return '|'.join(bases)
+    if sort:
+        bases.sort()
+    return '/'.join(bases)
 
 
 class VarscanVcfFile(VcfFile):
@@ -345,12 +379,24 @@ class SnpEffVcfFile(VarscanVcfFile):
             self._set_effect2priority()
         
         # Extract out the effects information string
-        effect_info_str = re.search('EFF=(.*)', variant['INFO']).group(1)
-        effect_strs = effect_info_str.split(',')
+        info = variant['INFO']
+        eff_start = info.find('EFF=')
+        if eff_start < 0:
+            raise AttributeError('No EFF field in the info column: %s' % info)
+        effect_strs = info[eff_start + 4:].split(',')
         effects = []
         for effect_str in effect_strs:
-            effect_val = re.search('(.+)\(', effect_str).group(1)
-            effect_attrs = [effect_val] + re.search('\((.+)\)', effect_str).group(1).split('|')
+            # EFFECT(attr1|attr2|...)
+            last_open = effect_str.rfind('(')
+            first_open = effect_str.find('(')
+            last_close = effect_str.rfind(')')
+            if last_open > 0 and last_close > first_open + 1:
+                effect_val = effect_str[:last_open]
+                attrs_str = effect_str[first_open + 1:last_close]
+            else:
+                effect_val = re.search('(.+)\(', effect_str).group(1)
+                attrs_str = re.search('\((.+)\)', effect_str).group(1)
+            effect_attrs = [effect_val] + attrs_str.split('|')
             
             # Skip annotations with errors and warnings
             if len(effect_attrs) > len(self.Effect._fields):
@@ -392,6 +438,378 @@ class SnpEffVcfFile(VarscanVcfFile):
                     found_effects.append(effect)
         return found_effects
 
+# ------------------------------------------------------------------------------------- #
+# Record stages
+#
+# A stage is a generator function that takes an iterable of VcfRecords and yields the
+# records that pass, possibly modified.  Stages are chained with run_stages, so that each
+# line is split once, and joined back once only if it was modified.
+
+# VarScan and SomaticSniper somatic status codes
+SOMATIC_TYPE2STATUS = {'wildtype': '0',
+                       'germline': '1',
+                       'somatic': '2',
+                       'LOH': '3',
+                       'unknown': '4'}
+
+# FORMAT field missing from the indel records of VarScan snpEff output
+VARSCAN_FORMAT_FIELD = 'GT:GQ:DP:RD:AD:FREQ'
+
+class VcfHeader(object):
+    '''
+    Meta lines and column names of a vcf file, shared by all the VcfRecords of the file
+    '''
+    def __init__(self, meta_lines, header_line):
+        self.meta_lines = meta_lines
+        self.header_line = header_line
+        self.column_names = header_line[1:].strip().split()
+        self.colname2colnum = dict((c, i) for i, c in enumerate(self.column_names))
+        # FORMAT string => format field => index, shared by the records with the same FORMAT
+        self.format2field2indx = {}
+
+    @classmethod
+    def read(cls, lines):
+        '''
+        Read the meta lines and the header line from an iterator over the lines of a vcf file,
+        leaving the iterator at the first variant line
+        '''
+        meta_lines = []
+        for line in lines:
+            if line[0:2] == '##':
+                meta_lines.append(line)
+            elif line[0:1] == '#':
+                return cls(meta_lines, line)
+            else:
+                break
+        raise ValueError('Vcf file has no header line')
+
+    def field2indx(self, format_str):
+        field2indx = self.format2field2indx.get(format_str)
+        if field2indx is None:
+            field2indx = dict((f, i) for i, f in enumerate(format_str.split(':')))
+            self.format2field2indx[format_str] = field2indx
+        return field2indx
+
+    def to_string(self):
+        return ''.join(self.meta_lines) + self.header_line
+
+class VcfRecord(object):
+    '''
+    A vcf variant line, split into its columns once.  The INFO field is parsed on first use.
+    Records that are not modified are written back as the original line
+    '''
+    __slots__ = ('header', 'line', 'fields', 'modified', '_info')
+
+    def __init__(self, header, line):
+        self.header = header
+        self.line = line
+        self.fields = line.strip().split('\t')
+        self.modified = False
+        self._info = None
+
+    def __getitem__(self, colname):
+        return self.fields[self.header.colname2colnum[colname]]
+
+    def __setitem__(self, colname, val):
+        self.fields[self.header.colname2colnum[colname]] = val
+        self.modified = True
+
+    def insert(self, colname, val):
+        '''
+        Insert a value before the column colname, shifting the following values right
+        '''
+        self.fields.insert(self.header.colname2colnum[colname], val)
+        self.modified = True
+
+    def info(self):
+        '''
+        Return a dictionary of the field=val pairs of the INFO column
+        '''
+        if self._info is None:
+            self._info = {}
+            for p in self['INFO'].split(';'):
+                pa = p.split('=')
+                if len(pa) == 2:
+                    self._info[pa[0]] = pa[1]
+        return self._info
+
+    def sample_field(self, sample, field):
+        '''
+        Return the value of a FORMAT field of a sample
+        '''
+        return self[sample].split(':')[self.header.field2indx(self['FORMAT'])[field]]
+
+    def to_line(self):
+        if not self.modified:
+            return self.line
+        return '%s\n' % '\t'.join(self.fields)
+
+def read_records(lines):
+    '''
+    Read a vcf file, and return its VcfHeader and a generator of its VcfRecords
+    '''
+    lines = iter(instrument.timed(lines, 'read'))
+    header = VcfHeader.read(lines)
+    return header, instrument.timed((VcfRecord(header, line) for line in lines), 'parse')
+
+def varscan_clean_indel(records):
+    '''
+    Stage: remove the + and - signs in front of VarScan indel alternate alleles, and
+    represent the indels with the reference base before them, i.e.
+      A +T => A AT
+      A -T => AT A
+    Raise ValueError on records that are neither insertions nor deletions
+    '''
+    for record in records:
+        ref = record['REF']
+        alt = record['ALT']
+        if alt[0] == '+':
+            alt = ref + alt.replace('+', '')
+        elif alt[0] == '-':
+            alt = alt.replace('-', '')
+            ref, alt = ref + alt, ref
+        else:
+            raise ValueError('%s\nThis record is neither insertion or deletion!' % record.line.rstrip('\n'))
+        record['REF'] = ref
+        record['ALT'] = alt
+        yield record
+
+def somatic_filter(records, program='varscan', somatic_type=None, min_dp_tumor=None,
+                   min_dp_normal=None, somatic_p_val=None):
+    '''
+    Stage: select the records of VarScan or SomaticSniper (program='ssniper') output with the
+    somatic_type status (see SOMATIC_TYPE2STATUS), tumor and normal depths >= min_dp_tumor
+    and min_dp_normal, and somatic p-value <= somatic_p_val.  Unset criteria are not applied
+    '''
+    wanted_status = SOMATIC_TYPE2STATUS.get(somatic_type)
+    for record in records:
+        if somatic_type:
+            if program == 'ssniper':
+                status = record.sample_field('TUMOR', 'SS')
+            else:
+                status = record.info()['SS']
+            if status != wanted_status:
+                continue
+        if min_dp_tumor and int(record.sample_field('TUMOR', 'DP')) < min_dp_tumor:
+            continue
+        if min_dp_normal and int(record.sample_field('NORMAL', 'DP')) < min_dp_normal:
+            continue
+        if somatic_p_val and float(record.info()['SPV']) > somatic_p_val:
+            continue
+        yield record
+
+def insert_format_field(records, format_str=VARSCAN_FORMAT_FIELD):
+    '''
+    Stage: insert a FORMAT value into records that lack one, i.e. VarScan snpEff indel output
+    '''
+    for record in records:
+        record.insert('FORMAT', format_str)
+        yield record
+
+def run_stages(fin, fout, stages):
+    '''
+    Read a vcf file, pass its records through a chain of stages, and write the header and
+    the resulting records
+      stages: list of functions that take and return an iterable of records,
+              i.e. functools.partial(somatic_filter, somatic_type='somatic')
+    '''
+    header, records = read_records(fin)
+    fout = instrument.timed_writer(fout)
+    fout.write(header.to_string())
+    for stage in stages:
+        records = instrument.timed(stage(records), 'transform')
+    for record in records:
+        fout.write(record.to_line())
+
+# ------------------------------------------------------------------------------------- #
+# Genotype matrices
+#
+# Blocks of variant rows are decoded into rows x samples matrices, so that genotype counts
+# and per-sample summaries are array reductions.  Each row is split once, and the distinct
+# values of a field within a block are decoded once.
+
+# Genotype codes
+GT_NOCALL = -1
+GT_HOM_REF = 0
+GT_HET = 1
+GT_HOM_ALT = 2
+GT_CODES = (GT_NOCALL, GT_HOM_REF, GT_HET, GT_HOM_ALT)
+
+# DP and GQ value of samples without one
+MISSING_INT = -1
+
+# Number of variant rows in a GenotypeBlock
+GENOTYPE_BLOCK_ROWS = 1024
+
+def genotype_code(gt):
+    '''
+    Classify a GT value, i.e. 0/0, 0|1, 1/2, 1, ./., into one of the GT_CODES.
+    Genotypes with any missing allele are no calls
+    '''
+    alleles = gt.replace('|', '/').split('/')
+    if '.' in alleles or '' in alleles:
+        return GT_NOCALL
+    if alleles.count(alleles[0]) != len(alleles):
+        return GT_HET
+    if alleles[0] == '0':
+        return GT_HOM_REF
+    return GT_HOM_ALT
+
+def _int_or_missing(val):
+    try:
+        return int(val)
+    except ValueError:
+        return MISSING_INT
+
+class GenotypeBlock(object):
+    '''
+    A block of variant rows of a vcf file.
+      rows: list of the CHROM to FORMAT column values of each row
+      gt: rows x samples int8 matrix of GT_CODES
+      dp, gq: rows x samples int32 matrices of DP and GQ values, MISSING_INT if missing
+      strings: FORMAT field => list of the sample values of each row, '' if missing,
+               for the string_fields given to read_genotype_blocks
+    The matrices are decoded on first use
+    '''
+    def __init__(self, header, rows, field2values, string_fields=()):
+        self.header = header
+        self.rows = rows
+        self.sample_names = header.column_names[9:]
+        self.field2values = field2values
+        self._gt = None
+        self._dp = None
+        self._gq = None
+        self.strings = {}
+        for field in string_fields:
+            self.strings[field] = [values if values is not None else [''] * len(self.sample_names)
+                                   for values in field2values[field]]
+
+    @property
+    def gt(self):
+        if self._gt is None:
+            self._gt = self._decode('GT', genotype_code, np.int8, GT_NOCALL)
+        return self._gt
+
+    @property
+    def dp(self):
+        if self._dp is None:
+            self._dp = self._decode('DP', _int_or_missing, np.int32, MISSING_INT)
+        return self._dp
+
+    @property
+    def gq(self):
+        if self._gq is None:
+            self._gq = self._decode('GQ', _int_or_missing, np.int32, MISSING_INT)
+        return self._gq
+
+    def _decode(self, field, decode, dtype, missing):
+        '''
+        Fill a matrix with the decoded values of a field for each row, or missing for rows
+        without the field, calling decode once per distinct value
+        '''
+        row_values = self.field2values[field]
+        shape = (len(self.rows), len(self.sample_names))
+        matrix = np.empty(shape, dtype=dtype)
+        matrix.fill(missing)
+        rownums = [i for i, values in enumerate(row_values) if values is not None]
+        if not rownums:
+            return matrix
+        values = [row_values[i] for i in rownums]
+        if len(rownums) == shape[0]:
+            rownums = slice(None)
+        value2code = dict((v, decode(v)) for v in set(itertools.chain.from_iterable(values)))
+        codes = np.fromiter(itertools.imap(value2code.__getitem__, itertools.chain.from_iterable(values)),
+                            dtype=dtype, count=len(values) * shape[1])
+        matrix[rownums] = codes.reshape((len(values), shape[1]))
+        return matrix
+
+    def __len__(self):
+        return len(self.rows)
+
+    def genotype_counts(self):
+        '''
+        Return a rows x 4 matrix of the number of samples with each of the GT_CODES
+        '''
+        return np.column_stack([(self.gt == code).sum(axis=1) for code in GT_CODES])
+
+    def sample_genotype_counts(self):
+        '''
+        Return a samples x 4 matrix of the number of rows with each of the GT_CODES
+        '''
+        return np.column_stack([(self.gt == code).sum(axis=0) for code in GT_CODES])
+
+    def sample_depth_sums(self):
+        '''
+        Return the sum of the DP values, and the number of rows with a DP value, of each sample
+        '''
+        has_dp = self.dp != MISSING_INT
+        return np.where(has_dp, self.dp, 0).sum(axis=0), has_dp.sum(axis=0)
+
+    def samples_with(self, rownum, code):
+        '''
+        Return the names of the samples with the genotype code in row rownum
+        '''
+        return [self.sample_names[j] for j in np.flatnonzero(self.gt[rownum] == code)]
+
+def _split_samples(samples_str, num_samples, num_fields):
+    '''
+    Split the sample columns of a row into a flat list of num_fields values per sample,
+    padding samples with missing trailing fields, i.e. ./. , with ''
+    '''
+    values = samples_str.replace('\t', ':').split(':')
+    if len(values) == num_samples * num_fields:
+        return values
+
+    # No calls without any other field, i.e. GATK ./. , are padded in place.  Adjacent
+    # ones share a tab, so the replacement is done twice
+    num_seps = num_fields - 1
+    padded = '\t%s\t' % samples_str
+    for i in xrange(2):
+        padded = padded.replace('\t./.\t', '\t./.%s\t' % (':' * num_seps))
+    values = padded[1:-1].replace('\t', ':').split(':')
+    if len(values) == num_samples * num_fields:
+        return values
+
+    sample_strs = [s if s.count(':') == num_seps else
+                   ':'.join((s.split(':') + [''] * num_fields)[:num_fields])
+                   for s in samples_str.split()]
+    return ':'.join(sample_strs).split(':')
+
+def read_genotype_blocks(lines, block_size=GENOTYPE_BLOCK_ROWS, string_fields=()):
+    '''
+    Read a vcf file, and return its VcfHeader and a generator of GenotypeBlocks of
+    block_size rows each
+      string_fields: FORMAT fields whose values are also kept as strings, i.e. ('GT', 'AD')
+    '''
+    lines = iter(instrument.timed(lines, 'read'))
+    header = VcfHeader.read(lines)
+    if len(header.column_names) < 10:
+        raise ValueError('Vcf file has no sample columns')
+    num_samples = len(header.column_names) - 9
+    fields = ['GT', 'DP', 'GQ'] + [f for f in string_fields if f not in ('GT', 'DP', 'GQ')]
+
+    def generate_blocks():
+        rows = []
+        field2values = dict((f, []) for f in fields)
+        for line in lines:
+            # Split the fixed columns, and then all the sample values at once
+            cols = line.split(None, 9)
+            rows.append(cols[:9])
+            field2indx = header.field2indx(cols[8])
+            num_fields = len(field2indx)
+            values = _split_samples(cols[9].rstrip(), num_samples, num_fields)
+            for field in fields:
+                indx = field2indx.get(field)
+                field2values[field].append(None if indx is None else values[indx::num_fields])
+            if len(rows) == block_size:
+                yield GenotypeBlock(header, rows, field2values, string_fields)
+                rows = []
+                field2values = dict((f, []) for f in fields)
+        if rows:
+            yield GenotypeBlock(header, rows, field2values, string_fields)
+
+    return header, instrument.timed(generate_blocks(), 'parse')
+
 # ------------------------------------------------------------------------------------- #
 # Classes to handle a list of vcf files
 
@@ -401,6 +819,98 @@ class VcfFiles(list):
     '''
     pass
 
+# Effect annotated with an impact that differs from the impact it was first seen with
+ImpactConflict = namedtuple('ImpactConflict', ['effect', 'impact', 'previous_impact', 'filename'])
+
+class TranscriptEffectCounts(object):
+    '''
+    Counts of transcript effects, keyed by (gene, transcript, effect)
+    Also keeps the effect to impact mapping, the counts of HIGH impact effects keyed by
+    (gene, transcript), and the list of ImpactConflicts found.
+    Counts of separate vcf files can be combined with update()
+    '''
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.counts = Counter()
+        self.high_counts = Counter()
+        self.effect2impact = {}
+        self.conflicts = []
+
+    def add_effect(self, eff):
+        '''
+        Count an Effect namedtuple
+        '''
+        self.counts[(eff.gene, eff.transcript, eff.effect)] += 1
+        if eff.impact == 'HIGH':
+            self.high_counts[(eff.gene, eff.transcript)] += 1
+        self.set_impact(eff.effect, eff.impact, self.filename)
+
+    def set_impact(self, effect, impact, filename=None):
+        '''
+        Update the effect to impact mapping, recording an ImpactConflict if the effect
+        already has a different impact
+        '''
+        previous_impact = self.effect2impact.setdefault(effect, impact)
+        if previous_impact != impact:
+            self.conflicts.append(ImpactConflict(effect, impact, previous_impact, filename))
+
+    def update(self, other):
+        '''
+        Add the counts of another TranscriptEffectCounts object
+        '''
+        self.counts.update(other.counts)
+        self.high_counts.update(other.high_counts)
+        self.conflicts.extend(other.conflicts)
+        for effect, impact in other.effect2impact.iteritems():
+            self.set_impact(effect, impact, other.filename)
+        return self
+
+    def g2t2e2c(self):
+        '''
+        Return the counts as a gene => transcript => effect => count mapping
+        '''
+        g2t2e2c = {}
+        for (g, t, e), c in self.counts.iteritems():
+            g2t2e2c.setdefault(g, {}).setdefault(t, {})[e] = c
+        return g2t2e2c
+
+    def g2t2high(self):
+        '''
+        Return the HIGH impact counts as a gene => transcript => count mapping
+        '''
+        g2t2high = {}
+        for (g, t), c in self.high_counts.iteritems():
+            g2t2high.setdefault(g, {})[t] = c
+        return g2t2high
+
+def count_transcript_effects(vcffile, highest_priority=False):
+    '''
+    Count the transcript effects of a SnpEffVcfFile, and return a TranscriptEffectCounts object
+    If highest_priority is set to True, count only the highest priority effect per variant.
+    '''
+    counts = TranscriptEffectCounts(vcffile.name)
+    with vcffile:
+        vcffile.jump2variants()
+        for line in vcffile:
+            variant = vcffile.parse_line(line)
+
+            # Use single highest priority, or all the transcript effects for the variant
+            if highest_priority:
+                effects = [vcffile.select_highest_priority_effect(variant)]
+            else:
+                effects = vcffile.parse_effects(variant)
+
+            for eff in effects:
+                counts.add_effect(eff)
+    return counts
+
+def _count_transcript_effects_worker(args):
+    '''
+    Worker function for SnpEffVcfFiles.count_transcript_effects_all
+    '''
+    filename, highest_priority = args
+    return count_transcript_effects(SnpEffVcfFile(filename, 'r'), highest_priority)
+
 class SnpEffVcfFiles(VcfFiles):
     '''
     Class to manage multiple SnpEffVcfFile objects
@@ -411,110 +921,114 @@ class SnpEffVcfFiles(VcfFiles):
 #     eff2imp = None
 #     transcript2len = None
     
-    def count_transcript_effects_single(self, vcffile, g2t2e2c, effect2impact, highest_priority=False):
+    def count_transcript_effects_single(self, vcffile, g2t2e2c, effect2impact, highest_priority=False,
+                                        g2t2high=None):
         '''
         For a single vcf file, update the counts of the total number of transcripts and their effects
         g2t2e2c is a dictionary of counts for the transcript effects counts.
         effect22impact is a dictionary mapping effect to their corresponding impact.
+        If g2t2high is set, it is updated with the running counts of HIGH impact effects
+        of each gene's transcripts, for select_transcript_for_gene.
         If highest_priority is set to True, count only the highest priority effect per variant.
         By default, will count all the transcript effects for each variant.
+        Raises ValueError if an effect is annotated with multiple impacts
         '''
-        with vcffile:
-            vcffile.jump2variants()
-            for line in vcffile:
-                variant = vcffile.parse_line(line)
-
-                # Use single highest priority, or all the transcript effects for the variant
-                if highest_priority:
-                    effects = [vcffile.select_highest_priority_effect(variant)]
-                else:
-                    effects = vcffile.parse_effects(variant)
-                    
-                # Update the counts
-                for eff in effects:
-                    a = eff.gene
-                    b = eff.transcript
-                    c = eff.effect
-                    g2t2e2c[a][b][c] = g2t2e2c.setdefault(a, {}).setdefault(b, {}).setdefault(c, 0) + 1
-                    
-                    # Update effect to impact mapping
-                    if eff.effect not in effect2impact:
-                        effect2impact[eff.effect] = eff.impact
-
-                    # Impact already set for effect but does not match current impact
-                    elif effect2impact[eff.effect] != eff.impact:
-                        exit_message = 'Multiple impacts for effect %s: %s, %s\nExiting.'
-                        sys.stderr.write(exit_message % (eff.effect, eff.impact, effect2impact[eff.effect]))
-                        sys.exit(1)
+        counts = count_transcript_effects(vcffile, highest_priority)
+        for effect, impact in effect2impact.iteritems():
+            counts.set_impact(effect, impact)
+        if counts.conflicts:
+            c = counts.conflicts[0]
+            raise ValueError, 'Multiple impacts for effect %s: %s, %s' % (c.effect, c.impact, c.previous_impact)
+        effect2impact.update(counts.effect2impact)
+
+        # Update the counts
+        for (g, t, e), c in counts.counts.iteritems():
+            e2c = g2t2e2c.setdefault(g, {}).setdefault(t, {})
+            e2c[e] = e2c.get(e, 0) + c
+        if g2t2high is not None:
+            for (g, t), c in counts.high_counts.iteritems():
+                t2high = g2t2high.setdefault(g, {})
+                t2high[t] = t2high.get(t, 0) + c
 
         return g2t2e2c, effect2impact
         
-    def count_transcript_effects_all(self, highest_priority=False):
+    def count_transcript_effects_all(self, highest_priority=False, processes=1):
         '''
         For all vcf files in the list, count the transcript effects.
+        If processes is more than 1, each file is counted in a separate worker process,
+        and the counts are merged.
+        The running counts of HIGH impact effects are kept in self.g2t2high, and the
+        ImpactConflicts of effects annotated with multiple impacts in self.impact_conflicts
         '''
-        g2t2e2c = {}
-        effect2impact = {}
-        for vcffile in self:
-            self.count_transcript_effects_single(vcffile, g2t2e2c, effect2impact, highest_priority=highest_priority)
+        counts = TranscriptEffectCounts()
+        if processes > 1:
+            args = []
+            for vcffile in self:
+                vcffile.close()
+                args.append((vcffile.name, highest_priority))
+            pool = multiprocessing.Pool(processes)
+            try:
+                for file_counts in pool.imap(_count_transcript_effects_worker, args):
+                    counts.update(file_counts)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for vcffile in self:
+                counts.update(count_transcript_effects(vcffile, highest_priority))
 
+        self.g2t2high = counts.g2t2high()
+        self.impact_conflicts = counts.conflicts
         #self.register_transcript_counts(g2t2e2c, effect2impact, None)
-        return g2t2e2c, effect2impact
+        return counts.g2t2e2c(), counts.effect2impact
+
+    def count_high_impact(self, g2t2e2c, effect2impact):
+        '''
+        Given transcript effect counts, return mapping of gene => transcript => count of
+        effects that have "HIGH" impact.  Transcripts without HIGH impact effects are left out
+        '''
+        g2t2high = {}
+        for g, t2e2c in g2t2e2c.iteritems():
+            for t, e2c in t2e2c.iteritems():
+                high_impact_count = 0
+                for e, c in e2c.iteritems():
+                    if effect2impact[e] == 'HIGH':
+                        high_impact_count += int(c)
+                if high_impact_count:
+                    g2t2high.setdefault(g, {})[t] = high_impact_count
+        return g2t2high
 
-    def select_transcript_for_gene(self, g2t2e2c, effect2impact, transcript2len):
+    def select_transcript_for_gene(self, g2t2e2c, effect2impact, transcript2len, g2t2high=None):
         '''
         For a gene, select transcript with highest mutation count with effects that have
         "HIGH" impact.
         If multiple transcripts result, select one with the longest transcript.
-        If selected transcripts have the same length, then select randomly.
-        '''
-        def get_high_impact_count(_e2c):
-            '''
-            Given an effect to count mapping, sum up the counts of effects that have HIGH impact
-            '''
-            high_impact_count = 0
-            for _e,_c in _e2c.iteritems():
-                if effect2impact[_e] == 'HIGH':
-                    high_impact_count += int(_c)
-            return high_impact_count
-
-        def get_transcript_w_most_high_impact(_t2e2c, _transcript2len):
-            '''
-            Given a set of transcript to effect to counts mapping, return transcript with the
-            highest HIGH impact effects.  If more than 1 transcript results, select the longest.
-            If still more than 1 transcript results, select randomly
-            If no transcript results, return False
-            '''
-
-            # Filter by transcript2len mapping.  Those that do not have length data cannot be used
-            usable_t2e2c = {}
-            for _t,_e2c in _t2e2c.iteritems():
-                if _t in _transcript2len:
-                    usable_t2e2c[_t] = _e2c
-            if len(usable_t2e2c) == 0:
-                return False
-            
-            # Generate tuples (transcript, count) sorted from highest to lowest counts
-            t_counts = sorted([(_t, get_high_impact_count(_e2c)) for _t,_e2c in usable_t2e2c.iteritems()],
-                              key=lambda x: x[1], reverse=True)
-
-            # Select the transcripts that have equal highest counts (could be one or more)
-            highest_count = t_counts[0][1]
-            transcripts_w_most_high_impact = [_t_c for _t_c in t_counts if _t_c[1] == highest_count]
-            if len(transcripts_w_most_high_impact) == 1:
-                return transcripts_w_most_high_impact[0][0]
-            
-            # Select longer transcript
-            return sorted([(_t_c[0], _transcript2len[_t_c[0]]) for _t_c in transcripts_w_most_high_impact],
-                          key=lambda x: x[1], reverse=True)[0][0]
+        If selected transcripts have the same length, then select the first by transcript name.
+        Transcripts that have no length in transcript2len cannot be selected.
+        transcript2len can be a dict or anything with a dict-like get, such as an
+        ngs.gtf.TranscriptTable.
+        g2t2high is the running HIGH impact counts kept by count_transcript_effects_all, which
+        are summed up from g2t2e2c if not given.
+        Each gene's transcripts are compared in a single pass, without sorting
+        '''
+        if g2t2high is None:
+            g2t2high = self.count_high_impact(g2t2e2c, effect2impact)
 
         g2highestt = {}
-        for g in g2t2e2c:
-            # Find total HIGH impact mutation counts
-            t = get_transcript_w_most_high_impact(g2t2e2c[g], transcript2len)
-            if not t:
-                continue
-            g2highestt[g] = t
+        for g, t2e2c in g2t2e2c.iteritems():
+            t2high = g2t2high.get(g, {})
+            best_t = None
+            best_key = None
+            for t in t2e2c:
+                length = transcript2len.get(t)
+                if length is None:
+                    continue
+                key = (t2high.get(t, 0), length)
+                if best_key is None or key > best_key or (key == best_key and t < best_t):
+                    best_t = t
+                    best_key = key
+            if best_t is not None:
+                g2highestt[g] = best_t
         
         return g2highestt
 
@@ -3,14 +3,23 @@ description = '''
 Generate plots using the output of GATK DepthOfCoverage
 '''
 import argparse
+import itertools
+import multiprocessing
 import os
 import sys
-import numpy as np
-import matplotlib as mpl
-mpl.use('Agg')
-import matplotlib.pyplot as plt
-from collections import defaultdict
 from random import randrange
+from ngs.util import lazy_import
+
+np = lazy_import('numpy')
+
+# Number of lines to parse at a time
+DEFAULT_CHUNK_SIZE = 100000
+
+# Maximum number of points per chromosome plot
+DEFAULT_MAX_POINTS = 10000
+
+# Depths are stored as uint16, i.e. np.iinfo(np.uint16).max
+DEPTH_MAX = 65535
 
 def random_color(existing_colors):
     '''
@@ -35,7 +44,19 @@ def filter_samplename(samplename):
     '''
     return os.path.split(samplename.replace('Depth_for_',''))[-1]
 
+def import_pyplot():
+    '''
+    Import pyplot with the non-interactive Agg backend.  matplotlib is slow to import, so it
+    is only imported once there is something to plot
+    '''
+    if 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot
+    return matplotlib.pyplot
+
 def create_single_plot(outfilename, x, y, title=None, xlabel=None, ylabel=None, color='k'):
+    plt = import_pyplot()
     plt.figure()
     plt.plot(x, y, color)
     if title is not None:
@@ -48,82 +69,221 @@ def create_single_plot(outfilename, x, y, title=None, xlabel=None, ylabel=None,
     plt.savefig(outfilename, format='png')
     plt.close()
 
-def plot_depthofcov_data(fin, outprefix):
+class ChromDepths(object):
+    '''
+    Growable arrays of positions (int32) and per-sample depths (uint16 matrix) for one chromosome.
+    Capacity is doubled whenever it runs out, so appends are amortized constant time, and only
+    the packed arrays are kept in memory.
+    Depths larger than the uint16 maximum are clipped.
+    '''
+    def __init__(self, num_samples, capacity=DEFAULT_CHUNK_SIZE):
+        self.size = 0
+        self.pos = np.empty(capacity, dtype=np.int32)
+        self.depths = np.empty((capacity, num_samples), dtype=np.uint16)
+
+    def extend(self, pos, depths):
+        '''
+        Append arrays of positions and sample depths
+        '''
+        n = len(pos)
+        if self.size + n > len(self.pos):
+            capacity = max(2 * len(self.pos), self.size + n)
+            self.pos = np.resize(self.pos, capacity)
+            self.depths = np.resize(self.depths, (capacity, self.depths.shape[1]))
+        self.pos[self.size:self.size + n] = pos
+        self.depths[self.size:self.size + n] = np.minimum(depths, DEPTH_MAX)
+        self.size += n
+
+    def arrays(self):
+        '''
+        Return the position and depth arrays of the appended rows, as views without copying
+        '''
+        return self.pos[:self.size], self.depths[:self.size]
+
+def parse_depthofcov_chunk(lines, num_samples):
+    '''
+    Parse a list of depthofcov lines
+    Return the list of chromosomes, and arrays of positions and sample depths for each line
+    Sample depths of the whole chunk are converted to numbers in a single call
+    '''
+    chroms = []
+    positions = []
+    sample_strs = []
+    for line in lines:
+        locus, total, avg, depths_str = line.split('\t', 3)
+        chrom, pos = locus.split(':')
+        chroms.append(chrom)
+        positions.append(pos)
+        sample_strs.append(depths_str)
+    pos = np.array(positions, dtype=np.int32)
+    depths = np.fromstring(''.join(sample_strs), dtype=np.int64, sep=' ').reshape(len(lines), num_samples)
+    return chroms, pos, depths
+
+def read_depthofcov_header(fin):
     '''
-    Read depthofcov data into memory
+    Read the column header line of GATK DepthOfCoverage data, and return the list of sample names
     '''
-    # Load list of sample names
     line = fin.next()
-    samples = map(filter_samplename, line.strip('\n').split('\t')[3:])
-
-    # Read in data
-    chrom2pos = defaultdict(list)
-    chrom2totdp = defaultdict(list)
-    chrom2avgdp = defaultdict(list)
-    chrom2stdev = defaultdict(list)
-    chrom2alldp = defaultdict(list)
-    for line in fin:
-        cols = line.strip('\n').split('\t')
-        chrom, pos = cols[0].split(':')
-
-        # Update values for each column
-        chrom2pos[chrom].append(int(pos))
-        chrom2totdp[chrom].append(int(cols[1]))
-        chrom2avgdp[chrom].append(float(cols[2]))
-        sample_depths = [int(x) for x in cols[3:]]
-        chrom2alldp[chrom].append(sample_depths)
-        chrom2stdev[chrom].append(np.std(sample_depths))
-
-    # Generate a set of plots for each chromosome
-    for chrom in chrom2pos:
-        # Pos vs Total DP
-        create_single_plot('.'.join([outprefix, chrom, 'totdp', 'png']),
-                           chrom2pos[chrom],
-                           chrom2totdp[chrom],
-                           title='Pos vs Total DP',
-                           xlabel='Position',
-                           ylabel='Total DP',
-                           color='b')
+    return map(filter_samplename, line.strip('\n').split('\t')[3:])
 
-        # Pos vs Avg DP
-        create_single_plot('.'.join([outprefix, chrom, 'avgdp', 'png']),
-                           chrom2pos[chrom],
-                           chrom2avgdp[chrom],
-                           title='Pos vs Avg DP',
-                           xlabel='Position',
-                           ylabel='Avg DP',
-                           color='b')
-        
-        # Pos vs Stdev
-        create_single_plot('.'.join([outprefix, chrom, 'stdev', 'png']),
-                           chrom2pos[chrom],
-                           chrom2stdev[chrom],
-                           title='Pos vs Stdev',
+def generate_chrom_depths(fin, num_samples, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Read GATK DepthOfCoverage data rows in chunks of lines into packed NumPy arrays, and generate
+    (chromosome, positions, depths) as soon as the rows of each chromosome end, so that only a
+    single chromosome is held in memory at a time.
+    Raises ValueError if the rows of a chromosome are not consecutive
+    '''
+    seen_chroms = set()
+    chrom = None
+    chrom_depths = None
+    while True:
+        lines = list(itertools.islice(fin, chunk_size))
+        if not lines:
+            break
+        chunk_chroms, pos, depths = parse_depthofcov_chunk(lines, num_samples)
+
+        # Split the chunk into runs of the same chromosome
+        breaks = [i for i in xrange(1, len(chunk_chroms)) if chunk_chroms[i] != chunk_chroms[i - 1]]
+        for s, e in zip([0] + breaks, breaks + [len(chunk_chroms)]):
+            if chunk_chroms[s] != chrom:
+                if chrom is not None:
+                    yield (chrom,) + chrom_depths.arrays()
+                chrom = chunk_chroms[s]
+                if chrom in seen_chroms:
+                    raise ValueError('Rows of chromosome %s are not consecutive' % chrom)
+                seen_chroms.add(chrom)
+                chrom_depths = ChromDepths(num_samples, capacity=chunk_size)
+            chrom_depths.extend(pos[s:e], depths[s:e])
+
+    if chrom is not None:
+        yield (chrom,) + chrom_depths.arrays()
+
+def depth_summaries(depths):
+    '''
+    Compute the total depth, average depth and standard deviation of the sample depths
+    at each position
+    '''
+    total = depths.sum(axis=1, dtype=np.int64)
+    avg = total / float(depths.shape[1])
+    stdev = depths.std(axis=1, dtype=np.float64)
+    return total, avg, stdev
+
+def summarize_chrom(pos, depths, max_points, block_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Reduce the number of points to plot to at most max_points, by averaging within equally sized
+    bins of consecutive positions.  Return the average position, total depth, average depth,
+    standard deviation, and sample depths (matrix with a column for each sample) of each bin.
+    The depths are summarized and binned in blocks of whole bins, so that only a block of
+    rows is converted to floats at a time
+    '''
+    n = len(pos)
+    bin_size = 1
+    if max_points is not None and n > max_points:
+        bin_size = int(np.ceil(n / float(max_points)))
+    block_size = bin_size * max(1, block_size // bin_size)
+    num_bins = (n + bin_size - 1) // bin_size
+
+    binned_pos = np.empty(num_bins, dtype=np.float64)
+    binned_summaries = np.empty((num_bins, 3), dtype=np.float64)
+    binned_depths = np.empty((num_bins, depths.shape[1]), dtype=np.float64)
+    for b in xrange(0, n, block_size):
+        block_depths = depths[b:b + block_size]
+        starts = np.arange(0, len(block_depths), bin_size)
+        bins = slice(b // bin_size, b // bin_size + len(starts))
+        binned_pos[bins] = np.add.reduceat(pos[b:b + block_size].astype(np.float64), starts)
+        binned_summaries[bins] = np.add.reduceat(np.column_stack(depth_summaries(block_depths)), starts, axis=0)
+        binned_depths[bins] = np.add.reduceat(block_depths.astype(np.float64), starts, axis=0)
+
+    counts = np.diff(np.append(np.arange(0, n, bin_size), n)).astype(np.float64)
+    binned_pos /= counts
+    binned_summaries /= counts[:, np.newaxis]
+    binned_depths /= counts[:, np.newaxis]
+    return (binned_pos, binned_summaries[:, 0], binned_summaries[:, 1], binned_summaries[:, 2],
+            binned_depths)
+
+def plot_chrom(outprefix, chrom, samples, pos, totdp, avgdp, stdev, sample_dps):
+    '''
+    Generate the set of plots for a single chromosome
+    '''
+    # Pos vs Total DP
+    create_single_plot('.'.join([outprefix, chrom, 'totdp', 'png']),
+                       pos,
+                       totdp,
+                       title='Pos vs Total DP',
+                       xlabel='Position',
+                       ylabel='Total DP',
+                       color='b')
+
+    # Pos vs Avg DP
+    create_single_plot('.'.join([outprefix, chrom, 'avgdp', 'png']),
+                       pos,
+                       avgdp,
+                       title='Pos vs Avg DP',
+                       xlabel='Position',
+                       ylabel='Avg DP',
+                       color='b')
+
+    # Pos vs Stdev
+    create_single_plot('.'.join([outprefix, chrom, 'stdev', 'png']),
+                       pos,
+                       stdev,
+                       title='Pos vs Stdev',
+                       xlabel='Position',
+                       ylabel='Standard Deviation',
+                       color='b')
+
+    # Individual sample depths
+    for i,sample in enumerate(samples):
+        create_single_plot('.'.join([outprefix, chrom, 'dp', sample, 'png']),
+                           pos,
+                           sample_dps[:, i],
+                           title='%s Pos vs Depth' % sample,
                            xlabel='Position',
-                           ylabel='Standard Deviation',
+                           ylabel='Depth',
                            color='b')
 
-        # Individual sample depths
-        sample_dps = zip(*chrom2alldp[chrom])
-        for i,sample in enumerate(samples):
-            create_single_plot('.'.join([outprefix, chrom, 'dp', sample, 'png']),
-                               chrom2pos[chrom],
-                               sample_dps[i],
-                               title='%s Pos vs Depth' % sample,
-                               xlabel='Position',
-                               ylabel='Depth',
-                               color='b')
-
-        # Plot all samples onto same plot
-        colors_used = set()
-        plt.figure()
-        for i,sample in enumerate(samples):
-            plt.plot(chrom2pos[chrom], sample_dps[i], random_color(colors_used))
-        plt.suptitle('All Samples Pos vs Depth')
-        plt.xlabel('Position')
-        plt.ylabel('Depth')
-        plt.savefig('.'.join([outprefix, chrom, 'dp', 'allsamples', 'png']), format='png')
-        plt.close()
+    # Plot all samples onto same plot
+    colors_used = set()
+    plt = import_pyplot()
+    plt.figure()
+    for i,sample in enumerate(samples):
+        plt.plot(pos, sample_dps[:, i], random_color(colors_used))
+    plt.suptitle('All Samples Pos vs Depth')
+    plt.xlabel('Position')
+    plt.ylabel('Depth')
+    plt.savefig('.'.join([outprefix, chrom, 'dp', 'allsamples', 'png']), format='png')
+    plt.close()
+
+def plot_depthofcov_data(fin, outprefix, chunk_size=DEFAULT_CHUNK_SIZE, max_points=DEFAULT_MAX_POINTS,
+                         processes=1):
+    '''
+    Read depthofcov data into packed arrays, and generate plots for each chromosome
+    Each chromosome is binned down to at most max_points points as soon as its rows are read,
+    and chromosomes are plotted in parallel using a pool of processes
+    '''
+    samples = read_depthofcov_header(fin)
+    pool = None
+    results = []
+    if processes > 1:
+        pool = multiprocessing.Pool(processes=processes)
+    try:
+        for chrom, pos, depths in generate_chrom_depths(fin, len(samples), chunk_size=chunk_size):
+            args = (outprefix, chrom, samples) + summarize_chrom(pos, depths, max_points, block_size=chunk_size)
+            if pool is None:
+                plot_chrom(*args)
+            else:
+                results.append(pool.apply_async(plot_chrom, args))
+        if pool is not None:
+            pool.close()
+            for result in results:
+                result.get()
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
         
 
 def main():
@@ -138,10 +298,29 @@ def main():
                     help='Output prefix for all the figures',
                     type=str,
                     default='depthofcov.plot')
+    ap.add_argument('-c', '--chunk-size',
+                    help='Number of lines to parse at a time',
+                    type=int,
+                    default=DEFAULT_CHUNK_SIZE)
+    ap.add_argument('-m', '--max-points',
+                    help='Maximum number of points per plot. Positions are binned down to this number',
+                    type=int,
+                    default=DEFAULT_MAX_POINTS)
+    ap.add_argument('-p', '--processes',
+                    help='Number of processes to use for plotting the chromosomes',
+                    type=int,
+                    default=1)
     params = ap.parse_args()
 
     with params.depthofcov as fin:
-        plot_depthofcov_data(fin, params.out_prefix)
+        try:
+            plot_depthofcov_data(fin, params.out_prefix,
+                                 chunk_size=params.chunk_size,
+                                 max_points=params.max_points,
+                                 processes=params.processes)
+        except ValueError as e:
+            sys.stderr.write('%s\nExiting.\n\n' % e)
+            sys.exit(1)
         
     
 if __name__ == '__main__':
@@ -68,11 +68,10 @@ def subcommand_filter(args):
             csvreader.add_filter(filter_factory.create_1000Genomes_maf_selector(minval=args.maf_1000G_select[0],
                                                                                 maxval=args.maf_1000G_select[1]))
 
-        # Run filters
+        # Run filters, evaluated on chunks of rows at a time
         csvwriter = csv.writer(sys.stdout, dialect='excel')
         csvwriter.writerow(csvreader.header)
-        for row in csvreader.filtered_variants():
-            csvwriter.writerow(row)
+        csvwriter.writerows(csvreader.filtered_variants_batch(chunk_size=args.chunk_size))
 
 def main():
     parser = argparse.ArgumentParser(description=description)
@@ -115,6 +114,10 @@ def main():
                                nargs=2,
                                help='Select 1000 Genomes maf range (min, max)',
                                type=float)
+    parser_filter.add_argument('--chunk-size',
+                               help='Number of rows filtered at a time',
+                               type=int,
+                               default=annovar.DEFAULT_CHUNK_SIZE)
     parser_filter.set_defaults(func=subcommand_filter)
 
     # Subcommand: Count variants
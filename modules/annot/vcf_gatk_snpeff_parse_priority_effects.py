@@ -8,6 +8,7 @@ Parse and output the data in the vcf file
 import argparse
 import re
 import sys
+from ngs import vcf
 
 def get_effects_categories():
     effects_cats = [['High','SPLICE_SITE_ACCEPTOR'],
@@ -57,34 +58,6 @@ def get_effects_categories():
         effects.append(effect)
     return effects, effects2impact
 
-def build_sampleinfo_field2indx(field_str):
-    '''
-    Generate a dictionary that maps the sample genotype field to their corresponding index
-    '''
-    fields = field_str.split(':')
-    field2indx = {}
-    for i,fieldname in enumerate(fields):
-        field2indx[fieldname] = i
-    return field2indx
-
-def build_colname2colnum(colname_str):
-    '''
-    Generate a dictionary that maps column name to the column index number
-    Also generates a list of all the sample ids separately, which is a subset of the column names
-    Also generates a sorted list of all the sample ids' indexes
-    Assumes that sample ids are located to the right of the FORMAT column
-    '''
-    colnames = colname_str.split()
-    colname2colnum = {}
-    for i,colname in enumerate(colnames):
-        colname2colnum[colname] = i
-
-    # Sample ids
-    first_sample_index = colname2colnum['FORMAT'] + 1
-    sample_names = colnames[first_sample_index:]
-    sample_indexes = sorted([colname2colnum[sn] for sn in sample_names])
-    return colname2colnum, sample_names, sample_indexes
-
 def build_info_field2val(field_str):
     '''
     Generate a dictionary that maps the info column fields to their corresponding values
@@ -97,24 +70,6 @@ def build_info_field2val(field_str):
             field2val[pa[0]] = pa[1]
     return field2val
 
-def convert_allele2bases(allele_str, ref, alt):
-    '''
-    Given an allele string i.e. 0/0, 0/1, 1/1, convert to genotype string i.e. A/A, C/G
-    '''
-    alleles = allele_str.split('/')
-    bases = []
-    for a in alleles:
-        if a == '0':
-            bases.append(ref)
-        elif a == '1':
-            bases.append(alt)
-        elif a == '.':
-            bases.append('N')
-        else:
-            sys.stderr.write('Could not recognize allele %s\nExiting\n\n' % allele_str)
-            sys.exit(1)
-    return '/'.join(bases)
-
 def parse_effect(info_str, effects):
     '''
     Parse the info column string in the vcf file, and extract the highest-priority effect, impact,
@@ -170,165 +125,101 @@ def parse_file(fin, effects, effects2impact):
     Read through the vcf file, and parse it.
     Output the columns as defined above
     '''
-
-    for line in fin:
-        # Headers
-        if line[0:2] == '##':
-            continue
-
-        # Column Labels: build column-to-column_number mapping
-        if line[0] == '#':
-            colname2colnum, sample_names, sample_indexes = build_colname2colnum(line[1:].strip())
-            sys.stdout.write('%s\n' % '\t'.join(['CHROM',
-                                                 'POS',
-                                                 'VARIANT_ID',
-                                                 'REF',
-                                                 'ALT',
-                                                 'QUAL',
-                                                 'FILTER',
-                                                 'ALT_FREQ',
-                                                 'TOTAL_DP',
-                                                 'RMS_MQ',
-                                                 'EFFECT',
-                                                 'EFFECT_IMPACT',
-                                                 'FUNCTIONAL_CLASS',
-                                                 'CODON_CHANGE',
-                                                 'AA_CHANGE',
-                                                 'GENE_NAME',
-                                                 'GENE_BIOTYPE',
-                                                 'CODING',
-                                                 'TRANSCRIPT',
-                                                 'EXON',
-                                                 './.',
-                                                 '0/0',
-                                                 '0/1',
-                                                 '1/1',
-                                                 'REF_HOMO_SAMPLE_IDS',
-                                                 'VARIANT_HETERO_SAMPLE_IDS',
-                                                 'VARIANT_HOMO_SAMPLE_IDS']
-                                                + append_to_sample_names(sample_names, 'GT_allele')
-                                                + append_to_sample_names(sample_names, 'GT_base')
-                                                + append_to_sample_names(sample_names, 'DP')
-                                                + append_to_sample_names(sample_names, 'GQ')
-                                                + append_to_sample_names(sample_names, 'AD')))
-    
-            continue
-        
-        # Parse each row of data
-        la = line.strip().split('\t')
-        # Build info column field2val mapping
-        info_field2val = build_info_field2val(la[colname2colnum['INFO']])
-
-        # Record columns
-        chrom = la[colname2colnum['CHROM']]
-        pos = la[colname2colnum['POS']]
-        variantid = la[colname2colnum['ID']]
-        ref = la[colname2colnum['REF']]
-        alt = la[colname2colnum['ALT']]
-        qual = la[colname2colnum['QUAL']]
-        filtr = la[colname2colnum['FILTER']]
-        alt_freq = info_field2val['AF']
-        total_dp = info_field2val['DP']
-        rms_mq = info_field2val['MQ']
-        (effect, 
-         effect_impact,
-         functional_class,
-         codon_change,
-         aa_change,
-         gene_name,
-         gene_biotype,
-         coding,
-         transcript,
-         exon) = parse_effect(la[colname2colnum['INFO']], effects)
-        
-        # Keep track of genotypes for different calls
-        nocall = []
-        ref_homo = []
-        variant_homo = []
-        variant_hetero = []
-
-        # Record sample alleles, genotypes, depth for alleles, genotype quality
-        sample_gt_alleles = []
-        sample_gt_bases = []
-        sample_depths = []
-        sample_gqs = []
-        sample_allele_depths = []
-
-        # Build sample info string format mapping
-        sample_field2indx = build_sampleinfo_field2indx(la[colname2colnum['FORMAT']])
-        for sample_name in sample_names:
-            sample_i = colname2colnum[sample_name]
-            sample_info_str = la[sample_i]
-
-            # Check if 'no call'
-            if sample_info_str == './.':
-                sample_info_str = './.::::'
-
-            sample_info_list = sample_info_str.split(':')
-            sample_gt = sample_info_list[sample_field2indx['GT']]
-
-            # Update output lists
-            sample_gt_alleles.append(sample_gt)
-            sample_gt_bases.append(convert_allele2bases(sample_gt, ref, alt))
-            sample_depths.append(sample_info_list[sample_field2indx['DP']])
-            sample_gqs.append(sample_info_list[sample_field2indx['GQ']])
-            sample_allele_depths.append(sample_info_list[sample_field2indx['AD']])
-
-            # Update genotype counts and sample names
-            # Check if 'no call'
-            if sample_gt == './.':
-                nocall.append(sample_name)
-
-            # Check reference homo
-            elif sample_gt == '0/0':
-                ref_homo.append(sample_name)
-
-            # Check variant genotypes
-            else:
-                sample_alleles = sample_gt.split('/')
-                if '1' in sample_alleles:
-                    # Homo
-                    if sample_alleles[0] == '1' and sample_alleles[1] == '1':
-                        variant_homo.append(sample_name)
-                    elif sample_alleles[0] == '1' or sample_alleles[1] == '1':
-                        variant_hetero.append(sample_name)
-                    else:
-                        sys.stderr.write('Genotype format for sample %s is unknown: %s\n' % (sample_name, sample_info_str))
-                        sys.exit(1)
-
-        # Output to standard output
-        sys.stdout.write('%s\n' % '\t'.join([chrom,
-                                             pos,
-                                             variantid,
-                                             ref,
-                                             alt,
-                                             qual,
-                                             filtr,
-                                             alt_freq,
-                                             total_dp,
-                                             rms_mq,
-                                             effect,
-                                             effect_impact,
-                                             functional_class,
-                                             codon_change,
-                                             aa_change,
-                                             gene_name,
-                                             gene_biotype,
-                                             coding,
-                                             transcript,
-                                             exon,
-                                             str(len(nocall)),
-                                             str(len(ref_homo)),
-                                             str(len(variant_hetero)),
-                                             str(len(variant_homo)),
-                                             ';'.join(ref_homo),
-                                             ';'.join(variant_hetero),
-                                             ';'.join(variant_homo)]
-                                            + sample_gt_alleles
-                                            + sample_gt_bases
-                                            + sample_depths
-                                            + sample_gqs
-                                            + sample_allele_depths))
+    # Read the vcf file in blocks of variants x samples genotype matrices
+    header, blocks = vcf.read_genotype_blocks(fin, string_fields=('GT', 'DP', 'GQ', 'AD'))
+    sample_names = header.column_names[9:]
+    sys.stdout.write('%s\n' % '\t'.join(['CHROM',
+                                         'POS',
+                                         'VARIANT_ID',
+                                         'REF',
+                                         'ALT',
+                                         'QUAL',
+                                         'FILTER',
+                                         'ALT_FREQ',
+                                         'TOTAL_DP',
+                                         'RMS_MQ',
+                                         'EFFECT',
+                                         'EFFECT_IMPACT',
+                                         'FUNCTIONAL_CLASS',
+                                         'CODON_CHANGE',
+                                         'AA_CHANGE',
+                                         'GENE_NAME',
+                                         'GENE_BIOTYPE',
+                                         'CODING',
+                                         'TRANSCRIPT',
+                                         'EXON',
+                                         './.',
+                                         '0/0',
+                                         '0/1',
+                                         '1/1',
+                                         'REF_HOMO_SAMPLE_IDS',
+                                         'VARIANT_HETERO_SAMPLE_IDS',
+                                         'VARIANT_HOMO_SAMPLE_IDS']
+                                        + append_to_sample_names(sample_names, 'GT_allele')
+                                        + append_to_sample_names(sample_names, 'GT_base')
+                                        + append_to_sample_names(sample_names, 'DP')
+                                        + append_to_sample_names(sample_names, 'GQ')
+                                        + append_to_sample_names(sample_names, 'AD')))
+
+    for block in blocks:
+        # Genotype counts of each row: no call, reference homo, variant hetero, variant homo
+        genotype_counts = block.genotype_counts()
+        for i, row in enumerate(block.rows):
+            # Record columns
+            chrom, pos, variantid, ref, alt, qual, filtr, info = row[:8]
+
+            # Build info column field2val mapping
+            info_field2val = build_info_field2val(info)
+            alt_freq = info_field2val['AF']
+            total_dp = info_field2val['DP']
+            rms_mq = info_field2val['MQ']
+            (effect, 
+             effect_impact,
+             functional_class,
+             codon_change,
+             aa_change,
+             gene_name,
+             gene_biotype,
+             coding,
+             transcript,
+             exon) = parse_effect(info, effects)
+
+            # Record sample alleles, genotypes, depth for alleles, genotype quality
+            sample_gt_alleles = block.strings['GT'][i]
+            gt2bases = dict((sample_gt, vcf.genotype_bases(sample_gt, ref, alt, sort=False))
+                            for sample_gt in set(sample_gt_alleles))
+            sample_gt_bases = [gt2bases[sample_gt] for sample_gt in sample_gt_alleles]
+
+            # Output to standard output
+            sys.stdout.write('%s\n' % '\t'.join([chrom,
+                                                 pos,
+                                                 variantid,
+                                                 ref,
+                                                 alt,
+                                                 qual,
+                                                 filtr,
+                                                 alt_freq,
+                                                 total_dp,
+                                                 rms_mq,
+                                                 effect,
+                                                 effect_impact,
+                                                 functional_class,
+                                                 codon_change,
+                                                 aa_change,
+                                                 gene_name,
+                                                 gene_biotype,
+                                                 coding,
+                                                 transcript,
+                                                 exon]
+                                                + [str(c) for c in genotype_counts[i]]
+                                                + [';'.join(block.samples_with(i, vcf.GT_HOM_REF)),
+                                                   ';'.join(block.samples_with(i, vcf.GT_HET)),
+                                                   ';'.join(block.samples_with(i, vcf.GT_HOM_ALT))]
+                                                + sample_gt_alleles
+                                                + sample_gt_bases
+                                                + block.strings['DP'][i]
+                                                + block.strings['GQ'][i]
+                                                + block.strings['AD'][i]))
 
 def main():
     ap = argparse.ArgumentParser(description=description)
@@ -340,7 +231,11 @@ def main():
     params = ap.parse_args()
 
     effects, effects2impact = get_effects_categories()
-    parse_file(params.vcf_file, effects, effects2impact)
+    try:
+        parse_file(params.vcf_file, effects, effects2impact)
+    except ValueError as e:
+        sys.stderr.write('%s\nExiting.\n\n' % e)
+        sys.exit(1)
     params.vcf_file.close()
 
 
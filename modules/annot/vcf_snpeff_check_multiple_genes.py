@@ -7,6 +7,7 @@ Check to see if a variant (row) has been annotated with multiple genes
 import argparse
 import re
 import sys
+from ngs import annotdb
 
 
 def build_sampleinfo_field2indx(field_str):
@@ -49,24 +50,6 @@ def build_info_field2val(field_str):
             field2val[pa[0]] = pa[1]
     return field2val
 
-def convert_allele2bases(allele_str, ref, alt):
-    '''
-    Given an allele string i.e. 0/0, 0/1, 1/1, convert to genotype string i.e. A/A, C/G
-    '''
-    alleles = allele_str.split('/')
-    bases = []
-    for a in alleles:
-        if a == '0':
-            bases.append(ref)
-        elif a == '1':
-            bases.append(alt)
-        elif a == '.':
-            bases.append('N')
-        else:
-            sys.stderr.write('Could not recognize allele %s\nExiting\n\n' % allele_str)
-            sys.exit(1)
-    return '/'.join(bases)
-
 def check_variant(info_str, transcript2gene):
     '''
     Parse the info column string in the vcf file, and check if multiple genes are included.
@@ -119,6 +102,16 @@ def load_mapping_file(mapping_file_in):
         transcript2gene[transcript] = gene
     return transcript2gene
 
+def load_transcript2gene(mapping_file_in):
+    '''
+    If the mapping file is an annotation database, return its transcript2gene lookup, which
+    queries the database as needed.  Otherwise read the mapping file to memory
+    '''
+    if annotdb.is_annotdb(mapping_file_in.name):
+        mapping_file_in.close()
+        return annotdb.AnnotDb(mapping_file_in.name).lookup('transcript2gene')
+    return load_mapping_file(mapping_file_in)
+
 def check_multiple_genes(fin, transcript2gene):
     '''
     Read through the vcf file and look for variants that are annotated
@@ -168,14 +161,14 @@ def main():
                     type=argparse.FileType('r'),
                     default=sys.stdin)
     ap.add_argument('mapping_file',
-                    help='Ensemble gene,geneid,transcriptid mapping file parsed from Ensembl\'s Homo_sapiens.GRChxx.xx.gtf file',
+                    help='Ensemble gene,geneid,transcriptid mapping file parsed from Ensembl\'s Homo_sapiens.GRChxx.xx.gtf file, or annotation database created by sqlite_load_ensemble_gene2transcript.py',
                     nargs='?',
                     type=argparse.FileType('r'),
                     default=sys.stdin)
     params = ap.parse_args()
     
     # Load mapping file to memory
-    transcript2gene = load_mapping_file(params.mapping_file)
+    transcript2gene = load_transcript2gene(params.mapping_file)
 
     # Check 
     check_multiple_genes(params.vcf_file, transcript2gene)
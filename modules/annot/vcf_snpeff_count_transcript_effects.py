@@ -11,26 +11,37 @@ gene to selected transcripts
 
 import argparse
 import pickle
+import sys
 #from ngs import util
-from ngs import vcf
+from ngs import annotdb, ngsd, vcf
 
 def generate_counts(vcf_filenames,
                     t2l,
                     outprefix,
-                    highest_priority=False):
+                    highest_priority=False,
+                    processes=1):
     '''
     Read through a vcf file outputted by snpeff and count the transcription effects for each variant.
     If highest_priority is set to true, then only count the highest priority transcript effect
     per variant.
+    If processes is more than 1, the vcf files are counted in parallel.
     '''
     # Generate SnpEffVcfFiles objects
     vcffiles = vcf.SnpEffVcfFiles([vcf.SnpEffVcfFile(fn) for fn in vcf_filenames])
     
     # Count up all the transcript effects
-    g2t2e2c, effects2impact = vcffiles.count_transcript_effects_all(highest_priority=highest_priority)
+    g2t2e2c, effects2impact = vcffiles.count_transcript_effects_all(highest_priority=highest_priority,
+                                                                    processes=processes)
 
-    # Generate selected transcripts for each gene
-    g2t = vcffiles.select_transcript_for_gene(g2t2e2c, effects2impact, t2l)
+    # Effects must have a single impact
+    if vcffiles.impact_conflicts:
+        for c in vcffiles.impact_conflicts:
+            sys.stderr.write('Multiple impacts for effect %s: %s, %s in %s\n' % (c.effect, c.impact, c.previous_impact, c.filename))
+        sys.stderr.write('Exiting.\n')
+        sys.exit(1)
+
+    # Generate selected transcripts for each gene, using the HIGH impact counts kept while counting
+    g2t = vcffiles.select_transcript_for_gene(g2t2e2c, effects2impact, t2l, vcffiles.g2t2high)
     
     # Create output files
     g2t2e2c_outfile = outprefix + '.counts.pkl'
@@ -54,26 +65,36 @@ def main():
                     nargs='+',
                     type=str)
     ap.add_argument('-l', '--transcripts2length',
-                    help='Pickle (.pkl) file containing the lengths of transcripts',
+                    help='Pickle (.pkl) file or tab-separated file containing the lengths of transcripts, or annotation database created by sqlite_load_ensemble_gene2transcript.py',
                     type=str,
                     required=True)
     ap.add_argument('-e', '--highest-priority-effect',
                     help='If this flag is set, the highest-priority effect transcript will be selected from each variant annotation',
                     action='store_true')
+    ap.add_argument('-p', '--processes',
+                    help='Number of vcf files to count in parallel',
+                    type=int,
+                    default=1)
     ap.add_argument('-o', '--outprefix',
                     help='Output prefix',
                     default='transcript_effects')
     params = ap.parse_args()
 
-    # Load transcripts2length file
-    with open(params.transcripts2length, 'rb') as f:
-        t2l = pickle.load(f)
+    # Load transcripts2length file to a compact transcript table, or look up the lengths in
+    # the annotation database, unless ngsd keeps the table loaded
+    t2l = ngsd.warm_table('transcript_length', params.transcripts2length)
+    if t2l is None:
+        if annotdb.is_annotdb(params.transcripts2length):
+            t2l = annotdb.AnnotDb(params.transcripts2length).lookup('transcript_length')
+        else:
+            t2l = ngsd.load_table('transcript_length', params.transcripts2length)
 
     # Generate counts
     generate_counts(params.vcf_files,
                     t2l,
                     params.outprefix,
-                    highest_priority=params.highest_priority_effect)
+                    highest_priority=params.highest_priority_effect,
+                    processes=params.processes)
 
 
 if __name__ == '__main__':
@@ -8,6 +8,7 @@ Parse and output the data in the vcf file
 import argparse
 import re
 import sys
+from ngs import vcf
 
 
 def get_effects_categories():
@@ -98,24 +99,6 @@ def build_info_field2val(field_str):
             field2val[pa[0]] = pa[1]
     return field2val
 
-def convert_allele2bases(allele_str, ref, alt):
-    '''
-    Given an allele string i.e. 0/0, 0/1, 1/1, convert to genotype string i.e. A/A, C/G
-    '''
-    alleles = allele_str.split('/')
-    bases = []
-    for a in alleles:
-        if a == '0':
-            bases.append(ref)
-        elif a == '1':
-            bases.append(alt)
-        elif a == '.':
-            bases.append('N')
-        else:
-            sys.stderr.write('Could not recognize allele %s\nExiting\n\n' % allele_str)
-            sys.exit(1)
-    return '/'.join(bases)
-
 def parse_effect(info_str, effects):
     '''
     Parse the info column string in the vcf file, and extract the highest-priority effect, impact,
@@ -267,7 +250,7 @@ def parse_file(fin, effects, effects2impact):
 
             # Update output lists
             sample_gt_alleles.append(sample_gt)
-            sample_gt_bases.append(convert_allele2bases(sample_gt, ref, alt))
+            sample_gt_bases.append(vcf.genotype_bases(sample_gt, ref, alt, sort=False))
             sample_depths.append(sample_info_list[sample_field2indx['DP']])
             sample_gqs.append(sample_info_list[sample_field2indx['GQ']])
             sample_allele_depths.append(sample_info_list[sample_field2indx['AD']])
@@ -336,7 +319,11 @@ def main():
     params = ap.parse_args()
     
     effects, effects2impact = get_effects_categories()
-    parse_file(params.vcf_file, effects, effects2impact)
+    try:
+        parse_file(params.vcf_file, effects, effects2impact)
+    except ValueError as e:
+        sys.stderr.write('%s\nExiting.\n\n' % e)
+        sys.exit(1)
     params.vcf_file.close()
 
 
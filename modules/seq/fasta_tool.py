@@ -5,7 +5,9 @@ Manipulate pairs of fastq files
 
 import argparse
 import sys
-from Bio import SeqIO
+from ngs.util import lazy_import
+
+SeqIO = lazy_import('Bio.SeqIO')
 
 def subcommand_count(args):
     # Determine the type of comparison to make
@@ -10,29 +10,24 @@ import os
 import re
 import sys
 import StringIO
-from BeautifulSoup import BeautifulSoup
 from collections import defaultdict
-from django.conf import settings
-from django.template import Template, Context, Library, builtins
-from django.utils.encoding import force_unicode
-from xhtml2pdf import pisa
 from ngs import fastq
 
+# Django, xhtml2pdf and BeautifulSoup are slow to import, and are imported where they are used
+
 #=================================#
-# Custom template filters
-register = Library()
+# Custom template filters, registered by register_template_filters
 
-@register.filter
 def keyval(d, key):
     return d.get(key,'')
-builtins.append(register)
 
-@register.filter(is_safe=True)
 def intcomma(value, use_l10n=True):
     """
     Converts an integer to a string containing commas every three digits.
     For example, 3000 becomes '3,000' and 45000 becomes '45,000'.
     """
+    from django.conf import settings
+    from django.utils.encoding import force_unicode
     if settings.USE_L10N and use_l10n:
         try:
             if not isinstance(value, float):
@@ -48,7 +43,6 @@ def intcomma(value, use_l10n=True):
     else:
         return intcomma(new, use_l10n)
                 
-@register.filter
 def fastqc_context2title_text(value):
     '''
     Given a keyword for each fastqc context, return the context text
@@ -66,7 +60,6 @@ def fastqc_context2title_text(value):
             'overrepresented_sequences': 'Overrepresented Sequences',
             'kmer_profiles': 'Kmer Content'}.setdefault(value,'')
     
-@register.filter
 def fastqc_context2summary_text(value):
     '''
     Map context keyword for each fastqc plot to their corresponding term used
@@ -84,6 +77,22 @@ def fastqc_context2summary_text(value):
             'overrepresented_sequences': 'Overrepresented Sequences',
             'kmer_profiles': 'Kmer Content'}.setdefault(value,'')
 
+def register_template_filters():
+    '''
+    Configure django, and register the custom template filters as template builtins
+    '''
+    from django.conf import settings
+    from django.template import Library, builtins
+    if settings.configured:
+        return
+    settings.configure()
+    register = Library()
+    register.filter(keyval)
+    register.filter(intcomma, is_safe=True)
+    register.filter(fastqc_context2title_text)
+    register.filter(fastqc_context2summary_text)
+    builtins.append(register)
+
 #=================================#
 
 READ_NUM = {
@@ -214,6 +223,7 @@ def parse_demultiplex_stats_file(demul_stats_htm):
     '''
     Load and parse Illumina Demultiplex_Stats.htm
     '''
+    from BeautifulSoup import BeautifulSoup
     with open(demul_stats_htm, 'r') as f:
         soup = BeautifulSoup(f.read())
     table = soup.find("div", {"id" : "ScrollableTableBodyDiv"}).find("table")
@@ -333,8 +343,10 @@ def main():
     params = ap.parse_args()
 
     # Set dependent modules' settings
+    from django.template import Template, Context
+    from xhtml2pdf import pisa
     logging.basicConfig()
-    settings.configure()
+    register_template_filters()
 
     # Load template file
     t = Template(params.template.read())
@@ -15,11 +15,12 @@ Outputs:
 '''
 
 import argparse
-import numpy
 import sys
-from Bio import SeqIO
+from ngs.util import lazy_import
 #import jjinking.fnc.filesys as jfs
 
+numpy = lazy_import('numpy')
+
 # Platform to code mapping
 _PLATFORM_TYPE = {}
 _PLATFORM_TYPE['qual'] = 0 # Regular phred scores, no offset
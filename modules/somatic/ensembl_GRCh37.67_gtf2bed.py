@@ -2,17 +2,30 @@
 description = '''
 Convert Homo_sapiens.GRCh37.67.gtf downloaded from ensembl to bed file
 Select only exome regions
+
+If an output prefix is given, generate all the derived files in a single pass instead.
+The gene2transcript mapping lists the transcripts of all the chromosomes, including patches
+and haplotypes, and the other files those of the selected chromosomes:
+  outprefix.genes.bed                gene spans, named by gene
+  outprefix.transcripts.bed          transcript spans, named gene_transcript
+  outprefix.gene_transcripts.bed     merged exons of each transcript, named gene_transcript
+  outprefix.merged_transcripts.bed   merged exons of all the transcripts of each gene, named by gene
+  outprefix.transcripts.lengths.tsv  transcript, total length of its exons
+  outprefix.gene2transcript          gene_name, gene_id, transcript_id
 '''
 
 import argparse
 import sys
+from ngs import gtf
+
+REGULAR_CHROMS = frozenset([str(i) for i in range(1,23)] + ['X','Y','MT'])
 
 def in_chroms(chrom):
     '''
     Check to see if chrom is in the desired set of chromosomes
     '''
     # Check regular chromosomes
-    if chrom in [str(i) for i in range(1,23)] + ['X','Y','MT']:
+    if chrom in REGULAR_CHROMS:
         return True
 
     # Check super contigs
@@ -21,6 +34,32 @@ def in_chroms(chrom):
 
     return False
 
+def rename_chrom(seqname):
+    '''
+    Process chromosome name
+    '''
+    return seqname.split('.')[0].upper()
+
+def write_bed(records, filename):
+    with open(filename, 'w') as fo:
+        for r in records:
+            fo.write('%s\t%i\t%i\t%s\n' % r)
+
+def write_products(summary, outprefix):
+    '''
+    Output all the files derived from the gtf summary
+    '''
+    write_bed(summary.genes(), outprefix + '.genes.bed')
+    write_bed(summary.transcripts(), outprefix + '.transcripts.bed')
+    write_bed(summary.transcript_exons(), outprefix + '.gene_transcripts.bed')
+    write_bed(summary.gene_exons(), outprefix + '.merged_transcripts.bed')
+    with open(outprefix + '.transcripts.lengths.tsv', 'w') as fo:
+        for transcript, length in sorted(summary.transcript_lengths().iteritems()):
+            fo.write('%s\t%i\n' % (transcript, length))
+    with open(outprefix + '.gene2transcript', 'w') as fo:
+        for row in summary.gene2transcript():
+            fo.write('%s\n' % '\t'.join(row))
+
 def main():
     ap = argparse.ArgumentParser(description=description)
     ap.add_argument('input_gtf',
@@ -28,11 +67,32 @@ def main():
                     nargs='?',
                     type=argparse.FileType('r'),
                     default=sys.stdin)
+    ap.add_argument('-o', '--outprefix',
+                    help='Output prefix of the derived files',
+                    type=str)
+    ap.add_argument('-p', '--processes',
+                    help='Number of processes that parse the chromosomes in parallel, when the output prefix is set.  Input must be a file',
+                    type=int,
+                    default=1)
     params = ap.parse_args()
 
+    # Generate all derived files
+    if params.outprefix:
+        if params.processes > 1:
+            params.input_gtf.close()
+            summary = gtf.summarize_parallel(params.input_gtf.name,
+                                             processes=params.processes,
+                                             chrom_filter=in_chroms,
+                                             chrom_rename=rename_chrom)
+        else:
+            with params.input_gtf:
+                summary = gtf.GtfSummary(rename_chrom, in_chroms).scan(params.input_gtf)
+        write_products(summary, params.outprefix)
+        return
+
     for line in params.input_gtf:
         la = line.strip().split('\t')
-        
+
         seqname = la[0]
         source = la[1]
         feature = la[2]
@@ -48,7 +108,7 @@ def main():
             continue
 
         # Process chromosome name
-        chrom = seqname.split('.')[0].upper()
+        chrom = rename_chrom(seqname)
 
         # Process chromosome coords
         start = str(int(start) - 1)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+description = '''
+Update a persistent cohort store with the maf files of new samples, or remove samples from it,
+and output the cohort summaries of maf_summaries.py without re-reading the maf files of the
+samples already in the store.
+Samples are identified by Tumor_Sample_Barcode.
+Summaries are written to out_prefix.summary.pos.simple, out_prefix.summary.pos.detailed, and
+out_prefix.summary.gene.  Gene summary rows are sorted by gene.
+'''
+
+import argparse
+import sys
+from ngs import maf
+
+def main():
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('store_file',
+                    help='Cohort store file.  Created if it does not exist',
+                    type=str)
+    ap.add_argument('-a', '--add',
+                    help='Maf file of samples to add',
+                    nargs='+',
+                    default=[])
+    ap.add_argument('-r', '--remove',
+                    help='Tumor_Sample_Barcode of samples to remove',
+                    nargs='+',
+                    default=[])
+    ap.add_argument('--replace',
+                    help='Replace samples already in the store, instead of exiting with an error',
+                    action='store_true')
+    ap.add_argument('-o', '--out-prefix',
+                    help='Output the cohort summaries with this prefix',
+                    type=str)
+    ap.add_argument('-l', '--list',
+                    help='Output the samples in the store to stdout',
+                    action='store_true')
+    params = ap.parse_args()
+
+    store = maf.MafCohortStore.load(params.store_file)
+
+    try:
+        for sample in params.remove:
+            store.remove_sample(sample)
+        for maf_file in params.add:
+            with open(maf_file, 'r') as f:
+                samples = store.add_samples(f, replace=params.replace)
+            sys.stderr.write('%s\t%s\n' % (maf_file, ','.join(samples)))
+    except ValueError as e:
+        sys.stderr.write('%s\nExiting.\n\n' % e)
+        sys.exit(1)
+
+    if params.add or params.remove:
+        store.save(params.store_file)
+
+    if params.out_prefix:
+        with open('%s.summary.pos.simple' % params.out_prefix, 'w') as fout:
+            store.generate_pos_report(fout=fout, detailed=False)
+        with open('%s.summary.pos.detailed' % params.out_prefix, 'w') as fout:
+            store.generate_pos_report(fout=fout, detailed=True)
+        with open('%s.summary.gene' % params.out_prefix, 'w') as fout:
+            store.generate_gene_report(fout=fout)
+
+    if params.list:
+        for sample in store.samples.samples():
+            sys.stdout.write('%s\n' % sample)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+description = '''
+Benchmark the maf summaries on a synthetic cohort maf file.
+Generates a seeded maf with the given number of samples and mutated positions, where the number
+of samples carrying each mutation follows a heavy tailed distribution, as in tumor cohorts.
+Each summary is run in a separate process, and its time and peak memory increase are reported.
+The "sets" summary tracks the samples of each position with sets of sample names instead of
+bitmasks, for comparison.
+'''
+
+import argparse
+import os
+import sys
+from ngs import bench, maf
+
+def sets_pos_report(maf_file, fout):
+    '''
+    Positional report with sets of sample names per position
+    '''
+    poskey2samples = {}
+    with maf.MafFile(maf_file, 'r') as maffile:
+        for line in maffile:
+            maf_record = maffile.parse_line(line)
+            if maf_record['Hugo_Symbol'] == maf.MafFile.COLNAMES[0]:
+                continue
+            poskey = tuple([maf_record[k] for k in maf.POS_SIMPLE_COLUMNS])
+            poskey2samples.setdefault(poskey, set()).add(maf_record['Tumor_Sample_Barcode'])
+    for poskey, samples in sorted(poskey2samples.iteritems()):
+        fout.write('%s\t%i\t%s\n' % ('\t'.join(poskey), len(samples), ','.join(sorted(samples))))
+
+def run_summary(summary, maf_file):
+    with open(os.devnull, 'w') as fout:
+        if summary == 'sets':
+            sets_pos_report(maf_file, fout)
+            return
+        with maf.MafFile(maf_file, 'r') as maffile:
+            if summary == 'pos_simple':
+                maffile.generate_pos_report(fout=fout, detailed=False)
+            elif summary == 'pos_detailed':
+                maffile.generate_pos_report(fout=fout, detailed=True)
+            elif summary == 'gene':
+                maffile.generate_gene_report(fout=fout)
+
+def main():
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('-m', '--maf-file',
+                    help='Synthetic maf file to generate, or reuse if it exists',
+                    type=str,
+                    default='benchmark.maf')
+    ap.add_argument('-s', '--num-samples',
+                    help='Number of samples in the cohort',
+                    type=int,
+                    default=2000)
+    ap.add_argument('-n', '--num-positions',
+                    help='Number of mutated positions',
+                    type=int,
+                    default=300000)
+    ap.add_argument('--seed',
+                    help='Random seed',
+                    type=int,
+                    default=0)
+    ap.add_argument('-t', '--type',
+                    help='Summaries to benchmark',
+                    nargs='+',
+                    choices=['sets', 'pos_simple', 'pos_detailed', 'gene'],
+                    default=['sets', 'pos_simple', 'pos_detailed', 'gene'])
+    params = ap.parse_args()
+
+    if not os.path.exists(params.maf_file):
+        with open(params.maf_file, 'w') as fout:
+            bench.generate_maf(fout, params.num_samples, params.num_positions, params.seed)
+
+    sys.stdout.write('summary\tseconds\tmaxrss_increase_kb\n')
+    for summary in params.type:
+        m = bench.measure(run_summary, summary, params.maf_file)
+        if m.error is not None:
+            sys.stderr.write('%s summary failed: %s\nExiting.\n\n' % (summary, m.error))
+            sys.exit(1)
+        sys.stdout.write('%s\t%.2f\t%i\n' % (summary, m.seconds, m.rss_increase_kb))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
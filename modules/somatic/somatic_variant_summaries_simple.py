@@ -14,7 +14,7 @@ exclude the transcripts and report only on the gene.
 import argparse
 import re
 import sys
-from ngs import vcf
+from ngs import util, vcf
 
 REPORT_POS_COLNAMES=['chrom',
                      'pos',
@@ -85,6 +85,7 @@ def report_pos(sample_vcf, variant2rsid, outfilename, all_transcripts):
     '''
     variant_ext2annots = {}
     variant_ext2samples = {}
+    sample_index = util.SampleIndex()
     for s_v in sample_vcf:
         sampleid = s_v[0]
         vcffile = s_v[1]
@@ -93,7 +94,8 @@ def report_pos(sample_vcf, variant2rsid, outfilename, all_transcripts):
                                  vcffile,
                                  variant_ext2annots,
                                  variant_ext2samples,
-                                 all_transcripts)
+                                 all_transcripts,
+                                 sample_index)
 
     # Output results to file
     f = open(outfilename, 'w')
@@ -108,22 +110,26 @@ def report_pos(sample_vcf, variant2rsid, outfilename, all_transcripts):
             rsid = variant2rsid[variant]
 
         # Output records for each annotation for each variant_ext
+        samples = sample_index.names_of(variant_ext2samples[variant_ext])
         for annot in variant_ext2annots[variant_ext]:
             f.write('%s\n' % '\t'.join([variant_ext.replace(':','\t'),
                                         rsid,
                                         annot,
-                                        str(len(variant_ext2samples[variant_ext])),
-                                        ','.join(sorted(variant_ext2samples[variant_ext]))]))
+                                        str(len(samples)),
+                                        ','.join(samples)]))
     f.close()
 
 def report_pos_count_samples(sampleid,
                              vcfin,
                              variant_ext2annots,
                              variant_ext2samples,
-                             all_transcripts):
+                             all_transcripts,
+                             sample_index):
     '''
     Read through vcf file, and update counts for variant_ext
+    variant_ext2samples maps each variant_ext to the bitmask of its samples in sample_index
     '''
+    samplebit = sample_index.add(sampleid)
 
     with vcf.SnpEffVcfFile(vcfin, 'r') as vcffile:
 
@@ -174,9 +180,7 @@ def report_pos_count_samples(sampleid,
                                                                effect.gene,
                                                                effect.transcript,
                                                                effect.exon]))
-            if variant_ext not in variant_ext2samples:
-                variant_ext2samples[variant_ext] = set()
-            variant_ext2samples[variant_ext].add(sampleid)
+            variant_ext2samples[variant_ext] = variant_ext2samples.get(variant_ext, 0) | samplebit
 
 def increment_count(mapping, key, val):
     if key not in mapping:
@@ -3,6 +3,9 @@ description = '''
 Read in a vcf file outputted by SNPEff
 Parse and output the data in tcga maf format
 By default, every effect and transcript annotated per variant will be outputted as a row in the maf file.
+With --sample-list, the vcf files of all the samples in the list are converted by a pool of processes
+into a single cohort maf file, sorted by chromosome and position.  The lookup tables are loaded once,
+and shared with the worker processes.
 '''
 
 '''
@@ -32,10 +35,17 @@ De_novo_Start_OutOfFrame
 '''
 
 import argparse
+import heapq
+import multiprocessing
+import os
 import pickle
 import re
+import shutil
 import sys
-from ngs import vcf
+import tempfile
+from StringIO import StringIO
+from ngs import annotdb, ngsd, vcf
+from ngs.util import natural_chrom_key
 
 SOMATIC_CALLER = {'VARSCAN': 'varscan',
                   'GATK_SOMATIC_INDEL_DETECTOR': 'gatk_somatic_indel_detector'}
@@ -82,248 +92,390 @@ SNPEFF2TCGA = {'RARE_AMINO_ACID': 'Missense_Mutation',
                'CDS': 'Targeted_Region'}
 
 
-def load_gene2entrez(filename):
+def load_gene2entrez_lookup(filename, in_memory=False):
     '''
-    Given a filename, generate a mapping dict from gene2entrez
+    Given a gene2entrez mapping file or an annotation database, return the gene2entrez mapping
+    The annotation database is queried as needed, instead of being loaded to memory, unless
+    in_memory is set, or ngsd keeps the mapping loaded
     '''
-    gene2entrez = {}
-    g2e_fin = open(filename, 'r')
-    for line in g2e_fin:
-        la = line.strip('\n').split('\t')
-        gene = la[0]
-        entrezid = la[1]
-        if gene and entrezid:
-            gene2entrez[gene] = entrezid
-    g2e_fin.close()
-    return gene2entrez
+    gene2entrez = ngsd.warm_table('gene2entrez', filename)
+    if gene2entrez is not None:
+        return gene2entrez
+    if annotdb.is_annotdb(filename) and not in_memory:
+        return annotdb.AnnotDb(filename).lookup('gene2entrez')
+    return ngsd.load_table('gene2entrez', filename)
+
+# MAF output columns
+MAF_COLUMNS = ['Hugo_Symbol',
+               'Entrez_Gene_Id',
+               'Center',
+               'NCBI_Build',
+               'Chromosome',
+               'Start_position',
+               'End_position',
+               'Strand',
+               'Variant_Classification',
+               'Variant_Type',
+               'Reference_Allele',
+               'Tumor_Seq_Allele1',
+               'Tumor_Seq_Allele2',
+               'dbSNP_RS',
+               'dbSNP_Val_Status',
+               'Tumor_Sample_Barcode',
+               'Matched_Norm_Sample_Barcode',
+               'Match_Norm_Seq_Allele1',
+               'Match_Norm_Seq_Allele2',
+               'Tumor_Validation_Allele1',
+               'Tumor_Validation_Allele2',
+               'Match_Norm_Validation_Allele1',
+               'Match_Norm_Validation_Allele2',
+               'Verification_Status',
+               'Validation_Status',
+               'Mutation_Status',
+               'Sequencing_Phase',
+               'Sequence_Source',
+               'Validation_Method',
+               'Score',
+               'BAM_File',
+               'Sequencer',
+               'transcript_name',
+               'amino_acid_change']
+MAF_COLNUM = dict((colname, i) for i, colname in enumerate(MAF_COLUMNS))
+
+# MAF columns with the same value in every row
+MAF_CONSTANTS = {'Center': 'sequencing.center',
+                 'NCBI_Build': '37',
+                 'Strand': '+',
+                 'Sequence_Source': 'WES',
+                 'Sequencer': 'Illumina HiSeq'}
+
+# Number of maf rows buffered before they are written out
+OUTPUT_BUFFER_ROWS = 4096
+
+def maf_row_template(sampleid):
+    '''
+    Return a list of the maf columns of a sample, with the constant values filled in,
+    and the rest unavailable
+    '''
+    row = [''] * len(MAF_COLUMNS)
+    for colname, val in MAF_CONSTANTS.iteritems():
+        row[MAF_COLNUM[colname]] = val
+    row[MAF_COLNUM['Tumor_Sample_Barcode']] = sampleid
+    row[MAF_COLNUM['Matched_Norm_Sample_Barcode']] = sampleid
+    return row
 
-def parse_vcf(vcf_in,
-              sampleid,
-              gene2entrez,
-              fout,
-              highest_priority=False,
-              gene2transcript=None,
-              normal_sample='NORMAL',
-              tumor_sample='TUMOR',
-              tool=SOMATIC_CALLER['VARSCAN']):
+def write_maf_header(fout):
+    fout.write('%s\n' % '\t'.join(MAF_COLUMNS))
+
+def get_variant_type(ref, alt):
     '''
-    Read through the vcf file, and parse it.
-    Output the columns as defined by TCGA maf format
+    Return the maf variant type of a variant: SNP, DNP, TNP, ONP, INS, or DEL
+    '''
+    len_ref = len(ref)
+    len_alt = len(alt)
+    if len_ref == 1 and len_alt == 1:
+        return 'SNP'
+    if len_ref > len_alt:
+        return 'DEL'
+    if len_ref < len_alt:
+        return 'INS'
+    if len_ref == 2:
+        return 'DNP'
+    if len_ref == 3:
+        return 'TNP'
+    return 'ONP'
+
+def get_info_value(info_str, field):
+    '''
+    Return the value of a field=val pair in the info column, or None if it is not found
+    '''
+    prefix = field + '='
+    for field_str in info_str.split(';'):
+        if field_str.startswith(prefix):
+            return field_str[len(prefix):]
+    return None
+
+def genotype_alleles(gt, ref, alt):
+    '''
+    Sorted bases of the alleles of a GT value, for the two allele columns of a sample in the maf.
+    Phased and multi-allelic calls are decoded by vcf.genotype_bases, and the single allele of
+    a haploid call is used for both columns, i.e. 0|1 => [A, C], 1 => [C, C]
+    '''
+    alleles = vcf.genotype_bases(gt, ref, alt).split('/')
+    if len(alleles) == 1:
+        return alleles * 2
+    return alleles
+
+def convert_vcf(vcf_in,
+                sampleid,
+                gene2entrez,
+                fout,
+                highest_priority=False,
+                gene2transcript=None,
+                normal_sample='NORMAL',
+                tumor_sample='TUMOR',
+                tool=SOMATIC_CALLER['VARSCAN']):
     '''
-    # Output header line
-    fout.write('%s\n' % '\t'.join(['Hugo_Symbol',
-                                   'Entrez_Gene_Id',
-                                   'Center',
-                                   'NCBI_Build',
-                                   'Chromosome',
-                                   'Start_position',
-                                   'End_position',
-                                   'Strand',
-                                   'Variant_Classification',
-                                   'Variant_Type',
-                                   'Reference_Allele',
-                                   'Tumor_Seq_Allele1',
-                                   'Tumor_Seq_Allele2',
-                                   'dbSNP_RS',
-                                   'dbSNP_Val_Status',
-                                   'Tumor_Sample_Barcode',
-                                   'Matched_Norm_Sample_Barcode',
-                                   'Match_Norm_Seq_Allele1',
-                                   'Match_Norm_Seq_Allele2',
-                                   'Tumor_Validation_Allele1',
-                                   'Tumor_Validation_Allele2',
-                                   'Match_Norm_Validation_Allele1',
-                                   'Match_Norm_Validation_Allele2',
-                                   'Verification_Status',
-                                   'Validation_Status',
-                                   'Mutation_Status',
-                                   'Sequencing_Phase',
-                                   'Sequence_Source',
-                                   'Validation_Method',
-                                   'Score',
-                                   'BAM_File',
-                                   'Sequencer',
-                                   'transcript_name',
-                                   'amino_acid_change']))
+    Read through the vcf file, and output a maf row for each selected effect of each variant,
+    without the header line.
+    Each line is split once, only the NORMAL and TUMOR genotypes and the SS info field are
+    parsed, and the rows are filled in from a template of the constant columns
+    '''
+    template = maf_row_template(sampleid)
+    variant_colnums = [MAF_COLNUM[c] for c in ['Chromosome',
+                                               'Start_position',
+                                               'End_position',
+                                               'Variant_Type',
+                                               'Reference_Allele',
+                                               'Tumor_Seq_Allele1',
+                                               'Tumor_Seq_Allele2',
+                                               'dbSNP_RS',
+                                               'Match_Norm_Seq_Allele1',
+                                               'Match_Norm_Seq_Allele2',
+                                               'Mutation_Status']]
+    c_hugo = MAF_COLNUM['Hugo_Symbol']
+    c_entrez = MAF_COLNUM['Entrez_Gene_Id']
+    c_class = MAF_COLNUM['Variant_Classification']
+    c_transcript = MAF_COLNUM['transcript_name']
+    c_aa = MAF_COLNUM['amino_acid_change']
+
+    # (gene, transcript) => (gene column, entrez id)
+    gene_memo = {}
+    # FORMAT string => index of GT
+    format2gt_index = {}
+    buf = []
 
     with vcf.SnpEffVcfFile(vcf_in, 'r') as vcffile:
 
         # Skip to the variants section of the vcf file
         vcffile.jump2variants()
+        colname2colnum = dict((c, i) for i, c in enumerate(vcffile.column_names))
+        num_columns = len(vcffile.column_names)
+        c_info = colname2colnum['INFO']
+        c_format = colname2colnum['FORMAT']
+
+        # If GATK SomaticIndelDetector, then get the sample name by position
+        if tool == SOMATIC_CALLER['GATK_SOMATIC_INDEL_DETECTOR']:
+            sample_names = vcffile.get_sample_names()
+            normal_sample = sample_names[0]
+            tumor_sample = sample_names[1]
+        c_normal = colname2colnum[normal_sample]
+        c_tumor = colname2colnum[tumor_sample]
 
         # Read in the variant lines
         for line in vcffile:
-
-            # Get parsed variant data
-            variant = vcffile.parse_line(line)
-
-            # Parse the info column
-            info_map, info_single = vcffile.parse_info(variant)
+            la = line.split()
+            if len(la) != num_columns:
+                raise ValueError('This is not a variant line:\n\t%s\n' % line)
+            chrom, pos, variantid, ref, alt = la[:5]
+            variant = {'INFO': la[c_info]}
 
             # Control the number of transcript-effects to output for each variant
             # Select single highest priority
             if highest_priority:
                 effects = [vcffile.select_highest_priority_effect(variant)]
-#                 # Check if there were no effects
-#                 if effects[0] is None:
-#                    continue
             # Select gene_transcript with the most variants
             elif gene2transcript is not None:
-                selected_transcript_effects = vcffile.find_selected_transcript_effects(variant, gene2transcript)
-                # If non were found, continue
-                if not selected_transcript_effects:
+                effects = vcffile.find_selected_transcript_effects(variant, gene2transcript)[:1]
+                # If none were found, output the variant without an effect
+                if not effects:
                     effects = [None]
-                effects = [selected_transcript_effects[0]]
-                
             # By default, use all variants
             else:
                 effects = vcffile.parse_effects(variant)
-                
-            # Record columns
-            chrom = variant['CHROM']
-            pos = variant['POS']
-            variantid = variant['ID']
-            ref = variant['REF']
-            alt = variant['ALT']
+
+            # Sample genotypes
+            gt_index = format2gt_index.get(la[c_format])
+            if gt_index is None:
+                gt_index = la[c_format].split(':').index('GT')
+                format2gt_index[la[c_format]] = gt_index
+            normal_gt = genotype_alleles(la[c_normal].split(':')[gt_index], ref, alt)
+            tumor_gt = genotype_alleles(la[c_tumor].split(':')[gt_index], ref, alt)
+
+            # Variant columns
             if tool == SOMATIC_CALLER['VARSCAN']:
-                somatic_status = vcffile.SOMATIC_STATUS_CODE2TEXT[info_map['SS']]
+                somatic_status = vcffile.SOMATIC_STATUS_CODE2TEXT[get_info_value(la[c_info], 'SS')]
             else:
                 somatic_status = 'Somatic'
-
-            # Variant type
-            variant_type = 'SNP'
-            len_ref = len(ref)
-            len_alt = len(alt)
-            if len_ref > 1 or len_alt > 1:
-                if len_ref > len_alt:
-                    variant_type = 'DEL'
-                elif len_ref < len_alt:
-                    variant_type = 'INS'
-                else: # len_ref == len_alt
-                    if len_ref == 2:
-                        variant_type = 'DNP'
-                    elif len_ref == 3:
-                        variant_type = 'TNP'
-                    else:
-                        variant_type = 'ONP'
-
-            # Rsid
-            if variantid[0:2] != 'rs':
-                variantid = 'novel'
-
-            # Sample genotypes
-            # If GATK SomaticIndelDetector, then get the sample name by position
-            if tool == SOMATIC_CALLER['GATK_SOMATIC_INDEL_DETECTOR']:
-                sample_names = vcffile.get_sample_names()
-                normal_sample = sample_names[0]
-                tumor_sample = sample_names[1]
-            normal_gt = vcffile.get_sample_gt(variant, normal_sample).split('/')
-            tumor_gt = vcffile.get_sample_gt(variant, tumor_sample).split('/')
+            variant_row = template[:]
+            for colnum, val in zip(variant_colnums, [chrom,
+                                                     pos,
+                                                     str(int(pos) + len(ref) - 1),
+                                                     get_variant_type(ref, alt),
+                                                     ref,
+                                                     tumor_gt[0],
+                                                     tumor_gt[1],
+                                                     variantid if variantid[0:2] == 'rs' else 'novel',
+                                                     normal_gt[0],
+                                                     normal_gt[1],
+                                                     somatic_status]):
+                variant_row[colnum] = val
 
             # Iterate over the effects
             for effect in effects:
-
-#                 # If gene or transcript name is not found, skip
-#                 if not effect.gene or not effect.transcript:
-#                     continue
-
-#                 # If gene name contains a '.', skip
-#                 if re.search(r'\.', effect.gene):
-#                     continue
-
-#                 # If transcript name contains a '.', skip
-#                 if re.search(r'\.', effect.transcript):
-#                     continue
-
-                # If aa change, add 'p.'
-                aa_change = ''
-                if effect is not None:
-                    aa_change = effect.aa_change
-                    if aa_change:
-                        aa_change = 'p.' + aa_change
-
-                # Set up entrez id
-                entrez_id = ''
-                if effect is not None:
-                    if effect.gene in gene2entrez:
-                        entrez_id = gene2entrez[effect.gene]
-                
-
-                # Frame shift - determine whether insertion or deletion
-                effect_val = ''
+                row = variant_row[:]
                 if effect is not None:
+                    key = (effect.gene, effect.transcript)
+                    gene_vals = gene_memo.get(key)
+                    if gene_vals is None:
+                        gene_col_val = effect.gene if highest_priority else '_'.join(key)
+                        gene_vals = (gene_col_val, gene2entrez[effect.gene] if effect.gene in gene2entrez else '')
+                        gene_memo[key] = gene_vals
+                    row[c_hugo], row[c_entrez] = gene_vals
+
+                    # Frame shift - determine whether insertion or deletion
                     effect_val = effect.effect
                     if effect_val == 'FRAME_SHIFT':
                         if len(ref) < len(alt):
                             effect_val = 'FRAME_SHIFT_INS'
                         else:
                             effect_val = 'FRAME_SHIFT_DEL'
+                    row[c_class] = SNPEFF2TCGA.get(effect_val, '')
+                    row[c_transcript] = effect.transcript
+                    if effect.aa_change:
+                        row[c_aa] = 'p.' + effect.aa_change
+                buf.append('\t'.join(row))
+
+            if len(buf) >= OUTPUT_BUFFER_ROWS:
+                fout.write('\n'.join(buf) + '\n')
+                buf = []
+    if buf:
+        fout.write('\n'.join(buf) + '\n')
 
-                # Variant class
-                var_class = ''
-                if effect_val in SNPEFF2TCGA:
-                    var_class = SNPEFF2TCGA[effect_val]
+def parse_vcf(vcf_in,
+              sampleid,
+              gene2entrez,
+              fout,
+              highest_priority=False,
+              gene2transcript=None,
+              normal_sample='NORMAL',
+              tumor_sample='TUMOR',
+              tool=SOMATIC_CALLER['VARSCAN']):
+    '''
+    Read through the vcf file, and parse it.
+    Output the columns as defined by TCGA maf format
+    '''
+    write_maf_header(fout)
+    convert_vcf(vcf_in, sampleid, gene2entrez, fout,
+                highest_priority=highest_priority,
+                gene2transcript=gene2transcript,
+                normal_sample=normal_sample,
+                tumor_sample=tumor_sample,
+                tool=tool)
+
+def load_sample_list(fin):
+    '''
+    Given a file input handle to a file in the format:
+    Sample, Vcf file
+    Load the data and return a list of tuples for each row
+    '''
+    sample_vcf = []
+    for line in fin:
+        la = line.strip().split('\t')
+        if len(la) < 2:
+            continue
+        sample_vcf.append((la[0], la[1]))
+    return sample_vcf
+
+def load_single_transcript(filename):
+    '''
+    Load the gene => selected transcript mapping pickle, or return None if no file is given
+    '''
+    if not filename:
+        return None
+    with open(filename, 'rb') as f:
+        return pickle.load(f)
 
-                # Gene name column
-                gene_col_val = ''
-                if effect is not None:
-                    gene_col_val = '_'.join([effect.gene, effect.transcript])
-                    if highest_priority:
-                        gene_col_val = effect.gene
-                # elif single_transcript:
-                #    gene_col_val = '_'.join([effect.gene, effect.transcript])
+def maf_sort_key(line):
+    '''
+    Sort key of a maf row: chromosome, start, and end position
+    '''
+    la = line.split('\t', 7)
+    return (natural_chrom_key(la[MAF_COLNUM['Chromosome']]),
+            int(la[MAF_COLNUM['Start_position']]),
+            int(la[MAF_COLNUM['End_position']]))
 
-                transcrpt = ''
-                if effect is not None:
-                    transcrpt = effect.transcript
-
-                # Output to standard output
-                UNAVAILABLE=''
-                fout.write('%s\n' % '\t'.join([gene_col_val,
-                                               entrez_id,
-                                               'sequencing.center',
-                                               '37',
-                                               chrom,
-                                               pos,
-                                               str(int(pos) + len(ref) - 1),
-                                               '+',
-                                               var_class,
-                                               variant_type,
-                                               ref,
-                                               tumor_gt[0],
-                                               tumor_gt[1],
-                                               variantid,
-                                               UNAVAILABLE,
-                                               sampleid,
-                                               sampleid,
-                                               normal_gt[0],
-                                               normal_gt[1],
-                                               UNAVAILABLE,
-                                               UNAVAILABLE,
-                                               UNAVAILABLE,
-                                               UNAVAILABLE,
-                                               UNAVAILABLE,
-                                               UNAVAILABLE,
-                                               somatic_status,
-                                               UNAVAILABLE,
-                                               'WES',
-                                               UNAVAILABLE,
-                                               UNAVAILABLE,
-                                               UNAVAILABLE,
-                                               'Illumina HiSeq',
-                                               transcrpt,
-                                               aa_change]))
+def generate_keyed_rows(maf_fin, fileindex):
+    '''
+    Generate tuples (sort key, file index, line) for each row of a sorted headerless maf file
+    '''
+    for line in maf_fin:
+        yield maf_sort_key(line), fileindex, line
+
+# Lookups and options shared with the worker processes of convert_samples.  They are set in
+# the parent process before the pool is created, and inherited copy-on-write by the forked workers
+_worker_state = {}
+
+def _convert_sample_worker(args):
+    '''
+    Worker function for convert_samples
+    Convert the vcf file of a sample to a sorted headerless maf file, and return the maf filename
+    '''
+    sampleid, vcf_file, maf_file = args
+    buf = StringIO()
+    convert_vcf(vcf_file,
+                sampleid,
+                _worker_state['gene2entrez'],
+                buf,
+                gene2transcript=_worker_state['gene2transcript'],
+                **_worker_state['options'])
+    rows = buf.getvalue().splitlines(True)
+    buf.close()
+    rows.sort(key=maf_sort_key)
+    with open(maf_file, 'w') as fout:
+        fout.writelines(rows)
+    return maf_file
+
+def convert_samples(sample_vcf, gene2entrez, fout, gene2transcript=None, processes=None, **options):
+    '''
+    Convert the vcf files of a list of (sample, vcf file) with a pool of processes, and write
+    a single maf file sorted by chromosome and position, with the rows of a position in sample
+    list order.
+    gene2entrez and gene2transcript must be in-memory mappings, which are inherited by the
+    worker processes.  options are passed to convert_vcf
+    '''
+    _worker_state['gene2entrez'] = gene2entrez
+    _worker_state['gene2transcript'] = gene2transcript
+    _worker_state['options'] = options
+
+    write_maf_header(fout)
+    tmpdir = tempfile.mkdtemp(prefix='vcf2maf.')
+    try:
+        pool = multiprocessing.Pool(processes)
+        try:
+            tasks = [(sampleid, vcf_file, os.path.join(tmpdir, '%d.maf' % i))
+                     for i, (sampleid, vcf_file) in enumerate(sample_vcf)]
+            maf_files = pool.map(_convert_sample_worker, tasks, chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _worker_state.clear()
+
+        # Merge the sorted maf files of the samples
+        maf_fins = [open(f, 'r') for f in maf_files]
+        keyed_rows = [generate_keyed_rows(f, i) for i, f in enumerate(maf_fins)]
+        for key, fileindex, line in heapq.merge(*keyed_rows):
+            fout.write(line)
+        for f in maf_fins:
+            f.close()
+    finally:
+        shutil.rmtree(tmpdir)
 
 def main():
     ap = argparse.ArgumentParser(description=description)
     ap.add_argument('vcf_file',
-                    help='Input vcf file',
+                    help='Input vcf file.  Omitted with --sample-list',
+                    nargs='?',
                     type=str)
     ap.add_argument('sample_id',
-                    help='Name of sample for whom the vcf file pertains to, to be outputted in the maf file',
+                    help='Name of sample for whom the vcf file pertains to, to be outputted in the maf file.  Omitted with --sample-list',
+                    nargs='?',
                     type=str)
     ap.add_argument('gene2entrez',
-                    help='File containing gene2entrezid mapping',
+                    help='File containing gene2entrezid mapping, or annotation database created by sqlite_load_ensemble_gene2transcript.py',
                     type=str)
     ap.add_argument('-e', '--highest-priority-effect',
                     help='If this flag is set, the highest-priority effect transcript will be selected from each variant annotation',
@@ -352,6 +504,12 @@ def main():
                     help='Indicate what tool was used to call the somatic variants',
                     choices=SOMATIC_CALLER.values(),
                     default=SOMATIC_CALLER['VARSCAN'])
+    ap.add_argument('-m', '--sample-list',
+                    help='Tab-separated manifest of sample, vcf file lines.  All the samples are converted, in parallel, to a single sorted maf file',
+                    type=argparse.FileType('r'))
+    ap.add_argument('-p', '--processes',
+                    help='Number of processes to use with --sample-list.  Default all cores',
+                    type=int)
     ap.add_argument('-o', '--outfile',
                     help='Output result file',
                     type=argparse.FileType('w'),
@@ -372,26 +530,44 @@ def main():
 #        with open(params.transcript_lengths, 'r') as f:
 #            trs2len = util.xml2dict(f.read())
 
+    # Check usage
+    if params.sample_list is not None:
+        if params.vcf_file is not None:
+            ap.error('vcf_file and sample_id are not used with --sample-list')
+    elif params.vcf_file is None or params.sample_id is None:
+        ap.error('vcf_file and sample_id are required without --sample-list')
+
+    options = {'highest_priority': params.highest_priority_effect,
+               'normal_sample': params.normal,
+               'tumor_sample': params.tumor,
+               'tool': params.somatic_caller}
+
+    # Generate maf of all the samples in the list
+    if params.sample_list is not None:
+        with params.sample_list:
+            sample_vcf = load_sample_list(params.sample_list)
+        convert_samples(sample_vcf,
+                        load_gene2entrez_lookup(params.gene2entrez, in_memory=True),
+                        params.outfile,
+                        gene2transcript=load_single_transcript(params.single_transcript),
+                        processes=params.processes,
+                        **options)
+        params.outfile.close()
+        return
+
     # If single transcript has been selected for each gene, read in the gene2transcript mapping
-    g2t = None
-    if params.single_transcript:
-        with open(params.single_transcript, 'rb') as f:
-            g2t = pickle.load(f)
+    g2t = load_single_transcript(params.single_transcript)
 
     # Load gene2entrez id mapping
-    gene2entrez = load_gene2entrez(params.gene2entrez)
+    gene2entrez = load_gene2entrez_lookup(params.gene2entrez)
 
     # Generate maf
     parse_vcf(params.vcf_file,
               params.sample_id,
               gene2entrez,
               params.outfile,
-              highest_priority=params.highest_priority_effect,
               gene2transcript=g2t,
-              normal_sample=params.normal,
-              tumor_sample=params.tumor,
-              tool=params.somatic_caller)
-
+              **options)
 
 if __name__ == '__main__':
     main()
@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 description = '''
-Given 2 vcf files, concatenate the variant rows together.
-This tool assumes that the headers of the 2 vcf files are the same, so it will use the
-header from the first vcf file as the output vcf header.
+Given any number of vcf files sorted by position, merge the variant rows together into a single
+sorted vcf file.
+The meta lines of all the vcf files are merged, and the column header line of the first vcf file
+is used as the output column header line.  All the vcf files must have the same columns.
+Records are ordered by the contig order in the meta lines, then by position.
 '''
 
 import argparse
+import heapq
 import sys
+from ngs import filesys
+from ngs.util import natural_chrom_key
 
 def build_sampleinfo_field2indx(field_str):
     '''
@@ -48,58 +53,132 @@ def build_info_field2val(field_str):
             field2val[pa[0]] = pa[1]
     return field2val
 
-def convert_allele2bases(allele_str, ref, alt):
+def read_vcf_header(vcf_fin):
     '''
-    Given an allele string i.e. 0/0, 0/1, 1/1, convert to genotype string i.e. A/A, C/G
+    Read in the meta lines and the column header line of a vcf file.
+    The file iterator will be positioned at the first variant line
+    Return the list of meta lines and the header line
     '''
-    alleles = allele_str.split('/')
-    bases = []
-    for a in alleles:
-        if a == '0':
-            bases.append(ref)
-        elif a == '1':
-            bases.append(alt)
-        elif a == '.':
-            bases.append('N')
-        else:
-            sys.stderr.write('Could not recognize allele %s\nExiting\n\n' % allele_str)
+    meta_lines = []
+    for line in vcf_fin:
+        if line[0:2] == '##':
+            meta_lines.append(line)
+            continue
+        if line[0] == '#':
+            return meta_lines, line
+        break
+    sys.stderr.write('Could not find the header line in %s\nExiting\n\n' % vcf_fin.name)
+    sys.exit(1)
+
+def merge_meta_lines(metalists):
+    '''
+    Take the union of several lists of meta lines, keeping the order in which they first appear
+    The fileformat line is always placed first
+    Return the merged list of meta lines and a mapping of contig id to its rank in the headers
+    '''
+    merged = []
+    seen = set()
+    contig2rank = {}
+    for meta_lines in metalists:
+        for line in meta_lines:
+            if line in seen:
+                continue
+            seen.add(line)
+            if line.startswith('##fileformat='):
+                merged.insert(0, line)
+            else:
+                merged.append(line)
+            # Contig order is set by the order of appearance of the contig meta lines
+            if line.startswith('##contig=<'):
+                fields = build_info_field2val(line.strip()[len('##contig=<'):-1].replace(',', ';'))
+                if 'ID' in fields and fields['ID'] not in contig2rank:
+                    contig2rank[fields['ID']] = len(contig2rank)
+    return merged, contig2rank
+
+def generate_keyed_records(vcf_fin, fileindex, contig2rank):
+    '''
+    Generate tuples (sort key, file index, line) for each variant line in the vcf file
+    Sort key is composed of the contig rank described in the headers and the position.
+    Contigs that are not described in the headers are placed after those that are, in
+    natural chromosome order
+    '''
+    chrom2key = {}
+    prev_key = None
+    for line in vcf_fin:
+        chrom, pos = line.split('\t', 2)[:2]
+        if chrom not in chrom2key:
+            if chrom in contig2rank:
+                chrom2key[chrom] = (0, contig2rank[chrom], 0, '')
+            else:
+                chrom2key[chrom] = (1,) + natural_chrom_key(chrom)
+        key = (chrom2key[chrom], int(pos))
+        if prev_key is not None and key < prev_key:
+            sys.stderr.write('Vcf file %s is not sorted at %s:%s\nExiting\n\n' % (vcf_fin.name, chrom, pos))
             sys.exit(1)
-    return '/'.join(bases)
+        prev_key = key
+        yield key, fileindex, line
 
-def cat_vcf(vcf1_fin, vcf2_fin):
+def cat_vcf(vcf_fins, fout=sys.stdout, dedup=False):
     '''
-    Read in 2 vcf files and concatenate
+    Merge any number of sorted vcf files into a single sorted vcf file.
+    Meta lines of all the files are merged, and records are merged in
+    (contig order, position) order with a heap, so only one record per input file
+    is held in memory at a time.
+    If dedup is set to True, identical records are output only once
     '''
+    # Read in the headers of all the files
+    metalists = []
+    header_line = None
+    for vcf_fin in vcf_fins:
+        meta_lines, _header_line = read_vcf_header(vcf_fin)
+        metalists.append(meta_lines)
+        if header_line is None:
+            header_line = _header_line
+        elif _header_line.split() != header_line.split():
+            sys.stderr.write('Column headers of %s do not match\nExiting\n\n' % vcf_fin.name)
+            sys.exit(1)
 
-    # Output all of vcf1
-    for line in vcf1_fin:
-        sys.stdout.write(line)
+    # Output the merged headers
+    meta_lines, contig2rank = merge_meta_lines(metalists)
+    fout.write(''.join(meta_lines))
+    fout.write(header_line)
 
-    # Output vcf2, skipping the headers
-    for line in vcf2_fin:
-        # Headers
-        if line[0] == '#':
-            continue
-        sys.stdout.write(line)
+    # Merge the records
+    keyed_records = [generate_keyed_records(vcf_fin, i, contig2rank) for i,vcf_fin in enumerate(vcf_fins)]
+    current_key = None
+    current_lines = set()
+    for key, fileindex, line in heapq.merge(*keyed_records):
+        if dedup:
+            # Only identical records at the same position need to be remembered
+            if key != current_key:
+                current_key = key
+                current_lines = set()
+            if line in current_lines:
+                continue
+            current_lines.add(line)
+        fout.write(line)
 
 def main():
     ap = argparse.ArgumentParser(description=description)
-    ap.add_argument('vcf_file1',
-                    help='Input vcf file',
-                    nargs='?',
-                    type=argparse.FileType('r'),
-                    default=sys.stdin)
-    ap.add_argument('vcf_file2',
-                    help='Input vcf file',
-                    nargs='?',
-                    type=argparse.FileType('r'),
-                    default=sys.stdin)
+    ap.add_argument('vcf_files',
+                    help='Input vcf files, sorted by position',
+                    nargs='+',
+                    type=str)
+    ap.add_argument('-d', '--dedup',
+                    help='Output identical records only once',
+                    action='store_true')
     params = ap.parse_args()
-    
-    # Generate maf
-    cat_vcf(params.vcf_file1, params.vcf_file2)
-    params.vcf_file1.close()
-    params.vcf_file2.close()
+
+    # Merge the vcf files
+    vcf_fins = []
+    for vcf_file in params.vcf_files:
+        vcf_fin = filesys.get_file_read_handle(vcf_file)
+        if not vcf_fin:
+            ap.error('Could not open %s' % vcf_file)
+        vcf_fins.append(vcf_fin)
+    cat_vcf(vcf_fins, dedup=params.dedup)
+    for vcf_fin in vcf_fins:
+        vcf_fin.close()
 
 
 if __name__ == '__main__':
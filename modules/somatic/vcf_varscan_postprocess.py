@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+description = '''
+Post-process VarScan vcf output in a single pass, running the steps of
+vcf_varscan_clean_indel.py, vcf_somatic_filter.py, and
+vcf_varscan_snpeff_indel_insert_format_field.py in that order, without intermediate files.
+Only the selected steps are run.
+'''
+
+import argparse
+import functools
+import sys
+from ngs import vcf
+
+
+def main():
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('vcf_file',
+                    help='Input vcf file',
+                    nargs='?',
+                    type=argparse.FileType('r'),
+                    default=sys.stdin)
+    ap.add_argument('--clean-indel',
+                    help='Remove + and - signs in front of the indel alternate alleles',
+                    action='store_true')
+    ap.add_argument('-p', '--program',
+                    help='Name of somatic variant caller used to generate vcf. VarScan (default) | SomaticSniper',
+                    choices=['varscan','ssniper'],
+                    default='varscan')
+    ap.add_argument('-t', '--type',
+                    help='Filter type: wildtype | germline | LOH | somatic | unknown',
+                    choices=['somatic','wildtype','germline','LOH','unknown'])
+    ap.add_argument('--min-dp-tumor',
+                    help='Select variants where the depth of tumor is >= this value',
+                    type=int)
+    ap.add_argument('--min-dp-normal',
+                    help='Select variants where the depth of normal is >= this value',
+                    type=int)
+    ap.add_argument('--somatic-p-val',
+                    help='Select variants with somatic p-value less than or equal to this value. Input must be VarScan output',
+                    type=float)
+    ap.add_argument('--insert-format-field',
+                    help='Insert the FORMAT field %s missing from VarScan snpEff indel records' % vcf.VARSCAN_FORMAT_FIELD,
+                    action='store_true')
+    ap.add_argument('-o', '--outfile',
+                    help='Output results file',
+                    type=argparse.FileType('w'),
+                    default=sys.stdout)
+    params = ap.parse_args()
+
+    # Build the chain of stages
+    stages = []
+    if params.clean_indel:
+        stages.append(vcf.varscan_clean_indel)
+    if params.type or params.min_dp_tumor or params.min_dp_normal or params.somatic_p_val:
+        stages.append(functools.partial(vcf.somatic_filter,
+                                        program=params.program,
+                                        somatic_type=params.type,
+                                        min_dp_tumor=params.min_dp_tumor,
+                                        min_dp_normal=params.min_dp_normal,
+                                        somatic_p_val=params.somatic_p_val))
+    if params.insert_format_field:
+        stages.append(vcf.insert_format_field)
+
+    try:
+        vcf.run_stages(params.vcf_file, params.outfile, stages)
+    except ValueError as e:
+        sys.stderr.write('%s\nExiting.\n\n' % e)
+        sys.exit(1)
+
+    params.outfile.close()
+    params.vcf_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+description = '''
+Intersect the records of a vcf, maf, or bed file with the regions of interest in a bed file,
+outputting the records that overlap at least one region (similar to bedtools intersect -u).
+Header lines are passed through.
+The regions are loaded into an in-memory interval index, so no external tools are needed.
+'''
+
+import argparse
+import sys
+from ngs import bed, maf
+
+# Column indexes in the maf format
+MAF_CHROM_COL = maf.MafFile.COLNAMES.index('Chromosome')
+MAF_START_COL = maf.MafFile.COLNAMES.index('Start_position')
+MAF_END_COL = maf.MafFile.COLNAMES.index('End_position')
+
+def vcf_record_region(line):
+    '''
+    Return the 0-based half-open region spanned by the reference allele of a vcf record
+    Return None for header lines
+    '''
+    if line[0] == '#':
+        return None
+    la = line.split('\t', 4)
+    start = int(la[1]) - 1
+    return la[0], start, start + len(la[3])
+
+def maf_record_region(line):
+    '''
+    Return the 0-based half-open region of a maf record
+    Return None for header lines
+    '''
+    if line[0] == '#' or line.startswith(maf.MafFile.COLNAMES[0]):
+        return None
+    la = line.split('\t', MAF_END_COL + 1)
+    return la[MAF_CHROM_COL], int(la[MAF_START_COL]) - 1, int(la[MAF_END_COL])
+
+def bed_record_region(line):
+    '''
+    Return the region of a bed record
+    Return None for header lines
+    '''
+    if not bed.is_bed_line(line):
+        return None
+    return bed.parse_line(line)[:3]
+
+FORMAT2REGION = {'vcf': vcf_record_region,
+                 'maf': maf_record_region,
+                 'bed': bed_record_region}
+
+def guess_format(filename):
+    '''
+    Guess the format of the records file from the filename extension
+    '''
+    for ext in ('vcf', 'maf'):
+        if filename.endswith('.' + ext) or filename.endswith('.%s.gz' % ext):
+            return ext
+    return 'bed'
+
+def intersect(fin, index, record_region, fout=sys.stdout, invert=False):
+    '''
+    Output the records in fin that overlap a region in the interval index.
+    If invert is set to True, output the records that do not overlap any region
+    '''
+    for line in fin:
+        region = record_region(line)
+        if region is None:
+            fout.write(line)
+            continue
+        if index.overlaps(*region) != invert:
+            fout.write(line)
+
+def main():
+    # Set up parameter options
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('records_file',
+                    help='Input vcf, maf, or bed file',
+                    nargs='?',
+                    type=argparse.FileType('r'),
+                    default=sys.stdin)
+    ap.add_argument('-b', '--roi',
+                    help='Regions of interest bed file',
+                    type=argparse.FileType('r'),
+                    required=True)
+    ap.add_argument('-f', '--format',
+                    help='Format of the records file. Guessed from the filename extension if not set',
+                    choices=['vcf', 'maf', 'bed'])
+    ap.add_argument('-v', '--invert',
+                    help='Output the records that do not overlap any region',
+                    action='store_true')
+    params = ap.parse_args()
+
+    file_format = params.format
+    if file_format is None:
+        file_format = guess_format(params.records_file.name)
+
+    # Load the regions of interest
+    with params.roi:
+        index = bed.IntervalIndex.from_bed(params.roi).merge()
+
+    # Intersect
+    with params.records_file:
+        intersect(params.records_file, index, FORMAT2REGION[file_format], invert=params.invert)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,54 @@
 #!/usr/bin/env python
 description = '''
-Read in a bed file, and create a file for every single line in the bed file.
+Read in a bed file, and create a file for each gene in the bed file, containing all the lines
+for that gene.
 Name the file according to the 4th column of the bed file, which is usually
 the gene name.
+Alternatively, write all the genes' lines grouped together into a single consolidated bed file,
+along with an index file (consolidated file name + .idx) listing the gene, byte offset, and byte
+length of each gene's lines, so that per-gene jobs can seek directly to their gene.
 '''
 
 import argparse
 import os
 import sys
+from collections import OrderedDict
+from ngs import bed
+
+def group_lines_by_gene(fin):
+    '''
+    Read in the bed file and group the lines by the 4th column, in order of first appearance
+    '''
+    gene2lines = OrderedDict()
+    for line in fin:
+        cols = line.strip().split('\t')
+        gene2lines.setdefault(cols[3], []).append(line)
+    return gene2lines
+
+def write_gene_files(gene2lines, outputdir):
+    '''
+    Write each gene's lines to its own file, with a single write per gene
+    '''
+    for gene, lines in gene2lines.iteritems():
+        with open(os.path.join(outputdir, gene), 'w') as fo:
+            fo.write(''.join(lines))
+
+def write_consolidated(gene2lines, fout, fidx):
+    '''
+    Write all the genes' lines grouped by gene to fout, and write the gene, offset, and
+    length of each group to the index file fidx
+    '''
+    offset = 0
+    for gene, lines in gene2lines.iteritems():
+        data = ''.join(lines)
+        fout.write(data)
+        fidx.write('%s\t%i\t%i\n' % (gene, offset, len(data)))
+        offset += len(data)
 
 def main():
     # Set up cli argument options
     ap = argparse.ArgumentParser(description=description)
-    ap.add_argument('bed_file', 
+    ap.add_argument('bed_file',
                     help='Input bed file',
                     nargs='?',
                     type=argparse.FileType('r'),
@@ -21,19 +57,28 @@ def main():
                     help='Output directory',
                     type=str,
                     default='.')
+    ap.add_argument('-c', '--consolidated',
+                    help='Write a single consolidated bed file with this name, plus its index file, ' +
+                    'instead of a file per gene',
+                    type=str)
     params = ap.parse_args()
 
     # Create directory if it doesn't exist
     if not os.path.isdir(params.outputdir):
         os.makedirs(params.outputdir)
 
-    # Read bed file and create individual files for each line
+    # Read bed file and group lines by gene
     with params.bed_file:
-        for line in params.bed_file:
-            cols = line.strip().split('\t')
-            outfile_name = cols[3]
-            with open(os.path.join(params.outputdir, outfile_name), 'a') as fo:
-                fo.write(line)
+        gene2lines = group_lines_by_gene(params.bed_file)
+
+    # Output
+    if params.consolidated:
+        outfile = os.path.join(params.outputdir, params.consolidated)
+        with open(outfile, 'w') as fo:
+            with open(outfile + bed.GROUP_INDEX_EXT, 'w') as fi:
+                write_consolidated(gene2lines, fo, fi)
+    else:
+        write_gene_files(gene2lines, params.outputdir)
 
 
 if __name__ == '__main__':
@@ -17,7 +17,7 @@ import argparse
 import pickle
 import sys
 from collections import defaultdict
-from ngs import util
+from ngs import bed, util
 
 def main():
     # Set up parameter options
@@ -35,9 +35,8 @@ def main():
 
     g2l = defaultdict(int)
     with params.bedfile as f:
-        for line in f:
-            la = line.strip().split()
-            g2l[la[3]] += int(la[2]) - int(la[1])
+        for rec in bed.read_bed(f):
+            g2l[rec.name] += rec.end - rec.start
 
     # Output results
     if params.out_format == 'tsv':
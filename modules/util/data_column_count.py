@@ -6,26 +6,18 @@ Read in a file, and generate a report on the number of columns in each line
 
 import argparse
 import sys
+from ngs import tabular
 
 def count_columns(fi):
     '''
     Read through each row of the file input stream, and count
-    the number of columns.
+    the number of columns.  Blank lines are skipped.
     '''
-    colcount2freq = {}
-    colcount2linenum = {}
-    i = 0
-    for line in fi:
-        i += 1
-        colcount = len(line.strip('\n').split('\t'))
-        if colcount not in colcount2freq:
-            colcount2freq[colcount] = 0
-        colcount2freq[colcount] += 1
-        if colcount not in colcount2linenum:
-            colcount2linenum[colcount] = set()
-        
-        if len(colcount2linenum[colcount]) < 3:
-            colcount2linenum[colcount].add(i)
+    scanner = tabular.TabularScanner(count_columns=True)
+    scanner.scan(fi)
+    colcount2freq = scanner.colcount2freq
+    colcount2linenum = scanner.colcount2linenums
+    i = scanner.line_count - scanner.blank_count
 
     # Check if line count is unique
     colcounts = sorted(colcount2freq.keys(), key=lambda x: colcount2freq[x], reverse=True)
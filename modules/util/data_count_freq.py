@@ -7,6 +7,7 @@ Output the column values and their counts to standard output
 
 import argparse
 import sys
+from ngs import tabular
 
 def main():
     ap = argparse.ArgumentParser(description=description)
@@ -22,13 +23,9 @@ def main():
     params = ap.parse_args()
 
     # Read through data file and count the occurrences of the column vals
-    val2freq = {}
-    for line in params.file:
-        la = line.strip().split('\t')
-        val = la[params.column]
-        if val not in val2freq:
-            val2freq[val] = 0
-        val2freq[val] += 1
+    scanner = tabular.TabularScanner(freq_columns=[params.column])
+    scanner.scan(params.file)
+    val2freq = scanner.freqs[params.column]
     params.file.close()
 
     # Print to standard output
@@ -6,6 +6,10 @@ records to standard output
 
 import argparse
 import sys
+from ngs import tabular
+from ngs.util import lazy_import
+
+np = lazy_import('numpy')
 
 def is_greater_than(left_param, right_param):
     return left_param > right_param
@@ -23,12 +27,13 @@ def is_equal(left_param, right_param):
     return left_param == right_param
 
 def is_true(left_param, right_param):
-    return True
+    return np.ones(len(left_param), dtype=bool)
 
 def filter_data(fin, column,
                 greater_than=None,
                 less_than=None,
-                equal_to=None):
+                equal_to=None,
+                chunk_size=tabular.DEFAULT_CHUNK_SIZE):
     '''
     Filter the records (rows) in the input stream fin
     '''
@@ -52,19 +57,20 @@ def filter_data(fin, column,
         comparison_op = is_equal
         comparison_val = equal_to
 
-    # Read through the file records/rows
+    # Read through the file records/rows in chunks, comparing a whole column array at a time
     line_number = 1
-    for line in fin:
-        line_stripped = line.strip('\n')
-        if line_stripped:
-            la = line_stripped.split('\t')
-            try:
-                val = float(la[column])
-                if comparison_op(val, comparison_val):
-                    sys.stdout.write(line)
-            except ValueError:
-                sys.stderr.write('Warning: Non-numeric value in line %i\n%s\n' % (line_number, line))
-        line_number += 1
+    for lines in tabular.read_chunks(fin, chunk_size):
+        vals = tabular.to_float_array(tabular.get_column(tabular.split_lines(lines), column))
+        numeric = ~np.isnan(vals)
+        selected = np.zeros(len(lines), dtype=bool)
+        selected[numeric] = comparison_op(vals[numeric], comparison_val)
+        sys.stdout.write(''.join([lines[i] for i in np.nonzero(selected)[0]]))
+
+        # Warn about non-numeric values, skipping blank lines
+        for i in np.nonzero(~numeric)[0]:
+            if lines[i].strip('\n'):
+                sys.stderr.write('Warning: Non-numeric value in line %i\n%s\n' % (line_number + i, lines[i]))
+        line_number += len(lines)
 
 def main():
     ap = argparse.ArgumentParser(description=description)
@@ -1,29 +1,47 @@
 #!/usr/bin/env python
-#
-# Compute basic statistics about the values in a column of data
-#
+description = '''
+Compute basic statistics about the values in one or more columns of data, in a single pass
+over the file.  Quantiles are approximate, estimated in bounded memory.
+'''
 
 import argparse
 import sys
-from jjinking.fnc import coldata
+from ngs import tabular, util
 
-def process(iostream_, column):
-    avg_, min_, max_ = coldata.basic_statistics(iostream_, iostream=True, col=column)
-    output_strings = ['Avg: %s\n' % avg_,
-                      'Min: %s\n' % min_,
-                      'Max: %s\n' % max_]
-    for os_ in output_strings:
-        sys.stdout.write(os_)
+def process(iostream_, columns, delim=None, quantiles=(), chunk_size=tabular.DEFAULT_CHUNK_SIZE):
+    scanner = tabular.TabularScanner(numeric_columns=columns, delim=delim, chunk_size=chunk_size)
+    scanner.scan(iostream_)
+    for column in columns:
+        stats = scanner.stats[column]
+        output_strings = []
+        if len(columns) > 1:
+            output_strings.append('Column %i\n' % column)
+        output_strings += ['Avg: %s\n' % stats.mean,
+                           'Min: %s\n' % stats.min,
+                           'Max: %s\n' % stats.max,
+                           'Sum: %s\n' % stats.total,
+                           'Count: %i\n' % stats.count,
+                           'Stdev: %s\n' % stats.stdev()]
+        for q in quantiles:
+            output_strings.append('Quantile %s: %s\n' % (q, stats.quantile(q)))
+        if stats.invalid_count:
+            output_strings.append('Non-numeric: %i\n' % stats.invalid_count)
+        for os_ in output_strings:
+            sys.stdout.write(os_)
 
 def main():
     # Set up parameter(argument) options
-    ap = argparse.ArgumentParser(description='Compute basic statistics about the values in a column of data')
+    ap = argparse.ArgumentParser(description=description)
     ap.add_argument('file', help='Input file', nargs='?', type=argparse.FileType('r'), default=sys.stdin)
-    ap.add_argument('-k', '--column', help='Column number, with column count starting with 0', type=int, default=0)
+    ap.add_argument('-k', '--column', help='Column number(s), comma-separated, with column count starting with 0', type=util.parse_columns, default='0')
+    ap.add_argument('-d', '--delim', help='File column delimiter. Whitespace by default', type=str, default=None)
+    ap.add_argument('-q', '--quantiles', help='Comma-separated list of quantiles to compute, i.e. 0.25,0.5,0.75', type=lambda s: [float(q) for q in s.split(',')], default=[])
+    ap.add_argument('-c', '--chunk-size', help='Number of lines to parse at a time', type=int, default=tabular.DEFAULT_CHUNK_SIZE)
     params = ap.parse_args()
 
-    # Average the data
-    process(params.file, params.column)
+    # Compute the statistics
+    process(params.file, params.column, params.delim, params.quantiles, params.chunk_size)
+    params.file.close()
 
 if __name__ == '__main__':
     main()
@@ -5,31 +5,29 @@ Compute the arithmetic sum of the values in a column of data
 
 import argparse
 import sys
+from ngs import tabular
 
-def add_column(iostream, column, delim=None, weight_col=None):
-    accum = 0
-    line_number = 1
-    for line in iostream:
-        line_stripped = line.strip()
-        if line_stripped:
-            la = line_stripped.split(delim)
-            try:
-                val = float(la[column])
-                # Unweighted
-                if weight_col is None:
-                    accum += val
-                # Weighted
-                else:
-                    w = float(la[weight_col])
-                    accum += (w * val)
-                
-            except ValueError:
-                sys.stderr.write('Warning: Non-numeric value in line %i\n' % line_number)   
-        else:
-            sys.stderr.write('Warning: Skipping blank line %i\n' % line_number)
-        line_number += 1
-
-    return accum
+def add_column(iostream, column, delim=None, weight_col=None, chunk_size=tabular.DEFAULT_CHUNK_SIZE):
+    scanner = tabular.TabularScanner(numeric_columns=[column],
+                                     weight_column=weight_col,
+                                     delim=delim,
+                                     chunk_size=chunk_size)
+    scanner.scan(iostream)
+    stats = scanner.stats[column]
+
+    # Warnings
+    if stats.invalid_count:
+        sys.stderr.write('Warning: Non-numeric values in %i lines, starting at line(s) %s\n' %
+                         (stats.invalid_count, ', '.join(map(str, stats.invalid_lines))))
+    if scanner.blank_count:
+        sys.stderr.write('Warning: Skipping %i blank lines, starting at line(s) %s\n' %
+                         (scanner.blank_count, ', '.join(map(str, scanner.blank_lines))))
+
+    # Unweighted
+    if weight_col is None:
+        return stats.total
+    # Weighted
+    return stats.weighted_total
 
 def main():
     # Set up parameter options
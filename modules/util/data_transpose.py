@@ -1,22 +1,37 @@
 #!/usr/bin/env python
 description = """
-Read in a matrix and output the transpose of the matrix
+Read in a matrix and output the transpose of the matrix.
+The matrix is transposed in blocks of columns, making one pass over the memory-mapped input per
+block, so memory use is bounded by the block size rather than the file size.
+Input from stdin is first copied to a temporary file.
 """
 
 import argparse
-import itertools
+import shutil
 import sys
+import tempfile
+from ngs import tabular
 
 def main():
     # Set up the parameter(argument) options
     ap = argparse.ArgumentParser(description=description)
     ap.add_argument('infile', help='File containing matrix data', nargs='?', type=argparse.FileType('r'), default=sys.stdin)
     ap.add_argument('-o', '--outfile', help='File to output data to.  Default: Stdout', type=argparse.FileType('w'), default=sys.stdout)
+    ap.add_argument('-b', '--block-columns', help='Number of columns to transpose per pass over the input.  Default: set from --max-memory', type=int)
+    ap.add_argument('-m', '--max-memory', help='Approximate memory to use per block, in MB', type=int, default=tabular.DEFAULT_TRANSPOSE_MAX_BYTES / (1024 * 1024))
     params = ap.parse_args()
 
-    with params.infile as f:
-        for row in itertools.izip(*(line.strip('\n').split('\t') for line in f)):
-            params.outfile.write('%s\n' % '\t'.join(row))
+    # Memory-mapping requires a regular file
+    if params.infile == sys.stdin:
+        infile = tempfile.TemporaryFile()
+        shutil.copyfileobj(sys.stdin, infile)
+    else:
+        infile = params.infile
+
+    with infile as f:
+        tabular.transpose(f, params.outfile,
+                          block_columns=params.block_columns,
+                          max_bytes=params.max_memory * 1024 * 1024)
 
 if __name__ == '__main__':
     main()
@@ -4,7 +4,7 @@
 ##                mapping of gene names and transcript ids
 ##                Output format: gene_name, gene_id, transcript_id
 ##
-## USAGE:         ensembl_GRCH37.67_extract_gene2transcript.sh Homo_sapiens.GRCh37.67.gtf
+## USAGE:         ensembl_GRCH37.67_extract_gene2transcript.sh Homo_sapiens.GRCh37.67.gtf [num_parallel]
 ##
 ## OUTPUT:        Homo_sapiens.GRCh37.67.gtf.gene2transcript
 ##
@@ -13,9 +13,25 @@
 source $NGS_ANALYSIS_CONFIG
 
 # Usage check:
-usage 1 $# $0
+usage_min 1 $# $0
 
+# PROCESS INPUT PARAMS
 INFILE=$1
+NUM_PARALLEL=$2
+NUM_PARALLEL=${NUM_PARALLEL:=1}
+
+# FORMAT OUTPUT
 OUTFILE=$INFILE.gene2transcript
 
-cut -f1,9 Homo_sapiens.GRCh37.67.gtf | sed 's/\"/\t/g' | awk -F '\t' 'BEGIN{OFS="\t";}{print $9,$3,$5;}' | sort -u > $OUTFILE
\ No newline at end of file
+# Create temporary directory
+TMP=tmp.extract_gene2transcript.$RANDOM
+mkdir $TMP
+
+# Generate all the gtf-derived files in a single pass, parsing chromosomes in parallel
+$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/ensembl_GRCh37.67_gtf2bed.py $INFILE -o $TMP/tmp -p $NUM_PARALLEL
+
+# Output gene2transcript mapping
+mv $TMP/tmp.gene2transcript $OUTFILE
+
+# Remove temporary files
+rm -rf $TMP
@@ -27,40 +27,11 @@ OUTFILE=$INFILE.merged_transcripts.bed
 TMP=tmp.gtf2bed_merged_transcripts.$RANDOM
 mkdir $TMP
 
-# Convert first to bed format
-$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/ensembl_GRCh37.67_gtf2bed.py $INFILE > $TMP/tmp.bed
+# Generate all the gtf-derived files in a single pass, parsing chromosomes in parallel
+$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/ensembl_GRCh37.67_gtf2bed.py $INFILE -o $TMP/tmp -p $NUM_PARALLEL
 
-# Extract gene names to put as the 4th column
-paste <(cut -f1,2,3 $TMP/tmp.bed) <(cut -f4 $TMP/tmp.bed | cut -f8 -d'"') > $TMP/tmp.genes.bed
-
-# Extract gene names
-cut -f4 $TMP/tmp.genes.bed | sort -u > $TMP/tmp.genes.bed.genenames
-
-# Loop through gene names, and generate merged bed files
-P=0
-for gene in `cat $TMP/tmp.genes.bed.genenames`; do
-  awk '{ if($4=="'$gene'"){print $0} }' $TMP/tmp.genes.bed    \
-    | sort -k 1,1 -k 2,2n                                     \
-    | $BEDTOOLS_PATH/mergeBed -i stdin                        \
-    | sed 's/$/\t'$gene'/'                                    \
-    > $TMP/tmp.separate.$gene.merged.bed &
-  # Control parallel processes
-  P=$((P + 1))
-  if [ $P -ge $NUM_PARALLEL ]; then
-    wait
-    P=0
-  fi
-done
-wait
-
-# Concatenate all merged gene bed files
-rm -f $TMP/tmp.genes.merged.bed
-for gene in `cat $TMP/tmp.genes.bed.genenames`; do
-  cat $TMP/tmp.separate.$gene.merged.bed >> $TMP/tmp.genes.merged.bed
-done
-
-# Sort resulting output bed file
-sort -k 1,1 -k 2,2n $TMP/tmp.genes.merged.bed > $OUTFILE
+# Output merged bed file
+mv $TMP/tmp.merged_transcripts.bed $OUTFILE
 
 # Remove temporary files
 rm -rf $TMP
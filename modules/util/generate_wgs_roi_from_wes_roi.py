@@ -8,6 +8,7 @@ and flank them with user-provided flank size.
 import argparse
 import sys
 from collections import defaultdict
+from ngs import bed
 
 
 DEFAULT_FLANK=2000
@@ -46,12 +47,11 @@ def main():
     g2c2e = defaultdict(dict)
     # Read in bedfile and process data
     with params.bedfile as f:
-        for line in f:
-            la = line.strip().split()
-            g = la[3]
-            c = la[0]
-            s = int(la[1])
-            e = int(la[2])
+        for rec in bed.read_bed(f):
+            g = rec.name
+            c = rec.chrom
+            s = rec.start
+            e = rec.end
             update_pos(g2c2s, g, c, s, start=True)
             update_pos(g2c2e, g, c, e, start=False)
     
@@ -1,14 +1,22 @@
 #!/usr/bin/env python
 description = '''
 Read 2 files, and inner join them.  The files should be tab-delimited.
-The order of the output rows will be based on file1.
 The output file will be in the following format:
 (file1row,file2row) separated by tabs
-For optimal performance, the input files should be unique.
+Key columns can be given as comma-separated lists of columns, i.e. --k1 0,1
+Left joins output file1 rows without a match followed by empty file2 columns, and anti joins
+output only the file1 rows without a match.
+Join methods:
+  hash:  load file2 into memory; output is in the order of file1
+  grace: same as hash, but file2 tables larger than --max-memory are partitioned into temporary
+         files on disk.  Output is then grouped by partition
+  merge: both files must be sorted by their key columns; output is in the order of file1
 '''
 
 import argparse
+import itertools
 import sys
+from ngs import util
 
 def main():
     # Set up cli argument options
@@ -25,16 +33,31 @@ def main():
                     default=sys.stdin)
     # Optional arguments
     ap.add_argument('--k1',
-                    help='Key column of file 1, 0-based',
-                    type=int,
-                    default=0)
+                    help='Key column(s) of file 1, 0-based, comma-separated',
+                    type=util.parse_columns,
+                    default='0')
     ap.add_argument('--k2',
-                    help='Key column of file 2, 0-based',
-                    type=int,
-                    default=0)
+                    help='Key column(s) of file 2, 0-based, comma-separated',
+                    type=util.parse_columns,
+                    default='0')
     ap.add_argument('--header',
                     help='Header line exists for the input files',
                     action='store_true')
+    ap.add_argument('--how',
+                    help='Join type',
+                    choices=util.JOIN_TYPES,
+                    default='inner')
+    ap.add_argument('-m', '--method',
+                    help='Join method',
+                    choices=sorted(util.JOIN_METHODS.keys()),
+                    default='grace')
+    ap.add_argument('--max-memory',
+                    help='Approximate size of file 2 in memory, in MB, at which the grace method spills to disk',
+                    type=int,
+                    default=util.DEFAULT_JOIN_MAX_BYTES / (1024 * 1024))
+    ap.add_argument('--tmpdir',
+                    help='Directory for temporary partition files',
+                    type=str)
     ap.add_argument('-o', '--outfile',
                     help='Output file',
                     nargs='?',
@@ -42,35 +65,33 @@ def main():
                     default=sys.stdout)
     params = ap.parse_args()
 
-    # Read file2 into memory
-    file2_key2line = {}
-    for i,line in enumerate(params.file2):
-        line_stripped = line.strip('\n')
-
-        # Header line
-        if i == 0 and params.header:
-            file2_header = line_stripped
-            continue
-        
-        key = line_stripped.split('\t')[params.k2]
-
-        if key not in file2_key2line:
-            file2_key2line[key] = set()
-        file2_key2line[key].add(line_stripped)
+    rows1 = util.generate_rows(params.file1)
+    rows2 = util.generate_rows(params.file2)
 
-    # Read file 1, and output results as matching keys are found
-    for i,line in enumerate(params.file1):
-        line_stripped = line.strip('\n')
+    # Header lines, also used to find the number of columns of file 2
+    file2_header = None
+    if params.header:
+        file1_header = rows1.next()
+        file2_header = rows2.next()
+        params.outfile.write('%s\n' % '\t'.join(file1_header + file2_header))
+    else:
+        for row in rows2:
+            file2_header = row
+            rows2 = itertools.chain([row], rows2)
+            break
+    file2_empty = [''] * len(file2_header or [])
 
-        # Header line
-        if i == 0 and params.header:
-            params.outfile.write('%s\n' % '\t'.join([line_stripped, file2_header]))
-            continue
-        
-        key = line_stripped.split('\t')[params.k1]
-        if key in file2_key2line:
-            for file2_line in file2_key2line[key]:
-                params.outfile.write('%s\n' % '\t'.join([line_stripped, file2_line]))
+    # Join
+    kwargs = {}
+    if params.method == 'grace':
+        kwargs = {'max_bytes': params.max_memory * 1024 * 1024,
+                  'tmpdir': params.tmpdir}
+    join = util.JOIN_METHODS[params.method]
+    for row1, row2 in join(rows1, rows2, params.k1, params.k2, how=params.how, **kwargs):
+        if params.how == 'anti':
+            params.outfile.write('%s\n' % '\t'.join(row1))
+        else:
+            params.outfile.write('%s\n' % '\t'.join(row1 + (row2 or file2_empty)))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+description = '''
+Benchmark the hot paths of the ngs library and modules on seeded synthetic inputs: fastq pairs,
+VarScan snpEff vcf, maf, annovar csv, and GATK DepthOfCoverage files.
+Inputs are generated in the data directory, or reused if they were generated before.
+Each benchmark is run in a separate process, and its records per second and peak memory are
+output as json, which can be compared with the json of an earlier run to detect regressions.
+'''
+
+import argparse
+import json
+import sys
+from ngs import bench
+
+def log(name, result):
+    if 'error' in result:
+        sys.stderr.write('%s\terror\t%s\n' % (name, result['error']))
+    else:
+        sys.stderr.write('%s\t%i records\t%.2fs\t%.0f records/sec\t%i KB peak\n' %
+                         (name, result['records'], result['seconds'], result['records_per_sec'] or 0,
+                          result['peak_rss_kb']))
+
+def main():
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('-d', '--data-dir',
+                    help='Directory of the generated inputs',
+                    type=str,
+                    default='ngs_bench_data')
+    ap.add_argument('-b', '--benchmarks',
+                    help='Benchmarks to run.  Default all',
+                    nargs='+',
+                    choices=bench.BENCHMARK_NAMES)
+    ap.add_argument('-s', '--scale',
+                    help='Multiply the default input sizes by this factor',
+                    type=float,
+                    default=1.0)
+    ap.add_argument('--seed',
+                    help='Random seed of the generated inputs',
+                    type=int,
+                    default=0)
+    ap.add_argument('-c', '--compare',
+                    help='Json results of an earlier run to compare with',
+                    type=argparse.FileType('r'))
+    ap.add_argument('--tolerance',
+                    help='Fraction by which records/sec may drop, or peak memory grow, before it is a regression',
+                    type=float,
+                    default=0.1)
+    ap.add_argument('-o', '--outfile',
+                    help='Output json results file',
+                    type=argparse.FileType('w'),
+                    default=sys.stdout)
+    params = ap.parse_args()
+
+    results = bench.run_benchmarks(params.data_dir,
+                                   names=params.benchmarks,
+                                   scale=params.scale,
+                                   seed=params.seed,
+                                   log=log)
+    json.dump(results, params.outfile, indent=2, sort_keys=True)
+    params.outfile.write('\n')
+    params.outfile.close()
+
+    if params.compare:
+        baseline = json.load(params.compare)
+        base_sizes = baseline.get('sizes', {})
+        for kind, size in sorted(results['sizes'].iteritems()):
+            if kind in base_sizes and base_sizes[kind] != size:
+                sys.stderr.write('Baseline %s input size %i differs from %i\nExiting.\n\n' %
+                                 (kind, base_sizes[kind], size))
+                sys.exit(1)
+        regressions = bench.compare_results(baseline, results, params.tolerance)
+        for name, metric, base_val, val in regressions:
+            sys.stderr.write('Regression\t%s\t%s\t%s => %s\n' % (name, metric, base_val, val))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
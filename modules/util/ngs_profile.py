@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+description = '''
+Run an ngs-analysis python script with profiling, and write a json sidecar of the run:
+wall and cpu time, peak memory, bytes read and written, the time spent in the read, parse,
+transform, and write stages of the instrumented ngs library functions, and their record and
+byte counts.  Optionally, a sampling profiler records the python call stacks at regular intervals,
+and the collapsed stacks are written next to the sidecar.
+python_ngs.sh runs scripts through this wrapper when $NGS_PROFILE is 1.
+'''
+
+import argparse
+import os
+import runpy
+import sys
+from ngs import instrument
+
+def main():
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('-o', '--sidecar',
+                    help='Output json sidecar file.  Default a unique file in the profile directory',
+                    type=str)
+    ap.add_argument('-d', '--profile-dir',
+                    help='Profile directory, in which sidecars are collected.  Default $%s, or %s' % (instrument.ENV_PROFILE_DIR,
+                                                                                                     instrument.DEFAULT_PROFILE_DIR),
+                    type=str,
+                    default=os.environ.get(instrument.ENV_PROFILE_DIR) or instrument.DEFAULT_PROFILE_DIR)
+    ap.add_argument('-s', '--sample-interval',
+                    help='Sample the call stacks every this many seconds, i.e. 0.005.  Default $%s, or no sampling' % instrument.ENV_PROFILE_SAMPLE,
+                    type=float,
+                    default=os.environ.get(instrument.ENV_PROFILE_SAMPLE) or None)
+    ap.add_argument('script',
+                    help='Python script to run',
+                    type=str)
+    ap.add_argument('script_args',
+                    help='Arguments of the script',
+                    nargs=argparse.REMAINDER)
+    params = ap.parse_args()
+
+    sidecar = params.sidecar or instrument.sidecar_path(params.script, params.profile_dir)
+
+    # Run the script as if it was run directly
+    sys.argv = [params.script] + params.script_args
+    sys.path[0] = os.path.dirname(os.path.abspath(params.script))
+    prof = instrument.start(os.path.basename(params.script), sys.argv, params.sample_interval)
+    exit_status = 0
+    try:
+        runpy.run_path(params.script, run_name='__main__')
+    except SystemExit as e:
+        exit_status = e.code
+        raise
+    except:
+        exit_status = 1
+        raise
+    finally:
+        instrument.stop(exit_status)
+        prof.write(sidecar)
+        sys.stderr.write('Profile written to %s\n' % sidecar)
+
+
+if __name__ == '__main__':
+    main()
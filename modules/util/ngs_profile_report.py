@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+description = '''
+Summarize the json profile sidecars collected during a project run, by tool: number of runs,
+wall and cpu time, peak memory, bytes read and written, and the time spent in each stage.
+Followed by the functions with the most samples, when runs were sampled.
+'''
+
+import argparse
+import glob
+import json
+import os
+import sys
+from ngs import instrument
+
+def load_reports(paths):
+    '''
+    Load the sidecars given as files, or as directories of sidecars
+    '''
+    reports = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames = sorted(glob.glob(os.path.join(path, '*' + instrument.SIDECAR_SUFFIX)))
+        else:
+            filenames = [path]
+        for filename in filenames:
+            with open(filename, 'r') as f:
+                reports.append(json.load(f))
+    return reports
+
+def main():
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('sidecars',
+                    help='Sidecar files, or directories of sidecars.  Default $%s, or %s' % (instrument.ENV_PROFILE_DIR,
+                                                                                             instrument.DEFAULT_PROFILE_DIR),
+                    nargs='*')
+    ap.add_argument('-n', '--num-functions',
+                    help='Number of sampled functions to output',
+                    type=int,
+                    default=20)
+    ap.add_argument('-o', '--outfile',
+                    help='Output report file',
+                    type=argparse.FileType('w'),
+                    default=sys.stdout)
+    params = ap.parse_args()
+
+    paths = params.sidecars or [os.environ.get(instrument.ENV_PROFILE_DIR) or instrument.DEFAULT_PROFILE_DIR]
+    try:
+        reports = load_reports(paths)
+    except (IOError, ValueError) as e:
+        sys.stderr.write('Could not load the sidecars: %s\nExiting.\n\n' % e)
+        sys.exit(1)
+
+    rows, functions = instrument.summarize_reports(reports)
+    fout = params.outfile
+    fout.write('%s\n' % '\t'.join(['tool', 'runs', 'failed', 'wall_seconds', 'cpu_seconds', 'max_peak_rss_kb',
+                                   'io_read_bytes', 'io_write_bytes'] +
+                                  ['%s_seconds' % s for s in instrument.STAGES]))
+    for row in rows:
+        fout.write('%s\t%i\t%i\t%.2f\t%.2f\t%i\t%i\t%i\t%s\n' % (tuple(row[:8]) +
+                                                                ('\t'.join('%.2f' % t for t in row[8:]),)))
+    if functions:
+        fout.write('\nfunction\tself_samples\ttotal_samples\n')
+        for func, self_samples, total_samples in functions[:params.num_functions]:
+            fout.write('%s\t%i\t%i\n' % (func, self_samples, total_samples))
+    fout.close()
+
+
+if __name__ == '__main__':
+    main()
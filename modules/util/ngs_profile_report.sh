@@ -0,0 +1,20 @@
+#!/bin/bash
+## 
+## DESCRIPTION:   Summarize the json profile sidecars collected in a profile directory during a pipeline run
+##
+## USAGE:         ngs_profile_report.sh profile_dir
+##
+## OUTPUT:        profile_dir/profile.report.tsv
+##
+
+# Load analysis config
+source $NGS_ANALYSIS_CONFIG
+
+# Check correct usage
+usage 1 $# $0
+
+# Process input params
+PROFILE_DIR=$1
+
+# Run tool directly, so that the summary itself is not profiled
+$PYTHON $NGS_ANALYSIS_DIR/modules/util/ngs_profile_report.py $PROFILE_DIR -o $PROFILE_DIR/profile.report.tsv
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+description = '''
+ngsd: a long-lived local worker that imports the ngs library, numpy, and other modules once,
+keeps lookup tables loaded, and runs the ngs-analysis python scripts on request over a unix
+socket, so that short jobs do not pay for the interpreter startup and imports every time.
+  start   Start ngsd in the foreground, preloading modules and lookup tables
+  status  Show the status of a running ngsd
+  stop    Stop a running ngsd
+  run     Run a script with ngsd, or directly when no ngsd is running
+python_ngs.sh runs scripts with ngsd when $NGSD_SOCKET is set to the socket of a running ngsd.
+Scripts run with the environment and working directory of the caller, but with the python path
+of ngsd.
+'''
+
+import argparse
+import os
+import socket
+import sys
+from ngs import ngsd
+
+def main():
+    ap = argparse.ArgumentParser(description=description,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('-s', '--socket',
+                    help='Socket path.  Default $%s' % ngsd.ENV_SOCKET,
+                    type=str,
+                    default=os.environ.get(ngsd.ENV_SOCKET))
+    subparsers = ap.add_subparsers(title='subcommands',
+                                   dest='subcommand')
+
+    ap_start = subparsers.add_parser('start',
+                                     help='Start ngsd in the foreground')
+    ap_start.add_argument('-m', '--modules',
+                          help='Modules to import.  Default %s' % ' '.join(ngsd.DEFAULT_MODULES),
+                          nargs='+',
+                          default=ngsd.DEFAULT_MODULES)
+    ap_start.add_argument('--gene2entrez',
+                          help='Gene2entrez mapping file, or annotation database, to keep loaded',
+                          action='append',
+                          default=[])
+    ap_start.add_argument('--transcript-lengths',
+                          help='Transcript lengths pickle (.pkl) or tab-separated file, or annotation database, to keep loaded',
+                          action='append',
+                          default=[])
+    ap_start.add_argument('--rsid',
+                          help='Variant to rsid mapping pickle created by dbsnp_variant2rsid_pickle.py, to keep loaded',
+                          action='append',
+                          default=[])
+
+    subparsers.add_parser('status',
+                          help='Show the status of a running ngsd')
+    subparsers.add_parser('stop',
+                          help='Stop a running ngsd')
+
+    ap_run = subparsers.add_parser('run',
+                                   help='Run a python script with ngsd')
+    ap_run.add_argument('script',
+                        help='Python script to run',
+                        type=str)
+    ap_run.add_argument('script_args',
+                        help='Arguments of the script',
+                        nargs=argparse.REMAINDER)
+    params = ap.parse_args()
+
+    if params.subcommand == 'run':
+        argv = [os.path.abspath(params.script)] + params.script_args
+        # Run directly when ngsd is not running, i.e. on another cluster node.  Errors once
+        # connected are failures of the run, which is not started again
+        sock = ngsd.connect_running(params.socket) if params.socket else None
+        if sock is None:
+            sys.exit(ngsd.exec_script(argv))
+        sys.exit(ngsd.run_on(sock, argv))
+
+    if not params.socket:
+        sys.stderr.write('No socket given, and $%s is not set\nExiting.\n\n' % ngsd.ENV_SOCKET)
+        sys.exit(1)
+
+    if params.subcommand == 'start':
+        tables = ([('gene2entrez', f) for f in params.gene2entrez] +
+                  [('transcript_length', f) for f in params.transcript_lengths] +
+                  [('rsid', f) for f in params.rsid])
+        server = ngsd.Server(os.path.abspath(params.socket), params.modules, tables)
+        try:
+            server.preload()
+            server.bind()
+        except (IOError, OSError, ValueError, socket.error) as e:
+            sys.stderr.write('Could not start ngsd: %s\nExiting.\n\n' % e)
+            sys.exit(1)
+        sys.stderr.write('ngsd listening on %s\n' % params.socket)
+        server.serve()
+
+    elif params.subcommand == 'status':
+        status = ngsd.status(params.socket)
+        if status is None:
+            sys.stderr.write('ngsd is not running on %s\n' % params.socket)
+            sys.exit(1)
+        sys.stdout.write('pid\t%i\nuptime_seconds\t%.1f\nrequests\t%i\nmodules\t%s\n' % (status['pid'],
+                                                                                         status['uptime_seconds'],
+                                                                                         status['requests'],
+                                                                                         ','.join(status['modules'])))
+        for kind, path, size in status['tables']:
+            sys.stdout.write('table\t%s\t%s\t%i\n' % (kind, path, size))
+
+    elif params.subcommand == 'stop':
+        try:
+            ngsd.stop(params.socket)
+        except (socket.error, EOFError):
+            sys.stderr.write('ngsd is not running on %s\n' % params.socket)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+description = '''
+Run the steps of a pipeline defined in a json file, in parallel, as soon as their dependencies
+have finished, either as local processes or as Sun Grid Engine jobs.
+A step depends on the steps that produce its input files.
+Steps whose outputs are up to date with their inputs are skipped.
+
+Pipeline file format:
+{"steps": [{"name": "maf.summary.gene",
+            "command": "python_ngs.sh maf_summaries.py ${IN_MAF} -t gene -o ${IN_MAF}.summary.gene",
+            "inputs": ["${IN_MAF}"],
+            "outputs": ["${IN_MAF}.summary.gene"],
+            "threads": 1,
+            "memory": "4G"}]}
+
+${VAR} references are replaced by the values given with -v VAR=value, or else by environment
+variables.
+With a cache directory, the outputs of steps are served from the cache when the same command,
+tool version ("version", or the output of "version_command"), and inputs were run before.
+Inputs are compared by size, mtime, and a hash of sampled blocks.
+Outputs a report of the status, wall time, cpu time, and peak memory of each step.
+'''
+
+import argparse
+import os
+import sys
+from ngs import pipeline
+
+def parse_variables(var_strs):
+    '''
+    Parse a list of VAR=value strings into a dict
+    '''
+    variables = {}
+    for var_str in var_strs:
+        if '=' not in var_str:
+            sys.stderr.write('Variable %s must be given as VAR=value\nExiting\n\n' % var_str)
+            sys.exit(1)
+        k, v = var_str.split('=', 1)
+        variables[k] = v
+    return variables
+
+def main():
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('pipeline_file',
+                    help='Pipeline definition json file',
+                    type=argparse.FileType('r'))
+    ap.add_argument('-v', '--var',
+                    help='Pipeline variable, VAR=value',
+                    action='append',
+                    default=[])
+    ap.add_argument('-b', '--backend',
+                    help='Run steps as local processes, or grid engine jobs',
+                    choices=sorted(pipeline.BACKENDS.keys()),
+                    default='local')
+    ap.add_argument('-t', '--threads',
+                    help='Local backend: number of cores to use.  Default all',
+                    type=int)
+    ap.add_argument('-m', '--memory',
+                    help='Local backend: memory available to the steps, i.e. 64G',
+                    type=str)
+    ap.add_argument('-q', '--queue',
+                    help='Grid engine backend: queue',
+                    type=str,
+                    default='all.q')
+    ap.add_argument('-j', '--max-jobs',
+                    help='Grid engine backend: maximum number of jobs submitted at a time',
+                    type=int)
+    ap.add_argument('-c', '--check',
+                    help='How to check whether the outputs of a step are up to date',
+                    choices=pipeline.CHECK_METHODS,
+                    default='mtime')
+    ap.add_argument('-f', '--force',
+                    help='Run all the steps, even if they are up to date',
+                    action='store_true')
+    ap.add_argument('-n', '--dry-run',
+                    help='Report the steps that would be run, without running them',
+                    action='store_true')
+    ap.add_argument('-C', '--cache-dir',
+                    help='Step output cache directory, which can be shared between pipelines.  Default $NGS_PIPELINE_CACHE',
+                    type=str,
+                    default=os.environ.get('NGS_PIPELINE_CACHE'))
+    ap.add_argument('--cache-max-size',
+                    help='Evict the least recently used cache entries beyond this size, i.e. 100G',
+                    type=str)
+    ap.add_argument('--cache-max-age',
+                    help='Evict cache entries not used in this many days',
+                    type=float)
+    ap.add_argument('--cache-stats',
+                    help='Output cache hits, misses, and bytes saved',
+                    action='store_true')
+    ap.add_argument('-r', '--report',
+                    help='Output report file',
+                    type=argparse.FileType('w'),
+                    default=sys.stderr)
+    params = ap.parse_args()
+
+    # Load pipeline
+    with params.pipeline_file:
+        try:
+            pipe = pipeline.load_pipeline(params.pipeline_file, parse_variables(params.var))
+        except (ValueError, KeyError) as e:
+            sys.stderr.write('Invalid pipeline file: %s\nExiting\n\n' % e)
+            sys.exit(1)
+
+    # Set up backend
+    if params.backend == 'sge':
+        backend = pipeline.SgeBackend(queue=params.queue, max_jobs=params.max_jobs)
+    else:
+        backend = pipeline.LocalBackend(threads=params.threads, memory=params.memory)
+
+    cache = None
+    if params.cache_dir:
+        cache = pipeline.StepCache(params.cache_dir)
+
+    # Run
+    def log(result):
+        sys.stderr.write('%s\t%s\n' % (result.name, result.status))
+    results = pipeline.run_pipeline(pipe, backend,
+                                    check=params.check,
+                                    force=params.force,
+                                    dry_run=params.dry_run,
+                                    log=log,
+                                    cache=cache)
+    params.report.write(pipeline.format_report(results))
+
+    # Cache eviction and statistics
+    if cache is not None:
+        max_age = None
+        if params.cache_max_age is not None:
+            max_age = params.cache_max_age * 24 * 3600
+        cache.evict(max_bytes=pipeline.parse_memory(params.cache_max_size), max_age=max_age)
+        if params.cache_stats:
+            sys.stderr.write(cache.stats.report(cache))
+
+    if any(r.status == 'failed' for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
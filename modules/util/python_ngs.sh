@@ -3,6 +3,10 @@
 ## DESCRIPTION:   Python wrapper to call ngs-analysis python scripts without having to give the full path,
 ##                since when calling locally installed python, the user must give the full path to the
 ##                python script.
+##                When NGS_PROFILE=1, the script is run through ngs_profile.py, and a json profile
+##                sidecar is collected in $NGS_PROFILE_DIR (default ./profile)
+##                When NGSD_SOCKET is set to the socket of a running ngsd (see ngsd.py), the script is
+##                run by ngsd, which keeps the python modules and lookup tables loaded
 ##
 ## USAGE:         python_ngs.sh foo.py -a A -b B [...]
 ##
@@ -23,4 +27,10 @@ TOOL_DIR=$(dirname `which $TOOL`)
 TOOL_NAME=$(basename $TOOL)
 
 # Run the tool
-$PYTHON $TOOL_DIR/$TOOL_NAME $TOOL_PARAMS
+if [ "$NGS_PROFILE" == "1" ]; then
+  $PYTHON $NGS_ANALYSIS_DIR/modules/util/ngs_profile.py $TOOL_DIR/$TOOL_NAME $TOOL_PARAMS
+elif [ -n "$NGSD_SOCKET" ] && [ -S "$NGSD_SOCKET" ]; then
+  $PYTHON $NGS_ANALYSIS_DIR/modules/util/ngsd.py run $TOOL_DIR/$TOOL_NAME $TOOL_PARAMS
+else
+  $PYTHON $TOOL_DIR/$TOOL_NAME $TOOL_PARAMS
+fi
@@ -1,20 +1,27 @@
 #!/usr/bin/env python
 description = '''
-Load gene2transcript mapping data to sqlite
+Load gene2transcript mapping data to a sqlite annotation database
 Input file must have the following columns:
 
 gene_name
 gene_id
 transcript_id
+
+Optionally also load the following tab-separated files to the same database:
+transcript lengths:  transcript_id, length
+exons:               chrom, start, end, transcript_id, exon_number
+gene2entrez:         gene_name, entrez_id
+
+All the tables are loaded in a single transaction, and indexed after loading.
+The database can be used in place of the mapping files by vcf2maf.py,
+vcf_snpeff_check_multiple_genes.py, and vcf_snpeff_count_transcript_effects.py
 '''
 
 import argparse
-import csv
-import sqlite3
 import sys
+from ngs import annotdb
 
-DB_NAME='ensembl.db'
-TABLE_NAME='gene2transcript'
+DEFAULT_DB_NAME = 'ensembl.db'
 
 def main():
     ap = argparse.ArgumentParser(description=description)
@@ -23,31 +30,46 @@ def main():
                     nargs='?',
                     type=argparse.FileType('r'),
                     default=sys.stdin)
+    ap.add_argument('-d', '--db',
+                    help='Output sqlite database file',
+                    type=str,
+                    default=DEFAULT_DB_NAME)
+    ap.add_argument('-l', '--transcript-lengths',
+                    help='File containing the lengths of the transcripts',
+                    type=argparse.FileType('r'))
+    ap.add_argument('-x', '--exons',
+                    help='File containing the exons of the transcripts',
+                    type=argparse.FileType('r'))
+    ap.add_argument('-e', '--gene2entrez',
+                    help='File containing gene2entrezid mapping',
+                    type=argparse.FileType('r'))
     params = ap.parse_args()
 
-    # Open connection
-    conn = sqlite3.connect(DB_NAME)
-    with conn:
-        c = conn.cursor()
-
-        # Check if table exists and if it does, delete
-        c.execute('DROP TABLE IF EXISTS %s' % TABLE_NAME)
-        
-        # Create table
-        c.execute('''CREATE TABLE %s (gene_name TEXT,
-                                      gene_id TEXT,
-                                      transcript_id TEXT)''' % TABLE_NAME)
-        
-        # Create indices for fast searching
-        c.execute("CREATE INDEX gene2transcript_idx_gene_name ON %s (gene_name)" % TABLE_NAME)
-        c.execute("CREATE INDEX gene2transcript_idx_transcript_id ON %s (transcript_id)" % TABLE_NAME)
-
-        # Load file to table (fast)
-        f = csv.reader(params.file, delimiter='\t')
-        c.executemany("INSERT INTO %s VALUES (?,?,?)" % TABLE_NAME, f)
-
-    # Close input file stream
-    params.file.close()
+    # Tables to load
+    table2file = {'gene2transcript': params.file,
+                  'transcript_length': params.transcript_lengths,
+                  'exon': params.exons,
+                  'gene2entrez': params.gene2entrez}
+    table2rows = {}
+    for table, fin in table2file.iteritems():
+        if fin is not None:
+            num_columns = len(annotdb.TABLES[table][0])
+            table2rows[table] = annotdb.read_tsv_rows(fin, num_columns)
+
+    # Load tables
+    conn = annotdb.connect(params.db)
+    try:
+        table2count = annotdb.load_tables(conn, table2rows)
+    finally:
+        conn.close()
+
+    # Close input file streams
+    for fin in table2file.values():
+        if fin is not None:
+            fin.close()
+
+    for table, count in sorted(table2count.iteritems()):
+        sys.stderr.write('Loaded %i rows to table %s\n' % (count, table))
 
 
 if __name__ == '__main__':
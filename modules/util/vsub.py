@@ -25,11 +25,15 @@ a3    x3    c3
 For best results, make sure that all of file1 column a is a subset of file2 column a, and
 column a in file2 should be unique, i.e. file 2 column a to column b should be many-to-one.
 (In another words, file 2 should be a function with column a as the independent variable
-and column b as the dependent variable.)
+and column b as the dependent variable.)  If it is not, a row is output for each match.
+Column a can be given as comma-separated lists of columns, to match on multiple columns.
+File 2 tables larger than --max-memory are partitioned into temporary files on disk, in which
+case the output rows are no longer in the order of file 1.
 '''
 
 import argparse
 import sys
+from ngs import util
 
 def main():
     ap = argparse.ArgumentParser(description=description)
@@ -44,44 +48,50 @@ def main():
                     type=argparse.FileType('r'),
                     default=sys.stdin)
     ap.add_argument('--f1-column-a',
-                    help='File 1 column a, zero-based',
-                    type=int,
-                    default=0)
+                    help='File 1 column a, zero-based, comma-separated',
+                    type=util.parse_columns,
+                    default='0')
     ap.add_argument('--f1-column-b',
                     help='File 1 column b, zero-based',
                     type=int,
                     default=1)
     ap.add_argument('--f2-column-a',
-                    help='File 2 column a, zero-based',
-                    type=int,
-                    default=0)
+                    help='File 2 column a, zero-based, comma-separated',
+                    type=util.parse_columns,
+                    default='0')
     ap.add_argument('--f2-column-b',
                     help='File 2 column b, zero-based',
                     type=int,
                     default=1)
+    ap.add_argument('--max-memory',
+                    help='Approximate size of file 2 in memory, in MB, at which it is spilled to disk',
+                    type=int,
+                    default=util.DEFAULT_JOIN_MAX_BYTES / (1024 * 1024))
+    ap.add_argument('--tmpdir',
+                    help='Directory for temporary partition files',
+                    type=str)
     params = ap.parse_args()
 
-    # Read file 2 mapping into memory
-    f2_a2b = {}
-    for line in params.file2:
-        la = line.strip().split('\t')
-        a = la[params.f2_column_a]
-        b = la[params.f2_column_b]
-        f2_a2b[a] = b
-    params.file2.close()
+    # Only the key and value columns of file 2 are needed
+    f2_columns = params.f2_column_a + [params.f2_column_b]
+    f2_rows = ([la[c] for c in f2_columns] for la in util.generate_rows(params.file2))
+    f2_key_columns = range(len(params.f2_column_a))
 
-    # Read in file 1 and substitute the values
-    for line in params.file1:
-        la = line.strip().split('\t')
-        a = la[params.f1_column_a]
+    # Substitute the values in file 1
+    f1_rows = (line.strip().split('\t') for line in params.file1)
+    for la, f2_row in util.grace_hash_join(f1_rows, f2_rows, params.f1_column_a, f2_key_columns,
+                                           how='left',
+                                           max_bytes=params.max_memory * 1024 * 1024,
+                                           tmpdir=params.tmpdir):
         # If key is not in file 2, output error and skip row
-        if a not in f2_a2b:
-            sys.stderr.write('Could not find key %s in file 2\n' % a)
+        if f2_row is None:
+            sys.stderr.write('Could not find key %s in file 2\n' % ','.join([la[c] for c in params.f1_column_a]))
             continue
-        la[params.f1_column_b] = f2_a2b[a]
+        la[params.f1_column_b] = f2_row[-1]
         sys.stdout.write('%s\n' % '\t'.join(la))
 
     params.file1.close()
+    params.file2.close()
 
 
 if __name__ == '__main__':
@@ -8,6 +8,7 @@ and insert a column of rsids to the specified column
 import argparse
 import cPickle
 import sys
+from ngs import ngsd
 
 def main():
     ap = argparse.ArgumentParser(description=description)
@@ -33,9 +34,11 @@ def main():
                     action='store_true')
     params = ap.parse_args()
 
-    # Load mapping file
+    # Load mapping file, unless ngsd keeps it loaded
     with params.mapfile as fin:
-        var2rsid = cPickle.load(fin)
+        var2rsid = ngsd.warm_table('rsid', fin.name)
+        if var2rsid is None:
+            var2rsid = cPickle.load(fin)
 
     # Pickle the dict
     with params.infile as fin:
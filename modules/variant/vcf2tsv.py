@@ -7,16 +7,37 @@ import argparse
 import sys
 from ngs import vcf
 
+def get_variant_type(ref, alt):
+    '''
+    Classify a variant as snp, del, ins, dnp, tnp, or onp from its ref and alt alleles
+    '''
+    variant_type = 'snp'
+    len_ref = len(ref)
+    len_alt = len(alt)
+    if len_ref > 1 or len_alt > 1:
+        if len_ref > len_alt:
+            variant_type = 'del'
+        elif len_ref < len_alt:
+            variant_type = 'ins'
+        else: # len_ref == len_alt
+            if len_ref == 2:
+                variant_type = 'dnp'
+            elif len_ref == 3:
+                variant_type = 'tnp'
+            else:
+                variant_type = 'onp'
+    return variant_type
+
 def parse_vcf(vcf_in, fout):
     '''
     Read through the vcf file, and parse it.
     Output results in tsv format
     '''
-    with vcf.VcfFile(vcf_in, 'r') as vcffile:
+    with open(vcf_in, 'r') as f:
 
-        # Skip to the variants section of the vcf file
-        vcffile.jump2variants()
-        sample_names = vcffile.get_sample_names()
+        # Read the vcf file in blocks of variants x samples genotype matrices
+        header, blocks = vcf.read_genotype_blocks(f, string_fields=('GT', 'DP'))
+        sample_names = header.column_names[9:]
         sample_names_gt = [sn + '_gt' for sn in sample_names]
         sample_names_dp = [sn + '_dp' for sn in sample_names]
 
@@ -31,64 +52,36 @@ def parse_vcf(vcf_in, fout):
                                       sample_names_gt +
                                       sample_names_dp))
 
-        # Read in the variant lines
-        for line in vcffile:
-
-            # Get parsed variant data
-            variant = vcffile.parse_line(line)
-            # Record columns
-            chrom = variant['CHROM']
-            pos = variant['POS']
-            ref = variant['REF']
-            alt = variant['ALT']
-
-            # Parse the info column
-            info_map, info_single = vcffile.parse_info(variant)
-            af = info_map['AF']
+        for block in blocks:
+            nocalls = (block.gt == vcf.GT_NOCALL).sum(axis=1)
+            for i, row in enumerate(block.rows):
+                # Record columns
+                chrom, pos, variantid, ref, alt, qual, filtr, info = row[:8]
 
-            # Variant type
-            variant_type = 'snp'
-            len_ref = len(ref)
-            len_alt = len(alt)
-            if len_ref > 1 or len_alt > 1:
-                if len_ref > len_alt:
-                    variant_type = 'del'
-                elif len_ref < len_alt:
-                    variant_type = 'ins'
-                else: # len_ref == len_alt
-                    if len_ref == 2:
-                        variant_type = 'dnp'
-                    elif len_ref == 3:
-                        variant_type = 'tnp'
-                    else:
-                        variant_type = 'onp'
+                # Parse the info column
+                info_map = dict(p.split('=', 1) for p in info.split(';') if '=' in p)
+                af = info_map['AF']
 
-            # Sample genotypes
-            samples2field2val = vcffile.parse_samples(variant)
-            samples_gts = []
-            samples_dps = []
-            num_nocall = 0
-            for sample in sample_names:
-                sample_gt = vcffile.get_sample_gt(variant, sample)
-                if sample_gt == 'N/N':
-                    num_nocall += 1
-                if 'DP' not in samples2field2val[sample]:
-                    sample_dp = 'NA'
-                else:
-                    sample_dp = samples2field2val[sample]['DP']
-                samples_gts.append(sample_gt)
-                samples_dps.append(sample_dp)
+                # Sample genotypes, substituting the bases once per distinct GT value
+                gt2bases = {}
+                samples_gts = []
+                for gt in block.strings['GT'][i]:
+                    bases = gt2bases.get(gt)
+                    if bases is None:
+                        bases = gt2bases[gt] = vcf.genotype_bases(gt, ref, alt)
+                    samples_gts.append(bases)
+                samples_dps = [dp or 'NA' for dp in block.strings['DP'][i]]
 
-            # Output to standard output
-            fout.write('%s\n' % '\t'.join([chrom,
-                                           pos,
-                                           ref,
-                                           alt,
-                                           variant_type,
-                                           af,
-                                           str(num_nocall)] +
-                                          samples_gts +
-                                          samples_dps))
+                # Output to standard output
+                fout.write('%s\n' % '\t'.join([chrom,
+                                               pos,
+                                               ref,
+                                               alt,
+                                               get_variant_type(ref, alt),
+                                               af,
+                                               str(nocalls[i])] +
+                                              samples_gts +
+                                              samples_dps))
 
 def main():
     ap = argparse.ArgumentParser(description=description)
@@ -1,12 +1,23 @@
 #!/usr/bin/env python
 
 description = '''
-Separate out a vcf file containing variant calls for multiple samples into individual samples
+Separate out a vcf file containing variant calls for multiple samples into individual samples.
+Output lines are buffered in memory per sample and written out in large chunks, using a bounded
+pool of open file handles, so that vcf files with thousands of samples can be split without
+running into open file limits.
 '''
 
 import argparse
+import multiprocessing
 import sys
+from collections import OrderedDict
+from ngs import filesys
 
+# Maximum number of simultaneously open output files
+DEFAULT_MAX_OPEN = 256
+
+# Number of buffered bytes per sample before the buffer is flushed to file
+DEFAULT_BUFFER_SIZE = 65536
 
 def build_genotype_field2indx(field_str):
     '''
@@ -36,23 +47,113 @@ def build_colname2colnum(colname_str):
     sample_indexes = sorted([colname2colnum[sn] for sn in sample_names])
     return colname2colnum, sample_names, sample_indexes
 
-def separate_samples(vcfin, out_prefix, preserve_all=False):
+class SampleOutputPool(object):
+    '''
+    Buffered output files, one per sample, sharing a bounded pool of open file handles.
+    Lines are held in memory per sample and written out once the buffer reaches buffer_size bytes.
+    When max_open handles are already open, the least recently used handle is closed, and
+    reopened in append mode the next time its sample is flushed.
+    Buffers are compressed chunk by chunk when compress is set to 'gzip' or 'bgzf'.
+    '''
+    def __init__(self, max_open=DEFAULT_MAX_OPEN, buffer_size=DEFAULT_BUFFER_SIZE, compress=None):
+        self.max_open = max(1, max_open)
+        self.buffer_size = buffer_size
+        self.compress = compress
+        self.compressor = filesys.COMPRESSORS[compress]
+        self.filenames = {}
+        self.buffers = {}
+        self.buffered_bytes = {}
+        self.handles = OrderedDict()
+        self.created = set()
+
+    def add(self, key, filename):
+        '''
+        Register an output file
+        '''
+        self.filenames[key] = filename
+        self.buffers[key] = []
+        self.buffered_bytes[key] = 0
+
+    def write(self, key, s):
+        '''
+        Buffer string s for output file key, and flush if the buffer is full
+        '''
+        self.buffers[key].append(s)
+        self.buffered_bytes[key] += len(s)
+        if self.buffered_bytes[key] >= self.buffer_size:
+            self.flush(key)
+
+    def flush(self, key):
+        '''
+        Write out the buffered data for output file key
+        '''
+        if not self.buffers[key]:
+            return
+        self._get_handle(key).write(self.compressor(''.join(self.buffers[key])))
+        self.buffers[key] = []
+        self.buffered_bytes[key] = 0
+
+    def _get_handle(self, key):
+        '''
+        Return an open handle for output file key, closing the least recently used handle
+        if the pool is full
+        '''
+        if key in self.handles:
+            fh = self.handles.pop(key)
+            self.handles[key] = fh
+            return fh
+
+        if len(self.handles) >= self.max_open:
+            lru_key, lru_fh = self.handles.popitem(last=False)
+            lru_fh.close()
+
+        # Truncate the first time the file is opened, append afterwards
+        if key in self.created:
+            fh = open(self.filenames[key], 'ab')
+        else:
+            fh = open(self.filenames[key], 'wb')
+            self.created.add(key)
+        self.handles[key] = fh
+        return fh
+
+    def close(self):
+        '''
+        Flush all buffers and close all file handles
+        '''
+        for key in self.filenames:
+            self.flush(key)
+            if self.compress == 'bgzf':
+                self._get_handle(key).write(filesys.BGZF_EOF)
+        for fh in self.handles.values():
+            fh.close()
+        self.handles.clear()
+
+def separate_samples(vcfin, out_prefix, preserve_all=False, samples=None,
+                     max_open=DEFAULT_MAX_OPEN, buffer_size=DEFAULT_BUFFER_SIZE, compress=None):
     '''
     Read vcf file, and separate all samples into separate vcf files
+    If samples is given, only output vcf files for the samples in the collection
     '''
-    fouts = {}
+    fouts = SampleOutputPool(max_open=max_open, buffer_size=buffer_size, compress=compress)
+    out_ext = 'vcf' + filesys.COMPRESSION_EXT[compress]
+    format2field2indx = {}
     headerslist = []
     # Read through file
     for line in vcfin:
-        
+
         # Headers: store into list of headers, to be outputted later
         if line[0:2] == '##':
             headerslist.append(line)
             continue
-        
+
         # Column Labels: print and build column-to-column_number mapping
         if line[0] == '#':
             colname2colnum, sample_names, sample_indexes = build_colname2colnum(line[1:].strip())
+            if samples is not None:
+                samples = set(samples)
+                sample_names = [s for s in sample_names if s in samples]
+            format_colnum = colname2colnum['FORMAT']
+            sample_colnums = [(s, colname2colnum[s]) for s in sample_names]
 
             # Start list of column descriptors until the "FORMAT" column
             new_coldesc = []
@@ -60,56 +161,91 @@ def separate_samples(vcfin, out_prefix, preserve_all=False):
                 new_coldesc.append(colname)
                 if colname == 'FORMAT':
                     break
-            
+
             # Iterate through each sample name
             for sample in sample_names:
 
-                # Create a file output handle for each sample
-                fouts[sample] = open('.'.join([out_prefix, sample, 'vcf']), 'w')
-                
+                # Register a buffered output file for each sample
+                fouts.add(sample, '.'.join([out_prefix, sample, out_ext]))
+
                 # Output vcf headers
-                fouts[sample].write(''.join(headerslist))
+                fouts.write(sample, ''.join(headerslist))
 
                 # Output column descriptors
-                fouts[sample].write('%s\n' % ('\t'.join(new_coldesc + [sample])))
-                
+                fouts.write(sample, '%s\n' % ('\t'.join(new_coldesc + [sample])))
+
             continue
 
 
         # Data
         la = line.strip().split('\t')
 
-        # Parse line
-        allele_ref = la[colname2colnum['REF']]
-        allele_alt = la[colname2colnum['ALT']]
-        genotype_field2indx = build_genotype_field2indx(la[colname2colnum['FORMAT']])
+        # Parse line, reusing the genotype field mapping for previously seen FORMAT strings
+        format_str = la[format_colnum]
+        if format_str not in format2field2indx:
+            format2field2indx[format_str] = build_genotype_field2indx(format_str)
+        gt_indx = format2field2indx[format_str].get('GT')
+
+        # Start of output row, shared by all the samples
+        row_output_prefix = '\t'.join(la[:format_colnum + 1])
 
-        # Start list of columns
-        row_output_list = la[:colname2colnum['FORMAT'] + 1]
-        
         # Iterate through list of samples
-        for samplename in sample_names:
-            sample_idx = colname2colnum[samplename]
+        for samplename, sample_idx in sample_colnums:
             sample_genotype_info_str = la[sample_idx]
-            sample_genotype_info = sample_genotype_info_str.split(':')
 
             # If all positions should be outputted, then just loop through and output everything
             if preserve_all:
-                fouts[samplename].write('%s\n' % ('\t'.join(row_output_list + [sample_genotype_info_str])))
+                fouts.write(samplename, '%s\t%s\n' % (row_output_prefix, sample_genotype_info_str))
                 continue
 
             # If 'no call', and don't output anything
-            if sample_genotype_info_str == './.' or sample_genotype_info[genotype_field2indx['GT']] == './.':
+            sample_genotype = sample_genotype_info_str.split(':')[gt_indx]
+            if sample_genotype_info_str == './.' or sample_genotype == './.':
                 continue
 
             # Check if variant, and output variants only to file
-            sample_genotype = sample_genotype_info[genotype_field2indx['GT']]
             if sample_genotype != '0/0':
-                fouts[samplename].write('%s\n' % ('\t'.join(row_output_list + [sample_genotype_info_str])))
+                fouts.write(samplename, '%s\t%s\n' % (row_output_prefix, sample_genotype_info_str))
+
+    # Flush and close all file handles for each sample
+    fouts.close()
 
-    # Close all file handles for each sample
-    for fh in fouts.values():
-        fh.close()
+def read_sample_names(vcf_filename):
+    '''
+    Read the header line of a vcf file and return the list of sample names
+    '''
+    fin = filesys.get_file_read_handle(vcf_filename)
+    for line in fin:
+        if line[0:2] != '##':
+            break
+    fin.close()
+    colname2colnum, sample_names, sample_indexes = build_colname2colnum(line[1:].strip())
+    return sample_names
+
+def _separate_samples_worker(vcf_filename, out_prefix, samples, kwargs):
+    '''
+    Worker process function: separate a subset of the samples from the vcf file
+    '''
+    fin = filesys.get_file_read_handle(vcf_filename)
+    separate_samples(fin, out_prefix, samples=samples, **kwargs)
+    fin.close()
+
+def separate_samples_parallel(vcf_filename, out_prefix, num_workers, **kwargs):
+    '''
+    Spread the sample columns across num_workers processes.
+    Each worker reads the whole vcf file, and outputs only its own subset of the samples.
+    Keyword arguments are passed on to separate_samples
+    '''
+    sample_names = read_sample_names(vcf_filename)
+    sample_groups = [sample_names[i::num_workers] for i in range(num_workers)]
+    pool = multiprocessing.Pool(processes=num_workers)
+    results = [pool.apply_async(_separate_samples_worker, (vcf_filename, out_prefix, group, kwargs))
+               for group in sample_groups if group]
+    pool.close()
+    for result in results:
+        # Re-raise any exceptions raised in the workers
+        result.get()
+    pool.join()
 
 
 def main():
@@ -125,8 +261,23 @@ def main():
     ap.add_argument('-o', '--out-prefix',
                     help='Output prefix',
                     type=str)
+    ap.add_argument('-n', '--max-open-files',
+                    help='Maximum number of output files to keep open at once',
+                    type=int,
+                    default=DEFAULT_MAX_OPEN)
+    ap.add_argument('-b', '--buffer-size',
+                    help='Number of bytes to buffer per sample before writing to file',
+                    type=int,
+                    default=DEFAULT_BUFFER_SIZE)
+    ap.add_argument('-z', '--compress',
+                    help='Compress the output vcf files',
+                    choices=['gzip', 'bgzf'])
+    ap.add_argument('-p', '--processes',
+                    help='Number of worker processes to spread the samples across. Requires a vcf file, not stdin',
+                    type=int,
+                    default=1)
     params = ap.parse_args()
-    
+
     if params.out_prefix:
         out_prefix = params.out_prefix
     else:
@@ -135,9 +286,20 @@ def main():
         else:
             out_prefix = 'vcf_file'
 
+    kwargs = {'preserve_all': params.preserve_all_positions,
+              'max_open': params.max_open_files,
+              'buffer_size': params.buffer_size,
+              'compress': params.compress}
+
     # Separate vcf file's samples and create a vcf file for each sample
-    separate_samples(params.vcf_file, out_prefix, preserve_all=params.preserve_all_positions)
-    params.vcf_file.close()
+    if params.processes > 1:
+        if params.vcf_file == sys.stdin:
+            ap.error('Multiple processes require an input vcf file')
+        params.vcf_file.close()
+        separate_samples_parallel(params.vcf_file.name, out_prefix, params.processes, **kwargs)
+    else:
+        separate_samples(params.vcf_file, out_prefix, **kwargs)
+        params.vcf_file.close()
 
 
 if __name__ == '__main__':
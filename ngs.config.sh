@@ -57,6 +57,19 @@ export UCSC_DBSNP=path/to/snp135.txt
 export SURESELECT_BED=path/to/SureSelect_All_Exon_50mb_with_annotation_hg19_bed
 export SURESELECT_INTERVAL=path/to/SureSelect_All_Exon_50mb_with_annotation_hg19_bed.exceptChrUn.intervals
 
+# Profiling of the python scripts run by python_ngs.sh
+#   NGS_PROFILE=1 writes a json profile sidecar of each run to NGS_PROFILE_DIR
+#   NGS_PROFILE_DIR, when unset, is a new directory output_prefix.profile/date.pid for each
+#     pipeline run, summarized in profile.report.tsv at the end of the run
+#   NGS_PROFILE_SAMPLE=0.005 also samples the python call stacks every 5 ms
+export NGS_PROFILE=${NGS_PROFILE:-0}
+export NGS_PROFILE_DIR=${NGS_PROFILE_DIR:-}
+export NGS_PROFILE_SAMPLE=${NGS_PROFILE_SAMPLE:-}
+
+# Socket of a running ngsd worker (see modules/util/ngsd.py), through which python_ngs.sh runs
+# the python scripts, i.e. $HOME/.ngsd.sock.  Scripts are run directly when unset
+export NGSD_SOCKET=${NGSD_SOCKET:-}
+
 #=====================================================================================
 # Developers Only
 
@@ -38,6 +38,9 @@ MINCOVT=$6
 SNPEFFV=$7
 TSINGLE=$8
 
+# Collect the python profiles of the run under the output prefix
+ngs_profile_init $OUT_PRE
+
 # Create temporary directory
 RNUM=$RANDOM
 TMPDIR=tmp.bam2maf.$RNUM
@@ -54,6 +57,8 @@ $NGS_ANALYSIS_DIR/pipelines/ngs.pipe.mpileup.ge.sh $TMPDIR/bamfileslist $REFEREN
 create_dir varscan
 SOMATIC_PVAL=0.05
 GENE2ENTREZ=$NGS_ANALYSIS_DIR/resources/gene2entrezid
+MANIFEST=$TMPDIR/vcf2maf.manifest
+SNPEFF_JOBS=
 for bamfiles in `sed 's/\t/:/g' $BAMLIST`; do
   SAMPL=`echo $bamfiles | cut -f1 -d':'`
   BAM_N=`echo $bamfiles | cut -f2 -d':'`
@@ -106,72 +111,66 @@ for bamfiles in `sed 's/\t/:/g' $BAMLIST`; do
           varscan/$SAMPL.varscan.indel.dp10.clean.somatic.vcf                   \
           $SNPEFFV
 
-  # Convert snp to maf
-  $QSUB vcf2maf                                                                 \
-        all.q                                                                   \
-        1                                                                       \
-        snpeff.snp.$SAMPL                                                       \
-        n                                                                       \
-        `which python_ngs.sh` $NGS_ANALYSIS_DIR/modules/somatic/vcf2maf.py      \
-          varscan/$SAMPL.varscan.snp.somaticfilter.somatic.snpeff.vcf           \
-          $SAMPL                                                                \
-          $GENE2ENTREZ                                                          \
-          -e                                                                    \
-          -t varscan                                                            \
-          -o varscan/$SAMPL.varscan.snp.somaticfilter.somatic.snpeff.vcf.maf
+  # Add the annotated vcf files to the vcf2maf manifest
+  printf "$SAMPL\tvarscan/$SAMPL.varscan.snp.somaticfilter.somatic.snpeff.vcf\n" >> $MANIFEST
+  printf "$SAMPL\tvarscan/$SAMPL.varscan.indel.dp10.clean.somatic.snpeff.vcf\n" >> $MANIFEST
+  SNPEFF_JOBS=$SNPEFF_JOBS,snpeff.snp.$SAMPL,snpeff.indel.$SAMPL
+done
+SNPEFF_JOBS=${SNPEFF_JOBS:1}
 
-  # Convert indel to maf
+# Convert the vcf files of all the samples to a single sorted maf in one job
+VCF2MAF_PROCS=4
+if [ -z $TSINGLE ]; then
   $QSUB vcf2maf                                                                 \
         all.q                                                                   \
-        1                                                                       \
-        snpeff.indel.$SAMPL                                                     \
+        $VCF2MAF_PROCS                                                          \
+        $SNPEFF_JOBS                                                            \
         n                                                                       \
         `which python_ngs.sh` $NGS_ANALYSIS_DIR/modules/somatic/vcf2maf.py      \
-          varscan/$SAMPL.varscan.indel.dp10.clean.somatic.snpeff.vcf            \
-          $SAMPL                                                                \
+          -m $MANIFEST                                                          \
           $GENE2ENTREZ                                                          \
           -e                                                                    \
           -t varscan                                                            \
-          -o varscan/$SAMPL.varscan.indel.dp10.clean.somatic.snpeff.vcf.maf
-done
+          -p $VCF2MAF_PROCS                                                     \
+          -o $OUT_PRE.maf
+  VCF2MAF_JOB=vcf2maf
 
 # If select single transcript per gene
-if [ ! -z $TSINGLE ]; then
-  # Select transcript per gene
+else
+  # Select transcript per gene, counting the vcf files in parallel
   t2l=$NGS_ANALYSIS_DIR/resources/ensembl.GRCh37.67.transcripts.bed.lengths.pkl
+  TCOUNT_PROCS=4
   $QSUB select.single.transcript                                                \
         all.q                                                                   \
-	1                                                                       \
-	vcf2maf                                                                 \
+	$TCOUNT_PROCS                                                           \
+	$SNPEFF_JOBS                                                            \
 	n                                                                       \
 	$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh                            \
           vcf_snpeff_count_transcript_effects.py                                \
             -l $t2l                                                             \
+            -p $TCOUNT_PROCS                                                    \
             -o $OUT_PRE.tcount                                                  \
             varscan/*snpeff.vcf
 
-  # Generate maf for each sample based on the selected transcripts
-  for bamfiles in `sed 's/\t/:/g' $BAMLIST`; do
-    SAMPL=`echo $bamfiles | cut -f1 -d':'`
-    SNPVCF=`echo varscan/$SAMPL.varscan.snp.somaticfilter.somatic.snpeff.vcf`
-    INDVCF=`echo varscan/$SAMPL.varscan.indel.dp10.clean.somatic.snpeff.vcf`
-    for file in '$SNPVCF $INDVCF'; do
-      $QSUB vcf2maf.selected                                                    \
-            all.q                                                               \
-            1                                                                   \
-            select.single.transcript                                            \
-            n                                                                   \
-            $NGS_ANALYSIS_DIR/modules/util/python_ngs.sh vcf2maf.py             \
-              $file                                                             \
-              $SAMPL                                                            \
-              $GENE2ENTREZ                                                      \
-              -s $OUT_PRE.tcount.g2t.pkl                                        \
-              -t varscan                                                        \
-              -o $file.maf
-    done
-  done
+  # Generate the maf of all the samples based on the selected transcripts
+  $QSUB vcf2maf.selected                                                        \
+        all.q                                                                   \
+        $VCF2MAF_PROCS                                                          \
+        select.single.transcript                                                \
+        n                                                                       \
+        $NGS_ANALYSIS_DIR/modules/util/python_ngs.sh vcf2maf.py                 \
+          -m $MANIFEST                                                          \
+          $GENE2ENTREZ                                                          \
+          -s $OUT_PRE.tcount.g2t.pkl                                            \
+          -t varscan                                                            \
+          -p $VCF2MAF_PROCS                                                     \
+          -o $OUT_PRE.maf
+  VCF2MAF_JOB=vcf2maf.selected
 fi
 
+# Summarize the python profiles of the run
+ngs_profile_report $VCF2MAF_JOB
+
 
 exit
 
@@ -22,7 +22,7 @@ NUM_THREADS=$3
 NUM_THREADS=${NUM_THREADS:=20}
 
 # Samplesheet sanity check
-$PYTHON $NGS_ANALYSIS_DIR/modules/seq/illumina_samplesheet_sanitycheck.py $SAMPLESHEET
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/seq/illumina_samplesheet_sanitycheck.py $SAMPLESHEET
 
 # Check if tool ran successfully
 assert_normal_exit_status $? "Invalid samplesheet"
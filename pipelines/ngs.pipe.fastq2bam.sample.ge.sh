@@ -31,7 +31,7 @@ SAMPLE=`echo $SAMPLEDIR | cut -f2- -d'_'`
 FASTQ_PE_LIST_FILE=$SAMPLEDIR/list.fastq.pe
 
 # Get list of all paired-end fastq files in the sample directory
-$PYTHON $NGS_ANALYSIS_DIR/modules/seq/detect_fastq_pe_file_pairs.py $SAMPLEDIR > $FASTQ_PE_LIST_FILE
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/seq/detect_fastq_pe_file_pairs.py $SAMPLEDIR > $FASTQ_PE_LIST_FILE
 
 # Generate raw bam files for each pair of PE reads
 for pe in `sed 's/\t/:/' $FASTQ_PE_LIST_FILE`; do
@@ -24,7 +24,7 @@ REFERENCE=$3
 #FASTQ_R2=`ls $SAMPLEDIR/*_*_L???_R2_???.fastq.gz` # Sample_AAAAAA_L00N_R2_001.fastq.gz
 
 # Set up pipeline variables
-SAMPLE=`$PYTHON $NGS_ANALYSIS_DIR/modules/util/illumina_fastq_extract_samplename.py $FASTQ_R1`
+SAMPLE=`$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/util/illumina_fastq_extract_samplename.py $FASTQ_R1`
 FASTQ_PE=`echo $FASTQ_R1 | sed 's/R1/PE/'`
 FASTQ_SE=`echo $FASTQ_R1 | sed 's/R1/SE/'`
 FASTQ_ME=`echo $FASTQ_R1 | sed 's/R1/ME/'`
@@ -20,7 +20,7 @@ FASTQ_R1=$1
 REFERENCE=$2
 
 # Set up pipeline variables
-SAMPLE=`$PYTHON $NGS_ANALYSIS_DIR/modules/util/illumina_fastq_extract_samplename.py $FASTQ_R1`
+SAMPLE=`$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/util/illumina_fastq_extract_samplename.py $FASTQ_R1`
 
 #==[ Trim ]=========================================================================#
 
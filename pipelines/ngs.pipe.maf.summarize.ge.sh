@@ -21,6 +21,9 @@ IN_MAF=$1
 # Set output filenames
 OUTPRE=$IN_MAF
 
+# Collect the python profiles of the run under the output prefix
+ngs_profile_init $OUTPRE
+
 # Run summaries
 QSUB_WRAPPER=$NGS_ANALYSIS_DIR/modules/util/qsub_wrapper.sh
 PYTHON=$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh
@@ -53,3 +56,6 @@ $QSUB_WRAPPER maf.summary.pos.gene                                             \
                         $IN_MAF                                                \
                         -t gene                                                \
                         -o $OUTPRE.summary.gene
+
+# Summarize the python profiles of the run
+ngs_profile_report maf.summary.pos.simple,maf.summary.pos.detailed,maf.summary.pos.gene
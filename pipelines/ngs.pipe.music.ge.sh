@@ -39,12 +39,15 @@ assert_file_exists_w_content $REFEREN
 TMPDIR=tmp.music.$RANDOM
 mkdir $TMPDIR
 
+# Collect the python profiles of the run under the output directory
+ngs_profile_init $OUT_DIR
+
 #==[ Run MuSiC ]===============================================================================#
 
 # Select genes from ensembl exons that are in maf file
 echo 'Generating roi subset for genes in the maf file'
 #grep -w -f <(cut -f1 $MAFFILE | sed 1d | sort -u | sed '/^$/d') $ROI_BED > $TMPDIR/roi.bed
-cut -f1 $MAFFILE | sed 1d | sort -u | sed '/^$/d' | $PYTHON $NGS_ANALYSIS_DIR/modules/util/grep_w_column.py - $ROI_BED -k 3 > $TMPDIR/roi.bed
+cut -f1 $MAFFILE | sed 1d | sort -u | sed '/^$/d' | $NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/util/grep_w_column.py - $ROI_BED -k 3 > $TMPDIR/roi.bed
 
 # Check if tool ran successfully
 assert_normal_exit_status $? "Error generating subset of roi for genes in the maf file. Exiting"
@@ -74,6 +77,9 @@ music.smg.sh $OUT_DIR/gene_mrs $OUT_DIR 20
 # Check if tool ran successfully
 assert_normal_exit_status $? "Error computing smg. Exiting"
 
+# Summarize the python profiles of the run
+ngs_profile_report
+
 exit
 
 # Merge maf gene summary with the p-values from smg
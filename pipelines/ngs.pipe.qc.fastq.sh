@@ -17,21 +17,27 @@ usage 2 $# $0
 
 FASTQ_R1=$1
 FASTQ_R2=$2
-SAMPLE_PREFIX=`$PYTHON $NGS_ANALYSIS_DIR/modules/util/illumina_fastq_extract_samplename.py $FASTQ_R1`
+SAMPLE_PREFIX=`$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/util/illumina_fastq_extract_samplename.py $FASTQ_R1`
+
+# Collect the python profiles of the run under the sample prefix
+ngs_profile_init $SAMPLE_PREFIX
 
 #==[ Get fastq stats ]=========================================================================#
 
-$PYTHON $NGS_ANALYSIS_DIR/modules/seq/fastq_stats.py $FASTQ_R1 &
-$PYTHON $NGS_ANALYSIS_DIR/modules/seq/fastq_stats.py $FASTQ_R2 &
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/seq/fastq_stats.py $FASTQ_R1 &
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/seq/fastq_stats.py $FASTQ_R2 &
 wait
 
 #==[ Get fastq quality score summmary ]========================================================#
 
-$PYTHON $NGS_ANALYSIS_DIR/modules/seq/fastq_scores.py $FASTQ_R1 &
-$PYTHON $NGS_ANALYSIS_DIR/modules/seq/fastq_scores.py $FASTQ_R2 &
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/seq/fastq_scores.py $FASTQ_R1 &
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/seq/fastq_scores.py $FASTQ_R2 &
 wait
 
 #==[ Run FastQC ]==============================================================================#
 $NGS_ANALYSIS_DIR/modules/seq/fastqc.sh $FASTQ_R1 1 &
 $NGS_ANALYSIS_DIR/modules/seq/fastqc.sh $FASTQ_R2 1 &
 wait
+
+# Summarize the python profiles of the run
+ngs_profile_report
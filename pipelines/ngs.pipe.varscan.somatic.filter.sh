@@ -41,9 +41,11 @@ fi
 PREFIX_SNP=`filter_ext $SNPVCF 1`
 PREFIX_IND=`filter_ext $INDVCF 1`
 
+# Collect the python profiles of the run under the output prefix
+ngs_profile_init $PREFIX_SNP
 
 # Filter indel for depth
-$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/vcf_somatic_filter.py         \
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh vcf_somatic_filter.py      \
           $PREFIX_IND.vcf                                               \
           --min-dp-tumor $MINCOV                                        \
           --min-dp-normal $MINCOV                                       \
@@ -53,7 +55,7 @@ $PYTHON $NGS_ANALYSIS_DIR/modules/somatic/vcf_somatic_filter.py         \
 varscan.somaticfilter.vcf.sh $SNPVCF $PREFIX_IND.dp10.vcf $S_PVAL $MINCOV
 
 # Filter snps for somatic
-$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/vcf_somatic_filter.py         \
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh vcf_somatic_filter.py      \
           $PREFIX_SNP.somaticfilter.vcf                                 \
           --min-dp-tumor $MINCOV                                        \
           --min-dp-normal $MINCOV                                       \
@@ -61,16 +63,15 @@ $PYTHON $NGS_ANALYSIS_DIR/modules/somatic/vcf_somatic_filter.py         \
           -t somatic                                                    \
           -o $PREFIX_SNP.somaticfilter.somatic.vcf
 
-# Clean up indel file
-$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/vcf_varscan_clean_indel.py    \
+# Clean up indel file, and filter indel for somatic
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh vcf_varscan_postprocess.py \
           $PREFIX_IND.dp10.vcf                                          \
-          -o $PREFIX_IND.dp10.clean.vcf
-
-# Filter indel for somatic
-$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/vcf_somatic_filter.py         \
-          $PREFIX_IND.dp10.clean.vcf                                    \
+          --clean-indel                                                 \
           -t somatic                                                    \
           --min-dp-tumor $MINCOV                                        \
           --min-dp-normal $MINCOV                                       \
           --somatic-p-val $S_PVAL                                       \
           -o $PREFIX_IND.dp10.clean.somatic.vcf
+
+# Summarize the python profiles of the run
+ngs_profile_report
@@ -31,6 +31,9 @@ INDEL_VCF=$2
 SNPEFF_GENOME_VERSION=$3
 PREFIX_INDEL=`filter_ext $INDEL_VCF 1`
 
+# Collect the python profiles of the run under the output prefix
+ngs_profile_init $PREFIX_INDEL
+
 # Create temporary directory
 TMPDIR=tmp.vcf2maf.somaticindeldetector.$RANDOM
 mkdir $TMPDIR
@@ -47,10 +50,13 @@ $NGS_ANALYSIS_DIR/modules/somatic/vcf_gatk_somaticindel_filter.somatic.sh $PREFI
 $NGS_ANALYSIS_DIR/modules/annot/snpeff.eff.sh $PREFIX_INDEL.somatic.vcf $SNPEFF_GENOME_VERSION
 
 # Convert to maf format
-$PYTHON $NGS_ANALYSIS_DIR/modules/somatic/vcf2maf.py                                       \
+$NGS_ANALYSIS_DIR/modules/util/python_ngs.sh $NGS_ANALYSIS_DIR/modules/somatic/vcf2maf.py \
           $PREFIX_INDEL.somatic.snpeff.vcf                                                 \
           $SAMPLE_ID                                                                       \
           $GENE2ENTREZ                                                                     \
           -e                                                                               \
           -t gatk_somatic_indel_detector                                                   \
           -o $PREFIX_INDEL.somatic.snpeff.vcf.maf
+
+# Summarize the python profiles of the run
+ngs_profile_report